@@ -0,0 +1,450 @@
+# ./bench.py
+"""
+無螢幕 benchmark / 回歸測試。
+
+e.x.
+    python bench.py forward --source ./records/match01.mp4 --frames 2000
+    python bench.py forward --source ./records/imgs --engine none --fps 144
+    python bench.py forward --source ./records/imgs --dump ref.npz
+    python bench.py forward --source ./records/imgs --compare ref.npz
+    python bench.py forward --source ./records/imgs --engine models/multi.trt --input_size 320
+    python bench.py restart --source ./records/imgs --engine none --cycles 20
+    python bench.py capture --source ./records/imgs --fps 240 --work_ms 6
+    python bench.py preview --frames 500
+    python bench.py logging --calls 20000
+"""
+import argparse
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+import yaml
+
+from main import Main
+from utils.lifecycle import State
+from utils.frame_source import CaptureThread, ReplaySource
+
+
+class _NullMouse:
+    def send_mouse_move(self, dx, dy, silent=False):
+        return
+
+    def close(self):
+        return
+
+    def open(self):
+        return
+
+
+class _NullEngine:
+    """不需要 GPU 的假 engine，只量測擷取與前後處理的開銷。"""
+
+    def forward(self, image):
+        return (
+            np.zeros((0, 4), dtype=np.float32),
+            np.zeros((0,), dtype=np.float32),
+            np.zeros((0,), dtype=np.float32),
+        )
+
+    def close(self):
+        return
+
+
+class BenchMain(Main):
+    """不接滑鼠與鍵盤監聽的 Main，其餘流程（擷取、推論、選目標）完全相同。"""
+
+    def __init__(self, args: dict, engine_path: str | None, engine_load_ms: float = 0.0):
+        self._engine_path = engine_path
+        self._engine_load_ms = engine_load_ms
+        self.engine_loads = 0
+        super().__init__(args=args, no_gui=True)
+
+    def init_mouse(self):
+        self.m = _NullMouse()
+
+    def init_engine(self):
+        self.engine_loads += 1
+        if self._engine_path == "none":
+            time.sleep(self._engine_load_ms / 1000.0)  # 模擬載入 engine 的時間
+            self.engine = _NullEngine()
+            return
+        super().init_engine()
+
+    def init_listeners(self):
+        self.down = set()
+        self.kb_Listener = self.listener = None
+        self.aim = True
+        self.aiming = False
+        self.silent_aim = False
+        self.silent_aiming = False
+
+
+def _percentiles(ms: np.ndarray, fps: bool = True) -> str:
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    txt = (
+        f"mean {ms.mean():.3f} ms | p50 {p50:.3f} | p90 {p90:.3f} | p99 {p99:.3f} "
+        f"| max {ms.max():.3f}"
+    )
+    if fps:
+        txt += f" | {1000.0 / ms.mean():.1f} FPS"
+    return txt
+
+
+def _load_args(opt) -> dict:
+    with open(opt.cfg, "r", encoding="utf-8") as f:
+        args = yaml.safe_load(f)
+    args = copy.deepcopy(args)
+    args["camera"] = "replay"
+    args["replay"] = {"path": opt.source, "fps": opt.fps, "loop": True}
+    args["capture_thread"] = opt.threaded
+    args["log_level"] = opt.log
+    args["debug"] = False
+    if opt.engine and opt.engine != "none":
+        args["model"]["file_path"] = opt.engine
+    if getattr(opt, "input_size", None) is not None:
+        args["model"]["input_size"] = opt.input_size
+    return args
+
+
+def bench_forward(opt):
+    main = BenchMain(_load_args(opt), opt.engine)
+    main.cam.start()
+
+    # 攔截 engine 輸出，用於 dump / compare
+    dets = []
+    forward = main.engine.forward
+
+    def _record(img):
+        out = forward(img)
+        boxes, scores, cls_inds = out
+        dets.append(
+            np.concatenate(
+                [
+                    np.reshape(boxes, (-1, 4)),
+                    np.reshape(scores, (-1, 1)),
+                    np.reshape(cls_inds, (-1, 1)),
+                ],
+                axis=1,
+            )
+        )
+        return out
+
+    main.engine.forward = _record
+
+    for _ in range(opt.warmup):
+        main.forward()
+    dets.clear()
+    if isinstance(main.cam, ReplaySource):
+        main.cam.rewind()
+
+    times = np.empty(opt.frames, dtype=np.float64)
+    for i in range(opt.frames):
+        t0 = time.perf_counter()
+        main.forward()
+        times[i] = (time.perf_counter() - t0) * 1000.0
+
+    replay = main.cam.source if isinstance(main.cam, CaptureThread) else main.cam
+    print(f"source: {opt.source} ({len(replay)} frames cached), engine: {opt.engine}")
+    print(f"Main.forward x{opt.frames}: {_percentiles(times)}")
+    if isinstance(main.cam, CaptureThread):
+        print(f"capture: {main.cam.stats()}")
+    if main.change_detector is not None:
+        print(f"change detector: {main.change_detector.stats()}")
+
+    if opt.dump:
+        np.savez_compressed(opt.dump, *dets)
+        print(f"detections dumped to {opt.dump}")
+    if opt.compare:
+        ref = np.load(opt.compare)
+        ref = [ref[f"arr_{i}"] for i in range(len(ref.files))]
+        n = min(len(ref), len(dets))
+        bad = [
+            i for i in range(n)
+            if ref[i].shape != dets[i].shape or not np.allclose(ref[i], dets[i], atol=opt.atol)
+        ]
+        print(f"compare: {n - len(bad)}/{n} frames match (atol={opt.atol})")
+        if bad:
+            print(f"first mismatching frames: {bad[:10]}")
+            raise SystemExit(1)
+
+    main.cam.stop()
+
+
+def bench_restart(opt):
+    """反覆 start / stop，量測 stop 到 STOPPED、start 到第一幀的時間，並確認元件沒有重建。"""
+    main = BenchMain(_load_args(opt), opt.engine, engine_load_ms=opt.engine_ms)
+    if main.lifecycle.state is not State.READY:
+        raise SystemExit(f"init failed: {main.lifecycle.error!r}")
+    engine, cam = main.engine, main.cam
+
+    first_ms = np.empty(opt.cycles, dtype=np.float64)
+    stop_ms = np.empty(opt.cycles, dtype=np.float64)
+    for i in range(opt.cycles):
+        t = threading.Thread(target=main.start, name="bench-run")
+        t.start()
+        # 第一幀出現之前不會有 first_frame_ms；等它出現再多跑 run_ms
+        if not main.lifecycle.wait_for(State.RUNNING, timeout=5.0):
+            raise SystemExit(f"cycle {i}: did not start ({main.lifecycle.state.value})")
+        deadline = time.perf_counter() + 5.0
+        while main.lifecycle.first_frame_ms is None and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        time.sleep(opt.run_ms / 1000.0)
+
+        t0 = time.perf_counter()
+        if not main.stop(timeout=Main.STOP_TIMEOUT):
+            raise SystemExit(f"cycle {i}: stop timed out")
+        stop_ms[i] = (time.perf_counter() - t0) * 1000.0
+        t.join()
+        if main.lifecycle.first_frame_ms is None:
+            raise SystemExit(f"cycle {i}: no frame within 5 s")
+        first_ms[i] = main.lifecycle.first_frame_ms
+
+    print(f"source: {opt.source}, engine: {opt.engine} (simulated load {opt.engine_ms:.0f} ms)")
+    print(f"start -> first frame x{opt.cycles}: {_percentiles(first_ms, fps=False)}")
+    print(f"stop -> stopped      x{opt.cycles}: {_percentiles(stop_ms, fps=False)}")
+    warm = main.engine is engine and main.cam is cam
+    print(f"engine loads: {main.engine_loads}, components reused: {warm}, state: {main.lifecycle.state.value}")
+    main.cleanup()
+    if not warm or main.engine_loads != 1:
+        raise SystemExit(1)
+
+
+def bench_capture(opt):
+    """
+    CaptureThread 檢查：消費端每幀模擬 work_ms 的推論時間，
+    確認序號遞增、帳目 produced == consumed + dropped (+ 尚未取走的 1 幀)。
+    """
+    replay = ReplaySource(opt.source, (0, 0, opt.size, opt.size), fps=opt.fps)
+    cam = CaptureThread(replay)
+    cam.start()
+
+    last_seq = 0
+    lat = []
+    t0 = time.perf_counter()
+    for _ in range(opt.frames):
+        frame, ts, seq = cam.grab()
+        if frame is None:
+            continue
+        assert seq > last_seq, f"sequence went backwards: {last_seq} -> {seq}"
+        last_seq = seq
+        lat.append((time.perf_counter() - ts) * 1000.0)
+        time.sleep(opt.work_ms / 1000.0)
+    elapsed = time.perf_counter() - t0
+    cam.stop()
+
+    st = cam.stats()
+    pending = st["produced"] - st["consumed"] - st["dropped"]
+    print(f"capture x{opt.frames} in {elapsed:.2f}s: {st}, pending {pending}")
+    print(f"capture -> consume latency: {_percentiles(np.asarray(lat), fps=False)}")
+    assert pending in (0, 1), "frame accounting does not add up"
+
+
+def _legacy_draw_dets(page, qimg, boxes, scores, cls_inds):
+    from PyQt6.QtCore import Qt, QRect
+    from PyQt6.QtGui import QPainter, QPen, QColor, QFontMetrics
+
+    p = QPainter(qimg)
+    thickness = max(2, int(min(qimg.width(), qimg.height()) * 0.003))
+    p.setFont(page._bbox_font)
+    fm = QFontMetrics(page._bbox_font)
+    for i in range(len(boxes)):
+        x1, y1, x2, y2 = map(int, boxes[i][:4])
+        ci = int(cls_inds[i])
+        color = page._det_colors[ci % len(page._det_colors)]
+        p.setPen(QPen(color, thickness))
+        p.setBrush(Qt.BrushStyle.NoBrush)
+        p.drawRect(x1, y1, x2 - x1, y2 - y1)
+        lbl = f"{ci} {float(scores[i]):.2f}"
+        rect = QRect(x1, max(0, y1 - fm.height() - 4), fm.horizontalAdvance(lbl) + 8, fm.height() + 4)
+        bg_color = QColor(color)
+        bg_color.setAlpha(160)
+        p.fillRect(rect, bg_color)
+        p.setPen(Qt.GlobalColor.white)
+        p.drawText(rect.adjusted(4, 0, 0, 0), Qt.AlignmentFlag.AlignVCenter, lbl)
+    p.end()
+
+
+def _legacy_on_image(page, img, boxes, scores, cls_inds):
+    """舊版 VisualizePage.on_image 的繪圖流程：全解析度 copy + 畫框，之後再縮放。"""
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QImage, QPixmap, QPainter, QFontMetrics
+
+    h, w = img.shape[:2]
+    if img.shape[2] == 4:
+        qimg = QImage(img.data, w, h, w * 4, QImage.Format.Format_RGB32).copy()
+    else:
+        rgb = img[:, :, ::-1].copy()
+        qimg = QImage(rgb.data, w, h, w * 3, QImage.Format.Format_RGB888).copy()
+    _legacy_draw_dets(page, qimg, boxes, scores, cls_inds)
+    qimg = qimg.scaled(
+        page.view.size(),
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.FastTransformation,
+    )
+    pix = QPixmap.fromImage(qimg)
+    painter = QPainter(pix)
+    fm = QFontMetrics(page._fps_font)
+    painter.setFont(page._fps_font)
+    painter.drawText(max(8, pix.width() - fm.horizontalAdvance("FPS: 0") - 12), fm.ascent() + 8, "FPS: 0")
+    painter.end()
+    if pix.width() != page.view.width() or pix.height() != page.view.height():
+        pix = pix.scaled(
+            page.view.size(),
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.FastTransformation,
+        )
+    page.view.setPixmap(pix)
+
+
+def bench_preview(opt):
+    """VisualizePage.on_image 每幀耗時（新舊繪圖流程比較），使用 offscreen Qt。"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication, QWidget
+    from ui.visualize_page import VisualizePage
+
+    app = QApplication.instance() or QApplication([])
+    parent = QWidget()
+    parent.args = {"model": {"conf": 0.0}}
+    page = VisualizePage(parent)
+    parent.resize(opt.view + 40, opt.view + 80)
+    parent.show()
+    page.resize(opt.view + 20, opt.view + 60)
+    page.view.setFixedSize(opt.view, opt.view)
+    app.processEvents()
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 255, (opt.size, opt.size, 4), dtype=np.uint8)
+    xy = rng.uniform(0, opt.size * 0.8, (opt.boxes, 2)).astype(np.float32)
+    boxes = np.concatenate([xy, xy + opt.size * 0.1], axis=1)
+    scores = np.full(opt.boxes, 0.9, dtype=np.float32)
+    cls_inds = rng.integers(0, 3, opt.boxes).astype(np.float32)
+
+    def run(fn):
+        for _ in range(20):
+            fn()
+        t = np.empty(opt.frames)
+        for i in range(opt.frames):
+            t0 = time.perf_counter()
+            fn()
+            t[i] = (time.perf_counter() - t0) * 1000.0
+        return t
+
+    before = run(lambda: _legacy_on_image(page, img, boxes, scores, cls_inds))
+    after = run(lambda: page.on_image(img, boxes, scores, cls_inds, fps=144.0))
+    print(f"on_image {opt.size}x{opt.size} -> view {opt.view}px, {opt.boxes} boxes")
+    print(f"  before: {_percentiles(before, fps=False)}")
+    print(f"  after:  {_percentiles(after, fps=False)}")
+
+
+def bench_logging(opt):
+    """
+    warning storm：在「frame 執行緒」上連續打同一個 warning，量測每次呼叫的延遲。
+    console 導到 devnull、檔案寫到暫存資料夾，比較同步 / queue / queue + rate limit，
+    最後一列是 FrameLogger.log（每幀 JSON lines）的成本。
+    """
+    import sys
+    import tempfile
+    from pathlib import Path
+    from utils.logger import get_logger, get_frame_logger, drain_logs, LoggerConfig
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_log_"))
+    modes = {
+        "sync": dict(),
+        "queue": dict(use_queue=True),
+        "queue+rate_limit": dict(use_queue=True, rate_limit=1.0),
+    }
+
+    def storm(log) -> np.ndarray:
+        t = np.empty(opt.calls)
+        for i in range(opt.calls):
+            t0 = time.perf_counter()
+            log.warning("No frame captured from camera.")
+            t[i] = (time.perf_counter() - t0) * 1e6
+        return t
+
+    stdout = sys.stdout
+    results = {}
+    for name, kw in modes.items():
+        sys.stdout = open(os.devnull, "w")  # handler 會抓住建立當下的 stdout
+        try:
+            log = get_logger(
+                LoggerConfig(
+                    name=f"bench-{name}", level="info", to_file=True, file_dir=tmp,
+                    file_name=name, use_color=True, **kw,
+                )
+            )
+        finally:
+            sys.stdout = stdout
+        results[name] = storm(log)
+        drain_logs()  # 等背景執行緒把 queue 寫完
+
+    # 每幀計時紀錄（log_frames）在 frame 執行緒上的成本
+    flog = get_frame_logger(tmp / "frames.jsonl")
+    t = np.empty(opt.calls)
+    for i in range(opt.calls):
+        t0 = time.perf_counter()
+        flog.log(seq=i, aim=True, skip=False, dets=3, cap_ms=0.41, inf_ms=3.2, total_ms=3.7, lat_ms=4.1)
+        t[i] = (time.perf_counter() - t0) * 1e6
+    results["frame_log"] = t
+    drain_logs()
+
+    print(f"logger.warning x{opt.calls} on the calling thread (us per call):")
+    for name, t in results.items():
+        p50, p99 = np.percentile(t, [50, 99])
+        print(f"  {name:<18} mean {t.mean():7.2f} | p50 {p50:7.2f} | p99 {p99:7.2f} | max {t.max():9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("forward", help="benchmark Main.forward on a replay source")
+    p.add_argument("--source", required=True, help="video file or image directory")
+    p.add_argument("--cfg", default="./config/default.yaml", help="config path")
+    p.add_argument("--engine", default=None, help="engine path, 'none' = no GPU")
+    p.add_argument("--input_size", type=int, default=None, help="engine input size (--input_sizes engines)")
+    p.add_argument("--frames", type=int, default=1000)
+    p.add_argument("--warmup", type=int, default=50)
+    p.add_argument("--fps", type=float, default=0, help="replay rate, 0 = unthrottled")
+    p.add_argument("--dump", default=None, help="save per-frame detections (.npz)")
+    p.add_argument("--compare", default=None, help="compare with a saved .npz")
+    p.add_argument("--atol", type=float, default=1e-3)
+    p.add_argument("--log", default="warning", help="log level")
+    p.add_argument("--threaded", action="store_true", help="capture on its own thread")
+    p.set_defaults(func=bench_forward)
+
+    p = sub.add_parser("restart", help="start/stop cycles: restart-to-first-frame and stop latency")
+    p.add_argument("--source", required=True, help="video file or image directory")
+    p.add_argument("--cfg", default="./config/default.yaml", help="config path")
+    p.add_argument("--engine", default="none", help="engine path, 'none' = no GPU")
+    p.add_argument("--engine_ms", type=float, default=500, help="simulated engine load time (engine none)")
+    p.add_argument("--cycles", type=int, default=20)
+    p.add_argument("--run_ms", type=float, default=50, help="time to run between start and stop")
+    p.add_argument("--fps", type=float, default=0, help="replay rate, 0 = unthrottled")
+    p.add_argument("--log", default="warning", help="log level")
+    p.add_argument("--threaded", action="store_true", help="capture on its own thread")
+    p.set_defaults(func=bench_restart)
+
+    p = sub.add_parser("capture", help="check CaptureThread on a replay source")
+    p.add_argument("--source", required=True, help="video file or image directory")
+    p.add_argument("--frames", type=int, default=500)
+    p.add_argument("--fps", type=float, default=240, help="replay rate, 0 = unthrottled")
+    p.add_argument("--work_ms", type=float, default=5.0, help="simulated inference time")
+    p.add_argument("--size", type=int, default=640)
+    p.set_defaults(func=bench_capture)
+
+    p = sub.add_parser("preview", help="micro-benchmark VisualizePage.on_image")
+    p.add_argument("--frames", type=int, default=500)
+    p.add_argument("--size", type=int, default=640, help="frame size")
+    p.add_argument("--view", type=int, default=400, help="view size")
+    p.add_argument("--boxes", type=int, default=10)
+    p.set_defaults(func=bench_preview)
+
+    p = sub.add_parser("logging", help="warning storm latency, sync vs queue logging")
+    p.add_argument("--calls", type=int, default=20000)
+    p.set_defaults(func=bench_logging)
+
+    opt = parser.parse_args()
+    opt.func(opt)
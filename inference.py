@@ -1,17 +1,31 @@
+import time
+
 import tensorrt as trt
 from cuda import cudart
 import numpy as np
 import cv2
 
 from utils import common
+from utils.engine_meta import (
+    END2END_ROLES,
+    check_io,
+    input_layout,
+    meta_path,
+    num_classes,
+    output_roles,
+    preprocess_spec,
+    read_meta,
+)
 
 
 class BaseEngine(object):
     def __init__(self, engine_path):
         self.mean = None
         self.std = None
-        self.n_classes = 3
-        self.class_names = ["enm", "down", "friend"]
+        # 建置時寫的 metadata（utils/engine_meta.py）；舊的 engine 沒有，沿用下面的預設
+        self.meta = read_meta(engine_path)
+        self.class_names = self.meta.get("class_names") or ["enm", "down", "friend"]
+        self.n_classes = num_classes(self.meta) or len(self.class_names)
 
         logger = trt.Logger(trt.Logger.ERROR)
         trt.init_libnvinfer_plugins(logger, "")
@@ -20,42 +34,27 @@ class BaseEngine(object):
         with open(engine_path, "rb") as f:
             self.engine = runtime.deserialize_cuda_engine(f.read())
 
-        # 讀模型輸入尺寸 (CHW 或 NCHW 的 HW)
+        # 讀模型輸入 layout (CHW / NCHW 的 HW，HWC / NHWC 則在通道前)
         in_name0 = self.engine.get_tensor_name(0)
         in_shape0 = list(self.engine.get_tensor_shape(in_name0))
-        self.imgsz = in_shape0[-2:]  # H, W
+        self.layout = (self.meta.get("input") or {}).get("layout") or input_layout(in_shape0)
 
         self.context = self.engine.create_execution_context()
+        # CUDA stream（切換 optimization profile 也走這個 stream）
+        self.stream = cudart.cudaStreamCreate()[1]
+
+        # 每個輸入大小對應一個 optimization profile（export.py --input_sizes），靜態 engine 只有一個
+        self.dynamic = any(d < 0 for d in in_shape0)
+        self.profiles = self._input_profiles(in_name0, in_shape0)
+        self.sizes = sorted(self.profiles)
+        names = [self.engine.get_tensor_name(i) for i in range(self.engine.num_io_tensors)]
+        shapes = {size: self._activate(size, names) for size in self.sizes}
 
-        # ---- 一次性配置 I/O ----
+        # ---- 一次性配置 I/O：依所有 profile 中最大的形狀配置，切換大小時不重新配置 ----
         self.inputs, self.outputs, self.allocations = [], [], []
-        for i in range(self.engine.num_io_tensors):
-            name = self.engine.get_tensor_name(i)
+        for i, name in enumerate(names):
             dtype = np.dtype(trt.nptype(self.engine.get_tensor_dtype(name)))
-            shape = list(self.engine.get_tensor_shape(name))
-
-            # 動態輸入則設定實際形狀（例如 1x3x640x640）
-            if self.engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT:
-                if any(d < 0 for d in shape):  # 動態
-                    if len(shape) == 4:  # NCHW
-                        shape = [
-                            1,
-                            shape[1] if shape[1] > 0 else 3,
-                            self.imgsz[0],
-                            self.imgsz[1],
-                        ]
-                        self.context.set_input_shape(name, tuple(shape))
-                    elif len(shape) == 3:  # CHW
-                        shape = [
-                            shape[0] if shape[0] > 0 else 3,
-                            self.imgsz[0],
-                            self.imgsz[1],
-                        ]
-                        self.context.set_input_shape(name, tuple(shape))
-
-            nbytes = dtype.itemsize
-            for s in shape:
-                nbytes *= s
+            nbytes = max(dtype.itemsize * int(np.prod(shapes[size][name])) for size in self.sizes)
             # GPU 配置
             d_ptr = common.cuda_call(cudart.cudaMalloc(nbytes))
             self.allocations.append(d_ptr)
@@ -64,7 +63,7 @@ class BaseEngine(object):
                 "index": i,
                 "name": name,
                 "dtype": dtype,
-                "shape": shape,
+                "shape": shapes[self.sizes[-1]][name],
                 "allocation": d_ptr,
                 "size": nbytes,
             }
@@ -73,16 +72,91 @@ class BaseEngine(object):
             else:
                 self.outputs.append(b)
 
-        # 預先建立主機輸出緩衝，避免每幀分配
-        self.h_outputs = [np.empty(o["shape"], dtype=o["dtype"]) for o in self.outputs]
+        # metadata 與 engine 實際 I/O 不符時直接失敗，不要跑出錯位的結果
+        io = [
+            {
+                "name": b["name"],
+                "mode": "input" if b in self.inputs else "output",
+                "shape": list(self.engine.get_tensor_shape(b["name"])),
+                "dtype": b["dtype"].name,
+            }
+            for b in self.inputs + self.outputs
+        ]
+        problems = check_io(self.meta, io)
+        if problems:
+            raise ValueError(
+                "{} does not match its metadata {}: {}".format(engine_path, meta_path(engine_path), "; ".join(problems))
+            )
+        self.roles = output_roles(self.meta, [o["name"] for o in self.outputs])
+        self.end2end = all(r in self.roles for r in END2END_ROLES)
+        # predictions 輸出的格式（yolov8 / yolov5）載入時就決定，metadata 沒記錄又無法從形狀判斷時直接失敗
+        self.pred_format = None
+        if not self.end2end and "predictions" in self.roles:
+            from utils.decode import prediction_format
 
-        # CUDA stream
-        self.stream = cudart.cudaStreamCreate()[1]
+            spec = next((o for o in self.meta.get("outputs", []) if o.get("role") == "predictions"), {})
+            self.pred_format = prediction_format(self.outputs[self.roles["predictions"]]["shape"], spec.get("format"))
+        self.preprocess_cfg = self.meta.get("preprocess") or preprocess_spec(
+            self.inputs[0]["dtype"].name, self.layout
+        )
+
+        # 預先建立每個輸入大小的主機輸出緩衝，避免每幀分配
+        self._shapes = shapes
+        self._h_outputs = {
+            size: [np.empty(shapes[size][o["name"]], dtype=o["dtype"]) for o in self.outputs] for size in self.sizes
+        }
 
-        # v3：把每個 tensor 綁定到位址（僅需做一次）
+        # v3：把每個 tensor 綁定到位址（僅需做一次，所有 profile 共用）
         for b in self.inputs + self.outputs:
             self.context.set_tensor_address(b["name"], int(b["allocation"]))
 
+        # 預設用最大的輸入大小
+        self.input_size = None
+        self.set_input_size(self.sizes[-1])
+
+    def _input_profiles(self, name, shape):
+        """{輸入大小 (H): (profile index, 輸入形狀, [H, W])}；動態輸入取每個 profile 的 opt 形狀。"""
+        hw = slice(-3, -1) if self.layout.endswith("HWC") else slice(-2, None)
+        if not self.dynamic:
+            h, w = shape[hw]
+            return {h: (0, shape, [h, w])}
+        profiles = {}
+        for p in range(self.engine.num_optimization_profiles):
+            opt = [int(d) for d in self.engine.get_tensor_profile_shape(name, p)[1]]
+            h, w = opt[hw]
+            profiles.setdefault(h, (p, opt, [h, w]))
+        return profiles
+
+    def _activate(self, size, names=None):
+        """切到 size 的 profile 並設定輸入形狀，回傳 {tensor 名稱: 形狀}。"""
+        profile, shape, _ = self.profiles[size]
+        if self.dynamic:
+            if self.engine.num_optimization_profiles > 1:
+                self.context.set_optimization_profile_async(profile, self.stream)
+            self.context.set_input_shape(self.engine.get_tensor_name(0), tuple(shape))
+        names = names or [b["name"] for b in self.inputs + self.outputs]
+        return {n: [int(d) for d in self.context.get_tensor_shape(n)] for n in names}
+
+    def set_input_size(self, size):
+        """
+        切換輸入大小（export.py --input_sizes 建置的其中一個），在兩個 frame 之間呼叫。
+        只換 optimization profile 與輸入形狀，device / 主機緩衝區都是載入時配置好的。
+        較小的輸入換取較高的吞吐量，forward() 會把影像縮到這個大小、框再換算回原本的座標。
+        """
+        size = int(size)
+        if size not in self.profiles:
+            raise ValueError(f"input size {size} not in engine profiles {self.sizes}")
+        if size == self.input_size:
+            return
+        if self.input_size is not None:
+            self._activate(size)
+        for b in self.inputs + self.outputs:
+            b["shape"] = self._shapes[size][b["name"]]
+            b["size"] = b["dtype"].itemsize * int(np.prod(b["shape"]))
+        self.h_outputs = self._h_outputs[size]
+        self.imgsz = self.profiles[size][2]  # H, W
+        self.input_size = size
+
     def output_spec(self):
         return [(o["shape"], o["dtype"]) for o in self.outputs]
 
@@ -113,14 +187,69 @@ class BaseEngine(object):
         cudart.cudaStreamSynchronize(self.stream)
         return self.h_outputs
 
+    def benchmark(self, iterations=200, warmup=20):
+        """以固定的隨機輸入量測 infer()（H2D + 執行 + D2H），回傳每次耗時的統計（ms）。"""
+        spec = self.inputs[0]
+        rng = np.random.default_rng(0)
+        inp = rng.random(spec["shape"], dtype=np.float32).astype(spec["dtype"])
+        for _ in range(warmup):
+            self.infer(inp)
+
+        t = np.empty(iterations, dtype=np.float64)
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            self.infer(inp)
+            t[i] = (time.perf_counter() - t0) * 1e3
+        p50, p90, p99 = np.percentile(t, [50, 90, 99])
+        return {
+            "iterations": iterations,
+            "mean_ms": float(t.mean()),
+            "p50_ms": float(p50),
+            "p90_ms": float(p90),
+            "p99_ms": float(p99),
+            "max_ms": float(t.max()),
+        }
+
+    def preprocess(self, image, swap=(2, 0, 1)):
+        """依 metadata 的前處理規格把 BGR HWC 影像轉成 engine 輸入；engine 自己會做的步驟（fused）跳過。"""
+        pre = self.preprocess_cfg
+        img = image
+        if pre.get("color", "RGB") == "RGB":
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        if not self.layout.endswith("HWC"):
+            img = img.transpose(swap)
+        if pre.get("divisor"):
+            return np.ascontiguousarray(img, dtype=np.float32) / pre["divisor"]
+        return np.ascontiguousarray(img, dtype=self.inputs[0]["dtype"])
+
+    def decode(self, out):
+        """沒有 NMS 的 engine：在 CPU 上解碼 predictions 輸出（utils/decode.py），格式見 __init__ 的 pred_format。"""
+        from utils.decode import decode
+
+        if self.pred_format is None:
+            raise RuntimeError("engine has neither end2end (num / boxes / scores / classes) nor predictions outputs")
+        return decode(out[self.roles["predictions"]], self.pred_format)
+
     def forward(self, image, swap=(2, 0, 1)):
-        # 若你的 engine 已內含前處理與 NMS，這段可對齊 engine 期待的輸入
-        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        img = img.transpose(swap)
-        img = np.ascontiguousarray(img, dtype=np.float32) / 255.0
+        # 擷取區域與目前的輸入大小不同（切到較小的 input size）時先縮放，框再換算回擷取座標
+        h, w = image.shape[:2]
+        ratio = 1.0
+        if (h, w) != tuple(self.imgsz):
+            ry, rx = self.imgsz[0] / h, self.imgsz[1] / w
+            interp = cv2.INTER_AREA if rx < 1 else cv2.INTER_LINEAR
+            image = cv2.resize(image, (self.imgsz[1], self.imgsz[0]), interpolation=interp)
+            ratio = np.array([rx, ry, rx, ry], dtype=np.float32)
+        img = self.preprocess(image, swap)
 
-        num, final_boxes, final_scores, final_cls_inds = self.infer(img)
-        ratio, dwdh = 1.0, (0.0, 0.0)
+        out = self.infer(img)
+        if self.end2end:
+            num, final_boxes, final_scores, final_cls_inds = (out[self.roles[r]] for r in END2END_ROLES)
+        else:
+            num, final_boxes, final_scores, final_cls_inds = self.decode(out)
+        # --fp16_outputs 的 engine 輸出 fp16，這裡統一轉成 float32（astype 會複製，不會改到 h_outputs）
+        final_boxes = final_boxes.astype(np.float32)
+        final_scores = final_scores.astype(np.float32)
+        dwdh = (0.0, 0.0)
 
         dwdh = np.asarray(dwdh * 2, dtype=np.float32)
         final_boxes -= dwdh
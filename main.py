@@ -2,27 +2,25 @@
 import sys
 import os
 import time
-import dxcam
 import numpy as np
 import threading, queue
+from dataclasses import asdict
 from typing import Tuple
 from simple_pid import PID
 from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
-from utils.logger import get_logger, C, LoggerConfig
+from utils.logger import get_logger, get_frame_logger, C, LoggerConfig
 from utils.mouse import USBMouse
-from inference import BaseEngine
-from pynput.mouse import Button, Listener
-from pynput import keyboard as KB
+from utils.frame_source import CaptureThread, DXCamSource, MSSSource, ReplaySource
+from utils.change_detect import ChangeDetector
+from utils.preview import PreviewChannel
+from utils.config import compile_config, deep_merge, diff, load_yaml, lookup, plan_reload
+from utils.lifecycle import Lifecycle, State
 
 import ctypes
-from dxcam.dxcam import INFINITE, WAIT_FAILED
 from serial.serialutil import PortNotOpenError, SerialException
-from dxcam.util.timer import (
-    create_high_resolution_timer,
-    set_periodic_timer,
-    wait_for_timer,
-    cancel_timer,
-)
+
+# dxcam / pynput / tensorrt 只在 Windows + GPU 環境可用，延後到實際使用時才 import，
+# 讓 replay 來源可以在無螢幕的 Linux 上跑完整的 forward 流程
 
 def safe_stop(self, ):
     t = getattr(self, "_DXCamera__thread", None)
@@ -46,6 +44,14 @@ def safe_stop(self, ):
 def fixed_cap(
     self, region: Tuple[int, int, int, int], target_fps: int = 60, video_mode=False
 ):
+    from dxcam.dxcam import INFINITE, WAIT_FAILED
+    from dxcam.util.timer import (
+        create_high_resolution_timer,
+        set_periodic_timer,
+        wait_for_timer,
+        cancel_timer,
+    )
+
     if target_fps != 0:
         period_ms = 1000 // target_fps  # millisenonds for periodic timer
         self._DXCamera__timer_handle = create_high_resolution_timer()
@@ -123,17 +129,48 @@ def fixed_cap(
     )
 
 
+# 可以在 frame 之間直接套用的設定 → Main 裡只重設那一部分的方法（結尾 "." 代表整個區塊，規則同 utils/config.REBUILD）
+HOT_APPLY: dict[str, str] = {
+    "mouse.smooth": "_init_scalars",
+    "mouse.mag": "_init_scalars",
+    "mouse.pos_factor": "_init_scalars",
+    "mouse.max_lock_dis": "_init_scalars",
+    "mouse.max_step_dis": "_init_scalars",
+    "mouse.max_pid_dis": "_init_scalars",
+    "resolution_x": "_init_scalars",  # smooth 依解析度縮放；擷取來源另外重建
+    "model.conf": "_init_scalars",
+    "model.label_list": "_init_scalars",
+    "model.enemy_list": "_init_scalars",
+    "mouse.pidx_kp": "_update_pid",
+    "mouse.pidx_kd": "_update_pid",
+    "mouse.pidx_ki": "_update_pid",
+    "mouse.pidy_kp": "_update_pid",
+    "mouse.pidy_kd": "_update_pid",
+    "mouse.pidy_ki": "_update_pid",
+    "mouse.aimbot_button": "_bind_buttons",
+    "mouse.switch_button": "_bind_buttons",
+    "mouse.silent_button": "_bind_buttons",
+    "mouse.silent_aim": "_bind_buttons",
+    "preview_fps": "_init_preview",
+    "skip_unchanged.": "_init_change_detector",
+    "log_frames.": "_init_frame_log",
+    "model.input_size": "_apply_input_size",
+    "log_level": "_init_log_level",
+    "debug": "_init_log_level",
+}
+
+
 class Main(QObject):
-    image_queue = pyqtSignal(
-        object, object, object, object
-    )  # img, boxes, scores, cls_inds
     on_exception = pyqtSignal(type, Exception)
     finished = pyqtSignal()
     on_trigger = pyqtSignal(bool)
 
-    def __init__(self, args: dict | str, no_gui: bool = True):
-        self.running = False
-        self._is_cleaned = False # 管理線程狀態
+    STOP_TIMEOUT = 10.0  # s，stop() 之後 frame loop 超過這個時間沒停下來就強制清理
+
+    def __init__(self, args: dict | str, no_gui: bool = True, cfg_path: str | None = None):
+        # 執行狀態只看 lifecycle（見 utils/lifecycle.py）
+        self.lifecycle = Lifecycle(on_change=self._on_state_change)
+        self._cleanup_lock = threading.RLock()
 
         if not isinstance(args, dict) and not isinstance(args, str):
             raise TypeError("Config most be dict or str")
@@ -142,13 +179,30 @@ class Main(QObject):
 
         if isinstance(args, str):
             self.args = self.load_yaml(path=args)
+            cfg_path = args
 
-        if (l := self.args.get("log_level", None)) is not None:
-            log_level = l
+        # 設定檔熱更新：request_reload() 或檔案 mtime 變動時，在兩個 frame 之間套用
+        self.cfg_path = cfg_path
+        self._cfg_stamp = self._stat_cfg()
+        self._next_cfg_poll = 0.0
+        self._reload_lock = threading.Lock()
+        self._reload_pending = False
+        self._reload_raw: dict | None = None
 
-        if self.args["debug"]:
+        # 合併 default.yaml 並檢查型別；之後都讀 self.cfg（frozen），不再改動 self.args
+        self.cfg = compile_config(self.args)
+
+        log_level = self.cfg.log_level
+        if self.cfg.debug:
             log_level = "DEBUG"
-        cfg = LoggerConfig(name="AimSys", level=log_level)
+        cfg = LoggerConfig(
+            name="AimSys",
+            level=log_level,
+            use_queue=self.cfg.log_async,
+            rate_limit=self.cfg.log_rate_limit,
+            jsonl=self.cfg.log_jsonl,
+            file_name="aimsys",
+        )
         self.LOGGER = get_logger(cfg)
 
         self.no_gui = no_gui
@@ -157,13 +211,23 @@ class Main(QObject):
 
         self.LOGGER.debug(f"Arguments: {self.args}, NO GUI: {no_gui}")
 
+        self.preview = None
         if not self.no_gui:
             super().__init__(parent=None)
+            # 預覽只在 UI 訂閱時才發佈（見 utils/preview.py）
+            self.preview = PreviewChannel()
 
             self.LOGGER.debug("Start by Main Ui Thread")
         else:
             self.init_all()
 
+    @property
+    def running(self) -> bool:
+        return self.lifecycle.running
+
+    def _on_state_change(self, old: State, new: State):
+        self.LOGGER.debug(f"State: {old.value} -> {new.value}")
+
     def init_all(self):
         try:
             self.init_camera()
@@ -171,6 +235,7 @@ class Main(QObject):
             self.init_mouse()
             self.init_engine()
             self.init_listeners()
+            self.lifecycle.to(State.READY)
 
             self.LOGGER.info("All components initialized successfully. (•̀ᴗ•́)و")
             self.LOGGER.info(f"""{C["cyan"]}Welcome to use this aimbot! YOLO V8, V9, V10{C["green"]}
@@ -186,28 +251,24 @@ class Main(QObject):
                            ---------------------Sucsessful---------------------{C["r"]}""")
         except SerialException as SE:
             # se = SerialPortNotFound(cause=SE)
+            self.lifecycle.try_to(State.FAILED, SE)
             if not self.no_gui:
                 self.on_exception.emit(type(SE), SE)
         except Exception as e:
             self.LOGGER.critical(f"Error initializing all components: {e}")
+            self.lifecycle.try_to(State.FAILED, e)
             if not self.no_gui:
                 self.on_exception.emit(type(e), e)
 
     def load_yaml(self, path: str) -> dict:
-        import yaml
-
-        if not os.path.exists(path):
-            # copy default
-            import shutil
-
-            shutil.copy("config/default.yaml", path)
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        return data
+        # 不存在時複製 default.yaml；檔案沒變時沿用快取的 parse 結果
+        return load_yaml(path)
 
     def _rework_dxc(self):
-        fix_dxcam: bool = self.args.get("fix_dxcam_error_hook", False)
-        fix_dxcam_thread_join = self.args.get("fix_dxcam_thread_join", False)
+        import dxcam
+
+        fix_dxcam: bool = self.cfg.fix_dxcam_error_hook
+        fix_dxcam_thread_join = self.cfg.fix_dxcam_thread_join
 
         if fix_dxcam_thread_join:
             self.LOGGER.warning(f"Using fix_dxcam_thread_join: {fix_dxcam_thread_join}")
@@ -220,18 +281,19 @@ class Main(QObject):
             DXC = dxcam
             org_cap = DXC.DXCamera._DXCamera__capture
             DXC.DXCamera._DXCamera__capture = fixed_cap
-            self.cam = DXC.create(output_idx=0, output_color="BGRA")
+            camera = DXC.create(output_idx=0, output_color="BGRA")
         else:
-            self.cam = dxcam.create(output_idx=0, output_color="BGRA")
+            camera = dxcam.create(output_idx=0, output_color="BGRA")
 
-        self.grab_screen = self._dx_grab_screen
+        self.cam = DXCamSource(camera, self.box, target_fps=240)
 
     def init_camera(self):
-        self.cam_type = self.args.get("camera", "dxcam")
+        self.cam_type = self.cfg.camera.lower()
         self.screen_width, self.screen_height = (
-            self.args.get("resolution_x", None),
-            self.args.get("resolution_y", None),
+            self.cfg.resolution_x,
+            self.cfg.resolution_y,
         )
+        # 擷取區域固定；engine 切到較小的 input size 時由 BaseEngine.forward 縮放，視野不變
         self.detect_length = 640
         top = self.screen_height // 2 - self.detect_length // 2
         left = self.screen_width // 2 - self.detect_length // 2
@@ -239,60 +301,98 @@ class Main(QObject):
 
         if self.cam_type == "dxcam":
             self._rework_dxc()
-
+        elif self.cam_type == "replay":
+            replay = self.cfg.replay
+            self.cam = ReplaySource(
+                replay.path,
+                self.box,
+                fps=replay.fps,
+                loop=replay.loop,
+            )
         else:
-            self.grab_screen = self._mss_grab_screen
+            self.cam = MSSSource(self.box)
+
+        # dxcam 本身就有擷取執行緒；其他來源放到獨立執行緒，擷取與推論重疊
+        if self.cam_type != "dxcam" and self.cfg.capture_thread:
+            self.cam = CaptureThread(self.cam)
 
         self.LOGGER.debug(f"Camera initialized., cam type: {self.cam_type}")
 
     def init_parms(self):
-        self._on_dxcam_reinit = False
-        self.smooth = (
-            self.args.get("mouse", None).get("smooth", None)
-            * 1920
-            / self.args.get("resolution_x", None)
-        )
-        self.scale = self.args.get("resolution_x", None) / 1920
-        for key, _ in self.args.items():
-            if "dis" == key:
-                self.args[key] *= self.scale
-        pidx_kp = self.args.get("mouse", None).get("pidx_kp", None)
-        pidx_kd = self.args.get("mouse", None).get("pidx_kd", None)
-        pidx_ki = self.args.get("mouse", None).get("pidx_ki", None)
-        pidy_kp = self.args.get("mouse", None).get("pidy_kp", None)
-        pidy_kd = self.args.get("mouse", None).get("pidy_kd", None)
-        pidy_ki = self.args.get("mouse", None).get("pidy_ki", None)
-        self.mms = 1 / self.args["mouse"]["mag"]
-        self.pidx = PID(
-            pidx_kp,
-            pidx_kd,
-            pidx_ki,
-            setpoint=0,
-            sample_time=0.001,
-        )
-        self.pidy = PID(
-            pidy_kp,
-            pidy_kd,
-            pidy_ki,
-            setpoint=0,
-            sample_time=0.001,
-        )
-        self.pidx(0), self.pidy(0)
-        self.conf = self.args["model"]["conf"]
-        self.label = self.args["model"]["label_list"]
-        self.enemy_label = self.args["model"]["enemy_list"]
-        self.pos_factor = self.args["mouse"]["pos_factor"]
-        self.max_lock_dis = self.args["mouse"]["max_lock_dis"]
-        self.max_step_dis = self.args["mouse"]["max_step_dis"]
-        self.max_pid_dis = self.args["mouse"]["max_pid_dis"]
+        self._init_scalars()
+        self._init_pid()
+        self._bind_buttons()
+        self._init_preview()
+        self._init_change_detector()
+        self._apply_input_size()
+        self._init_frame_log()
+        self.LOGGER.debug(f"Parameters initialized.")
+
+    def _init_scalars(self):
+        mouse, model = self.cfg.mouse, self.cfg.model
+        self.smooth = mouse.smooth / self.cfg.scale
+        self.scale = self.cfg.scale
+        self.mms = 1 / mouse.mag
+        self.conf = model.conf
+        self.label = list(model.label_list)
+        self.enemy_label = list(model.enemy_list)
+        self.pos_factor = mouse.pos_factor
+        self.max_lock_dis = mouse.max_lock_dis
+        self.max_step_dis = mouse.max_step_dis
+        self.max_pid_dis = mouse.max_pid_dis
         self.detect_center_x, self.detect_center_y = (
             self.detect_length // 2,
             self.detect_length // 2,
         )
-        self.LOGGER.debug(f"Parameters initialized.")
+
+    def _pid_tunings(self):
+        mouse = self.cfg.mouse
+        return (
+            (mouse.pidx_kp, mouse.pidx_kd, mouse.pidx_ki),
+            (mouse.pidy_kp, mouse.pidy_kd, mouse.pidy_ki),
+        )
+
+    def _init_pid(self):
+        tx, ty = self._pid_tunings()
+        self.pidx = PID(*tx, setpoint=0, sample_time=0.001)
+        self.pidy = PID(*ty, setpoint=0, sample_time=0.001)
+        self.pidx(0), self.pidy(0)
+
+    def _update_pid(self):
+        """熱更新只換參數，保留積分項與上一次的誤差。"""
+        if self.__dict__.get("pidx") is None:
+            self._init_pid()
+            return
+        self.pidx.tunings, self.pidy.tunings = self._pid_tunings()
+
+    def _init_preview(self):
+        if self.preview is not None:
+            self.preview.set_max_fps(self.cfg.preview_fps)
+
+    def _init_change_detector(self):
+        skip = self.cfg.skip_unchanged
+        self.change_detector = None
+        if skip.enabled:
+            self.change_detector = ChangeDetector(
+                threshold=skip.threshold,
+                stride=skip.stride,
+                tiles=skip.tiles,
+                max_skip=skip.max_skip,
+            )
+        self._last_dets = None
+
+    def _init_frame_log(self):
+        # 每幀計時（JSON lines），用 python -m utils.log_summary 統計
+        flog = self.cfg.log_frames
+        self.frame_log = None
+        if flog.enabled:
+            self.frame_log = get_frame_logger(flog.path, every=flog.every)
+
+    def _init_log_level(self):
+        self.LOGGER.setLevel("DEBUG" if self.cfg.debug else self.cfg.log_level.upper())
 
     def init_mouse(self):
-        serial_port = self.args.get("mouse", None).get("serial_port", None)
+        serial_port = self.cfg.mouse.serial_port
 
         if serial_port is None:
             raise ValueError("Serial port not specified in configuration.")
@@ -300,21 +400,178 @@ class Main(QObject):
         self.LOGGER.debug(f"Mouse initialized on port {serial_port}.")
 
     def init_engine(self):
-        path = self.args.get("model").get("file_path")
+        from inference import BaseEngine
+
+        path = self.cfg.model.file_path
         self.engine = BaseEngine(path)
-        self.LOGGER.debug(f"Engine initialized with model at {path}.")
+        if not self.engine.meta:
+            self.LOGGER.warning(f"No metadata next to {path}, using default preprocessing and class names.")
+        self._apply_input_size()
+        self.LOGGER.debug(f"Engine initialized with model at {path}, classes {self.engine.class_names}.")
+
+    def _apply_input_size(self):
+        """model.input_size：切換 engine 的 optimization profile，不重建 engine 與擷取來源。"""
+        engine = self.__dict__.get("engine")
+        sizes = getattr(engine, "sizes", None)
+        if not sizes:
+            return  # engine 還沒載入，init_engine 會再呼叫一次
+        size = self.cfg.model.input_size or sizes[-1]
+        if size == engine.input_size:
+            return
+        try:
+            engine.set_input_size(size)
+        except ValueError as e:
+            self.LOGGER.error(f"{e}, keeping input size {engine.input_size}")
+            return
+        self._last_dets = None
+        self.LOGGER.info(f"Engine input size: {size} (capture {self.detect_length})")
+
+    def set_input_size(self, size: int):
+        """切換 engine 輸入大小（0 = 最大）；任何執行緒都可以呼叫，跟設定檔熱更新一樣在兩個 frame 之間套用。"""
+        self.request_reload(deep_merge(self.args, {"model": {"input_size": int(size)}}))
+
+    def _bind_buttons(self):
+        if self.__dict__.get("listener") is None:
+            return  # 還沒建立監聽器，init_listeners 會再呼叫一次
+        from pynput.mouse import Button
+
+        self.toggle_aim = getattr(Button, self.cfg.mouse.switch_button)
+        self.toggle_aiming = getattr(Button, self.cfg.mouse.aimbot_button)
+        self.toggle_silent = self.cfg.mouse.silent_button
+        self.silent_aim_btn = self.cfg.mouse.silent_aim
+
+    # -------- 設定檔熱更新 --------
+    def _stat_cfg(self) -> tuple[int, int] | None:
+        if not self.cfg_path:
+            return None
+        try:
+            st = os.stat(self.cfg_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def request_reload(self, raw: dict | None = None):
+        """
+        任何執行緒都可以呼叫。raw 為 None 時重新讀取 cfg_path。
+        執行中會在下一個 frame 之前套用；沒有在執行時直接套用。
+        """
+        with self._reload_lock:
+            self._reload_raw = raw
+            self._reload_pending = True
+        if not self.running:
+            self._apply_reload()
+
+    def _poll_config(self):
+        """frame loop 每圈呼叫；平常只有一次時間比較，每 0.5 秒 stat 一次設定檔。"""
+        if not self._reload_pending:
+            now = time.monotonic()
+            if now < self._next_cfg_poll:
+                return
+            self._next_cfg_poll = now + 0.5
+            stamp = self._stat_cfg()
+            if stamp == self._cfg_stamp:
+                return
+        self._apply_reload()
+
+    def _apply_reload(self):
+        with self._reload_lock:
+            raw, self._reload_raw = self._reload_raw, None
+            self._reload_pending = False
+        self._cfg_stamp = self._stat_cfg()
+        try:
+            if raw is None:
+                if not self.cfg_path:
+                    return
+                raw = self.load_yaml(self.cfg_path)
+            new_cfg = compile_config(raw)
+        except Exception as e:
+            self.LOGGER.error(f"Config reload failed, keeping current settings: {e}")
+            return
+
+        changes = diff(asdict(self.cfg), asdict(new_cfg))
+        if not changes:
+            return
+        hot, rebuild, restart = plan_reload(changes)
+        self.LOGGER.info(f"Config changed: {', '.join(changes)}")
+
+        old_cfg, old_args = self.cfg, self.args
+        self.args, self.cfg = raw, new_cfg
+        self._apply_hot(changes, hot)
+        rebuilders = {"camera": self._rebuild_camera, "engine": self._rebuild_engine, "mouse": self._rebuild_mouse}
+        done = []
+        try:
+            for comp in ("camera", "engine", "mouse"):
+                if comp in rebuild:
+                    rebuilders[comp]()
+                    done.append(comp)
+        except Exception as e:
+            # 元件重建失敗時還原設定；已經用新設定重建的元件也換回來，執行中的元件才會與 self.cfg 一致
+            self.LOGGER.error(f"Rebuild failed ({', '.join(sorted(rebuild))}), keeping previous settings: {e}")
+            self.args, self.cfg = old_args, old_cfg
+            self._apply_hot(changes, hot)
+            if "camera" in rebuild and self.__dict__.get("cam") is None and "camera" not in done:
+                done.insert(0, "camera")  # 舊的擷取來源已經釋放，用原本的設定重建
+            for comp in done:
+                try:
+                    rebuilders[comp]()
+                except Exception as e2:
+                    self.LOGGER.critical(f"Restoring {comp} with the previous settings failed: {e2}")
+        if restart:
+            self.LOGGER.warning(f"Takes effect after restart: {', '.join(restart)}")
+
+    def _apply_hot(self, changes, hot: list[str]):
+        """
+        只重設變動的 key 影響到的部分（HOT_APPLY），PID 的積分項、略過偵測的參考畫面等狀態不受其他 key 影響；
+        沒有對應方法的可熱更新 key 才退回整個 init_parms()。
+        """
+        if any(lookup(key, HOT_APPLY) is None for key in hot):
+            self.init_parms()
+            if "log_level" in changes or "debug" in changes:
+                self._init_log_level()
+            return
+        for name in dict.fromkeys(lookup(key, HOT_APPLY) for key in changes):
+            if name is not None:
+                getattr(self, name)()
+
+    def _rebuild_camera(self):
+        self.LOGGER.info("Rebuilding camera")
+        old = self.__dict__.get("cam")
+        if old is not None:
+            if old.is_capturing:
+                old.stop()
+            old.release()
+            self.cam = None
+        self.init_camera()
+        if self.change_detector is not None:
+            self.change_detector.reset()
+        self._last_dets = None
+        if self.running:
+            self.cam.start()
+
+    def _rebuild_engine(self):
+        self.LOGGER.info(f"Loading engine {self.cfg.model.file_path}")
+        old = self.__dict__.get("engine")
+        self.init_engine()  # 先載入新的，失敗時舊的還能用
+        if old is not None:
+            old.close()
+        self._last_dets = None
+
+    def _rebuild_mouse(self):
+        old = self.__dict__.get("m")
+        self.init_mouse()
+        if old is not None:
+            old.close()
 
     def init_listeners(self):
+        from pynput.mouse import Listener
+        from pynput import keyboard as KB
+
         self.down = set()
         self.kb_Listener = KB.Listener(
             on_press=self.on_press, on_release=self.on_release
         )
         self.listener = Listener(on_click=self.on_click)
-
-        self.toggle_aim = self.args["mouse"]["switch_button"]
-        self.toggle_aiming = self.args["mouse"]["aimbot_button"]
-        self.toggle_silent = self.args["mouse"]["silent_button"]
-        self.silent_aim_btn = self.args["mouse"]["silent_aim"]
+        self._bind_buttons()
         self.aim = False
         self.aiming = False
         self.silent_aim = False
@@ -350,7 +607,7 @@ class Main(QObject):
         # self.LOGGER.debug(
         #     f"Mouse clicked at ({x}, {y}) with {button}, pressed={pressed}"
         # )
-        if button == getattr(Button, self.toggle_aim):
+        if button == self.toggle_aim:
             if pressed:
                 self.aim = not self.aim
                 self.LOGGER.info(
@@ -359,19 +616,10 @@ class Main(QObject):
                 if not self.no_gui:
                     self.on_trigger.emit(self.aim)
 
-        if button == getattr(Button, self.toggle_aiming) and self.aim:
+        if button == self.toggle_aiming and self.aim:
             self.aiming = pressed
             self.LOGGER.info(f"Aimbot aiming {'started' if pressed else 'stopped'}")
 
-    # def grab_screen(self):
-    #     return self.cam.get_latest_frame()
-
-    def _dx_grab_screen(self):
-        return self.cam.get_latest_frame()
-
-    def _mss_grab_screen(self):
-        return np.asarray(self.cam.grab(self.box))
-
     def target_list(self, boxes, confidences, classes):
         # boxes: Nx4, confidences: N, classes: N
         if len(boxes) == 0:
@@ -456,97 +704,120 @@ class Main(QObject):
     ):
         is_aim = self.aim
         is_silent = self.silent_aim
-        img = self.grab_screen()
+        t0 = time.perf_counter()
+        img, capture_ts, seq = self.cam.grab()
+        t1 = time.perf_counter()
 
         if img is None:
             self.LOGGER.warning("No frame captured from camera.")
             return
 
+        inf_ms = 0.0
+        n_det = 0
         if is_aim or is_silent:
-            boxes, confidences, classes = self.engine.forward(img)
+            if (
+                self.change_detector is not None
+                and self._last_dets is not None
+                and not self.change_detector.changed(img, seq)
+            ):
+                # 畫面沒變，沿用上一次的偵測結果
+                boxes, confidences, classes = self._last_dets
+                skipped = True
+            else:
+                t2 = time.perf_counter()
+                boxes, confidences, classes = self.engine.forward(img)
+                inf_ms = (time.perf_counter() - t2) * 1e3
+                self._last_dets = (boxes, confidences, classes)
+                skipped = False
             T = self.target_list(boxes, confidences, classes)
+            n_det = len(boxes)
             if is_aim:
                 self.lock_target(T, self.mms)
 
             # if is_silent:
             #     self.silent(T)
 
-            if not self.no_gui:
-                self.image_queue.emit(
-                    img,
-                    boxes,
-                    confidences,
-                    classes,
-                )
+            if self.preview is not None:
+                self.preview.offer(img, boxes, confidences, classes)
         else:
+            skipped = False
             time.sleep(0.001)
-            if not self.no_gui:
-                self.image_queue.emit(
-                    img,
-                    None,
-                    None,
-                    None,
-                )
+            if self.preview is not None:
+                self.preview.offer(img)
+
+        if self.frame_log is not None:
+            t3 = time.perf_counter()
+            self.frame_log.log(
+                seq=seq,
+                aim=is_aim or is_silent,
+                skip=skipped,
+                dets=n_det,
+                cap_ms=round((t1 - t0) * 1e3, 4),
+                inf_ms=round(inf_ms, 4),
+                total_ms=round((t3 - t0) * 1e3, 4),
+                lat_ms=round((t3 - capture_ts) * 1e3, 4),  # 擷取到送出滑鼠指令
+            )
+
+        if self.lifecycle.first_frame_ms is None:
+            ms = self.lifecycle.mark_first_frame()
+            if ms is not None:
+                self.LOGGER.info(f"First frame {ms:.1f} ms after start")
+
+    def _prepare_run(self):
+        """start() 的準備工作：元件沿用上一次的（engine、緩衝區、擷取來源都不重建）。"""
+        if not self.cam.is_capturing:
+            self.cam.start()
+        if self.cam_type == "dxcam" and not self.cam.is_capturing:
+            raise RuntimeError("Camera failed to start capturing.")
+
+        if self.m is None:
+            self.LOGGER.info("reconnect USB.")
+            self.m = USBMouse(self.cfg.mouse.serial_port)
+        try:
+            self.m.send_mouse_move(0, 0)
+        except PortNotOpenError as pnoe:
+            self.LOGGER.warning(
+                f"{pnoe}, USB serial Port {self.cfg.mouse.serial_port} is close."
+            )
+            self.m.open()
+
+        # pynput 的 Listener 停止後不能再 start，只有這兩個需要重建
+        if self.listener is not None and not self.listener.is_alive():
+            self.init_listeners()
+        if self.kb_Listener is not None:
+            self.kb_Listener.start()
+        if self.listener is not None:
+            self.listener.start()
 
     @pyqtSlot()
     def start(self):
-        if self.running:
+        lc = self.lifecycle
+        if lc.running:
             self.LOGGER.warning("Already running")
             return
-        self._is_cleaned = False
-        self.running = True
+        if lc.state is State.INIT or (lc.state is State.FAILED and lc.failed_from is State.INIT):
+            self.init_all()  # 已 release 或初始化失敗過：重新建立全部元件
+            if lc.state is not State.READY:
+                # init_all 已經記錄並回報錯誤，不能在沒建好的元件上跑 frame loop
+                self.LOGGER.error(f"Cannot start, initialization failed: {lc.error!r}")
+                if not self.no_gui:
+                    self.finished.emit()
+                return
+        if lc.state is State.FAILED and lc.failed_from is not State.INIT:
+            # 上一次在執行中出錯（例如 dxcam 回傳 None），擷取來源可能已經壞掉，只重建它
+            self.LOGGER.warning(f"Last run failed ({lc.error!r}), rebuilding camera")
+            self._rebuild_camera()
+
+        if not lc.try_to(State.RUNNING):
+            self.LOGGER.error(f"Cannot start from state: {lc.state.value}")
+            if not self.no_gui:
+                self.finished.emit()
+            return
         self.LOGGER.info("Starting main process")
         try:
-            if self.cam_type == "dxcam":
-                import gc
-                if self._on_dxcam_reinit and hasattr(self, "cam"):
-
-                    self.LOGGER.warning(f"Rebuild DXC")
-                    self.cam.stop()
-                    self.cam.release()
-                    self.cam.__del__()
-                    del self.cam
-                    gc.collect()
-                    # self.cam = None
-                    self._rework_dxc()
-                    self._on_dxcam_reinit = False
-                elif not hasattr(self, "cam"):
-                    gc.collect()
-                    self.cam = None
-                    self._rework_dxc()
-
-                self.cam.start(region=self.box, target_fps=240)
-                time.sleep(0.3)  # warmup
-                if not self.cam.is_capturing:
-                    raise RuntimeError("Camera failed to start capturing.")
-            else:
-                from mss import mss
-
-                self.cam = mss()
-
-            if self.m is None:
-                self.LOGGER.info("reconnect USB.")
-                self.m = USBMouse(self.args.get("mouse", None).get("serial_port", None))
-            try:
-                self.m.send_mouse_move(0, 0)
-            except PortNotOpenError as pnoe:
-                self.LOGGER.warning(
-                    f"{pnoe}, USB serial Port {self.args['mouse']['serial_port']} is close."
-                )
-                self.m.open()
-            except Exception as e:
-                raise e
-
-            # if self.engine is None:
-            #     self.init_engine()
-
-            if not self.listener.is_alive() and not self.kb_Listener.is_alive():
-                self.kb_Listener = self.listener = None
-                self.init_listeners()
-            self.kb_Listener.start()
-            self.listener.start()
-
-            while self.running:
+            self._prepare_run()
+            while lc.running:
+                self._poll_config()
                 self.forward()
 
         except TypeError as te:
@@ -554,83 +825,98 @@ class Main(QObject):
             if str(te) == "'NoneType' object is not subscriptable":
                 self.LOGGER.error(f"TypeError: {te}")
             self.LOGGER.warning(f"Sys Auto Stop.")
-            self._on_dxcam_reinit = True
+            lc.try_to(State.FAILED, te)
         except Exception as e:
             sys.__excepthook__(type(e), e, None)
             self.LOGGER.error(f"Error occurred: {e}")
+            lc.try_to(State.FAILED, e)
             if not self.no_gui:
                 self.on_exception.emit(type(e), e)
         except KeyboardInterrupt:
             self.LOGGER.info("KeyboardInterrupt received. Stopping...")
+            lc.try_to(State.DRAINING)
         finally:
-            self.running = False
-
-            if not self._is_cleaned:
-                self.cleanup(True)
-
+            self.cleanup(pause=True)
             if not self.no_gui:
-                time.sleep(0.3)  # wait ui
                 self.LOGGER.debug("Emitting finished signal")
                 self.finished.emit()
 
-    def cleanup(self, pause: bool = False):
-        if hasattr(self, "cam"):
-            if self.cam:
-                self.LOGGER.debug(f"Dxcame closed status: {self.cam.is_capturing}")
-
-                if self.cam_type == "dxcam" and self.cam.is_capturing:
-                    self.cam.stop()
-                    del self.cam
-                    self.LOGGER.debug("obj del self.cam")
-
-        if self.kb_Listener and self.kb_Listener.running:
-            self.kb_Listener.stop()
-
-        if self.listener and self.listener.running:
-            self.listener.stop()
-
+    def _stop_components(self, pause: bool):
+        cam = self.__dict__.get("cam")
+        if cam is not None:
+            self.LOGGER.debug(f"Camera capturing: {cam.is_capturing}")
+            if cam.is_capturing:
+                cam.stop()
+                if isinstance(cam, CaptureThread):
+                    self.LOGGER.info(f"Capture stats: {cam.stats()}")
+            if not pause:
+                cam.release()
+                self.cam = None
+
+        if self.__dict__.get("change_detector") is not None:
+            self.LOGGER.info(f"Skipped inferences: {self.change_detector.stats()}")
+
+        for name in ("kb_Listener", "listener"):
+            lis = self.__dict__.get(name)
+            if lis is not None and lis.running:
+                lis.stop()
         self.LOGGER.debug("All listener closed")
 
         if not pause:
-            if self.m:
+            if self.__dict__.get("m"):
                 self.m.close()
                 self.m = None
-                del self.m
 
-            if self.engine:
+            if self.__dict__.get("engine"):
                 self.engine.close()
+                self.engine = None
 
-        self._is_cleaned = True
+    def cleanup(self, pause: bool = False):
+        """
+        pause=True：停止擷取與監聽，engine / 滑鼠 / 擷取來源保留給下一次 start()。
+        pause=False：全部釋放，狀態回到 INIT，下一次 start() 會重新 init_all()。
+        可以重複呼叫（frame loop 結束與 stop 逾時時都會呼叫）。
+        """
+        lc = self.lifecycle
+        with self._cleanup_lock:
+            if lc.running:
+                lc.to(State.DRAINING)  # 直接呼叫 cleanup 時先讓 frame loop 停下
+            self._stop_components(pause)
+            if lc.state is State.DRAINING:
+                lc.to(State.STOPPED)
+            if not pause:
+                lc.try_to(State.INIT)
         self.LOGGER.info("Cleaned up resources.")
 
     @pyqtSlot()
-    def stop(self):
-        if not self.running:
-            self.LOGGER.warning("Not running")
-            self.finished.emit()
+    def stop(self, timeout: float | None = None) -> bool:
+        """
+        要求 frame loop 在目前這一幀結束後停止。預設立即回傳；
+        給 timeout 時等到 STOPPED / FAILED 為止，回傳是否在時間內停止。
+        超過 STOP_TIMEOUT 還沒停下（例如卡在擷取）由 watchdog 強制清理。
+        """
+        lc = self.lifecycle
+        if not lc.try_to(State.DRAINING):
+            if lc.state is not State.DRAINING:
+                self.LOGGER.warning(f"Not running ({lc.state.value})")
+                if not self.no_gui:
+                    self.finished.emit()
+                return True
+        else:
+            self.LOGGER.info("Stopping main process")
+            threading.Thread(target=self._stop_watchdog, name="AimSys-stop", daemon=True).start()
+        if timeout is None:
+            return True
+        return lc.wait_for(State.STOPPED, State.FAILED, State.INIT, timeout=timeout)
+
+    def _stop_watchdog(self):
+        lc = self.lifecycle
+        if lc.wait_for(State.STOPPED, State.FAILED, State.INIT, timeout=self.STOP_TIMEOUT):
             return
-        self.running = False
-        self.LOGGER.info("Stopping main process")
-        t = threading.Thread(target=self._interruption_when_time_out)
-        t.start()
-        # t.join()
-
-    def timer(self, time_out: int):
-        start_time = time.time()
-        while time.time() - start_time <= time_out:
-            if self._is_cleaned:
-                break
-            time.sleep(0.001)
-
-    def _interruption_when_time_out(self):
-        time_out = 10 #s
-        self.timer(time_out)
-
-        if not self._is_cleaned: # 當機了 沒有成功清除
-            self.LOGGER.warning(f"thread request Interruption")
-            self.cleanup(True)
-            if not self.no_gui:
-                # time.sleep(0.3)  # wait ui
-                self.LOGGER.debug("Emitting finished signal")
-                self.finished.emit()
-
+        # 當機了 沒有成功清除
+        self.LOGGER.warning(f"Frame loop did not stop within {self.STOP_TIMEOUT:g}s, forcing cleanup")
+        lc.try_to(State.FAILED, TimeoutError("stop timed out"))
+        self.cleanup(pause=True)
+        if not self.no_gui:
+            self.LOGGER.debug("Emitting finished signal")
+            self.finished.emit()
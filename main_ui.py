@@ -1,5 +1,5 @@
 from PyQt6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QStackedWidget
-from PyQt6.QtCore import Qt, QObject, pyqtSignal, pyqtSlot, QThread, QTimer, QSettings
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, pyqtSlot, QThread, QTimer
 
 import sys
 import os
@@ -8,12 +8,12 @@ from ui import *
 from logging import Logger
 from pathlib import Path
 import sys
-from packaging.tags import sys_tags
-from packaging.utils import parse_wheel_filename
-from src.logger import get_logger, C, LoggerConfig
+from functools import lru_cache
+from utils.cache import CACHE_DIR, JsonCache, digest_obj, env_fingerprint
+from utils.config import load_yaml
+from utils.logger import get_logger, C, LoggerConfig
 import json
 from pprint import pformat
-from utils.updater import Updater
 # from cuda import cudart
 # import importlib, pkgutil, cuda
 
@@ -44,8 +44,6 @@ class MainUI(QMainWindow):
         self.setStyleSheet("background-color: #212121;")
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground, True)
 
-        self.settings: QSettings | None = None
-
         self.aim_sys = None  # Main instance
 
         self.central_widget = QWidget()
@@ -104,6 +102,7 @@ class MainUI(QMainWindow):
         self.home_page.startRequested.connect(self._start_aim_sys)
         self.home_page.stopRequested.connect(self._stop_aim_sys)
         self.home_page.restartRequested.connect(self._restart_aim_sys)
+        self.setting_page.saved.connect(self._on_config_saved)
 
         self.osd.stop_aim_sys.connect(self._stop_aim_sys)
 
@@ -156,7 +155,7 @@ class MainUI(QMainWindow):
             # self.hide()
             return
 
-        self.aim_sys = Main(no_gui=False, args=self.args)
+        self.aim_sys = Main(no_gui=False, args=self.args, cfg_path=self.cfg_path)
         self._prepare_worker()
 
         # self.startRequested.connect(self.aim_sys.start)
@@ -181,9 +180,7 @@ class MainUI(QMainWindow):
         )
 
         self.aim_sys.on_exception.connect(self._on_exception)
-        self.aim_sys.image_queue.connect(
-            self.visualize_page.on_image, type=Qt.ConnectionType.QueuedConnection
-        )
+        self.visualize_page.set_preview_channel(self.aim_sys.preview)
         # self.aim_sys.finished.connect(self.work_thread.quit)
         self.aim_sys.finished.connect(self.on_aim_sys_finished)
 
@@ -191,6 +188,13 @@ class MainUI(QMainWindow):
 
         self.aim_sys.init_all()
 
+    @pyqtSlot(str)
+    def _on_config_saved(self, path: str):
+        self.args = self._load_yaml(path)
+        if self.aim_sys is not None and path == self.cfg_path:
+            # 執行中會在下一個 frame 前套用；只有擷取 / engine 相關的設定會重建元件
+            self.aim_sys.request_reload(self.args)
+
     @pyqtSlot()
     def on_aim_sys_finished(self):
         self.LOGGER.debug("Hide osd")
@@ -328,16 +332,8 @@ class MainUI(QMainWindow):
         return self.pos().y()
 
     def _load_yaml(self, path: str) -> dict:
-        import yaml
-
-        if not os.path.exists(path):
-            # copy default
-            import shutil
-
-            shutil.copy("config/default.yaml", path)
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        return data
+        # 不存在時複製 default.yaml；檔案沒變時沿用快取的 parse 結果
+        return load_yaml(path)
 
 
 class StartUp(QObject):
@@ -347,10 +343,49 @@ class StartUp(QObject):
     finished = pyqtSignal()
     show_next_page = pyqtSignal(int)
 
-    def __init__(self, Logger: Logger, args: dict):
+    ENV_TARGETS = [
+        "serial",
+        "yaml",
+        "numpy",
+        "cv2",
+        "argparse",
+        "time",
+        "threading",
+        "multiprocessing",
+        "mss",
+        "pynput.mouse",
+        "pynput.keyboard",
+        "simple_pid",
+        "cuda.cudart",
+        "tensorrt",
+        "ctypes",
+        "torch",
+        "dxcam",
+    ]
+
+    def __init__(
+        self,
+        Logger: Logger,
+        args: dict,
+        probe=None,
+        gpu_checks=None,
+        probe_cache: JsonCache | None = None,
+    ):
+        """
+        :param probe: mod -> (ok, ver, err)，預設真的 import；可換成假的來模擬缺模組
+        :param gpu_checks: [() -> (gpu_info, ok)]，預設檢查 torch cuda 與 TensorRT
+        :param probe_cache: 探測結果快取，key 為環境指紋（見 utils/cache.py）
+        """
         super().__init__()
         self.logger = Logger
         self.args = args
+        self._probe_fn = probe or self._probe
+        self._gpu_checks = gpu_checks or [
+            ("torch cuda check", self._check_torch_cuda),
+            ("tensorrt check", self._check_tensorrt),
+        ]
+        self.probe_cache = probe_cache or JsonCache(CACHE_DIR / "env_probe.json")
+        self._env_key: str | None = None
 
     @pyqtSlot()
     def run_startup(self):
@@ -359,7 +394,6 @@ class StartUp(QObject):
 
         try:
             self.emit_helper("env_check", value, "Checking system environment...")
-            time.sleep(2)
             res = self.env_check(value)
 
             # raise Here
@@ -378,10 +412,13 @@ class StartUp(QObject):
             value = 41
 
             if self.args['auto_update']:
+                from utils.updater import Updater  # requests 只在需要檢查更新時載入
+
                 upd = Updater(on_update_func=self.emit_helper, value=value)
                 up_success, exc = upd.start_update()
                 if exc is not None:
-                    self.settings.setValue("env_ok", False)
+                    if self._env_key:
+                        self.probe_cache.pop(self._env_key)  # 更新失敗，下次啟動重新檢查
                     self.emit_helper("init_AimSys", value, "Update Fail, Initializing system...")
                 elif up_success is True:
                     self.emit_helper("Update success", value, "Update success, Initializing system...")
@@ -418,9 +455,7 @@ class StartUp(QObject):
             self.emit_helper("error", value, str(e))
             self._exception.emit(type(e), e)
         finally:
-            for i in range(value + 1, 101):
-                self.emit_helper("start_up_end", i, None)
-                time.sleep(0.02)
+            self.emit_helper("start_up_end", 100, None)
             if next_page is not None:
                 self.show_next_page.emit(next_page)  # 切換到主頁
             self.finished.emit()
@@ -517,96 +552,94 @@ class StartUp(QObject):
             # raise e
             return False, None, e
         
-    def _is_checked(self, ) -> bool:
-        self.settings = QSettings("ClumsyCompany", "ClumsyApp") # XD
-        return self.settings.value("env_ok", False, type=bool)
-
-    def env_check(self, progress_value: int) -> dict:
-        """
-        回傳結果：
-        {'ok': True/False, 'modules': {name: {'ok':bool,'ver':str,'err':str|None}}, 'gpu': {...}}
-        並透過 emit_helper 回報進度。
-        progress_value 最後為40
-        """
-        if self._is_checked():
-            self.logger.info("Environment already checked, skipping.")
-            return {"ok": True, "modules": {}, "gpu": {}}
-        
-        targets = [
-            "serial",
-            "yaml",
-            "numpy",
-            "cv2",
-            "argparse",
-            "time",
-            "threading",
-            "multiprocessing",
-            "mss",
-            "pynput.mouse",
-            "pynput.keyboard",
-            "simple_pid",
-            "cuda.cudart",
-            "tensorrt",
-            "ctypes",
-            "torch",
-            "dxcam",
-        ]
-
-        result = {"ok": True, "modules": {}, "gpu": {}}
-        step = max(1, int(40 / (len(targets) + 2)))  # +2 給 GPU 檢查
-        p = progress_value
-
-        for mod in targets:
-            self.emit_helper("env_check", None, f"Checking {mod}...")
-            ok, ver, err = self._probe(mod)
-            p = min(40, p + step)
-            msg = f"{mod} ... {'OK' if ok else 'MISSING'}"
-            self.emit_helper("env_check", p, msg)
-            result["modules"][mod] = {
-                "ok": ok,
-                "ver": ver or "",
-                "err": "" if ok else str(err),
-            }
-            if not ok:
-                result["ok"] = False
-
-        # 進一步檢查 GPU 能力（若有安裝）
+    def _check_torch_cuda(self) -> tuple[dict, bool]:
+        gpu = {}
         try:
             self.logger.info(f"Checking torch cuda...")
             import torch
 
-            result["gpu"]["torch_cuda"] = bool(torch.cuda.is_available())
-            result["gpu"]["torch_device_count"] = (
+            gpu["torch_cuda"] = bool(torch.cuda.is_available())
+            gpu["torch_device_count"] = (
                 torch.cuda.device_count() if torch.cuda.is_available() else 0
             )
             if torch.cuda.is_available():
-                result["gpu"]["torch_device0"] = torch.cuda.get_device_name(0)
+                gpu["torch_device0"] = torch.cuda.get_device_name(0)
         except Exception as e:
             self.logger.error(f"Error checking torch cuda: {e}")
-            # raise e
-            result["gpu"]["torch_cuda"] = False
-            result["gpu"]["torch_err"] = str(e)
-
-        p = min(40, p + step)
-        self.emit_helper("env_check", p, "torch cuda check")
+            gpu["torch_cuda"] = False
+            gpu["torch_err"] = str(e)
+        return gpu, True
 
+    def _check_tensorrt(self) -> tuple[dict, bool]:
+        gpu = {}
         try:
             self.logger.info(f"Checking tensorrt...")
             import tensorrt as trt
 
-            result["gpu"]["tensorrt_ver"] = getattr(trt, "__version__", "")
+            gpu["tensorrt_ver"] = getattr(trt, "__version__", "")
             # 可選：建立 Logger 以驗證可載入
             _ = trt.Logger(trt.Logger.WARNING)
-            self.logger.info(f"TensorRT version: {result['gpu']['tensorrt_ver']}")
+            self.logger.info(f"TensorRT version: {gpu['tensorrt_ver']}")
         except Exception as e:
             self.logger.error(f"Error checking tensorrt: {e}")
-            # raise e
-            result["gpu"]["tensorrt_ver"] = ""
-            result["gpu"]["tensorrt_err"] = str(e)
-            result["ok"] = False
+            gpu["tensorrt_ver"] = ""
+            gpu["tensorrt_err"] = str(e)
+            return gpu, False
+        return gpu, True
+
+    def env_check(self, progress_value: int) -> dict:
+        """
+        回傳結果：
+        {'ok': True/False, 'modules': {name: {'ok':bool,'ver':str,'err':str|None}}, 'gpu': {...}}
+        並透過 emit_helper 回報進度。
+        progress_value 最後為40
+        """
+        # 直譯器、site-packages、requirements.txt 都沒變時直接沿用上次的結果
+        self._env_key = digest_obj(env_fingerprint())
+        cached = self.probe_cache.get(self._env_key)
+        if cached is not None:
+            self.logger.info("Environment unchanged since last check, skipping.")
+            self.emit_helper("env_check", 40, "Environment unchanged, skipping checks.")
+            self._ensure_models()
+            return cached
+
+        targets = self.ENV_TARGETS
+
+        result = {"ok": True, "modules": {}, "gpu": {}}
+        step = max(1, int(40 / (len(targets) + len(self._gpu_checks))))
+        p = progress_value
 
-        p = min(100, p + step)
-        self.emit_helper("env_check", p, "tensorrt check")
+        # import 大多在等磁碟 / 載入 DLL，平行探測可以縮短整體等待時間
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        self.emit_helper("env_check", None, f"Checking {len(targets)} modules...")
+        with ThreadPoolExecutor(max_workers=8, thread_name_prefix="env_probe") as pool:
+            gpu_futs = [(label, pool.submit(fn)) for label, fn in self._gpu_checks]
+            futs = {pool.submit(self._probe_fn, mod): mod for mod in targets}
+
+            for fut in as_completed(futs):
+                mod = futs[fut]
+                ok, ver, err = fut.result()
+                p = min(40, p + step)
+                msg = f"{mod} ... {'OK' if ok else 'MISSING'}"
+                self.emit_helper("env_check", p, msg)
+                result["modules"][mod] = {
+                    "ok": ok,
+                    "ver": ver or "",
+                    "err": "" if ok else str(err),
+                }
+                if not ok:
+                    result["ok"] = False
+            result["modules"] = {mod: result["modules"][mod] for mod in targets}
+
+            # 進一步檢查 GPU 能力（若有安裝）
+            for label, fut in gpu_futs:
+                gpu, ok = fut.result()
+                result["gpu"].update(gpu)
+                if not ok:
+                    result["ok"] = False
+                p = min(40, p + step)
+                self.emit_helper("env_check", p, label)
 
         # 決策：缺模組時丟一個彙總錯誤，或交給呼叫端處理
         missing = [k for k, v in result["modules"].items() if not v["ok"]]
@@ -614,6 +647,14 @@ class StartUp(QObject):
             self.logger.error(f"Missing modules: {', '.join(missing)}")
             result["missing"] = missing
             return result
+        self._ensure_models()
+
+        if result["ok"]:
+            self.probe_cache.put(self._env_key, result)
+
+        return result
+
+    def _ensure_models(self):
         # 檢查models/500e.trt 是否存在
         model_path = Path("models/500e.trt")
         if not model_path.exists():
@@ -648,19 +689,34 @@ class StartUp(QObject):
                 end2end=True,
             )
 
-        if result["ok"]:
-            self.settings.setValue("env_ok", True)
 
-        return result
+@lru_cache(maxsize=1)
+def _env_tags() -> frozenset[str]:
+    # sys_tags() 每次都要重新列舉上百個 tag，同一個直譯器內結果不會變
+    from packaging.tags import sys_tags
+
+    return frozenset(str(t) for t in sys_tags())
 
 
 def pick_wheel(dirpath: str, name_prefix="tensorrt-10."):
+    d = Path(dirpath)
+    try:
+        mtime = d.stat().st_mtime_ns  # 資料夾內容變動時 mtime 會改變，快取自動失效
+    except OSError:
+        return None
+    return _pick_wheel(str(d), name_prefix, mtime)
+
+
+@lru_cache(maxsize=8)
+def _pick_wheel(dirpath: str, name_prefix: str, _mtime: int):
+    from packaging.utils import parse_wheel_filename
+
     wheels = [p for p in Path(dirpath).glob("*.whl") if p.name.startswith(name_prefix)]
     if not wheels:
         return None
 
     # 取得當前環境支援的 tag 集合
-    env_tags = {str(t) for t in sys_tags()}
+    env_tags = _env_tags()
 
     best = None
     for whl in wheels:
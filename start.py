@@ -16,8 +16,19 @@ if __name__ == "__main__":
     parser.add_argument(
         "--cfg", type=str, default="./config/config.yaml", help="config path"
     )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Re-run with -X importtime and print the slowest imports on exit",
+    )
     args = parser.parse_args()
 
+    if args.profile_startup:
+        from utils.startup_profile import run_profiled
+
+        argv = [a for a in sys.argv if a != "--profile-startup"]
+        sys.exit(run_profiled(argv))
+
     if args.trt_ver or args.trt_path:
         cuda_lib = (
             f"C:\\Program Files\\NVIDIA GPU Computing Toolkit\\CUDA\\{args.trt_ver}\\lib\\x64"
@@ -52,5 +63,9 @@ if __name__ == "__main__":
         app = QApplication(sys.argv)
         window = MainUI(level=args.log, cfg_path=args.cfg)
         window.show()
+        from PyQt6.QtCore import QTimer
+        from utils.startup_profile import mark_window_shown
+
+        QTimer.singleShot(0, mark_window_shown)  # 事件迴圈開始後才算視窗出現
         # window._clear_all()
         sys.exit(app.exec())
@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """n 張 64x64 的圖片（每張亮度不同），回傳 (資料夾, n)。"""
+    import cv2
+
+    d = tmp_path / "imgs"
+    d.mkdir()
+    n = 12
+    for i in range(n):
+        img = np.full((64, 64, 3), i * 20, dtype=np.uint8)
+        cv2.imwrite(str(d / f"{i:03d}.png"), img)
+    return d, n
+
+
+@pytest.fixture
+def http_server():
+    from http_stub import StubServer
+
+    srv = StubServer().start()
+    yield srv
+    srv.close()
+
+
+@pytest.fixture
+def updater(tmp_path, monkeypatch):
+    """install_dir 在 tmp_path/app 的 Updater；log 也寫在 tmp_path，下載重試不真的等待。"""
+    from utils import updater as upd
+
+    monkeypatch.chdir(tmp_path)
+    sleeps = []
+    monkeypatch.setattr(upd.time, "sleep", sleeps.append)
+    app = tmp_path / "app"
+    app.mkdir()
+    u = upd.Updater(install_dir=app, on_update_func=lambda **kw: None)
+    u.sleeps = sleeps
+    return u
+
+
+def bench_args(source: Path) -> dict:
+    """replay 來源 + 不需要 GPU 的設定，給 bench.BenchMain 用。"""
+    from utils.config import load_defaults
+
+    args = load_defaults()
+    args["camera"] = "replay"
+    args["replay"] = {"path": str(source), "fps": 0, "loop": True}
+    args["capture_thread"] = False
+    args["debug"] = False
+    args["log_level"] = "warning"
+    return args
+
+
+@pytest.fixture
+def bench_main(image_dir, tmp_path, monkeypatch):
+    """bench.BenchMain（假滑鼠、假 engine、replay 擷取），cache 寫在 tmp_path。"""
+    import bench
+
+    monkeypatch.chdir(tmp_path)
+    m = bench.BenchMain(bench_args(image_dir[0]), "none")
+    yield m
+    m.cleanup()
@@ -0,0 +1,79 @@
+"""
+測試用的本機 HTTP 伺服器：支援 Range（可關閉）、416、以及在傳送途中斷線，
+用來模擬 GitHub release / raw 檔案伺服器。
+"""
+from __future__ import annotations
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        return
+
+    def do_GET(self):
+        srv: StubServer = self.server
+        rng = self.headers.get("Range")
+        with srv.lock:
+            srv.requests.append((self.path, rng))
+            cut = srv.cuts.pop(0) if srv.cuts else None
+        body = srv.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        if rng and srv.ranges:
+            start = int(rng.split("=", 1)[1].split("-", 1)[0])
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        data = body[start:]
+        self.send_header("Content-Length", str(len(data)))
+        if srv.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if cut is not None and cut < len(data):
+            # 傳到一半斷線：Content-Length 是完整長度，但只送 cut 個位元組
+            self.wfile.write(data[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.files: dict[str, bytes] = {}
+        self.ranges = True
+        self.cuts: list[int] = []  # 依序套用到之後的請求：只送出這麼多位元組就斷線
+        self.requests: list[tuple[str, str | None]] = []
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,112 @@
+import pytest
+
+from utils.calib_cache import (
+    cache_path,
+    calib_identity,
+    check_cache,
+    read_identity,
+    resolve_cache,
+    write_identity,
+)
+
+SHAPE = [8, 3, 640, 640]
+OUTPUTS = ["num", "boxes", "scores", "classes"]
+
+
+def ident(**kw):
+    args = dict(onnx_path=None, input_shape=SHAPE, calibrator="entropy", outputs=OUTPUTS, graph="g" * 64)
+    args.update(kw)
+    return calib_identity(**args)
+
+
+def key(i) -> str:
+    return cache_path("calib", "models/best.onnx", i).name
+
+
+def test_every_factor_changes_the_key():
+    base = key(ident())
+    assert key(ident(input_shape=[1, 3, 640, 640])) == base  # batch 不影響 scale
+    assert key(ident(outputs=list(reversed(OUTPUTS)))) == base  # 順序不影響
+    changed = [
+        ident(graph="h" * 64),
+        ident(input_shape=[8, 3, 480, 480]),
+        ident(calibrator="minmax"),
+        ident(calibrator="percentile"),
+        ident(outputs=["output0"]),
+        ident(preprocessor="letterbox"),
+    ]
+    keys = [key(i) for i in changed]
+    assert base not in keys and len(set(keys)) == len(keys)
+
+    p1 = ident(calibrator="percentile", percentile=99.9)
+    p2 = ident(calibrator="percentile", percentile=99.99)
+    assert key(p1) != key(p2)
+    assert key(p2) == key(ident(calibrator="percentile"))  # 預設 99.99
+    with pytest.raises(ValueError, match="unknown calibrator"):
+        ident(calibrator="legacy")
+
+
+def test_graph_digest_from_onnx(tmp_path):
+    onnx = pytest.importorskip("onnx")
+    from test_onnx_opt import tiny_model
+
+    a, b = tmp_path / "a.onnx", tmp_path / "b.onnx"
+    m = tiny_model()
+    onnx.save(m, str(a))
+    m.producer_name = "someone else"  # metadata 不影響 key
+    onnx.save(m, str(b))
+    assert calib_identity(a, SHAPE)["graph"] == calib_identity(b, SHAPE)["graph"]
+    m.graph.node[0].op_type = "Sub"
+    onnx.save(m, str(b))
+    assert calib_identity(a, SHAPE)["graph"] != calib_identity(b, SHAPE)["graph"]
+
+
+def test_check_cache(tmp_path):
+    i = ident()
+    path = tmp_path / "x.cache"
+    assert check_cache(path, i) == (False, "missing")
+
+    path.write_bytes(b"TRT-8601-EntropyCalibration2\n")
+    assert check_cache(path, i) == (True, "unverified")  # 舊式快取，沒有 .json
+
+    write_identity(path, i)
+    assert read_identity(path) == i
+    assert check_cache(path, i) == (True, "ok")
+    ok, reason = check_cache(path, ident(input_shape=[8, 3, 320, 320], calibrator="minmax"))
+    assert not ok and reason == "mismatch: calibrator, input_shape"
+
+
+def test_resolve_mismatched_explicit_falls_back_to_keyed(tmp_path):
+    old, new = ident(graph="a" * 64), ident(graph="b" * 64)
+    explicit = tmp_path / "calibration.cache"
+    explicit.write_bytes(b"old scales")
+    write_identity(explicit, old)
+    keyed = cache_path(tmp_path / "calib", "best.onnx", new)
+
+    path, ok, checks = resolve_cache(explicit, keyed, new)
+    assert (path, ok) == (str(keyed), False)  # 重新校正，寫到 key 對應的檔案
+    assert checks == [(str(explicit), "mismatch: graph"), (str(keyed), "missing")]
+    assert read_identity(explicit) == old  # 明確指定的快取不被改動
+
+    # 校正完（呼叫端寫出快取與 .json）之後再建置就直接沿用
+    keyed.parent.mkdir(parents=True)
+    keyed.write_bytes(b"new scales")
+    write_identity(keyed, new)
+    assert resolve_cache(explicit, keyed, new)[:2] == (str(keyed), True)
+    assert resolve_cache(None, keyed, new)[:2] == (str(keyed), True)
+    assert resolve_cache(explicit, keyed, old)[:2] == (str(explicit), True)
+
+
+def test_resolve_legacy_and_missing(tmp_path):
+    i = ident()
+    keyed = tmp_path / "keyed.cache"
+    legacy = tmp_path / "calibration.cache"
+    legacy.write_bytes(b"no sidecar")
+    assert resolve_cache(legacy, keyed, i) == (str(legacy), True, [(str(legacy), "unverified")])
+    assert resolve_cache(None, keyed, i) == (str(keyed), False, [(str(keyed), "missing")])
+
+    # key 對應的檔案本身來源不符（例如 CALIB_VERSION 改過）：不沿用，原地重新校正
+    keyed.write_bytes(b"stale")
+    write_identity(keyed, ident(graph="z" * 64))
+    path, ok, checks = resolve_cache(None, keyed, i)
+    assert (path, ok) == (str(keyed), False) and checks == [(str(keyed), "mismatch: graph")]
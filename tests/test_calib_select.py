@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+import pytest
+
+from utils import calib_select as cs
+from utils.calib_select import coverage, descriptors, k_center, k_means, select_subset
+from utils.image_batch import ImageBatcher
+
+
+def images(folder, n: int = 8) -> list[str]:
+    """n 張顏色與構圖都不同的小圖。"""
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        img = np.full((48, 64, 3), rng.integers(0, 256, 3), np.uint8)
+        cv2.rectangle(img, (4 * i, 2 * i), (4 * i + 16, 2 * i + 24), (255 - 30 * i, 30 * i, 128), -1)
+        path = folder / f"{i:02d}.png"
+        cv2.imwrite(str(path), img)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def X():
+    rng = np.random.default_rng(1)
+    # 三群分得很開的點
+    return np.concatenate([rng.normal(c, 0.1, (20, 4)) for c in (0.0, 5.0, 10.0)]).astype(np.float32)
+
+
+@pytest.mark.parametrize("select", [k_center, k_means])
+def test_selection_size_and_unique(X, select):
+    for k in (1, 3, 10):
+        pick = select(X, k)
+        assert len(pick) == k and len(set(pick)) == k
+        assert all(0 <= i < len(X) for i in pick)
+    assert select(X, len(X)) == list(range(len(X)))
+    assert select(X, len(X) + 5) == list(range(len(X)))
+
+
+def test_k_center_covers_every_cluster(X):
+    pick = k_center(X, 3)
+    assert sorted(i // 20 for i in pick) == [0, 1, 2]  # 每一群各一張
+    assert coverage(X, pick) < coverage(X, [0, 1, 2])
+
+
+def test_descriptors_skip_unreadable(tmp_path):
+    paths = images(tmp_path / "img", 4)
+    bad = tmp_path / "img" / "broken.png"
+    bad.write_bytes(b"not a png")
+    paths.insert(1, str(bad))
+
+    X, valid = descriptors(paths, workers=2, cache_path=tmp_path / "desc.npz")
+    assert valid == [0, 2, 3, 4]  # index 對應回 paths
+    assert X.shape[0] == 4 and X.dtype == np.float32
+    for row, i in zip(X, valid):
+        np.testing.assert_array_equal(row, cs.describe(paths[i]))
+
+
+def test_descriptors_second_call_hits_cache(tmp_path, monkeypatch):
+    paths = images(tmp_path / "img", 5)
+    cache = tmp_path / "desc.npz"
+    X1, valid1 = descriptors(paths, workers=2, cache_path=cache)
+    assert cache.exists()
+    mtime = cache.stat().st_mtime_ns
+
+    def no_decode(path):
+        raise AssertionError(f"decoded {path} again")
+
+    monkeypatch.setattr(cs, "describe", no_decode)
+    X2, valid2 = descriptors(paths, workers=2, cache_path=cache)
+    np.testing.assert_array_equal(X1, X2)
+    assert valid1 == valid2
+    assert cache.stat().st_mtime_ns == mtime  # 全部命中時不重寫
+
+
+def test_select_subset(tmp_path):
+    paths = images(tmp_path / "img", 8)
+    cache = tmp_path / "desc.npz"
+    for method in cs.METHODS:
+        picked = select_subset(paths, 3, method=method, cache_path=cache)
+        assert len(picked) == 3 and picked == sorted(picked)  # 依原本順序
+    assert select_subset(paths, 8, cache_path=cache) == paths
+    with pytest.raises(ValueError, match="unknown selection method"):
+        select_subset(paths, 3, method="random")
+
+
+def test_image_batcher_select_reduces_images(tmp_path, monkeypatch):
+    images(tmp_path / "img", 8)
+    monkeypatch.chdir(tmp_path)  # 特徵快取寫在 ./cache
+    batcher = ImageBatcher(str(tmp_path / "img"), [2, 3, 32, 32], np.float32, max_num_images=3, select="kcenter")
+    assert batcher.num_images == 3 and len(batcher.images) == 3
+    assert batcher.num_batches == 2
+    assert (tmp_path / "cache" / "calib_desc.npz").exists()
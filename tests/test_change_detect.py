@@ -0,0 +1,40 @@
+import numpy as np
+
+from utils.change_detect import ChangeDetector
+from utils.config import SkipConfig, compile_config
+
+
+def frame(value=0):
+    return np.full((64, 64, 4), value, dtype=np.uint8)
+
+
+def test_skip_unchanged_is_opt_in():
+    assert SkipConfig().enabled is False
+    assert compile_config({}).skip_unchanged.enabled is False
+
+
+def test_unchanged_frames_are_skipped_until_max_skip():
+    det = ChangeDetector(threshold=2.0, stride=4, tiles=4, max_skip=3)
+    assert det.changed(frame(10), seq=1)
+    assert [det.changed(frame(11), seq=s) for s in range(2, 6)] == [False, False, False, True]
+    assert det.stats() == {"checked": 5, "skipped": 3}
+
+
+def test_local_change_and_drift_trigger_inference():
+    det = ChangeDetector(threshold=2.0, stride=4, tiles=4, max_skip=0)
+    assert det.changed(frame(10))
+    moved = frame(10)
+    moved[:16, :16] = 200  # 只有一個 tile 變了
+    assert det.changed(moved)
+    det.reset()
+    assert det.changed(frame(10))
+    # 參考簽章只在推論時更新，緩慢漂移累積到門檻就會觸發
+    assert [det.changed(frame(10 + d)) for d in (1, 2, 3)] == [False, False, True]
+
+
+def test_same_seq_short_circuits():
+    det = ChangeDetector(threshold=2.0, stride=4, tiles=4, max_skip=0)
+    assert det.changed(frame(10), seq=7)
+    # 同一個 seq 不重新比對（畫面內容不看）
+    assert not det.changed(frame(200), seq=7)
+    assert det.changed(frame(200), seq=8)
@@ -0,0 +1,106 @@
+import dataclasses
+
+import pytest
+
+from utils.config import (
+    AppConfig,
+    ConfigError,
+    compile_config,
+    deep_merge,
+    diff,
+    load_defaults,
+    plan_reload,
+    validate,
+)
+
+
+@pytest.fixture(scope="module")
+def defaults():
+    return load_defaults()
+
+
+def test_deep_merge_does_not_touch_inputs():
+    base = {"a": 1, "m": {"x": [1, 2], "y": {"z": 1}}}
+    override = {"m": {"y": {"w": 2}, "x": [3]}, "b": {"c": 1}}
+    out = deep_merge(base, override)
+    assert out == {"a": 1, "m": {"x": [3], "y": {"z": 1, "w": 2}}, "b": {"c": 1}}
+    assert base == {"a": 1, "m": {"x": [1, 2], "y": {"z": 1}}}
+
+    out["m"]["y"]["z"] = 9
+    out["b"]["c"] = 9
+    assert base["m"]["y"]["z"] == 1 and override["b"]["c"] == 1  # 複本，不共用巢狀物件
+
+    # 一邊不是 dict 時直接覆蓋
+    assert deep_merge({"m": {"x": 1}}, {"m": 5}) == {"m": 5}
+    assert deep_merge({"m": 5}, {"m": {"x": 1}}) == {"m": {"x": 1}}
+
+
+def test_diff_lists_changed_leaves():
+    old = {"a": 1, "m": {"x": 1, "y": 2}, "gone": 3, "l": [1]}
+    new = {"a": 1, "m": {"x": 1, "y": 5, "z": 0}, "l": [1, 2]}
+    assert diff(old, new) == {
+        "gone": (3, None),
+        "l": ([1], [1, 2]),
+        "m.y": (2, 5),
+        "m.z": (None, 0),
+    }
+    assert diff(old, old) == {}
+    assert list(diff(old, new)) == sorted(diff(old, new))
+
+
+def test_validate_types_and_choices(defaults):
+    assert validate(defaults, defaults) == []
+    cfg = deep_merge(defaults, {
+        "resolution_x": "1920",
+        "debug": 1,
+        "mouse": {"smooth": True, "mag": 3},  # int 可以放在 float 欄位
+        "model": {"label_list": "enemy"},
+        "camera": "DXCAM",  # 不分大小寫
+        "log_level": "verbose",
+        "unknown": {"anything": 1},  # schema 沒有的 key 不檢查
+    })
+    errors = validate(cfg, defaults)
+    assert [e.split(":")[0] for e in errors] == [
+        "model.label_list", "mouse.smooth", "resolution_x", "debug", "log_level",
+    ]
+    assert "expected int, got str ('1920')" in errors[2]
+
+
+def test_validate_nullable_only_where_allowed(defaults):
+    assert validate(deep_merge(defaults, {"mouse": {"serial_port": None}}), defaults) == []
+    for override, key in [
+        ({"model": {"file_path": None}}, "model.file_path"),
+        ({"camera": None}, "camera"),
+        ({"replay": None}, "replay"),
+        ({"mouse": {"smooth": None}}, "mouse.smooth"),
+    ]:
+        errors = validate(deep_merge(defaults, override), defaults)
+        assert len(errors) == 1 and errors[0].startswith(f"{key}: expected")
+
+
+def test_compile_config(defaults):
+    cfg = compile_config({"mouse": {"smooth": 0.5, "serial_port": None}, "resolution_x": 2560}, defaults)
+    assert isinstance(cfg, AppConfig)
+    assert cfg.mouse.smooth == 0.5 and cfg.mouse.serial_port is None
+    assert cfg.mouse.mag == defaults["mouse"]["mag"]  # 沒給的用預設值
+    assert cfg.model.label_list == ("enemy", "down", "friend")  # list 轉 tuple
+    assert cfg.scale == pytest.approx(2560 / 1920)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cfg.mouse.smooth = 1.0
+
+    with pytest.raises(ConfigError) as e:
+        compile_config({"model": {"file_path": None}, "camera": "webcam"}, defaults)
+    assert [x.split(":")[0] for x in e.value.errors] == ["model.file_path", "camera"]
+
+
+def test_plan_reload():
+    hot, rebuild, restart = plan_reload({
+        "mouse.smooth": (0.8, 0.5),
+        "mouse.serial_port": ("COM3", None),
+        "replay.fps": (0, 30),
+        "model.file_path": ("a", "b"),
+        "log_async": (False, True),
+    })
+    assert hot == ["mouse.smooth"]
+    assert rebuild == {"mouse", "camera", "engine"}
+    assert restart == ["log_async"]
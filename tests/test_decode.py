@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from utils.decode import (
+    compare,
+    cxcywh_to_xyxy,
+    decode,
+    efficient_nms,
+    prediction_format,
+    split_predictions,
+    topk_candidates,
+)
+
+NC = 3
+N = 400
+
+
+def synthetic(seed: int = 0, n: int = N, nc: int = NC) -> np.ndarray:
+    """yolov8 格式 [1, 4 + nc, n]：幾群互相重疊的框，分數大多在門檻以下。"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(50, 590, size=(8, 2))
+    c = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 4, size=(n, 2))
+    wh = rng.uniform(20, 60, size=(n, 2))
+    scores = rng.uniform(0, 0.3, size=(n, nc))
+    hot = rng.choice(n, size=n // 5, replace=False)
+    scores[hot, rng.integers(0, nc, len(hot))] = rng.uniform(0.45, 0.99, len(hot))
+    pred = np.concatenate([c, wh, scores], axis=1).astype(np.float32)  # [n, 4 + nc]
+    return pred.T[None]
+
+
+def as_yolov5(pred8: np.ndarray) -> np.ndarray:
+    """同樣的預測轉成 yolov5 [1, n, 5 + nc]；objectness 1，類別分數不變。"""
+    p = pred8[0].T
+    return np.concatenate([p[:, :4], np.ones((len(p), 1), np.float32), p[:, 4:]], axis=1)[None]
+
+
+def engine_topk_gather(pred8: np.ndarray, k: int, conf=0.4, iou=0.5, max_det=100, fp16=False):
+    """
+    仿照 export.py 的 end2end 網路：ReduceMax(scores) → TopK → Gather(boxes / scores)
+    → EfficientNMS，輸出依 fp16_outputs 轉型。拿來對照 decode() 的結果。
+    """
+    p = pred8[0].T.astype(np.float32)
+    boxes, scores = cxcywh_to_xyxy(p[:, :4]), p[:, 4:]
+    best = scores.max(axis=1)
+    idx = np.argsort(-best, kind="stable")[:k]
+    b, s, c = efficient_nms(boxes[idx], scores[idx], conf, iou, max_det)
+    dt = np.float16 if fp16 else np.float32
+    out = [np.array([[len(b)]], np.int32), np.zeros((1, max_det, 4), dt), np.zeros((1, max_det), dt),
+           np.zeros((1, max_det), np.int32)]
+    out[1][0, : len(b)], out[2][0, : len(b)], out[3][0, : len(b)] = b, s, c
+    return out
+
+
+def test_topk_matches_reduce_max_topk():
+    pred = synthetic()
+    _, scores = split_predictions(pred)
+    idx = topk_candidates(scores, 50)
+    best = scores.max(axis=1)
+    assert len(idx) == 50
+    np.testing.assert_array_equal(np.sort(best[idx])[::-1], np.sort(best)[::-1][:50])
+    assert np.all(np.diff(best[idx]) <= 0)  # 由高到低，與 TopK 的輸出順序相同
+    assert len(topk_candidates(scores, None)) == N and len(topk_candidates(scores, N + 10)) == N
+
+
+@pytest.mark.parametrize("k", [30, 100, N])
+@pytest.mark.parametrize("fp16", [False, True])
+def test_decode_matches_topk_gather_network(k, fp16):
+    pred = synthetic(1)
+    ref = engine_topk_gather(pred, k, fp16=fp16)
+    out = decode(pred, "yolov8", pre_nms_topk=k, fp16_outputs=fp16)
+    assert [o.dtype for o in out] == [o.dtype for o in ref]
+    assert [o.shape for o in out] == [(1, 1), (1, 100, 4), (1, 100), (1, 100)]
+    for a, b in zip(out, ref):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_topk_keeps_detections_when_k_covers_candidates():
+    pred = synthetic(2)
+    full = decode(pred)
+    n_cand = int((split_predictions(pred)[1] > 0.4).any(axis=1).sum())
+    r = compare(full, decode(pred, pre_nms_topk=n_cand))
+    assert r["f1"] == 1.0 and r["box_err"] == 0.0
+
+    # k 太小時只剩最高分的幾個框
+    small = decode(pred, pre_nms_topk=5)
+    assert int(small[0][0, 0]) <= 5
+
+
+def test_fp16_outputs_close_to_fp32():
+    pred = synthetic(3)
+    f32, f16 = decode(pred), decode(pred, fp16_outputs=True)
+    assert f16[1].dtype == np.float16 and f16[2].dtype == np.float16 and f16[3].dtype == np.int32
+    # inference.BaseEngine.forward 把 fp16 轉回 float32 再用
+    back = [f16[0], f16[1].astype(np.float32), f16[2].astype(np.float32), f16[3]]
+    r = compare(f32, back)
+    assert r["ref"] > 0 and r["f1"] == 1.0
+    assert r["box_err"] <= 0.5 and r["score_err"] <= 1e-3
+
+
+def test_yolov5_layout_same_detections():
+    pred8 = synthetic(4)
+    for a, b in zip(decode(pred8, "yolov8"), decode(as_yolov5(pred8), "yolov5")):
+        np.testing.assert_array_equal(a, b)
+    with pytest.raises(ValueError, match="unknown prediction format"):
+        decode(pred8, "yolov7")
+
+
+def test_prediction_format_guess():
+    assert prediction_format((1, 4 + 80, 8400)) == "yolov8"
+    assert prediction_format((1, 25200, 5 + 80)) == "yolov5"
+    assert prediction_format([1, 7, 400]) == "yolov8"
+    # metadata 優先，不看形狀
+    assert prediction_format((1, 25200, 85), "yolov8") == "yolov8"
+
+
+def test_prediction_format_square_needs_metadata():
+    with pytest.raises(ValueError, match="square"):
+        prediction_format((1, 84, 84))
+    assert prediction_format((1, 84, 84), "yolov5") == "yolov5"
+    with pytest.raises(ValueError, match="unknown prediction format"):
+        prediction_format((1, 84, 8400), "yolo")
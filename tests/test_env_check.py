@@ -0,0 +1,82 @@
+import logging
+
+import pytest
+
+pytest.importorskip("PyQt6")
+
+import main_ui
+from utils.cache import JsonCache
+
+
+class Probe:
+    """假的模組探測：missing 內的模組回報不存在，並記錄被探測的模組。"""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.calls = []
+
+    def __call__(self, mod):
+        self.calls.append(mod)
+        if mod in self.missing:
+            return False, None, ModuleNotFoundError(f"No module named '{mod}'")
+        return True, "1.0", None
+
+
+def gpu_ok():
+    return {"tensorrt_ver": "10.0"}, True
+
+
+@pytest.fixture
+def fingerprint(monkeypatch):
+    env = {"python": "py", "site": {"site-packages": 1}, "requirements": "abc"}
+    monkeypatch.setattr(main_ui, "env_fingerprint", lambda: dict(env))
+    return env
+
+
+def startup(tmp_path, probe):
+    s = main_ui.StartUp(
+        logging.getLogger("test"),
+        {"auto_update": False},
+        probe=probe,
+        gpu_checks=[("gpu check", gpu_ok)],
+        probe_cache=JsonCache(tmp_path / "env_probe.json"),
+    )
+    s._ensure_models = lambda: None  # 不要去建置 models/500e.trt
+    return s
+
+
+def test_cache_hit_skips_probing(tmp_path, fingerprint):
+    probe = Probe()
+    first = startup(tmp_path, probe).env_check(0)
+    assert first["ok"] and "missing" not in first
+    assert sorted(probe.calls) == sorted(main_ui.StartUp.ENV_TARGETS)
+    assert first["gpu"] == {"tensorrt_ver": "10.0"}
+
+    probe.calls.clear()
+    second = startup(tmp_path, probe).env_check(0)
+    assert probe.calls == []
+    assert second == first
+
+
+def test_fingerprint_change_probes_again(tmp_path, fingerprint):
+    probe = Probe()
+    startup(tmp_path, probe).env_check(0)
+    probe.calls.clear()
+
+    fingerprint["site"] = {"site-packages": 2}  # pip 安裝 / 移除套件
+    startup(tmp_path, probe).env_check(0)
+    assert sorted(probe.calls) == sorted(main_ui.StartUp.ENV_TARGETS)
+
+
+def test_missing_module_is_reported_and_not_cached(tmp_path, fingerprint):
+    probe = Probe(missing={"tensorrt", "dxcam"})
+    res = startup(tmp_path, probe).env_check(0)
+    assert res["ok"] is False
+    assert res["missing"] == ["tensorrt", "dxcam"]  # ENV_TARGETS 的順序
+    assert res["modules"]["tensorrt"] == {"ok": False, "ver": "", "err": "No module named 'tensorrt'"}
+    assert res["modules"]["numpy"]["ok"] is True
+
+    # 失敗的結果不快取，下一次還是重新探測
+    probe.calls.clear()
+    startup(tmp_path, probe).env_check(0)
+    assert sorted(probe.calls) == sorted(main_ui.StartUp.ENV_TARGETS)
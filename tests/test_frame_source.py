@@ -0,0 +1,137 @@
+import time
+
+from utils.frame_source import CaptureThread, FrameSource, ReplaySource
+
+REGION = (0, 0, 64, 64)
+
+
+def replay(image_dir, tmp_path, **kw):
+    path, _ = image_dir
+    return ReplaySource(str(path), REGION, cache_dir=tmp_path / "cache", **kw)
+
+
+def drain(cap, delay=0.0):
+    """grab 到來源播完為止，回傳每幀的 (亮度, seq)。"""
+    got = []
+    while True:
+        frame, _, seq = cap.grab()
+        if frame is None:
+            if cap.exhausted or not cap.is_capturing:
+                break
+            continue
+        got.append((int(frame[0, 0, 0]), seq))
+        if delay:
+            time.sleep(delay)
+    return got
+
+
+def test_replay_source_plays_every_frame(image_dir, tmp_path):
+    src = replay(image_dir, tmp_path, loop=False)
+    src.start()
+    seqs = []
+    while True:
+        frame, _, seq = src.grab()
+        if frame is None:
+            break
+        assert frame.shape == (64, 64, 4)
+        seqs.append(seq)
+    assert src.exhausted
+    assert seqs == list(range(1, image_dir[1] + 1))
+
+
+def test_capture_thread_fast_consumer_drops_nothing(image_dir, tmp_path):
+    n = image_dir[1]
+    cap = CaptureThread(replay(image_dir, tmp_path, fps=100, loop=False))
+    cap.start()
+    got = drain(cap)
+    cap.stop()
+
+    stats = cap.stats()
+    assert stats == {"produced": n, "consumed": n, "dropped": 0}
+    assert [s for _, s in got] == list(range(1, n + 1))
+    assert [v for v, _ in got] == [i * 20 for i in range(n)]
+
+
+def test_capture_thread_slow_consumer_gets_latest_frames(image_dir, tmp_path):
+    n = image_dir[1]
+    cap = CaptureThread(replay(image_dir, tmp_path, fps=200, loop=False))
+    cap.start()
+    got = drain(cap, delay=0.02)
+    cap.stop()
+
+    stats = cap.stats()
+    assert stats["produced"] == n
+    assert stats["consumed"] == len(got)
+    assert stats["dropped"] > 0
+    assert stats["consumed"] + stats["dropped"] == stats["produced"]
+    seqs = [s for _, s in got]
+    assert seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+    # 畫面內容與 seq 對得上（buffer 沒有被 producer 寫到一半）
+    assert all(v == (s - 1) * 20 for v, s in got)
+
+
+class _EmptySource(FrameSource):
+    """永遠沒有新畫面（例如 mss 第一幀之前）。"""
+
+    name = "empty"
+
+    def __init__(self):
+        super().__init__(REGION)
+        self.calls = 0
+
+    def grab(self, out=None):
+        self.calls += 1
+        return self._stamp(None, out)
+
+
+def test_capture_thread_waits_when_source_has_no_frame():
+    src = _EmptySource()
+    cap = CaptureThread(src, timeout=0.05)
+    cap.start()
+    frame, _, _ = cap.grab()
+    time.sleep(0.1)
+    cap.stop()
+
+    assert frame is None
+    # 每次沒畫面都等 idle_wait，不會空轉成百萬次
+    assert 0 < src.calls < 0.25 / cap.idle_wait
+    assert cap.stats() == {"produced": 0, "consumed": 0, "dropped": 0}
+
+
+def test_capture_thread_stop_is_prompt(image_dir, tmp_path):
+    cap = CaptureThread(replay(image_dir, tmp_path, fps=0, loop=True))
+    cap.start()
+    assert cap.grab()[0] is not None
+    t0 = time.perf_counter()
+    cap.stop()
+    assert time.perf_counter() - t0 < 1.0
+    assert not cap.is_capturing
+
+
+def test_replay_16bit_png_is_cached_as_uint8(tmp_path):
+    import cv2
+    import numpy as np
+
+    d = tmp_path / "png16"
+    d.mkdir()
+    for i in range(3):
+        img = np.full((32, 32, 3), (i + 1) * 0x1000 + 0xFF, dtype=np.uint16)
+        img[:, :, 2] = 0xFFFF
+        assert cv2.imwrite(str(d / f"{i}.png"), img)
+    rgba = np.full((32, 32, 4), 0x8000, dtype=np.uint16)  # 帶 alpha 的 16-bit
+    assert cv2.imwrite(str(d / "3.png"), rgba)
+
+    src = ReplaySource(str(d), (0, 0, 32, 32), cache_dir=tmp_path / "cache", loop=False)
+    src.start()
+    frames = []
+    while True:
+        frame, _, _ = src.grab()
+        if frame is None:
+            break
+        frames.append(frame.copy())
+    assert len(frames) == 4
+    assert all(f.dtype == np.uint8 and f.shape == (32, 32, 4) for f in frames)
+    assert [tuple(f[0, 0]) for f in frames] == [(16, 16, 255, 255), (32, 32, 255, 255), (48, 48, 255, 255),
+                                                (128, 128, 128, 128)]
+    (bin_file,) = (tmp_path / "cache").glob("*.bin")
+    assert bin_file.stat().st_size == 4 * 32 * 32 * 4
@@ -0,0 +1,16 @@
+import subprocess
+import sys
+
+from conftest import ROOT
+
+HEAVY = ("tensorrt", "cuda", "matplotlib", "cv2")
+
+
+def test_utils_utils_import_is_light():
+    # 獨立的直譯器，才不會受到其他測試已經 import 的模組影響
+    code = (
+        "import sys; import utils.utils; "
+        f"print([m for m in {HEAVY!r} if m in sys.modules])"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
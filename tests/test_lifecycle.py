@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+from utils.lifecycle import Lifecycle, State, TransitionError
+
+
+def wait_first_frame(m, timeout: float = 5.0) -> float:
+    deadline = time.perf_counter() + timeout
+    while m.lifecycle.first_frame_ms is None and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    assert m.lifecycle.first_frame_ms is not None, f"no frame ({m.lifecycle.state.value})"
+    return m.lifecycle.first_frame_ms
+
+
+def run(m) -> threading.Thread:
+    t = threading.Thread(target=m.start, daemon=True)
+    t.start()
+    assert m.lifecycle.wait_for(State.RUNNING, State.FAILED, timeout=5.0)
+    return t
+
+
+def test_illegal_transitions_rejected():
+    seen = []
+    lc = Lifecycle(on_change=lambda a, b: seen.append((a, b)))
+    with pytest.raises(TransitionError, match="init -> running"):
+        lc.to(State.RUNNING)
+    assert not lc.try_to(State.STOPPED)
+    assert lc.state is State.INIT and lc.starts == 0 and seen == []
+
+    lc.to(State.READY)
+    lc.to(State.RUNNING)
+    for bad in (State.READY, State.STOPPED, State.INIT):
+        assert not lc.can(bad)
+        with pytest.raises(TransitionError):
+            lc.to(bad)
+    assert lc.to(State.RUNNING) is State.RUNNING  # 同一狀態不算轉換
+    assert seen == [(State.INIT, State.READY), (State.READY, State.RUNNING)]
+    assert lc.starts == 1
+
+
+def test_first_frame_only_measured_once_per_start():
+    lc = Lifecycle()
+    assert lc.mark_first_frame() is None  # 還沒 start
+    lc.to(State.READY)
+    lc.to(State.RUNNING)
+    ms = lc.mark_first_frame()
+    assert ms is not None and ms >= 0
+    assert lc.mark_first_frame() is None and lc.first_frame_ms == ms
+
+    lc.to(State.DRAINING)
+    lc.to(State.STOPPED)
+    lc.to(State.RUNNING)
+    assert lc.first_frame_ms is None and lc.starts == 2
+
+
+def test_start_first_frame_restart_reuses_components(bench_main):
+    m = bench_main
+    assert m.lifecycle.state is State.READY
+    engine, cam = m.engine, m.cam
+
+    for i in range(2):
+        t = run(m)
+        assert m.lifecycle.state is State.RUNNING
+        wait_first_frame(m)
+        assert m.stop(timeout=m.STOP_TIMEOUT)
+        t.join(timeout=5.0)
+        assert not t.is_alive()
+        assert m.lifecycle.state is State.STOPPED
+        assert m.lifecycle.starts == i + 1
+
+    assert m.engine is engine and m.cam is cam
+    assert m.engine_loads == 1
+
+    # 停止狀態下再 stop 不會改變狀態
+    assert m.stop(timeout=0.1)
+    assert m.lifecycle.state is State.STOPPED
+
+
+def test_start_while_running_is_ignored(bench_main):
+    m = bench_main
+    t = run(m)
+    wait_first_frame(m)
+    m.start()  # 已經在跑：直接回傳，不會巢狀進入 frame loop
+    assert m.lifecycle.starts == 1 and m.lifecycle.state is State.RUNNING
+    assert m.stop(timeout=m.STOP_TIMEOUT)
+    t.join(timeout=5.0)
+
+
+def test_failed_run_rebuilds_camera_only(bench_main, monkeypatch):
+    m = bench_main
+    engine, cam = m.engine, m.cam
+
+    def broken_grab(*a, **kw):
+        raise RuntimeError("capture device lost")
+
+    monkeypatch.setattr(cam, "grab", broken_grab)
+    run(m).join(timeout=5.0)
+    assert m.lifecycle.state is State.FAILED
+    assert m.lifecycle.failed_from is State.RUNNING
+    assert str(m.lifecycle.error) == "capture device lost"
+
+    t = run(m)
+    wait_first_frame(m)
+    assert m.cam is not cam and m.engine is engine and m.engine_loads == 1
+    assert m.stop(timeout=m.STOP_TIMEOUT)
+    t.join(timeout=5.0)
+    assert m.lifecycle.state is State.STOPPED
+
+
+def test_full_cleanup_goes_back_to_init(bench_main):
+    m = bench_main
+    m.cleanup()
+    assert m.lifecycle.state is State.INIT
+    assert m.cam is None and m.engine is None
+
+    t = run(m)  # INIT -> init_all -> READY -> RUNNING
+    wait_first_frame(m)
+    assert m.engine_loads == 2
+    assert m.stop(timeout=m.STOP_TIMEOUT)
+    t.join(timeout=5.0)
+
+
+def test_failed_reinit_does_not_run(bench_main, monkeypatch):
+    m = bench_main
+    m.cleanup()
+    loads = m.engine_loads
+
+    def broken_engine():
+        raise RuntimeError("engine load failed")
+
+    monkeypatch.setattr(m, "init_engine", broken_engine)
+    for _ in range(2):  # 第二次是 FAILED（failed_from INIT）再重試
+        m.start()
+        assert m.lifecycle.state is State.FAILED
+        assert m.lifecycle.failed_from is State.INIT
+        assert str(m.lifecycle.error) == "engine load failed"  # 不會被 frame loop 的錯誤蓋掉
+        assert m.lifecycle.starts == 0
+
+    monkeypatch.undo()
+    t = run(m)  # 修好之後可以正常啟動
+    wait_first_frame(m)
+    assert m.engine_loads == loads + 1
+    assert m.stop(timeout=m.STOP_TIMEOUT)
+    t.join(timeout=5.0)
@@ -0,0 +1,103 @@
+import dataclasses
+import json
+import logging
+
+import pytest
+
+from utils import logger as lg
+from utils.logger import LoggerConfig, RateLimitFilter, drain_logs, get_logger
+
+
+class Clock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(lg.time, "monotonic", c)
+    return c
+
+
+def record(msg, level=logging.WARNING):
+    return logging.makeLogRecord({"msg": msg, "levelno": level, "levelname": logging.getLevelName(level)})
+
+
+def test_rate_limit_window_and_suffix(clock):
+    f = RateLimitFilter(1.0)
+    assert f.filter(record("no frame"))
+    clock.t += 0.5
+    assert not f.filter(record("no frame"))
+    assert not f.filter(record("no frame"))
+    assert f.filter(record("no frame", logging.ERROR))  # 不同等級分開計算
+    assert f.filter(record("other"))
+
+    clock.t += 0.6  # 距離上一次放行超過 1 秒
+    r = record("no frame")
+    assert f.filter(r)
+    assert r.getMessage() == "no frame (suppressed 2 similar messages)"
+
+    clock.t += 2.0  # 中間沒有被擋下的，不加後綴
+    r = record("no frame")
+    assert f.filter(r) and r.getMessage() == "no frame"
+
+
+def cfg(tmp_path, name, **kw):
+    return LoggerConfig(name=name, level="info", to_file=True, file_dir=tmp_path, file_name=name,
+                        static_file_name=True, use_color=False, **kw)
+
+
+def read_log(tmp_path, name) -> str:
+    for h in logging.getLogger(name).handlers:
+        h.flush()
+    drain_logs()
+    return (tmp_path / f"{name}.log").read_text(encoding="utf-8")
+
+
+def test_queue_handler_freezes_message_and_writes_in_background(tmp_path):
+    log = get_logger(cfg(tmp_path, "t-queue", use_queue=True))
+    assert [type(h) for h in log.handlers] == [lg._NonBlockingQueueHandler]
+
+    state = {"x": 1}
+    log.info("state %s", state)
+    state["x"] = 2  # 呼叫之後才改，輸出仍是呼叫當下的值
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.exception("failed")
+    text = read_log(tmp_path, "t-queue")
+    assert "state {'x': 1}" in text
+    assert "failed" in text and "ValueError: boom" in text
+
+
+def test_reconfigure_when_output_settings_change(tmp_path):
+    c = cfg(tmp_path, "t-reconf")
+    log = get_logger(c)
+    handlers = list(log.handlers)
+    assert not log.filters
+    assert get_logger(c) is log and log.handlers == handlers  # 相同設定不重複加 handler
+
+    # 等級每次都套用，不會重建 handlers
+    get_logger(dataclasses.replace(c, level="error"))
+    assert log.level == logging.ERROR and log.handlers == handlers
+
+    # 重建 Main（同一個行程）時新的 log_async / log_rate_limit / log_jsonl 會生效
+    log = get_logger(cfg(tmp_path, "t-reconf", use_queue=True, rate_limit=1.0, jsonl=True))
+    assert [type(h) for h in log.handlers] == [lg._NonBlockingQueueHandler]
+    assert [type(f) for f in log.filters] == [RateLimitFilter]
+    for _ in range(3):
+        log.info("repeated")
+    drain_logs()
+    assert read_log(tmp_path, "t-reconf").count("repeated") == 1
+    lines = (tmp_path / "t-reconf.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(x)["msg"] for x in lines] == ["repeated"]
+
+    log = get_logger(cfg(tmp_path, "t-reconf"))
+    assert log.handlers == handlers and not log.filters
+    assert "t-reconf" not in lg._DISPATCHER._routes
+    log.info("direct")
+    assert "direct" in read_log(tmp_path, "t-reconf")
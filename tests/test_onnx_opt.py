@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+from onnx import TensorProto, helper, numpy_helper  # noqa: E402
+
+from utils.onnx_opt import (  # noqa: E402
+    check_outputs,
+    eliminate_dead_nodes,
+    fold_constants,
+    format_report,
+    infer_shapes,
+    node_counts,
+    optimize_onnx,
+)
+
+
+def tiny_model():
+    """
+    y = Reshape(x + (w + w) * scale, Shape(x))
+    常數子圖：Add(w, w) → Mul(·, scale)；Shape(x) 的形狀已知也可以折疊。
+    死節點：Relu(x) → Neg，結果沒有接到任何輸出。
+    """
+    w = numpy_helper.from_array(np.arange(16, dtype=np.float32).reshape(1, 1, 4, 4), "w")
+    scale = numpy_helper.from_array(np.array(0.5, dtype=np.float32), "scale")
+    nodes = [
+        helper.make_node("Add", ["w", "w"], ["w2"], name="const_add"),
+        helper.make_node("Mul", ["w2", "scale"], ["bias"], name="const_mul"),
+        helper.make_node("Add", ["x", "bias"], ["xb"], name="add"),
+        helper.make_node("Shape", ["x"], ["shape"], name="shape"),
+        helper.make_node("Reshape", ["xb", "shape"], ["y"], name="reshape"),
+        helper.make_node("Relu", ["x"], ["dead0"], name="dead_relu"),
+        helper.make_node("Neg", ["dead0"], ["dead1"], name="dead_neg"),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "tiny",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 3, 4, 4])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 3, 4, 4])],
+        initializer=[w, scale],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    onnx.checker.check_model(model)
+    return model
+
+
+@pytest.fixture
+def tiny_path(tmp_path):
+    path = tmp_path / "tiny.onnx"
+    onnx.save(tiny_model(), str(path))
+    return path
+
+
+def test_fold_constants():
+    model = infer_shapes(tiny_model())
+    assert fold_constants(model) == 3  # const_add、const_mul、shape
+    assert node_counts(model) == {"Add": 1, "Neg": 1, "Relu": 1, "Reshape": 1}
+    inits = {i.name: numpy_helper.to_array(i) for i in model.graph.initializer}
+    np.testing.assert_array_equal(inits["bias"], np.arange(16, dtype=np.float32).reshape(1, 1, 4, 4))
+    np.testing.assert_array_equal(inits["shape"], [1, 3, 4, 4])
+
+
+def test_eliminate_dead_nodes():
+    model = tiny_model()
+    assert eliminate_dead_nodes(model) == 2
+    assert [n.name for n in model.graph.node] == ["const_add", "const_mul", "add", "shape", "reshape"]
+    assert eliminate_dead_nodes(model) == 0
+
+    model = infer_shapes(tiny_model())
+    fold_constants(model)
+    eliminate_dead_nodes(model)
+    # 折疊後 w / scale / w2 沒人用了，跟著移除
+    assert sorted(i.name for i in model.graph.initializer) == ["bias", "shape"]
+    assert {v.name for v in model.graph.value_info}.isdisjoint({"dead0", "dead1", "w2"})
+
+
+def test_optimize_onnx_outputs_match_and_cache(tiny_path, tmp_path):
+    cache = tmp_path / "cache"
+    out, report = optimize_onnx(tiny_path, cache_dir=cache, simplify=False)
+    assert report["cached"] is False
+    assert report["total_before"] == 7
+    assert report["nodes_after"] == {"Add": 1, "Reshape": 1}
+    assert report["initializers_after"] == 2
+    assert check_outputs(tiny_path, out) == [0.0]
+    assert "nodes: 7 -> 2" in format_report(report)
+
+    out2, report2 = optimize_onnx(tiny_path, cache_dir=cache, simplify=False)
+    assert out2 == out and report2["cached"] is True
+    assert report2["nodes_after"] == report["nodes_after"]
+    assert "(cached)" in format_report(report2)
+
+    # 來源改變就是新的 key
+    onnx.save(tiny_model(), str(tiny_path))  # 內容相同 → 仍命中
+    assert optimize_onnx(tiny_path, cache_dir=cache, simplify=False)[1]["cached"] is True
+    m = tiny_model()
+    m.graph.node[-1].op_type = "Sigmoid"
+    onnx.save(m, str(tiny_path))
+    out3, report3 = optimize_onnx(tiny_path, cache_dir=cache, simplify=False)
+    assert out3 != out and report3["cached"] is False
+    assert len(list(cache.glob("*.onnx"))) == 2
+    assert json.loads(out3.with_suffix(".json").read_text())["output"] == str(out3.resolve())
+
+
+def test_check_outputs_detects_mismatch(tiny_path, tmp_path):
+    m = tiny_model()
+    m.graph.initializer[1].CopyFrom(numpy_helper.from_array(np.array(0.75, dtype=np.float32), "scale"))
+    other = tmp_path / "other.onnx"
+    onnx.save(m, str(other))
+    with pytest.raises(AssertionError, match="max abs error"):
+        check_outputs(tiny_path, other)
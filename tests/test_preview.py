@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6")
+
+from utils import preview  # noqa: E402
+from utils.preview import PreviewChannel  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(preview.time, "perf_counter", c)
+    return c
+
+
+@pytest.fixture
+def channel():
+    ch = PreviewChannel()
+    ch.emitted = 0
+
+    def on_ready():
+        ch.emitted += 1
+
+    ch.ready.connect(on_ready)  # 同一執行緒、沒有 event loop：直接呼叫
+    return ch
+
+
+def frame(value: int = 0, w: int = 320, h: int = 200) -> np.ndarray:
+    return np.full((h, w, 4), value, np.uint8)
+
+
+def test_not_subscribed_publishes_nothing(channel, clock):
+    for _ in range(3):
+        channel.offer(frame())
+        clock.t += 1.0
+    assert channel.take() is None
+    assert channel.emitted == 0 and channel.published == 0
+    assert channel.fps == pytest.approx(1.0)  # 沒訂閱也會更新發佈端 FPS
+
+
+def test_single_slot_emits_only_on_empty_to_full(channel, clock):
+    channel.subscribe(max_fps=1000)
+    channel.offer(frame(1))
+    assert channel.emitted == 1
+
+    # slot 還沒被取走：略過，不再發通知
+    for v in (2, 3):
+        clock.t += 1.0
+        channel.offer(frame(v))
+    assert channel.emitted == 1 and channel.busy == 2 and channel.published == 1
+
+    img, boxes, scores, cls_inds, fps = channel.take()
+    assert img[0, 0, 0] == 1  # 是第一張，不是被覆寫成最新的
+    assert channel.take() is None
+
+    clock.t += 1.0
+    channel.offer(frame(4))
+    assert channel.emitted == 2
+    assert channel.take()[0][0, 0, 0] == 4
+    assert img[0, 0, 0] == 1  # 雙緩衝：剛取走的畫面不會被下一次發佈改寫
+
+
+def test_downscale_and_box_scale(channel, clock):
+    channel.subscribe(max_fps=1000, max_size=(160, 160))
+    boxes = np.array([[32, 20, 64, 40, 0.9, 1]], np.float32)
+    scores = np.array([0.9], np.float32)
+    channel.offer(frame(w=320, h=200), boxes, scores, [1.0])
+    img, b, s, c, _ = channel.take()
+    assert img.shape == (100, 160, 4)
+    np.testing.assert_allclose(b, [[16, 10, 32, 20]])
+    scores[0] = 0.1
+    assert s[0] == pytest.approx(0.9)  # 複製過，不受呼叫端後續修改影響
+
+    clock.t += 1.0
+    channel.offer(frame(w=100, h=80), np.zeros((0, 6), np.float32))
+    assert channel.take()[0].shape == (80, 100, 4)  # 比上限小時不放大
+
+
+def test_rate_gating(channel, clock):
+    channel.subscribe(max_fps=10)  # 每 0.1 秒最多一張
+    published = []
+    for _ in range(20):
+        channel.offer(frame())
+        if channel.take() is not None:
+            published.append(round(clock.t - 100.0, 2))
+        clock.t += 0.025
+    assert published == [0.0, 0.1, 0.2, 0.3, 0.4]
+
+    channel.set_max_fps(5)  # worker 端上限比訂閱端要求低時取較低者
+    published.clear()
+    for _ in range(40):
+        channel.offer(frame())
+        if channel.take() is not None:
+            published.append(round(clock.t - 100.0, 2))
+        clock.t += 0.025
+    assert len(published) == 5
+    assert np.diff(published) == pytest.approx([0.2] * 4)
+
+    channel.set_max_fps(0)  # 0 = 回到訂閱端的速率
+    assert channel._interval == pytest.approx(0.1)
+
+
+def test_unsubscribe_drops_pending_and_resubscribe(channel, clock):
+    channel.subscribe(max_fps=1)
+    channel.offer(frame(1))
+    assert channel.subscribed and channel.emitted == 1
+
+    channel.unsubscribe()
+    assert not channel.subscribed
+    assert channel.take() is None  # 頁面隱藏時丟掉還沒取走的畫面
+    clock.t += 5.0
+    channel.offer(frame(2))
+    assert channel.take() is None and channel.emitted == 1
+
+    # 重新訂閱立即可以發佈，不必等上一次的間隔
+    channel.subscribe(max_fps=1)
+    clock.t += 0.01
+    channel.offer(frame(3))
+    assert channel.emitted == 2 and channel.take()[0][0, 0, 0] == 3
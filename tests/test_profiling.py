@@ -0,0 +1,103 @@
+import copy
+from pathlib import Path
+
+import pytest
+
+from utils.profiling import aggregate, diff, format_diff, format_table, load_profile, save_profile
+
+DATA = Path(__file__).parent / "data"
+
+L0 = "/model.0/conv/Conv + /model.0/act/Mul"
+L1 = "/model.1/conv/Conv"
+L2 = "/model.2/m.0/cv1/conv/Conv"
+CONCAT = "/model.9/Concat"
+SIGMOID = "/model.22/Sigmoid"
+
+
+@pytest.fixture
+def fp16():
+    return load_profile(DATA / "profile_fp16.json")
+
+
+def int8(profile: dict) -> dict:
+    """由 fp16 改出來的第二份 profile：Sigmoid 被融合進新的層，其他層快慢不一。"""
+    p = copy.deepcopy(profile)
+    p["engine"] = "models/int8.trt"
+    layers = p["layers"]
+    layers[L0] = [0.375] * 5  # +0.25
+    layers[L1] = [0.25] * 5  # -0.25
+    layers[CONCAT] = [0.125] * 5  # +0.0625
+    del layers[SIGMOID]
+    layers["/model.22/Sigmoid + /model.22/Mul"] = [0.0625] * 5
+    p["info"]["/model.22/Sigmoid + /model.22/Mul"] = {"type": "PointWise", "precision": "INT8"}
+    return p
+
+
+def test_aggregate_per_layer(fp16):
+    rep = aggregate(fp16)
+    assert rep["engine"] == "models/fp16.trt" and rep["iterations"] == 5
+    rows = {r["name"]: r for r in rep["layers"]}
+    assert "/model.22/Reshape" not in rows  # 沒有量到的層略過
+    assert rep["total_ms"] == pytest.approx(0.5 + 0.25 + 0.125 + 0.0625 + 0.125)
+
+    # median 由大到小；相同時保持執行順序
+    assert [r["name"] for r in rep["layers"]] == [L1, L2, L0, SIGMOID, CONCAT]
+    r0 = rows[L0]
+    assert r0["median_ms"] == 0.125  # 單次突波不影響 median
+    assert r0["mean_ms"] == pytest.approx(0.3)
+    assert r0["p90_ms"] > 0.5
+    assert (r0["order"], r0["calls"], r0["type"], r0["precision"]) == (0, 5, "CaskConvolution", "FP16")
+    assert rows[L1]["pct"] == pytest.approx(0.5 / rep["total_ms"] * 100)
+    assert sum(r["pct"] for r in rep["layers"]) == pytest.approx(100.0)
+
+
+def test_aggregate_by_type(fp16):
+    rep = aggregate(fp16)
+    assert [(t["type"], t["layers"]) for t in rep["by_type"]] == [
+        ("CaskConvolution", 3),
+        ("PointWise", 1),
+        ("Reformat", 1),
+    ]
+    assert rep["by_type"][0]["median_ms"] == pytest.approx(0.875)
+
+    no_info = dict(fp16, info=None)
+    types = aggregate(no_info)["by_type"]
+    assert [(t["type"], t["layers"]) for t in types] == [("?", 5)]
+
+
+def test_diff_ordering(fp16):
+    d = diff(aggregate(fp16), aggregate(int8(fp16)))
+    assert d["a"] == "models/fp16.trt" and d["b"] == "models/int8.trt"
+
+    # |delta| 由大到小；L1 與 L0 同為 0.25，依基準（a）的順序
+    assert [(r["name"], r["delta_ms"]) for r in d["common"]] == [
+        (L1, -0.25),
+        (L0, 0.25),
+        (CONCAT, 0.0625),
+        (L2, 0.0),
+    ]
+    assert [r["name"] for r in d["only_a"]] == [SIGMOID]
+    assert [r["name"] for r in d["only_b"]] == ["/model.22/Sigmoid + /model.22/Mul"]
+    assert [(t["type"], t["delta_ms"]) for t in d["by_type"]] == [
+        ("PointWise", -0.0625),
+        ("Reformat", 0.0625),
+        ("CaskConvolution", 0.0),
+    ]
+    assert d["b_total_ms"] - d["a_total_ms"] == pytest.approx(0.0)
+
+    text = format_diff(d)
+    assert text.index(L1) < text.index(L0) < text.index(CONCAT)
+    assert "only in A (1 layers" in text and "only in B (1 layers" in text
+
+
+def test_roundtrip_and_table(fp16, tmp_path):
+    path = tmp_path / "out" / "p.json"
+    save_profile(fp16, path)
+    assert load_profile(path) == fp16
+
+    text = format_table(aggregate(fp16), top=2)
+    assert "5 layers" in text and "(3 more layers)" in text
+
+    (tmp_path / "bad.json").write_text("{}")
+    with pytest.raises(ValueError, match="missing 'layers'"):
+        load_profile(tmp_path / "bad.json")
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+from onnx import TensorProto, helper, numpy_helper  # noqa: E402
+
+from utils.engine_meta import write_meta  # noqa: E402
+from utils.refit import RefitError, check_topology, topology_digest  # noqa: E402
+
+
+def model(seed: int = 0, target=(2, 8), scales=(1.0, 1.0, 2.0, 2.0), const=1.0, out_ch: int = 4):
+    """
+    x [1, 3, 4, 4] → Conv(w, b) → Add(Constant) → Resize(scales) → Reshape(target)。
+    seed 只改 float 權重的數值（模擬重新訓練），其他參數改的是會寫死在 engine 裡的常數。
+    """
+    rng = np.random.default_rng(seed)
+    inits = [
+        numpy_helper.from_array(rng.standard_normal((out_ch, 3, 1, 1)).astype(np.float32), "w"),
+        numpy_helper.from_array(rng.standard_normal(out_ch).astype(np.float32), "b"),
+        numpy_helper.from_array(np.array([], np.float32), "roi"),
+        numpy_helper.from_array(np.array(scales, np.float32), "scales"),
+        numpy_helper.from_array(np.array(target, np.int64), "target"),
+    ]
+    nodes = [
+        helper.make_node("Conv", ["x", "w", "b"], ["c"]),
+        helper.make_node("Constant", [], ["k"], value=numpy_helper.from_array(np.array(const, np.float32))),
+        helper.make_node("Add", ["c", "k"], ["a"]),
+        helper.make_node("Resize", ["a", "roi", "scales"], ["r"], mode="nearest"),
+        helper.make_node("Reshape", ["r", "target"], ["y"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "refit",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 3, 4, 4])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [f"d{i}" for i in range(len(target))])],
+        initializer=inits,
+    )
+    m = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    onnx.checker.check_model(m)
+    return m
+
+
+def digest(tmp_path, m, name="m.onnx") -> str:
+    path = tmp_path / name
+    onnx.save(m, str(path))
+    return topology_digest(path)
+
+
+def test_retrained_weights_keep_digest(tmp_path):
+    assert digest(tmp_path, model(0), "a.onnx") == digest(tmp_path, model(1), "b.onnx")
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"target": (8, 2)},  # Reshape 目標（int64 initializer）
+        {"scales": (1.0, 1.0, 4.0, 4.0)},  # Resize scales（float，但是形狀參數）
+        {"const": 2.0},  # Constant 節點的 tensor
+        {"out_ch": 8},  # 權重形狀
+    ],
+)
+def test_baked_constants_change_digest(tmp_path, change):
+    assert digest(tmp_path, model(0), "a.onnx") != digest(tmp_path, model(0, **change), "b.onnx")
+
+
+def test_reshape_target_same_size_changes_digest(tmp_path):
+    # 元素個數相同、只有數值不同的形狀常數
+    a = model(0, target=(2, 2, 2, 4))
+    b = model(0, target=(4, 1, 2, 4))
+    assert digest(tmp_path, a, "a.onnx") != digest(tmp_path, b, "b.onnx")
+
+
+def test_check_topology(tmp_path):
+    engine = tmp_path / "m.trt"
+    engine.write_bytes(b"")
+    src = tmp_path / "src.onnx"
+    onnx.save(model(0), str(src))
+    write_meta(engine, {"build": {"refittable": True, "optimized": False, "topology": topology_digest(src)}})
+
+    retrained = tmp_path / "ft.onnx"
+    onnx.save(model(1), str(retrained))
+    path, meta = check_topology(engine, retrained)
+    assert path == str(retrained) and meta["build"]["refittable"] is True
+
+    reshaped = tmp_path / "reshaped.onnx"
+    onnx.save(model(1, target=(8, 2)), str(reshaped))
+    with pytest.raises(RefitError, match="different graph topology"):
+        check_topology(engine, reshaped)
+
+    write_meta(engine, {"build": {"refittable": True, "topology": None}})
+    with pytest.raises(RefitError, match="no topology hash"):
+        check_topology(engine, retrained)
+    write_meta(engine, {"build": {"refittable": False}})
+    with pytest.raises(RefitError, match="--refittable"):
+        check_topology(engine, retrained)
@@ -0,0 +1,58 @@
+import copy
+
+import pytest
+
+from utils.config import deep_merge
+
+
+def reload(m, **override):
+    raw = deep_merge(m.args, override)
+    m.request_reload(raw)
+    return raw
+
+
+def test_hot_key_keeps_pid_and_skip_state(bench_main):
+    m = bench_main
+    reload(m, skip_unchanged={"enabled": True})
+    pidx, detector = m.pidx, m.change_detector
+    assert detector is not None
+
+    reload(m, mouse={"smooth": 0.5})
+    assert m.smooth == pytest.approx(0.5 / m.cfg.scale)
+    assert m.pidx is pidx and m.change_detector is detector
+
+    reload(m, mouse={"pidx_kp": 9.0})
+    assert m.pidx is pidx  # 只換參數，積分項保留
+    assert m.pidx.tunings[0] == 9.0
+    assert m.change_detector is detector
+
+    reload(m, skip_unchanged={"threshold": 5.0})
+    assert m.change_detector is not detector and m.change_detector.threshold == 5.0
+    assert m.pidx is pidx
+
+
+def test_failed_rebuild_restores_args_cfg_and_components(bench_main, monkeypatch):
+    m = bench_main
+    old_args, old_cfg = copy.deepcopy(m.args), m.cfg
+    engine = m.engine
+
+    def broken_engine():
+        raise RuntimeError("engine file is corrupt")
+
+    monkeypatch.setattr(m, "init_engine", broken_engine)
+    # camera 先重建成功，engine 才失敗
+    reload(m, replay={"fps": 30}, model={"file_path": "models/other.trt", "conf": 0.9}, mouse={"smooth": 0.1})
+
+    assert m.cfg == old_cfg
+    assert m.args == old_args
+    assert m.engine is engine
+    assert m.cam.fps == 0  # 擷取來源換回原本的設定
+    assert m.conf == old_cfg.model.conf
+    assert m.smooth == pytest.approx(old_cfg.mouse.smooth / old_cfg.scale)
+
+    # 之後的 set_input_size 以目前的設定為基礎，不會把被拒絕的設定再送一次
+    monkeypatch.undo()
+    m.set_input_size(320)
+    assert m.cfg.model.file_path == old_cfg.model.file_path
+    assert m.cfg.replay == old_cfg.replay
+    assert m.cfg.model.input_size == 320
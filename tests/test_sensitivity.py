@@ -0,0 +1,129 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.sensitivity import (
+    accumulate_errors,
+    fake_build,
+    fake_pairs,
+    fake_probe,
+    fake_run,
+    layer_scores,
+    load_overrides,
+    overrides_path,
+    pin_counts,
+    save_overrides,
+    sensitivity,
+)
+
+
+def test_accumulate_errors():
+    a = np.ones((2, 2), np.float32)
+    pairs = [
+        ({"t": a, "skip": a, "shape": a, "zero": np.zeros(2)}, {"t": a * 1.1, "shape": np.ones(3), "zero": np.ones(2)}),
+        ({"t": a * 3}, {"t": a * 3}),
+    ]
+    err = accumulate_errors(pairs)
+    assert set(err) == {"t", "zero"}  # 另一邊沒有 / 形狀不同的略過
+    # sqrt(4 * 0.01 / (4 * 1 + 4 * 9))：逐筆累加平方誤差與能量
+    assert err["t"] == pytest.approx(np.sqrt(0.04 / 40))
+    assert err["zero"] == pytest.approx(np.sqrt(2))  # 參考輸出全為 0 時退回 RMS 總和
+
+
+def test_layer_scores_walks_unprobed_ancestors():
+    layers = [
+        {"name": "conv0", "type": "CONVOLUTION", "inputs": ["images"], "outputs": ["c0"]},
+        {"name": "act0", "type": "ACTIVATION", "inputs": ["c0"], "outputs": ["a0"]},
+        {"name": "pool", "type": "POOLING", "inputs": ["a0"], "outputs": ["p0"]},
+        {"name": "conv1", "type": "CONVOLUTION", "inputs": ["p0"], "outputs": ["c1"]},
+        {"name": "conv2", "type": "CONVOLUTION", "inputs": ["c1", "a0"], "outputs": ["c2"]},
+        # 不在 probed 內、也沒有量到的層
+        {"name": "conv3", "type": "CONVOLUTION", "inputs": ["c2"], "outputs": ["c3"]},
+    ]
+    errors = {"c0": 0.01, "c1": 0.05, "c2": 0.06}
+    scores = layer_scores(layers, errors, ["conv0", "conv1", "conv2", "conv3"])
+    assert [s["name"] for s in scores] == ["conv1", "conv0", "conv2"]
+    by = {s["name"]: s for s in scores}
+    assert by["conv0"]["input_error"] == 0.0  # 直接接網路輸入
+    assert by["conv1"]["input_error"] == 0.01  # p0 <- a0 <- c0
+    assert by["conv1"]["score"] == pytest.approx(0.04)
+    assert by["conv2"]["input_error"] == 0.05  # 多個輸入取最大
+    assert by["conv2"]["score"] == pytest.approx(0.01)
+
+
+def test_layer_scores_survives_cycles():
+    # Loop 之類的結構可能讓描述出現環；不能無限遞迴
+    layers = [
+        {"name": "a", "type": "ACTIVATION", "inputs": ["tb"], "outputs": ["ta"]},
+        {"name": "b", "type": "ACTIVATION", "inputs": ["ta"], "outputs": ["tb"]},
+        {"name": "conv", "type": "CONVOLUTION", "inputs": ["tb"], "outputs": ["tc"]},
+    ]
+    scores = layer_scores(layers, {"tc": 0.2}, ["conv"])
+    assert [(s["name"], s["input_error"], s["score"]) for s in scores] == [("conv", 0.0, 0.2)]
+
+
+def test_pin_counts():
+    assert pin_counts(0) == [0]
+    assert pin_counts(1) == [0, 1]
+    assert pin_counts(5) == [0, 1, 2, 4, 5]
+    assert pin_counts(8) == [0, 1, 2, 4, 8]
+    assert pin_counts(12, max_pinned=3) == [0, 1, 2, 3]
+    assert pin_counts(2, max_pinned=10) == [0, 1, 2]
+
+
+def test_overrides_validation(tmp_path):
+    path = tmp_path / "o.json"
+    save_overrides(path, {"conv1": "fp16"}, graph=None)
+    assert load_overrides(path) == {"conv1": "fp16"}
+    path.write_text(json.dumps({"conv1": "int4"}))
+    with pytest.raises(ValueError, match="unsupported precision"):
+        load_overrides(path)
+
+
+def test_fake_flow_pins_the_noisy_layers(tmp_path):
+    onnx = pytest.importorskip("onnx")
+    from test_onnx_opt import tiny_model
+
+    from utils.engine_meta import read_meta
+
+    src = tmp_path / "tiny.onnx"
+    onnx.save(tiny_model(), str(src))
+    engine = tmp_path / "out" / "mixed.trt"
+    msgs = []
+    summary = sensitivity(
+        src, engine, num_inputs=4, tolerance=0.03, iterations=5, warmup=0, work_dir=tmp_path / "work",
+        probe_fn=fake_probe, build_fn=fake_build, pairs_fn=fake_pairs, run_fn=fake_run, progress=msgs.append,
+    )
+
+    # FAKE_NOISE：conv7 (0.05) > conv3 (0.02) > conv10 (0.015) > 其他 (0.001)
+    assert [s["name"] for s in summary["scores"][:3]] == ["conv7", "conv3", "conv10"]
+    assert summary["scores"][0]["score"] == pytest.approx(0.05)
+    # 0 層 0.094、1 層 0.044、2 層 0.024 <= 0.03
+    assert [c["pinned"] for c in summary["candidates"]] == [0, 1, 2]
+    assert [c["passed"] for c in summary["candidates"]] == [False, False, True]
+    assert summary["chosen"] == 2
+
+    ov = overrides_path(engine)
+    assert summary["overrides"] == str(ov) and engine.exists()
+    assert load_overrides(ov, src) == {"conv7": "fp16", "conv3": "fp16"}
+    with open(engine, encoding="utf-8") as f:
+        assert json.load(f)["layer_precisions"] == {"conv7": "fp16", "conv3": "fp16"}
+    assert read_meta(engine)["sensitivity"]["chosen"] == 2
+    assert any("pin   2 layers" in m and m.endswith("ok") for m in msgs)
+
+
+def test_fake_flow_nothing_passes(tmp_path):
+    onnx = pytest.importorskip("onnx")
+    from test_onnx_opt import tiny_model
+
+    src = tmp_path / "tiny.onnx"
+    onnx.save(tiny_model(), str(src))
+    engine = tmp_path / "mixed.trt"
+    summary = sensitivity(
+        src, engine, num_inputs=2, tolerance=0.001, max_pinned=2, iterations=3, warmup=0, work_dir=tmp_path / "w",
+        probe_fn=fake_probe, build_fn=fake_build, pairs_fn=fake_pairs, run_fn=fake_run,
+    )
+    assert summary["chosen"] is None and summary["overrides"] is None
+    assert [c["pinned"] for c in summary["candidates"]] == [0, 1, 2]
+    assert not engine.exists() and not overrides_path(engine).exists()
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+onnx = pytest.importorskip("onnx")
+
+from utils import sweep  # noqa: E402
+from utils.sweep import fake_bench, run_sweep  # noqa: E402
+
+
+def record_build(onnx_path: str, engine_path: str, params: dict, timing_cache: str | None):
+    """模組層級（process pool 要能 pickle）：把收到的參數寫進 engine 檔。"""
+    with open(engine_path, "w", encoding="utf-8") as f:
+        json.dump({"onnx_path": onnx_path, "params": params}, f)
+
+
+@pytest.fixture
+def tiny_onnx(tmp_path, monkeypatch):
+    from test_onnx_opt import tiny_model
+
+    monkeypatch.chdir(tmp_path)  # onnx_opt 的快取寫在 ./cache
+    path = tmp_path / "tiny.onnx"
+    onnx.save(tiny_model(), str(path))
+    return path
+
+
+def built(v) -> dict:
+    with open(v.engine, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_pre_optimized_build_gets_original_source(tiny_onnx, tmp_path, monkeypatch):
+    monkeypatch.setattr(sweep, "build_engine", record_build)  # 走真正 builder 的路徑
+    out = run_sweep(tiny_onnx, {"precision": ["fp16", "int8"]}, {"v8": True}, out_dir=tmp_path / "sw",
+                    jobs=1, build_fn=record_build, bench_fn=fake_bench, tag="test")
+    assert [v.status for v in out] == ["built", "built"]
+    for v in out:
+        rec = built(v)
+        assert rec["onnx_path"] != str(tiny_onnx) and "cache" in rec["onnx_path"]  # 共用最佳化過的副本
+        assert rec["params"]["onnx_source"] == str(tiny_onnx)
+        assert rec["params"]["v8"] is True
+
+    # onnx_source 只給 builder，不影響 engine 的 key / 紀錄
+    history = json.loads((tmp_path / "sw" / "sweep.json").read_text())
+    assert all("onnx_source" not in json.dumps(e) for e in history.values())
+
+
+def test_unoptimized_and_fake_builds_get_plain_params(tiny_onnx, tmp_path, monkeypatch):
+    monkeypatch.setattr(sweep, "build_engine", record_build)
+    out = run_sweep(tiny_onnx, {"precision": ["fp16"]}, out_dir=tmp_path / "a", jobs=1,
+                    build_fn=record_build, bench_fn=fake_bench, optimize=False, tag="test")
+    assert built(out[0]) == {"onnx_path": str(tiny_onnx), "params": {"precision": "fp16"}}
+
+    monkeypatch.undo()
+    out = run_sweep(tiny_onnx, {"precision": ["fp16"]}, out_dir=tmp_path / "b", jobs=1,
+                    build_fn=record_build, bench_fn=fake_bench, tag="test")
+    assert built(out[0])["params"] == {"precision": "fp16"}
@@ -0,0 +1,156 @@
+import hashlib
+import io
+import json
+import shutil
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from utils import updater as upd
+from utils.updater import diff_manifest
+
+
+def sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def entry(data: bytes) -> dict:
+    return {"sha256": sha(data), "size": len(data)}
+
+
+def publish(srv, files: dict[str, bytes], broken: set[str] = frozenset()) -> str:
+    """把 files 放到假伺服器的 /raw/ 底下並發佈 manifest；broken 內的檔案 manifest 記錄錯誤的 sha256。"""
+    manifest = {"base_url": srv.url + "/raw/", "files": {}}
+    for rel, data in files.items():
+        srv.files["/raw/" + rel] = data
+        e = entry(data)
+        if rel in broken:
+            e["sha256"] = sha(b"something else")
+        manifest["files"][rel] = e
+    srv.files["/manifest.json"] = json.dumps(manifest).encode()
+    return srv.url + "/manifest.json"
+
+
+def install(app: Path, files: dict[str, bytes]):
+    for rel, data in files.items():
+        p = app / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(data)
+
+
+def tree(app: Path) -> dict[str, bytes]:
+    return {
+        p.relative_to(app).as_posix(): p.read_bytes()
+        for p in app.rglob("*")
+        if p.is_file() and "cache" not in p.relative_to(app).parts
+    }
+
+
+V1 = {"main.py": b"v1 main", "utils/a.py": b"v1 a", "old.py": b"removed in v2"}
+V2 = {"main.py": b"v1 main", "utils/a.py": b"v2 a", "utils/new.py": b"new in v2"}
+
+
+def test_diff_manifest():
+    remote = {"a": {"sha256": "AA"}, "b": {"sha256": "bb"}, "c": {"sha256": "cc"}}
+    assert diff_manifest(remote, {"a": "aa", "b": "xx", "c": None}) == ["b", "c"]
+    assert diff_manifest(remote, {}) == ["a", "b", "c"]
+
+
+def test_delta_update_downloads_changed_and_removes_stale(updater, http_server, tmp_path):
+    app = updater.install_dir
+    install(app, V1)
+    (app / "user.txt").write_bytes(b"not managed by the manifest")
+    updater._save_local_manifest({rel: entry(data) for rel, data in V1.items()})
+
+    url = publish(http_server, V2)
+    assert updater._delta_update(url, "TR-1.0.1", tmp_path) == 2
+
+    assert tree(app) == {**V2, "user.txt": b"not managed by the manifest"}
+    fetched = sorted(p for p, _ in http_server.requests if p.startswith("/raw/"))
+    assert fetched == ["/raw/utils/a.py", "/raw/utils/new.py"]  # main.py 沒變，不下載
+    assert set(updater._load_local_manifest()) == set(V2)
+    assert not list(app.glob(".update_tmp_*"))
+
+    # 再跑一次：本機 manifest 的 mtime / size 命中，什麼都不用下載
+    http_server.requests.clear()
+    assert updater._delta_update(url, "TR-1.0.1", tmp_path) == 0
+    assert http_server.requests == [("/manifest.json", None)]
+
+
+def test_delta_update_digest_mismatch_changes_nothing(updater, http_server, tmp_path):
+    app = updater.install_dir
+    install(app, V1)
+    url = publish(http_server, V2, broken={"utils/new.py"})
+    with pytest.raises(ValueError, match="mismatch"):
+        updater._delta_update(url, "TR-1.0.1", tmp_path)
+    assert tree(app) == V1
+
+
+def test_apply_rolls_back_when_a_write_fails(updater, http_server, tmp_path, monkeypatch):
+    app = updater.install_dir
+    v1 = {"a.py": b"v1 a", "b.py": b"v1 b", "c.py": b"v1 c"}
+    install(app, v1)
+    updater._save_local_manifest({rel: entry(data) for rel, data in v1.items()})
+    url = publish(http_server, {"a.py": b"v2 a", "b.py": b"v2 b", "c.py": b"v1 c", "d.py": b"v2 d"})
+
+    real_move = shutil.move
+    moved = []
+
+    def flaky_move(src, dst):
+        if len(moved) == 2:
+            raise OSError("disk full")
+        moved.append(dst)
+        return real_move(src, dst)
+
+    monkeypatch.setattr(upd.shutil, "move", flaky_move)
+    with pytest.raises(OSError, match="disk full"):
+        updater._delta_update(url, "TR-1.0.1", tmp_path)
+
+    assert len(moved) == 2
+    assert tree(app) == v1  # 已經換掉的檔案還原、新增的檔案刪除
+    assert set(updater._load_local_manifest()) == set(v1)
+
+
+def release(srv, tag: str, zip_files: dict[str, bytes], manifest_url: str | None):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for rel, data in zip_files.items():
+            z.writestr(f"owner-repo-abc123/{rel}", data)
+    srv.files["/zipball"] = buf.getvalue()
+    srv.files["/version.json"] = json.dumps({"version": tag}).encode()
+    assets = [{"name": "version.json", "browser_download_url": srv.url + "/version.json"}]
+    if manifest_url:
+        assets.append({"name": "manifest.json", "browser_download_url": manifest_url})
+    srv.files["/latest"] = json.dumps(
+        {"tag_name": tag, "assets": assets, "zipball_url": srv.url + "/zipball"}
+    ).encode()
+
+
+def test_start_update_falls_back_to_full_package(updater, http_server):
+    app = updater.install_dir
+    cfg = b"model:\n  conf: 0.35\n"
+    install(app, {**V1, "config/default.yaml": cfg, "config/config.yaml": cfg})
+    full = {**V2, "config/default.yaml": cfg}
+    release(http_server, "TR-1.0.1", full, publish(http_server, V2, broken={"utils/a.py"}))
+    updater.version_url = http_server.url + "/latest"
+
+    assert updater.start_update() == (True, None)
+    paths = [p for p, _ in http_server.requests]
+    assert "/manifest.json" in paths and "/zipball" in paths
+    for rel, data in full.items():
+        assert (app / rel).read_bytes() == data
+    assert not list(app.glob(".update_tmp_*"))
+
+
+def test_start_update_uses_delta_when_manifest_matches(updater, http_server):
+    app = updater.install_dir
+    cfg = b"model:\n  conf: 0.35\n"
+    install(app, {**V1, "config/default.yaml": cfg, "config/config.yaml": cfg})
+    release(http_server, "TR-1.0.1", {}, publish(http_server, V2))
+    updater.version_url = http_server.url + "/latest"
+
+    assert updater.start_update() == (True, None)
+    assert "/zipball" not in [p for p, _ in http_server.requests]
+    for rel, data in V2.items():
+        assert (app / rel).read_bytes() == data
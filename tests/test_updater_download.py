@@ -0,0 +1,103 @@
+import hashlib
+import os
+
+import pytest
+import requests
+
+BODY = bytes(range(256)) * 64  # 16 KB
+
+
+def sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def served(http_server):
+    http_server.files["/pkg.zip"] = BODY
+    return http_server
+
+
+def download(updater, srv, dst, **kw):
+    return updater._download_file(srv.url + "/pkg.zip", dst, chunk_size=1024, progress=False, **kw)
+
+
+def test_download_writes_file_and_digest(updater, served, tmp_path):
+    dst = tmp_path / "pkg.zip"
+    assert download(updater, served, dst) == sha(BODY)
+    assert dst.read_bytes() == BODY
+    assert not dst.with_name("pkg.zip.part").exists()
+    assert served.requests == [("/pkg.zip", None)]
+
+
+def test_resume_from_part_file(updater, served, tmp_path):
+    dst = tmp_path / "pkg.zip"
+    dst.with_name("pkg.zip.part").write_bytes(BODY[:5000])
+    assert download(updater, served, dst) == sha(BODY)
+    assert dst.read_bytes() == BODY
+    assert served.requests == [("/pkg.zip", "bytes=5000-")]
+
+
+def test_server_ignoring_range_restarts(updater, served, tmp_path):
+    served.ranges = False
+    dst = tmp_path / "pkg.zip"
+    dst.with_name("pkg.zip.part").write_bytes(b"stale bytes from another file")
+    assert download(updater, served, dst) == sha(BODY)
+    assert dst.read_bytes() == BODY
+
+
+def test_complete_part_file_gets_416(updater, served, tmp_path):
+    dst = tmp_path / "pkg.zip"
+    dst.with_name("pkg.zip.part").write_bytes(BODY)
+    assert download(updater, served, dst) == sha(BODY)
+    assert dst.read_bytes() == BODY
+    assert served.requests == [("/pkg.zip", f"bytes={len(BODY)}-")]
+
+
+def test_interrupted_download_retries_with_backoff(updater, served, tmp_path):
+    # 前兩次請求都在中途斷線；續傳從最後一個完整寫入的 chunk（1 KB）之後開始
+    served.cuts = [3072, 4096]
+    dst = tmp_path / "pkg.zip"
+    assert download(updater, served, dst) == sha(BODY)
+    assert dst.read_bytes() == BODY
+    assert [r for _, r in served.requests] == [None, "bytes=3072-", "bytes=7168-"]
+    assert updater.sleeps == [2, 4]
+
+
+def test_retries_exhausted_keeps_part_for_next_run(updater, served, tmp_path):
+    served.cuts = [2048, 2048, 2048]
+    dst = tmp_path / "pkg.zip"
+    with pytest.raises((requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+        download(updater, served, dst, retries=2)
+    assert updater.sleeps == [2, 4]
+    part = dst.with_name("pkg.zip.part")
+    assert part.read_bytes() == BODY[:6144]  # 每次重試都接著上一次的位置
+    assert not dst.exists()
+
+    # 下次啟動從 .part 續傳
+    assert download(updater, served, dst) == sha(BODY)
+    assert served.requests[-1] == ("/pkg.zip", "bytes=6144-")
+
+
+def test_backup_hardlinks_only_listed_files(updater, tmp_path):
+    app = updater.install_dir
+    (app / "sub").mkdir()
+    (app / "a.py").write_text("a")
+    (app / "sub" / "b.py").write_text("b")
+    (app / "untouched.py").write_text("u")
+
+    bk = updater.backup(["a.py", "sub/b.py", "new.py"], backup_dir=tmp_path / "bk")
+    assert sorted(p.relative_to(bk).as_posix() for p in bk.rglob("*") if p.is_file()) == ["a.py", "sub/b.py"]
+    for rel in ("a.py", "sub/b.py"):
+        assert os.path.samefile(bk / rel, app / rel)  # hardlink，沒有複製內容
+
+    # 再備份一次會先清掉舊的備份
+    bk = updater.backup(["a.py"], backup_dir=tmp_path / "bk")
+    assert [p.name for p in bk.rglob("*") if p.is_file()] == ["a.py"]
+
+
+def test_full_backup_copies_tree(updater, tmp_path):
+    app = updater.install_dir
+    (app / "a.py").write_text("a")
+    bk = updater.backup(backup_dir=tmp_path / "full")
+    assert (bk / "a.py").read_text() == "a"
+    assert not os.path.samefile(bk / "a.py", app / "a.py")
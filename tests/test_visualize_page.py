@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6")
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # 和 bench.py 一樣不開視窗
+    from PyQt6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def page(qapp):
+    from PyQt6.QtWidgets import QWidget
+
+    from ui.visualize_page import VisualizePage
+
+    parent = QWidget()
+    parent.args = {"model": {"conf": 0.5}}
+    page = VisualizePage(parent)
+    page.view.setFixedSize(200, 200)
+    yield page
+    page._watchdog.stop()
+    parent.deleteLater()
+
+
+def rgb(qimg, x, y) -> tuple[int, int, int]:
+    c = qimg.pixelColor(x, y)
+    return c.red(), c.green(), c.blue()
+
+
+def test_numpy_frame_scaled_to_view(page):
+    from PyQt6.QtGui import QImage
+
+    img = np.zeros((300, 400, 4), np.uint8)
+    img[..., :3] = (10, 20, 30)  # BGR
+    qimg, scale = page._to_display_qimage(img)
+    assert (qimg.width(), qimg.height()) == (200, 150)  # 保持比例塞進 200x200
+    assert scale == pytest.approx(0.5)
+    assert qimg.format() == QImage.Format.Format_RGB32
+    assert rgb(qimg, 100, 75) == (30, 20, 10)
+
+    buf = page._render_buf
+    page._to_display_qimage(img)
+    assert page._render_buf is buf  # 同尺寸重複使用 buffer
+
+    qimg, scale = page._to_display_qimage(np.zeros((100, 50, 3), np.uint8))
+    assert (qimg.width(), qimg.height()) == (100, 200)  # 小圖放大到 view
+    assert scale == pytest.approx(2.0)
+    assert qimg.format() == QImage.Format.Format_BGR888
+
+    assert page._to_display_qimage(np.zeros((10, 10), np.uint8)) == (None, 1.0)
+
+
+def test_same_size_frame_is_copied(page):
+    img = np.zeros((150, 200, 4), np.uint8)
+    qimg, scale = page._to_display_qimage(img)
+    assert scale == 1.0 and (qimg.width(), qimg.height()) == (200, 150)
+    page._draw_dets(qimg, np.array([[20, 20, 120, 120]], np.float32), [0.9], [0])
+    assert rgb(qimg, 20, 70) != (0, 0, 0)
+    assert not img.any()  # 不會畫到呼叫端的陣列上
+
+
+def test_qimage_input_scaled_to_view(page):
+    from PyQt6.QtGui import QImage
+
+    src = QImage(800, 400, QImage.Format.Format_RGB32)
+    qimg, scale = page._to_display_qimage(src)
+    assert (qimg.width(), qimg.height()) == (200, 100)
+    assert scale == pytest.approx(0.25)
+
+
+def test_draw_dets_in_display_coordinates(page):
+    img = np.zeros((300, 400, 4), np.uint8)
+    qimg, scale = page._to_display_qimage(img)
+    boxes = np.array(
+        [
+            [100, 100, 300, 260],  # 縮放後 (50, 50) - (150, 130)
+            [20, 20, 60, 60],  # 低於 conf 門檻
+            [0, 0, 0, 0],  # engine 補零，之後的都不畫
+            [200, 20, 380, 80],
+        ],
+        np.float32,
+    )
+    page._draw_dets(qimg, boxes, scores=[0.9, 0.2, 0.0, 0.9], cls_inds=[1, 0, 0, 2], scale=scale)
+
+    color = page._det_colors[1]
+    box = (color.red(), color.green(), color.blue())
+    assert rgb(qimg, 50, 90) == box and rgb(qimg, 150, 90) == box  # 左右邊
+    assert rgb(qimg, 100, 130) == box  # 下邊
+    assert rgb(qimg, 100, 90) == (0, 0, 0)  # 框內不填滿
+    assert rgb(qimg, 10, 20) == (0, 0, 0)  # 低分的框
+    assert rgb(qimg, 100, 10) == (0, 0, 0) and rgb(qimg, 190, 25) == (0, 0, 0)  # 補零之後的框
+
+
+def test_on_image_keeps_display_size(page, qapp):
+    page.parent.show()
+    page.show()
+    qapp.processEvents()
+    page.view.setFixedSize(200, 200)
+    img = np.zeros((300, 400, 4), np.uint8)
+    page.on_image(img, np.array([[100, 100, 300, 260]], np.float32), [0.9], [1], fps=60.0)
+    assert (page._pix.width(), page._pix.height()) == (200, 150)
+    assert page.view.pixmap().size() == page._pix.size()  # 已是顯示大小，不再縮放
+    page.parent.hide()
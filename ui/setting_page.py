@@ -16,6 +16,7 @@ from PyQt6.QtWidgets import (
     QFileDialog,
 )
 from PyQt6.QtCore import Qt, pyqtSignal, QThread, pyqtSlot
+import copy
 from .threads import YamlWriter as _YamlWriter
 
 _TEXT_STYLE = """
@@ -29,11 +30,14 @@ color: #FFFFFF;
 
 class SettingPage(QWidget):
     on_exception = pyqtSignal(type, object)
+    saved = pyqtSignal(str)  # 寫檔完成，參數為設定檔路徑
 
     def __init__(self, parent):
         super().__init__(parent)
         self.setObjectName("SettingPage")
         self._widgets = {}  # path(tuple) -> widget
+        self._target_yaml = None
+        self._built_args = None
         self.parent = parent
 
         v = QVBoxLayout(self)
@@ -77,7 +81,11 @@ class SettingPage(QWidget):
 
     # 對外：建立表單
     def build(self, args: dict, target_yaml: str):
+        # 內容沒變就不重建整個表單
+        if target_yaml == self._target_yaml and args == self._built_args:
+            return
         self._target_yaml = target_yaml
+        self._built_args = copy.deepcopy(args)
         self._clear_form()
         self._make_settings(self._form, args, ())
 
@@ -129,8 +137,10 @@ class SettingPage(QWidget):
     @pyqtSlot(str)
     def _on_saved(self, path: str):
         self.save_btn.setEnabled(True)
+        self._built_args = None  # 表單內容已和檔案一致，下次 build 照常比對
+        self.saved.emit(path)
         self.parent.toast.show_notice(
-            "info", "Config Saved.", "Config Saved. Restart Aim Sys to apply settings."
+            "info", "Config Saved.", "Config Saved. Applied to the running Aim Sys."
         )
 
     # -------- 內部 --------
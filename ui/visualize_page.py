@@ -57,6 +57,8 @@ class VisualizePage(QWidget):
 
         # 目前顯示中的 pixmap
         self._pix: QPixmap | None = None
+        # 顯示大小的繪圖 buffer（重複使用，QImage 直接指向它）
+        self._render_buf = None
 
         # FPS 計算（輸入訊號的實際 FPS）
         self._fps_tau = 0.5
@@ -86,6 +88,8 @@ class VisualizePage(QWidget):
         self._fps_bg_color = QColor(0, 0, 0, 120)
 
         self._bbox_font = QFont("Source Han Sans TC", 10)
+        self._bbox_fm = QFontMetrics(self._bbox_font)
+        self._det_styles: dict[tuple[int, int], tuple[QPen, QColor]] = {}
         self._det_colors = [
             QColor(255, 99, 132),
             QColor(54, 162, 235),
@@ -98,18 +102,57 @@ class VisualizePage(QWidget):
         # 是否使用高品質縮放（CPU 負載高），預設 False 走 FastTransformation
         self._use_smooth_scale = False
 
+        # 預覽通道（由 MainUI 設定），頁面可見時才訂閱
+        self._preview = None
+
         # 監測未更新（watchdog）
         self._watchdog = QTimer(self)
         self._watchdog.setInterval(1500)  # 0.5s 檢查一次
         self._watchdog.timeout.connect(self._check_signal)
         self._watchdog.start()
 
+    # ---------------- 預覽通道 ----------------
+
+    def set_preview_channel(self, channel):
+        """channel: utils.preview.PreviewChannel，worker 只在這頁可見時發佈縮小後的畫面。"""
+        if self._preview is not None:
+            self._preview.unsubscribe()
+            self._preview.ready.disconnect(self._on_preview_ready)
+        self._preview = channel
+        if channel is None:
+            return
+        channel.ready.connect(
+            self._on_preview_ready, type=Qt.ConnectionType.QueuedConnection
+        )
+        if self.isVisible():
+            self._subscribe()
+
+    def _subscribe(self):
+        if self._preview is None:
+            return
+        size = self.view.maximumSize() if self.view.width() <= 0 else self.view.size()
+        self._preview.subscribe(
+            max_fps=1000.0 / self._min_redraw_interval_ms,
+            max_size=(size.width(), size.height()),
+        )
+
+    @pyqtSlot()
+    def _on_preview_ready(self):
+        if self._preview is None:
+            return
+        item = self._preview.take()
+        if item is None:
+            return
+        img, boxes, scores, cls_inds, fps = item
+        self.on_image(img, boxes, scores, cls_inds, fps=fps)
+
     # ---------------- 信號處理 ----------------
 
     @pyqtSlot(object, object, object, object)
-    def on_image(self, img, boxes=None, scores=None, cls_inds=None, conf=None):
+    def on_image(self, img, boxes=None, scores=None, cls_inds=None, conf=None, fps=None):
         """
         img: numpy ndarray (H,W,3|4, BGR/BGRA) 或 QImage
+        fps: 發佈端量到的 FPS；沒給則以本函式被呼叫的頻率估計
         """
         # 更新「最後一次收到畫面」的時間
         if not self._last_update_timer.isValid():
@@ -119,7 +162,9 @@ class VisualizePage(QWidget):
 
         # 更新輸入 FPS（訊號真正的 FPS，而不是 UI FPS）
         dt = self._fps_timer.restart() / 1000.0
-        if dt > 0:
+        if fps is not None:
+            self._fps = fps
+        elif dt > 0:
             alpha = 1.0 - math.exp(-dt / self._fps_tau)
             self._dt_ema = dt if self._dt_ema is None else (
                 (1 - alpha) * self._dt_ema + alpha * dt
@@ -131,8 +176,8 @@ class VisualizePage(QWidget):
             self._fps_text = f"FPS: {self._fps:.1f}"
             self._fps_ui_timer.restart()
 
-        # 限制 UI 重繪 FPS（如果訊號太快就丟幀）
-        if self._display_timer.elapsed() < self._min_redraw_interval_ms:
+        # 限制 UI 重繪 FPS（如果訊號太快就丟幀）；預覽通道已在發佈端依速率節流
+        if fps is None and self._display_timer.elapsed() < self._min_redraw_interval_ms:
             return
         self._display_timer.restart()
 
@@ -140,33 +185,19 @@ class VisualizePage(QWidget):
         if not self.isVisible():
             return
 
-        # numpy -> QImage + 繪製 detection
+        # 先在 numpy 端縮到顯示大小（只縮放一次），再零複製包成 QImage 畫框
         try:
-            qimg = self._to_qimage(img)
+            qimg, scale = self._to_display_qimage(img)
             if qimg is None:
                 return
 
-            # 畫框與標籤
+            # 畫框與標籤（座標換算到顯示解析度）
             if boxes is not None and len(boxes):
-                self._draw_dets(qimg, boxes, scores, cls_inds)
+                self._draw_dets(qimg, boxes, scores, cls_inds, scale=scale)
         except Exception as e:
             self.on_exception.emit(type(e), e)
             return
 
-        # 先縮放到 QLabel 大小（只縮放一次）
-        if self.view.width() > 0 and self.view.height() > 0:
-            target_size = self.view.size()
-            transform_mode = (
-                Qt.TransformationMode.SmoothTransformation
-                if self._use_smooth_scale
-                else Qt.TransformationMode.FastTransformation
-            )
-            qimg = qimg.scaled(
-                target_size,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                transform_mode,
-            )
-
         self._pix = QPixmap.fromImage(qimg)
 
         # FPS 文字疊在右上角
@@ -211,8 +242,19 @@ class VisualizePage(QWidget):
     def resizeEvent(self, e):
         # 視窗大小改變時，重新縮放目前這張圖即可
         self._render_pix()
+        if self.isVisible():
+            self._subscribe()
         return super().resizeEvent(e)
 
+    def showEvent(self, e):
+        self._subscribe()
+        return super().showEvent(e)
+
+    def hideEvent(self, e):
+        if self._preview is not None:
+            self._preview.unsubscribe()
+        return super().hideEvent(e)
+
     # ---------------- 私有輔助函式 ----------------
 
     def _render_pix(self):
@@ -224,11 +266,11 @@ class VisualizePage(QWidget):
         if self.view.width() <= 0 or self.view.height() <= 0:
             return
 
-        # 如果大小剛好就直接用，不再重複縮放
-        if (
-            self._pix.width() == self.view.width()
-            and self._pix.height() == self.view.height()
-        ):
+        # 如果已經是 KeepAspectRatio 後的大小就直接用，不再重複縮放
+        fit = self._pix.size().scaled(
+            self.view.size(), Qt.AspectRatioMode.KeepAspectRatio
+        )
+        if fit == self._pix.size():
             scaled = self._pix
         else:
             transform_mode = (
@@ -260,40 +302,59 @@ class VisualizePage(QWidget):
             self.view.setPixmap(QPixmap())
 
     # numpy / QImage 轉換
-    def _to_qimage(self, img) -> QImage | None:
+    def _display_size(self, w: int, h: int) -> tuple[int, int]:
+        vw, vh = self.view.width(), self.view.height()
+        if vw <= 0 or vh <= 0:
+            return w, h
+        s = min(vw / w, vh / h)
+        return max(1, int(w * s)), max(1, int(h * s))
+
+    def _to_display_qimage(self, img) -> tuple[QImage | None, float]:
+        """
+        回傳 (顯示大小的 QImage, 相對原圖的縮放比)。
+        numpy 畫面會縮放（或複製）進重複使用的 self._render_buf，
+        QImage 直接指向這塊記憶體不再 copy；buffer 由 self 持有，QImage 存活期間不會被釋放。
+        """
         if isinstance(img, QImage):
-            return img
+            tw, th = self._display_size(img.width(), img.height())
+            transform_mode = (
+                Qt.TransformationMode.SmoothTransformation
+                if self._use_smooth_scale
+                else Qt.TransformationMode.FastTransformation
+            )
+            scaled = img.scaled(tw, th, Qt.AspectRatioMode.IgnoreAspectRatio, transform_mode)
+            return scaled, tw / max(1, img.width())
 
         # 假設是 numpy ndarray uint8
         #   H, W, 4: BGRA
         #   H, W, 3: BGR
-        if not hasattr(img, "ndim"):
-            return None
-
-        if img.ndim == 3 and img.shape[2] == 4:
-            h, w = img.shape[:2]
-            if hasattr(QImage.Format, "Format_BGRA8888"):
-                qimg = QImage(
-                    img.data, w, h, w * 4, QImage.Format.Format_BGRA8888
-                ).copy()
-            else:
-                rgba = img[:, :, [2, 1, 0, 3]].copy()
-                qimg = QImage(
-                    rgba.data, w, h, w * 4, QImage.Format.Format_RGBA8888
-                ).copy()
-            return qimg
-
-        if img.ndim == 3 and img.shape[2] == 3:
-            h, w = img.shape[:2]
-            rgb = img[:, :, ::-1].copy()
-            qimg = QImage(
-                rgb.data, w, h, w * 3, QImage.Format.Format_RGB888
-            ).copy()
-            return qimg
-
-        return None
-
-    def _draw_dets(self, qimg: QImage, boxes, scores=None, cls_inds=None, conf=0.5):
+        if not hasattr(img, "ndim") or img.ndim != 3 or img.shape[2] not in (3, 4):
+            return None, 1.0
+
+        # UI-only 環境（尚未安裝套件）也要能載入這頁，所以延後 import
+        import cv2
+        import numpy as np
+
+        h, w, c = img.shape
+        tw, th = self._display_size(w, h)
+        buf = self._render_buf
+        if buf is None or buf.shape != (th, tw, c):
+            buf = self._render_buf = np.empty((th, tw, c), dtype=np.uint8)
+
+        if (tw, th) == (w, h):
+            np.copyto(buf, img)  # 畫框會改到 buffer，不能直接畫在呼叫端的陣列上
+        else:
+            interp = cv2.INTER_AREA if self._use_smooth_scale else cv2.INTER_NEAREST
+            cv2.resize(img, (tw, th), dst=buf, interpolation=interp)
+
+        # BGRA 在 little-endian 上即 RGB32 (0xffRRGGBB) 的記憶體排列；BGR 對應 BGR888
+        fmt = QImage.Format.Format_RGB32 if c == 4 else QImage.Format.Format_BGR888
+        qimg = QImage(buf.data, tw, th, buf.strides[0], fmt)
+        return qimg, tw / w
+
+    def _draw_dets(
+        self, qimg: QImage, boxes, scores=None, cls_inds=None, conf=0.5, scale=1.0
+    ):
         # conf 閾值從 parent 設定取得
         conf_thr = float(self.parent.args["model"]["conf"])
 
@@ -305,45 +366,43 @@ class VisualizePage(QWidget):
         thickness = max(2, int(min(W, H) * 0.003))
 
         p.setFont(self._bbox_font)
-        fm = QFontMetrics(self._bbox_font)
+        fm = self._bbox_fm
+        th = fm.height() + 4
 
-        n = len(boxes)
-        for i in range(n):
-            # 信心值過濾
-            if scores is not None and float(scores[i]) < conf_thr:
-                continue
+        import numpy as np
 
-            b = boxes[i]
-            try:
-                x1, y1, x2, y2 = map(int, b[:4])
-            except Exception:
-                continue
+        b = np.asarray(boxes, dtype=np.float32)[:, :4]
+        # (0,0,0,0) 之後是 engine 的補零，直接截斷
+        zero = ~b.astype(np.int32).any(axis=1)
+        n = int(zero.argmax()) if zero.any() else len(b)
+        xyxy = (b[:n] * scale).astype(np.int32).tolist()
+        score_l = None if scores is None else np.asarray(scores, dtype=np.float32).ravel()[:n].tolist()
+        cls_l = None if cls_inds is None else np.asarray(cls_inds).ravel()[:n].astype(np.int32).tolist()
 
-            if (x1, y1, x2, y2) == (0, 0, 0, 0):
-                break
+        p.setBrush(Qt.BrushStyle.NoBrush)
+        for i, (x1, y1, x2, y2) in enumerate(xyxy):
+            # 信心值過濾
+            if score_l is not None and score_l[i] < conf_thr:
+                continue
             if x2 <= x1 or y2 <= y1:
                 continue
 
-            ci = int(cls_inds[i]) if cls_inds is not None else 0
-            color = self._det_colors[ci % len(self._det_colors)]
+            ci = cls_l[i] if cls_l is not None else 0
+            pen, bg_color = self._det_style(ci, thickness)
 
             # 外框
-            p.setPen(QPen(color, thickness))
-            p.setBrush(Qt.BrushStyle.NoBrush)
+            p.setPen(pen)
             p.drawRect(x1, y1, x2 - x1, y2 - y1)
 
             # 標籤文字：預設用類別 index + score
             lbl = str(ci)
-            if scores is not None:
-                lbl = f"{lbl} {float(scores[i]):.2f}"
+            if score_l is not None:
+                lbl = f"{lbl} {score_l[i]:.2f}"
 
             tw = fm.horizontalAdvance(lbl) + 8
-            th = fm.height() + 4
             rect = QRect(x1, max(0, y1 - th), tw, th)
 
             # 背板 + 文字
-            bg_color = QColor(color)
-            bg_color.setAlpha(160)
             p.fillRect(rect, bg_color)
             p.setPen(Qt.GlobalColor.white)
             p.drawText(
@@ -353,3 +412,13 @@ class VisualizePage(QWidget):
             )
 
         p.end()
+
+    def _det_style(self, ci: int, thickness: int) -> tuple[QPen, QColor]:
+        key = (ci % len(self._det_colors), thickness)
+        style = self._det_styles.get(key)
+        if style is None:
+            color = self._det_colors[key[0]]
+            bg_color = QColor(color)
+            bg_color.setAlpha(160)
+            style = self._det_styles[key] = (QPen(color, thickness), bg_color)
+        return style
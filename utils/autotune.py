@@ -0,0 +1,365 @@
+# ./utils/autotune.py
+"""
+自動挑選 builder 選項：在 optimization level、tactic sources、structured sparsity、workspace
+的組合中建置候選 engine（沿用 utils/sweep.py 的平行建置與 engine / timing cache），
+以一組代表性的輸入量測延遲，並與 fp32 engine 的輸出比對，保留通過誤差門檻中最快的一個。
+選擇結果寫進 engine 的 metadata（utils/engine_meta.py）的 "autotune" 區塊。
+
+    python -m utils.autotune models/best.onnx -e models/best.trt -p fp16 --images ./records/imgs --end2end --v8
+    python -m utils.autotune models/best.onnx -e models/best.trt --space builder_opt_level=3,5 sparsity=false
+    python -m utils.autotune models/best.onnx -e /tmp/auto.trt --fake     # 不需要 GPU，走完整流程
+
+誤差定義（error，越小越好）：
+    end2end（num_dets, boxes, scores, classes）：1 - F1，同類別且 IoU >= 0.5 視為同一個偵測
+    其他輸出：max|out - ref| / max|ref|
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from utils.engine_meta import copy_meta, update_meta
+from utils.sweep import Variant, build_engine, parse_grid, rank, run_sweep
+
+AUTOTUNE_DIR = Path("./models/autotune")
+# 預設的搜尋空間；workspace 單位 GB，tactic_sources 以 '+' 串接 trt.TacticSource 名稱
+SPACE: dict[str, list] = {
+    "builder_opt_level": [3, 5],
+    "tactic_sources": ["default", "cublas+cublas_lt+edge_mask_convolutions+jit_convolutions"],
+    "sparsity": [False, True],
+    "workspace": [2, 4],
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+Outputs = list[list[np.ndarray]]  # [每個輸入][每個輸出 tensor]
+
+
+# -------- 輸入 --------
+def onnx_input_shape(onnx_path: str | Path) -> list[int]:
+    import onnx
+
+    model = onnx.load(str(onnx_path), load_external_data=False)
+    inits = {i.name for i in model.graph.initializer}
+    vi = next(i for i in model.graph.input if i.name not in inits)
+    return [d.dim_value if d.dim_value > 0 else 1 for d in vi.type.tensor_type.shape.dim]
+
+
+def load_inputs(images: str | Path | None, shape: list[int], count: int = 32, seed: int = 0) -> list[np.ndarray]:
+    """
+    代表性輸入：images 資料夾中的前 count 張圖，前處理與 BaseEngine.forward 相同（RGB、CHW、/255），
+    取中央區域（太小則縮放）。沒有給資料夾時用固定種子的隨機輸入。
+    """
+    h, w = shape[-2:]
+    if not images:
+        rng = np.random.default_rng(seed)
+        return [rng.random(shape, dtype=np.float32) for _ in range(count)]
+
+    import cv2
+
+    files = sorted(p for p in Path(images).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)[:count]
+    if not files:
+        raise FileNotFoundError(f"no images in {images}")
+    out = []
+    for p in files:
+        img = cv2.imread(str(p), cv2.IMREAD_COLOR)
+        ih, iw = img.shape[:2]
+        if ih >= h and iw >= w:
+            top, left = (ih - h) // 2, (iw - w) // 2
+            img = img[top : top + h, left : left + w]
+        else:
+            img = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+        out.append(np.ascontiguousarray(img, dtype=np.float32).reshape(shape) / 255.0)
+    return out
+
+
+# -------- 誤差（純 numpy，不需要 GPU） --------
+def _iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = lambda b: np.clip(b[..., 2] - b[..., 0], 0, None) * np.clip(b[..., 3] - b[..., 1], 0, None)
+    union = area(box) + area(boxes) - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-12), 0.0)
+
+
+def _dets(out: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = int(np.asarray(out[0]).reshape(-1)[0])
+    boxes = np.asarray(out[1], dtype=np.float64).reshape(-1, 4)[:n]
+    scores = np.asarray(out[2], dtype=np.float64).reshape(-1)[:n]
+    classes = np.asarray(out[3]).reshape(-1)[:n]
+    return boxes, scores, classes
+
+
+def det_f1(ref: Outputs, out: Outputs, iou: float = 0.5) -> float:
+    """依分數由高到低貪婪配對，同類別且 IoU >= iou 才算同一個偵測；兩邊都沒有偵測時為 1。"""
+    tp = n_ref = n_out = 0
+    for r, o in zip(ref, out):
+        rb, _, rc = _dets(r)
+        ob, os_, oc = _dets(o)
+        n_ref += len(rb)
+        n_out += len(ob)
+        used = np.zeros(len(rb), dtype=bool)
+        for i in np.argsort(-os_):
+            if not len(rb):
+                break
+            cand = np.where(~used & (rc == oc[i]), _iou(ob[i], rb), 0.0)
+            j = int(np.argmax(cand))
+            if cand[j] >= iou:
+                used[j] = True
+                tp += 1
+    if n_ref == 0 and n_out == 0:
+        return 1.0
+    return 2 * tp / (n_ref + n_out)
+
+
+def is_end2end(outputs: list[np.ndarray]) -> bool:
+    return len(outputs) == 4 and np.issubdtype(np.asarray(outputs[0]).dtype, np.integer)
+
+
+def output_error(ref: Outputs, out: Outputs) -> dict:
+    """回傳 {"metric", "error"}；error 的定義見模組說明。"""
+    if is_end2end(ref[0]):
+        return {"metric": "1-f1", "error": 1.0 - det_f1(ref, out)}
+    err, scale = 0.0, 0.0
+    for r, o in zip(ref, out):
+        for a, b in zip(r, o):
+            a = np.asarray(a, dtype=np.float64)
+            b = np.asarray(b, dtype=np.float64)
+            if a.shape != b.shape:
+                return {"metric": "rel_max_abs", "error": float("inf")}
+            if a.size:
+                err = max(err, float(np.max(np.abs(a - b))))
+                scale = max(scale, float(np.max(np.abs(a))))
+    return {"metric": "rel_max_abs", "error": err / scale if scale > 0 else err}
+
+
+# -------- 執行（可替換成假的，見 fake_run） --------
+def run_engine(engine_path: str, inputs: list[np.ndarray], iterations: int, warmup: int) -> tuple[Outputs, np.ndarray]:
+    """對每個輸入跑一次取輸出，再輪流跑 iterations 次量測延遲；回傳 (輸出, 每次 ms)。"""
+    from inference import BaseEngine
+
+    eng = BaseEngine(engine_path)
+    try:
+        outputs = [[o.copy() for o in eng.infer(x)] for x in inputs]  # h_outputs 會被下一次覆寫
+        for i in range(warmup):
+            eng.infer(inputs[i % len(inputs)])
+        t = np.empty(iterations, dtype=np.float64)
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            eng.infer(inputs[i % len(inputs)])
+            t[i] = (time.perf_counter() - t0) * 1e3
+        return outputs, t
+    finally:
+        eng.close()
+
+
+def fake_build(onnx_path: str, engine_path: str, params: dict, timing_cache: str | None):
+    """假的 builder：把參數寫進檔案給 fake_run 讀，模擬建置時間。"""
+    time.sleep(0.02 * int(params.get("builder_opt_level") or 3))
+    with open(engine_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+
+def fake_run(engine_path: str, inputs: list[np.ndarray], iterations: int, warmup: int) -> tuple[Outputs, np.ndarray]:
+    """
+    假的執行：fp32 最慢，opt level 越高越快；sparsity 最快但輸出有誤差（用來驗證門檻會擋掉它）。
+    輸出為 end2end 格式，每張圖一個由輸入決定的框。
+    """
+    with open(engine_path, encoding="utf-8") as f:
+        p = json.load(f)
+    ms = {"fp32": 4.0, "fp16": 2.0, "int8": 1.5}.get(p.get("precision"), 2.0)
+    ms -= 0.1 * int(p.get("builder_opt_level") or 3)
+    shift = 0.0
+    if p.get("sparsity"):
+        ms -= 0.5
+        shift = 60.0  # 框變寬，IoU 降到 0.5 以下
+    outputs = []
+    for x in inputs:
+        c = float(np.mean(x)) * 100
+        box = np.array([[c, c, c + 50 + shift, c + 50]], dtype=np.float32)
+        outputs.append([np.array([1], np.int32), box, np.array([0.9], np.float32), np.array([0], np.int32)])
+    return outputs, np.full(iterations, ms)
+
+
+def autotune(
+    onnx_path: str | Path,
+    engine_path: str | Path,
+    precision: str = "fp16",
+    space: dict[str, list] | None = None,
+    base: dict | None = None,
+    images: str | Path | None = None,
+    num_inputs: int = 32,
+    tolerance: float = 0.02,
+    iterations: int = 200,
+    warmup: int = 20,
+    jobs: int = 2,
+    gpu_jobs: int = 1,
+    work_dir: str | Path = AUTOTUNE_DIR,
+    build_fn: Callable = build_engine,
+    run_fn: Callable = run_engine,
+    tag: str = "",
+    progress: Callable[[Variant], None] | None = None,
+) -> tuple[Variant | None, list[Variant]]:
+    """
+    回傳 (選中的候選, 依延遲排序的全部候選)。沒有任何候選通過時不會寫出 engine_path。
+    每個候選的 bench 含延遲統計與 "error" / "metric" / "passed"。
+    """
+    space = dict(SPACE if space is None else space)
+    base = dict(base or {})
+    inputs = load_inputs(images, onnx_input_shape(onnx_path), count=num_inputs)
+    common = dict(base=base, out_dir=work_dir, jobs=jobs, gpu_jobs=gpu_jobs, iterations=iterations,
+                  warmup=warmup, build_fn=build_fn, tag=tag, progress=progress)
+
+    # fp32、TensorRT 預設選項的 engine 當作參考輸出
+    ref_outputs: Outputs = []
+
+    def _reference(path, iters, wu):
+        outputs, t = run_fn(path, inputs, iters, wu)
+        ref_outputs.extend(outputs)
+        return {"p50_ms": float(np.median(t))}
+
+    ref = run_sweep(onnx_path, {"precision": ["fp32"]}, bench_fn=_reference, **common)[0]
+    if ref.status == "failed":
+        raise RuntimeError(f"fp32 reference build failed: {ref.error}")
+
+    def _measure(path, iters, wu):
+        outputs, t = run_fn(path, inputs, iters, wu)
+        p50, p90, p99 = np.percentile(t, [50, 90, 99])
+        err = output_error(ref_outputs, outputs)
+        return {
+            "mean_ms": float(t.mean()),
+            "p50_ms": float(p50),
+            "p90_ms": float(p90),
+            "p99_ms": float(p99),
+            **err,
+            "passed": err["error"] <= tolerance,
+        }
+
+    grid = {"precision": [precision], **space}
+    ranked = rank(run_sweep(onnx_path, grid, bench_fn=_measure, **common))
+    best = next((v for v in ranked if v.status != "failed" and v.bench.get("passed")), None)
+    if best is None:
+        return None, ranked
+
+    engine_path = Path(engine_path)
+    engine_path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(best.engine, engine_path)
+    copy_meta(best.engine, engine_path)
+    update_meta(
+        engine_path,
+        autotune={
+            "onnx": str(Path(onnx_path).resolve()),
+            "precision": precision,
+            "options": {k: best.params[k] for k in space},
+            "base": base,
+            "p50_ms": round(best.bench["p50_ms"], 4),
+            "reference_p50_ms": round(ref.bench["p50_ms"], 4),
+            "metric": best.bench["metric"],
+            "error": best.bench["error"],
+            "tolerance": tolerance,
+            "inputs": str(images) if images else f"random x{len(inputs)}",
+            "candidates": [
+                {
+                    "options": {k: v.params.get(k) for k in space},
+                    "status": v.status,
+                    "p50_ms": round(v.bench.get("p50_ms", 0.0), 4),
+                    "error": v.bench.get("error"),
+                    "passed": bool(v.bench.get("passed")),
+                }
+                for v in ranked
+            ],
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    )
+    return best, ranked
+
+
+def format_table(ranked: list[Variant], best: Variant | None, space: dict) -> str:
+    keys = list(space)
+    width = {k: max([len(k)] + [len(str(v.params.get(k))) for v in ranked]) for k in keys}
+    head = f"{'':2}{'p50 ms':>8} {'error':>9} {'pass':>5} {'build s':>8}  " + " ".join(f"{k:<{width[k]}}" for k in keys)
+    lines = [head, "-" * len(head)]
+    for v in ranked:
+        mark = "* " if v is best else "  "
+        opts = " ".join(f"{str(v.params.get(k)):<{width[k]}}" for k in keys)
+        if v.status == "failed":
+            lines.append(f"{mark}{'-':>8} {'-':>9} {'-':>5} {v.build_s:8.1f}  {opts}  {v.error}")
+            continue
+        err = v.bench.get("error", float("nan"))
+        lines.append(
+            f"{mark}{v.bench['p50_ms']:8.3f} {err:9.4f} {'yes' if v.bench.get('passed') else 'no':>5} "
+            f"{v.build_s:8.1f}  {opts}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the fastest builder options within an accuracy tolerance")
+    parser.add_argument("onnx", help="input ONNX model")
+    parser.add_argument("-e", "--engine", required=True, help="where to write the chosen engine")
+    parser.add_argument("-p", "--precision", default="fp16", choices=["fp32", "fp16", "int8"])
+    parser.add_argument("--space", nargs="*", default=None,
+                        help="override the search space, key=v1,v2 (keys: " + ", ".join(SPACE) + ")")
+    parser.add_argument("--images", default=None, help="representative input images (default: random)")
+    parser.add_argument("--num_inputs", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="max error vs fp32 (1-F1 or relative)")
+    parser.add_argument("--iters", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument("--gpu_jobs", type=int, default=1)
+    parser.add_argument("--work_dir", default=str(AUTOTUNE_DIR))
+    parser.add_argument("--fake", action="store_true", help="fake builder / runner (no GPU)")
+    base_args = parser.add_argument_group("fixed export options (see utils/export.py)")
+    base_args.add_argument("--end2end", action="store_true")
+    base_args.add_argument("--v8", action="store_true")
+    base_args.add_argument("--v10", action="store_true")
+    base_args.add_argument("--calib_input", default=None)
+    base_args.add_argument("--calib_cache", default=None)
+    opt = parser.parse_args()
+
+    space = dict(SPACE)
+    if opt.space:
+        try:
+            override = parse_grid(opt.space)
+        except ValueError as e:
+            parser.error(str(e))
+        unknown = set(override) - set(SPACE)
+        if unknown:
+            parser.error(f"not a builder option: {', '.join(sorted(unknown))}")
+        space.update(override)
+    base = {"v8": opt.v8, "v10": opt.v10, "calib_input": opt.calib_input, "calib_cache": opt.calib_cache}
+    if opt.end2end:
+        base["end2end"] = True
+
+    best, ranked = autotune(
+        opt.onnx,
+        opt.engine,
+        precision=opt.precision,
+        space=space,
+        base=base,
+        images=opt.images,
+        num_inputs=opt.num_inputs,
+        tolerance=opt.tolerance,
+        iterations=opt.iters,
+        warmup=opt.warmup,
+        jobs=opt.jobs,
+        gpu_jobs=opt.gpu_jobs,
+        work_dir=opt.work_dir,
+        build_fn=fake_build if opt.fake else build_engine,
+        run_fn=fake_run if opt.fake else run_engine,
+        tag="fake" if opt.fake else "",
+        progress=lambda v: print(f"[{v.status}] {Path(v.engine).name} {v.params} {v.error}".rstrip(), flush=True),
+    )
+    print(format_table(ranked, best, space))
+    if best is None:
+        parser.exit(1, f"no candidate within tolerance {opt.tolerance}\n")
+    print(f"\nchosen: {best.params} -> {opt.engine} (metadata: {Path(opt.engine).with_suffix('.json')})")
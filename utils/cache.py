@@ -0,0 +1,112 @@
+# ./utils/cache.py
+"""
+小工具：檔案雜湊、環境指紋與寫在 ./cache 底下的 JSON 快取。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import site
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable
+
+CACHE_DIR = Path("./cache")
+
+
+def file_digest(path: str | Path, algo: str = "sha256", chunk_size: int = 1 << 20) -> str:
+    """檔案內容雜湊（分塊讀取，不會一次載入整個檔案）。"""
+    h = hashlib.new(algo)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digest_obj(obj: Any, algo: str = "sha256") -> str:
+    """可 JSON 序列化物件的雜湊（key 排序，內容相同結果就相同）。"""
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.new(algo, raw.encode("utf-8")).hexdigest()
+
+
+def site_dirs() -> list[str]:
+    dirs = list(getattr(site, "getsitepackages", lambda: [])())
+    user = getattr(site, "getusersitepackages", lambda: None)()
+    if user:
+        dirs.append(user)
+    return [d for d in dict.fromkeys(dirs) if os.path.isdir(d)]
+
+
+def env_fingerprint(
+    requirements: str | Path | None = "requirements.txt",
+    site_packages: Iterable[str] | None = None,
+) -> dict:
+    """
+    目前 Python 環境的指紋：直譯器路徑、各 site-packages 目錄的 mtime、requirements.txt 雜湊。
+    pip 安裝 / 移除套件會改變目錄 mtime，所以任何一項變動都代表需要重新檢查。
+    """
+    dirs = site_dirs() if site_packages is None else list(site_packages)
+    req = Path(requirements) if requirements else None
+    return {
+        "python": sys.executable,
+        "version": sys.version,
+        "site": {d: os.stat(d).st_mtime_ns for d in dirs if os.path.isdir(d)},
+        "requirements": file_digest(req) if req is not None and req.is_file() else "",
+    }
+
+
+class JsonCache:
+    """
+    以 key 存取的 JSON 檔快取。寫入先寫暫存檔再 os.replace，中途中斷不會留下壞掉的檔案；
+    讀取失敗（檔案不存在 / 格式錯誤）一律視為 miss。
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._load().get(key, default)
+
+    def put(self, key: str, value: Any, keep: int = 8):
+        """寫入 key；只保留最近 keep 筆，避免環境來回切換時檔案無限成長。"""
+        data = self._load()
+        data.pop(key, None)
+        data[key] = value
+        if keep > 0:
+            data = dict(list(data.items())[-keep:])
+        self._save(data)
+
+    def pop(self, key: str):
+        data = self._load()
+        if data.pop(key, None) is not None:
+            self._save(data)
+
+    def clear(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _save(self, data: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,171 @@
+# ./utils/calib_cache.py
+"""
+INT8 校正快取的識別：快取檔以「ONNX graph 雜湊 + 網路輸入/輸出 + 前處理 + 校正器種類」當 key，
+放在 ./cache/calib/<模型名>-<校正器>-<key>.cache，旁邊的 .json 記錄 key 的來源。
+換了模型、輸入大小、前處理或校正器就會換一個檔案，不會再誤用舊的 calibration.cache；
+key 相同時直接讀快取，跳過整個校正流程。這個檔案不需要 TensorRT，可以單獨檢查快取。
+
+    python -m utils.calib_cache                       # 列出 ./cache/calib 內的快取
+    python -m utils.calib_cache --check ./calibration.cache --onnx model.onnx --shape 1,3,640,640
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from utils.cache import CACHE_DIR, digest_obj, file_digest
+
+CALIB_DIR = CACHE_DIR / "calib"
+CALIB_VERSION = 1  # key 的組成改變時 +1，舊快取自動失效
+CALIBRATORS = ("entropy", "minmax", "percentile")
+DEFAULT_PERCENTILE = 99.99
+
+
+def graph_digest(onnx_path: str | Path) -> str:
+    """
+    只雜湊 graph 本身（節點、權重、輸入輸出），producer / doc_string 等 metadata 改變不影響 key。
+    沒有 onnx 套件時退回整個檔案的雜湊。
+    """
+    try:
+        import onnx
+    except ImportError:
+        return file_digest(onnx_path)
+    model = onnx.load(str(onnx_path))
+    return hashlib.sha256(model.graph.SerializeToString(deterministic=True)).hexdigest()
+
+
+def calib_identity(
+    onnx_path: str | Path,
+    input_shape,
+    preprocessor: str = "fixed_shape_resizer",
+    calibrator: str = "entropy",
+    percentile: float | None = None,
+    outputs=None,
+    graph: str | None = None,
+) -> dict:
+    """
+    決定校正結果的所有因素。batch 維度不算在內（校正 batch size 不影響 scale）；
+    outputs 是 TensorRT 網路實際標記的輸出（end2end 會多出 NMS 前的張量），一起放進 key。
+    """
+    if calibrator not in CALIBRATORS:
+        raise ValueError(f"unknown calibrator {calibrator!r}, expected one of {CALIBRATORS}")
+    ident = {
+        "version": CALIB_VERSION,
+        "graph": graph or graph_digest(onnx_path),
+        "input_shape": [int(d) for d in list(input_shape)[1:]],
+        "preprocessor": preprocessor,
+        "calibrator": calibrator,
+        "outputs": sorted(outputs or []),
+    }
+    if calibrator == "percentile":
+        ident["percentile"] = float(DEFAULT_PERCENTILE if percentile is None else percentile)
+    return ident
+
+
+def cache_path(cache_dir: str | Path, name: str, ident: dict) -> Path:
+    """<cache_dir>/<name>-<calibrator>-<key 前 16 碼>.cache"""
+    return Path(cache_dir) / "{}-{}-{}.cache".format(Path(name).stem, ident["calibrator"], digest_obj(ident)[:16])
+
+
+def sidecar_path(path: str | Path) -> Path:
+    return Path(str(path) + ".json")
+
+
+def read_identity(path: str | Path) -> dict | None:
+    try:
+        with open(sidecar_path(path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def write_identity(path: str | Path, ident: dict):
+    side = sidecar_path(path)
+    side.parent.mkdir(parents=True, exist_ok=True)
+    tmp = side.with_name(side.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ident, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, side)
+
+
+def check_cache(path: str | Path, ident: dict) -> tuple[bool, str]:
+    """
+    快取是否可以安全沿用。回傳 (可用, 原因)。
+    沒有 .json 的舊式快取無法確認來源，回傳 (True, "unverified") 交給呼叫端決定。
+    """
+    if not os.path.isfile(path):
+        return False, "missing"
+    recorded = read_identity(path)
+    if recorded is None:
+        return True, "unverified"
+    diff = sorted(k for k in set(ident) | set(recorded) if ident.get(k) != recorded.get(k))
+    if diff:
+        return False, "mismatch: " + ", ".join(diff)
+    return True, "ok"
+
+
+def resolve_cache(
+    explicit: str | Path | None, keyed: str | Path, ident: dict
+) -> tuple[str, bool, list[tuple[str, str]]]:
+    """
+    決定要用的快取檔：explicit（--calib_cache）優先；它的來源與 ident 不符時不覆蓋它，改用 keyed。
+    回傳 (路徑, 可否沿用, [(檢查過的路徑, 原因), ...])；不能沿用時呼叫端校正後寫到回傳的路徑。
+    """
+    path = str(explicit or keyed)
+    ok, reason = check_cache(path, ident)
+    checks = [(path, reason)]
+    if not ok and reason != "missing" and path != str(keyed):
+        path = str(keyed)
+        ok, reason = check_cache(path, ident)
+        checks.append((path, reason))
+    return path, ok, checks
+
+
+def list_caches(cache_dir: str | Path = CALIB_DIR) -> list[tuple[Path, dict | None]]:
+    cache_dir = Path(cache_dir)
+    if not cache_dir.is_dir():
+        return []
+    return [(p, read_identity(p)) for p in sorted(cache_dir.glob("*.cache"))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or check INT8 calibration caches")
+    parser.add_argument("--dir", default=str(CALIB_DIR), help="calibration cache directory")
+    parser.add_argument("--check", default=None, help="cache file to check against --onnx / --shape")
+    parser.add_argument("--onnx", default=None)
+    parser.add_argument("--shape", default=None, help="network input shape, e.g. 1,3,640,640")
+    parser.add_argument("--calibrator", default="entropy", choices=CALIBRATORS)
+    parser.add_argument("--percentile", type=float, default=DEFAULT_PERCENTILE)
+    parser.add_argument("--preprocessor", default="fixed_shape_resizer")
+    args = parser.parse_args()
+
+    if args.check:
+        if not (args.onnx and args.shape):
+            parser.error("--check needs --onnx and --shape")
+        ident = calib_identity(
+            args.onnx,
+            [int(s) for s in args.shape.split(",")],
+            args.preprocessor,
+            args.calibrator,
+            args.percentile,
+        )
+        # 這裡沒有 TensorRT 網路，輸出名稱沿用快取記錄的，只比對其餘欄位
+        ident["outputs"] = (read_identity(args.check) or {}).get("outputs", [])
+        ok, reason = check_cache(args.check, ident)
+        print(f"{args.check}: {'reusable' if ok else 'stale'} ({reason})")
+    else:
+        caches = list_caches(args.dir)
+        if not caches:
+            print(f"no calibration caches in {args.dir}")
+        for path, ident in caches:
+            if ident is None:
+                print(f"{path.name}: no identity record")
+                continue
+            shape = "x".join(map(str, ident.get("input_shape", [])))
+            extra = f" p{ident['percentile']:g}" if "percentile" in ident else ""
+            print(f"{path.name}: {ident.get('calibrator')}{extra} {shape} {ident.get('preprocessor')} "
+                  f"graph {str(ident.get('graph'))[:12]}")
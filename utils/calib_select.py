@@ -0,0 +1,245 @@
+# ./utils/calib_select.py
+"""
+INT8 校正集挑選：替每張圖算便宜的特徵（縮圖的 HSV 色彩直方圖 + 分區邊緣密度 + 亮度），
+再用 k-center（或 k-means）挑出 k 張差異最大的圖，取代「檔名排序的前 N 張」。
+特徵以檔案內容雜湊快取在 ./cache/calib_desc.npz，同一批圖第二次挑選幾乎不花時間。
+
+    paths = select_subset(all_paths, 500)                    # 給 ImageBatcher 用
+    python -m utils.calib_select ./calib --num 500           # 印出覆蓋半徑，和隨機挑選比較
+    python -m utils.calib_select ./calib --num 500 --copy_to ./calib_500
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from utils.cache import CACHE_DIR, file_digest
+
+DESC_CACHE = CACHE_DIR / "calib_desc.npz"
+DESC_VERSION = 1  # 特徵定義改變時 +1，舊快取自動失效
+THUMB = 64
+HIST_BINS = (8, 4, 4)  # H, S, V
+EDGE_GRID = 4
+EDGE_THRESHOLD = 32
+# 各組特徵的權重，讓色彩與構圖對距離的影響差不多
+W_HIST = 1.0
+W_EDGE = 0.5
+W_STATS = 0.5
+METHODS = ("kcenter", "kmeans")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def describe(path: str | Path) -> np.ndarray | None:
+    """單張圖的特徵向量（float32）；讀不到的圖回傳 None。"""
+    import cv2
+
+    # 解碼時就縮小 4 倍，大圖省下大部分的解碼時間
+    img = cv2.imread(str(path), cv2.IMREAD_REDUCED_COLOR_4)
+    if img is None:
+        return None
+    img = cv2.resize(img, (THUMB, THUMB), interpolation=cv2.INTER_AREA)
+
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).reshape(-1, 3).astype(np.int32)
+    hb, sb, vb = HIST_BINS
+    idx = (hsv[:, 0] * hb // 180 * sb + hsv[:, 1] * sb // 256) * vb + hsv[:, 2] * vb // 256
+    hist = np.bincount(idx, minlength=hb * sb * vb) / idx.size
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY).astype(np.float32)
+    mag = np.abs(np.diff(gray, axis=1))[:-1, :] + np.abs(np.diff(gray, axis=0))[:, :-1]
+    cell = (THUMB - 1) // EDGE_GRID
+    edges = (mag[: cell * EDGE_GRID, : cell * EDGE_GRID] > EDGE_THRESHOLD).reshape(
+        EDGE_GRID, cell, EDGE_GRID, cell
+    ).mean(axis=(1, 3))
+
+    stats = np.array([gray.mean() / 255.0, gray.std() / 128.0])
+    # sqrt 後的直方圖用 L2 距離即為 Hellinger 距離
+    return np.concatenate([np.sqrt(hist) * W_HIST, edges.ravel() * W_EDGE, stats * W_STATS]).astype(np.float32)
+
+
+def _load_cache(path: Path) -> dict[str, np.ndarray]:
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != DESC_VERSION:
+                return {}
+            return dict(zip(data["keys"].tolist(), data["desc"]))
+    except (OSError, KeyError, ValueError):
+        return {}
+
+
+def _save_cache(path: Path, cache: dict[str, np.ndarray]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    keys = list(cache)
+    desc = np.stack([cache[k] for k in keys]) if keys else np.zeros((0, 0), np.float32)
+    np.savez(tmp, version=DESC_VERSION, keys=np.array(keys, dtype=str), desc=desc)
+    os.replace(tmp, path)
+
+
+def descriptors(
+    paths: list[str],
+    workers: int | None = None,
+    cache_path: str | Path | None = DESC_CACHE,
+) -> tuple[np.ndarray, list[int]]:
+    """
+    平行計算 paths 的特徵（cv2 解碼時會釋放 GIL，用 thread 即可）。
+    回傳 (特徵矩陣, 有效圖片在 paths 中的 index)；讀不到的圖會被略過。
+    """
+    workers = workers or min(32, (os.cpu_count() or 4) + 4)
+    cache_path = Path(cache_path) if cache_path else None
+    cache = _load_cache(cache_path) if cache_path else {}
+
+    def _one(p):
+        key = file_digest(p, "sha1")
+        hit = cache.get(key)
+        return key, (hit if hit is not None else describe(p)), hit is None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_one, paths))
+
+    rows, valid, dirty = [], [], False
+    for i, (key, desc, fresh) in enumerate(results):
+        if desc is None:
+            continue
+        if fresh:
+            cache[key] = desc
+            dirty = True
+        rows.append(desc)
+        valid.append(i)
+    if cache_path and dirty:
+        _save_cache(cache_path, cache)
+    return (np.stack(rows) if rows else np.zeros((0, 0), np.float32)), valid
+
+
+def _sq_dist(X: np.ndarray, c: np.ndarray) -> np.ndarray:
+    d = X - c
+    return np.einsum("ij,ij->i", d, d)
+
+
+def k_center(X: np.ndarray, k: int) -> list[int]:
+    """
+    貪婪 k-center（farthest point）：從最接近平均值的點開始，每次加入離已選集合最遠的點。
+    結果可重現，選出的集合讓「任何一張圖到最近的被選圖」的最大距離約為最小值的 2 倍以內。
+    """
+    n = len(X)
+    if k >= n:
+        return list(range(n))
+    first = int(np.argmin(_sq_dist(X, X.mean(axis=0))))
+    chosen = [first]
+    dist = _sq_dist(X, X[first])
+    for _ in range(k - 1):
+        i = int(np.argmax(dist))
+        chosen.append(i)
+        np.minimum(dist, _sq_dist(X, X[i]), out=dist)
+    return chosen
+
+
+def k_means(X: np.ndarray, k: int, iters: int = 20, seed: int = 0) -> list[int]:
+    """k-means++ 初始化 + Lloyd；回傳離每個中心最近的實際圖片（不重複）。"""
+    n = len(X)
+    if k >= n:
+        return list(range(n))
+    rng = np.random.default_rng(seed)
+    centers = [X[rng.integers(n)]]
+    dist = _sq_dist(X, centers[0])
+    for _ in range(k - 1):
+        p = dist / dist.sum() if dist.sum() > 0 else None
+        centers.append(X[rng.choice(n, p=p)])
+        np.minimum(dist, _sq_dist(X, centers[-1]), out=dist)
+    C = np.stack(centers)
+
+    x2 = np.einsum("ij,ij->i", X, X)[:, None]
+    for _ in range(iters):
+        d = x2 - 2 * X @ C.T + np.einsum("ij,ij->i", C, C)[None, :]
+        label = np.argmin(d, axis=1)
+        counts = np.bincount(label, minlength=k)
+        sums = np.zeros_like(C)
+        np.add.at(sums, label, X)
+        moved = counts > 0
+        newC = C.copy()
+        newC[moved] = sums[moved] / counts[moved, None]
+        if np.allclose(newC, C):
+            break
+        C = newC
+
+    d = x2 - 2 * X @ C.T + np.einsum("ij,ij->i", C, C)[None, :]
+    chosen: list[int] = []
+    taken = np.zeros(n, dtype=bool)
+    for j in range(k):
+        col = np.where(taken, np.inf, d[:, j])
+        i = int(np.argmin(col))
+        taken[i] = True
+        chosen.append(i)
+    return chosen
+
+
+def coverage(X: np.ndarray, chosen: list[int]) -> float:
+    """覆蓋半徑：所有圖到最近被選圖的最大距離（越小代表子集越能代表全部）。"""
+    dist = np.full(len(X), np.inf)
+    for i in chosen:
+        np.minimum(dist, _sq_dist(X, X[i]), out=dist)
+    return float(np.sqrt(dist.max())) if len(X) else 0.0
+
+
+def select_subset(
+    paths: list[str],
+    k: int,
+    method: str = "kcenter",
+    workers: int | None = None,
+    cache_path: str | Path | None = DESC_CACHE,
+) -> list[str]:
+    """從 paths 挑出 k 張有代表性的圖，依原本順序回傳。k >= len(paths) 時直接回傳全部。"""
+    if method not in METHODS:
+        raise ValueError(f"unknown selection method {method!r}, expected one of {METHODS}")
+    if k >= len(paths):
+        return list(paths)
+    X, valid = descriptors(paths, workers=workers, cache_path=cache_path)
+    pick = k_center(X, k) if method == "kcenter" else k_means(X, k)
+    return [paths[valid[i]] for i in sorted(pick)]
+
+
+def list_images(folder: str | Path) -> list[str]:
+    return sorted(
+        str(p) for p in Path(folder).iterdir() if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+if __name__ == "__main__":
+    import shutil
+
+    parser = argparse.ArgumentParser(description="Pick a representative INT8 calibration subset")
+    parser.add_argument("folder", help="directory of calibration images")
+    parser.add_argument("--num", type=int, default=500)
+    parser.add_argument("--method", default="kcenter", choices=METHODS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no_cache", action="store_true", help="do not read / write the descriptor cache")
+    parser.add_argument("--copy_to", default=None, help="copy the selected images into this directory")
+    args = parser.parse_args()
+
+    paths = list_images(args.folder)
+    t0 = time.perf_counter()
+    X, valid = descriptors(paths, workers=args.workers, cache_path=None if args.no_cache else DESC_CACHE)
+    t1 = time.perf_counter()
+    k = min(args.num, len(valid))
+    pick = k_center(X, k) if args.method == "kcenter" else k_means(X, k)
+    t2 = time.perf_counter()
+
+    rng = np.random.default_rng(0)
+    baseline = {
+        "first N": list(range(k)),
+        "random": rng.choice(len(valid), size=k, replace=False).tolist(),
+    }
+    print(f"{len(paths)} images ({len(valid)} readable), descriptors {X.shape[1]}-d in {t1 - t0:.2f} s, "
+          f"{args.method} k={k} in {(t2 - t1) * 1e3:.0f} ms")
+    print(f"coverage radius (lower is better): {args.method} {coverage(X, pick):.3f}, "
+          + ", ".join(f"{name} {coverage(X, idx):.3f}" for name, idx in baseline.items()))
+
+    if args.copy_to:
+        os.makedirs(args.copy_to, exist_ok=True)
+        for i in sorted(pick):
+            shutil.copy2(paths[valid[i]], args.copy_to)
+        print(f"copied {k} images to {args.copy_to}")
@@ -0,0 +1,87 @@
+# ./utils/change_detect.py
+"""
+畫面變化偵測：畫面沒變時沿用上一次的偵測結果，省下 engine.forward。
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+class ChangeDetector:
+    """
+    把 strided 降採樣後的畫面切成 tiles x tiles 塊，比較每塊的平均 BGR 值。
+    參考簽章只在「判定有變化（會跑推論）」時更新，所以緩慢漂移也會累積到門檻。
+
+    :param threshold: 任一 tile 的平均值差（0-255）超過此值視為有變化
+    :param stride: 降採樣間隔（像素）
+    :param tiles: 每邊切幾塊
+    :param max_skip: 連續略過幾次後強制推論一次，0 = 不限制
+    """
+
+    def __init__(
+        self,
+        threshold: float = 2.0,
+        stride: int = 8,
+        tiles: int = 8,
+        max_skip: int = 30,
+    ):
+        self.threshold = float(threshold)
+        self.stride = max(1, int(stride))
+        self.tiles = max(1, int(tiles))
+        self.max_skip = int(max_skip)
+
+        self._ref: np.ndarray | None = None
+        self._ref_seq: int | None = None
+        self._run = 0  # 目前連續略過的次數
+
+        self.checked = 0
+        self.skipped = 0
+
+    def reset(self):
+        self._ref = None
+        self._ref_seq = None
+        self._run = 0
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        """回傳 (tiles, tiles, 3) 的每塊平均值。"""
+        s, t = self.stride, self.tiles
+        small = frame[::s, ::s, :3]
+        th, tw = small.shape[0] // t, small.shape[1] // t
+        if th == 0 or tw == 0:
+            raise ValueError(f"frame {frame.shape[:2]} too small for stride={s}, tiles={t}")
+        small = small[: th * t, : tw * t]
+        sums = small.reshape(t, th, t, tw, 3).sum(axis=(1, 3), dtype=np.int64)
+        return sums.astype(np.float32) / float(th * tw)
+
+    def changed(self, frame: np.ndarray, seq: int | None = None) -> bool:
+        self.checked += 1
+
+        # 同一個 seq 代表同一幀（呼叫端重複送進同一張畫面），不用再算。
+        # 擷取來源每次回傳畫面都會遞增 seq（dxcam 的 get_latest_frame 會等到桌面更新才回傳），
+        # 所以螢幕沒變的情況還是靠下面的簽章比對
+        if seq is not None and seq == self._ref_seq and self._ref is not None:
+            return self._skip()
+
+        sig = self.signature(frame)
+        if (
+            self._ref is None
+            or self._ref.shape != sig.shape
+            or float(np.abs(sig - self._ref).max()) > self.threshold
+            or (self.max_skip and self._run >= self.max_skip)
+        ):
+            self._ref = sig
+            self._ref_seq = seq
+            self._run = 0
+            return True
+        return self._skip()
+
+    def _skip(self) -> bool:
+        if self.max_skip and self._run >= self.max_skip:
+            self._run = 0
+            return True
+        self._run += 1
+        self.skipped += 1
+        return False
+
+    def stats(self) -> dict:
+        return {"checked": self.checked, "skipped": self.skipped}
@@ -0,0 +1,299 @@
+# ./utils/config.py
+"""
+設定檔：以 config/default.yaml 為 schema 做遞迴合併與型別檢查，
+再編譯成 frozen + __slots__ 的 dataclass 給 frame loop 讀取（不必每次走 dict）。
+
+    raw = load_yaml("config/config.yaml")     # 依 mtime 快取，檔案沒變就不重新 parse
+    cfg = compile_config(raw)                 # 合併預設值、檢查型別，回傳 AppConfig
+    changes = diff(old_raw, new_raw)          # {"mouse.smooth": (0.8, 0.6), ...}
+"""
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "config" / "default.yaml"
+
+# 只能是這些值的字串欄位（比對時不分大小寫）
+CHOICES: dict[str, tuple[str, ...]] = {
+    "camera": ("dxcam", "mss", "replay"),
+    "log_level": ("debug", "info", "warning", "error", "critical"),
+}
+# 可以寫成 null 的欄位；其他欄位是 null 時一律視為型別錯誤
+NULLABLE: frozenset[str] = frozenset({"mouse.serial_port"})
+
+
+class ConfigError(ValueError):
+    def __init__(self, errors: list[str]):
+        self.errors = errors
+        super().__init__("invalid config:\n  " + "\n  ".join(errors))
+
+
+# -------- cached parse --------
+_CACHE: dict[str, tuple[tuple[int, int], dict]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def load_yaml(path: str | Path, default: str | Path | None = DEFAULT_PATH) -> dict:
+    """
+    讀取 YAML，依 (mtime, size) 快取 parse 結果；回傳的是複本，呼叫端可以隨意修改。
+    檔案不存在且有給 default 時，先複製一份預設設定。
+    """
+    import yaml
+
+    path = Path(path)
+    if not path.exists() and default is not None:
+        import shutil
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(default, path)
+
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = str(path.resolve())
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+    if hit is None or hit[0] != stamp:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        hit = (stamp, data)
+        with _CACHE_LOCK:
+            _CACHE[key] = hit
+    return copy.deepcopy(hit[1])
+
+
+def load_defaults() -> dict:
+    return load_yaml(DEFAULT_PATH, default=None)
+
+
+# -------- merge / diff / validate --------
+def deep_merge(base: dict, override: dict) -> dict:
+    """回傳新的 dict：override 的值優先，兩邊都是 dict 時遞迴合併；不會修改輸入。"""
+    out = copy.deepcopy(base)
+    for k, v in override.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = deep_merge(out[k], v)
+        else:
+            out[k] = copy.deepcopy(v)
+    return out
+
+
+def diff(old: dict, new: dict, prefix: str = "") -> dict[str, tuple[Any, Any]]:
+    """回傳 {"a.b.c": (舊值, 新值)}，只列出葉節點；不存在的一側為 None。"""
+    out: dict[str, tuple[Any, Any]] = {}
+    for k in old.keys() | new.keys():
+        key = f"{prefix}{k}"
+        a, b = old.get(k), new.get(k)
+        if isinstance(a, dict) and isinstance(b, dict):
+            out.update(diff(a, b, key + "."))
+        elif a != b:
+            out[key] = (a, b)
+    return dict(sorted(out.items()))
+
+
+def _type_ok(value: Any, sample: Any, nullable: bool = False) -> bool:
+    if sample is None:
+        return True
+    if value is None:
+        return nullable
+    if isinstance(sample, bool):
+        return isinstance(value, bool)
+    if isinstance(sample, (int, float)):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if isinstance(sample, (list, tuple)):
+        return isinstance(value, (list, tuple))
+    if isinstance(sample, dict):
+        return isinstance(value, dict)
+    return isinstance(value, type(sample))
+
+
+def validate(cfg: dict, schema: dict, prefix: str = "") -> list[str]:
+    """依 schema（default.yaml）的值型別檢查 cfg；schema 沒有的 key 不檢查。"""
+    errors: list[str] = []
+    for k, sample in schema.items():
+        if k not in cfg:
+            continue
+        key = f"{prefix}{k}"
+        value = cfg[k]
+        if not _type_ok(value, sample, key in NULLABLE):
+            errors.append(
+                f"{key}: expected {type(sample).__name__}, got {type(value).__name__} ({value!r})"
+            )
+        elif isinstance(sample, dict):
+            errors.extend(validate(value, sample, key + "."))
+        elif key in CHOICES and str(value).lower() not in CHOICES[key]:
+            errors.append(f"{key}: {value!r} not in {CHOICES[key]}")
+    return errors
+
+
+# -------- compiled config --------
+def _from_dict(cls, data: dict):
+    """只取 dataclass 有的欄位；list 轉成 tuple，避免 frozen 物件裡藏著可變的內容。"""
+    kw = {}
+    for f in fields(cls):
+        if f.name in data:
+            v = data[f.name]
+            kw[f.name] = tuple(v) if isinstance(v, list) else v
+    return cls(**kw)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelConfig:
+    file_path: str = "models/500e.trt"
+    label_list: tuple[str, ...] = ()
+    enemy_list: tuple[str, ...] = ()
+    conf: float = 0.35
+    input_size: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class MouseConfig:
+    aimbot_button: str = "left"
+    switch_button: str = "x2"
+    silent_button: str = "alt_gr"
+    silent_aim: str = "caps_lock"
+    max_lock_dis: float = 100
+    max_step_dis: float = 30
+    max_pid_dis: float = 50
+    pos_factor: float = 0.02
+    pidx_kp: float = 0.0
+    pidx_kd: float = 0.0
+    pidx_ki: float = 0.0
+    pidy_kp: float = 0.0
+    pidy_kd: float = 0.0
+    pidy_ki: float = 0.0
+    smooth: float = 0.8
+    mag: float = 2
+    serial_port: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class ReplayConfig:
+    path: str = ""
+    fps: float = 0
+    loop: bool = True
+
+
+@dataclass(frozen=True, slots=True)
+class SkipConfig:
+    enabled: bool = False
+    threshold: float = 2.0
+    stride: int = 8
+    tiles: int = 8
+    max_skip: int = 30
+
+
+@dataclass(frozen=True, slots=True)
+class FrameLogConfig:
+    enabled: bool = False
+    every: int = 1
+    path: str = "./logs/frames.jsonl"
+
+
+@dataclass(frozen=True, slots=True)
+class AppConfig:
+    model: ModelConfig
+    mouse: MouseConfig
+    resolution_x: int = 1920
+    resolution_y: int = 1080
+    camera: str = "dxcam"
+    replay: ReplayConfig = ReplayConfig()
+    capture_thread: bool = True
+    skip_unchanged: SkipConfig = SkipConfig()
+    fix_dxcam_error_hook: bool = False
+    fix_dxcam_thread_join: bool = False
+    debug: bool = False
+    log_level: str = "info"
+    log_async: bool = False
+    log_rate_limit: float = 0.0
+    log_jsonl: bool = False
+    log_frames: FrameLogConfig = FrameLogConfig()
+    preview_fps: float = 30
+    auto_update: bool = True
+
+    _NESTED = {
+        "model": ModelConfig,
+        "mouse": MouseConfig,
+        "replay": ReplayConfig,
+        "skip_unchanged": SkipConfig,
+        "log_frames": FrameLogConfig,
+    }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AppConfig":
+        data = dict(data)
+        for k, sub in cls._NESTED.items():
+            data[k] = _from_dict(sub, data.get(k) or {})
+        return _from_dict(cls, data)
+
+    @property
+    def scale(self) -> float:
+        """相對於 1920 寬的縮放比例。"""
+        return self.resolution_x / 1920
+
+
+# 變動時需要重建元件的設定（結尾是 "." 代表整個區塊）；其餘都能在 frame 之間直接套用
+REBUILD: dict[str, str] = {
+    "camera": "camera",
+    "resolution_x": "camera",
+    "resolution_y": "camera",
+    "replay.": "camera",
+    "capture_thread": "camera",
+    "fix_dxcam_error_hook": "camera",
+    "fix_dxcam_thread_join": "camera",
+    "model.file_path": "engine",
+    "mouse.serial_port": "mouse",
+}
+# 只在啟動時讀取，執行中改了也不會生效
+RESTART: tuple[str, ...] = ("log_async", "log_jsonl", "log_rate_limit", "auto_update")
+
+
+def _match(key: str, pattern: str) -> bool:
+    return key.startswith(pattern) if pattern.endswith(".") else key == pattern
+
+
+def lookup(key: str, table: dict[str, Any]) -> Any:
+    """table（規則同 REBUILD）裡第一個符合 key 的 pattern 對應的值，沒有則回傳 None。"""
+    return next((v for pat, v in table.items() if _match(key, pat)), None)
+
+
+def plan_reload(changes: dict[str, tuple]) -> tuple[list[str], set[str], list[str]]:
+    """
+    把 diff() 的結果分成 (可直接套用的 key, 需要重建的元件, 需要重啟的 key)。
+    元件名稱為 "camera" / "engine" / "mouse"。
+    """
+    hot: list[str] = []
+    rebuild: set[str] = set()
+    restart: list[str] = []
+    for key in changes:
+        comp = lookup(key, REBUILD)
+        if comp is not None:
+            rebuild.add(comp)
+        elif any(_match(key, pat) for pat in RESTART):
+            restart.append(key)
+        else:
+            hot.append(key)
+    return hot, rebuild, restart
+
+
+def compile_config(raw: dict, defaults: dict | None = None) -> AppConfig:
+    """合併預設值、檢查型別，回傳 AppConfig；型別錯誤時丟出 ConfigError。"""
+    defaults = load_defaults() if defaults is None else defaults
+    merged = deep_merge(defaults, raw)
+    errors = validate(merged, defaults)
+    if errors:
+        raise ConfigError(errors)
+    return AppConfig.from_dict(merged)
+
+
+if __name__ == "__main__":
+    import sys
+
+    raw = load_yaml(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH, default=None)
+    cfg = compile_config(raw)
+    print(cfg)
+    print(diff(load_defaults(), raw))
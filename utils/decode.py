@@ -0,0 +1,223 @@
+# ./utils/decode.py
+"""
+YOLO 原始輸出的 CPU 參考解碼（純 numpy），行為對齊 export.py 的 end2end 網路：
+(pre-NMS top-k) → 分數門檻 → EfficientNMS（class-agnostic 或逐類別）→ max_det，
+輸出格式與 engine 相同：num [1, 1]、boxes [1, max_det, 4]（xyxy）、scores [1, max_det]、classes [1, max_det]。
+
+用途：
+- 驗證 end2end engine（含 --pre_nms_topk / --fp16_outputs）的輸出與原始模型一致
+- 沒有 NMS 的 engine（只有 predictions 輸出）由 inference.BaseEngine.forward 用它在 CPU 上解碼
+
+    python -m utils.decode --onnx models/best.onnx --v8 --images ./records/imgs --engine models/best.trt
+"""
+from __future__ import annotations
+
+import argparse
+
+import numpy as np
+
+FORMATS = ("yolov8", "yolov5")
+
+
+def prediction_format(shape, fmt: str | None = None) -> str:
+    """
+    predictions 輸出的格式：有 metadata（fmt）就用它，否則依形狀判斷，框的數量 N 一定比 4 + nc / 5 + nc 大：
+    [.., C, N]（C < N）是 yolov8，[.., N, C] 是 yolov5。最後兩維相同時無法判斷，丟 ValueError。
+    """
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown prediction format {fmt!r}, expected one of {FORMATS}")
+        return fmt
+    rows, cols = shape[-2], shape[-1]
+    if rows == cols:
+        raise ValueError(
+            f"cannot tell yolov8 from yolov5 for a square {list(shape)} predictions output, "
+            "rebuild the engine with utils/export.py to record the format in its metadata"
+        )
+    return "yolov8" if rows < cols else "yolov5"
+
+
+def split_predictions(pred: np.ndarray, fmt: str = "yolov8") -> tuple[np.ndarray, np.ndarray]:
+    """
+    單張圖的原始輸出 → (cx, cy, w, h 的 boxes [N, 4], 類別分數 [N, nc])。
+    yolov8：[1, 4 + nc, N]；yolov5：[1, N, 5 + nc]，類別分數要乘上 objectness。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown prediction format {fmt!r}, expected one of {FORMATS}")
+    p = np.asarray(pred, dtype=np.float32)
+    p = p.reshape(p.shape[-2], p.shape[-1])
+    if fmt == "yolov8":
+        p = p.T
+        return p[:, :4], p[:, 4:]
+    return p[:, :4], p[:, 5:] * p[:, 4:5]
+
+
+def cxcywh_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    half = boxes[:, 2:4] / 2
+    return np.concatenate([boxes[:, :2] - half, boxes[:, :2] + half], axis=1)
+
+
+def topk_candidates(scores: np.ndarray, k: int | None) -> np.ndarray:
+    """最高類別分數前 k 名的 index（與 export.add_pre_nms_topk 相同）；k 為 None 時全部保留。"""
+    if not k or k >= len(scores):
+        return np.arange(len(scores))
+    best = scores.max(axis=1)
+    idx = np.argpartition(-best, k - 1)[:k]
+    return idx[np.argsort(-best[idx], kind="stable")]
+
+
+def box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = lambda b: np.clip(b[..., 2] - b[..., 0], 0, None) * np.clip(b[..., 3] - b[..., 1], 0, None)
+    union = area(box) + area(boxes) - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-12), 0.0)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float) -> list[int]:
+    """貪婪 NMS，回傳保留的 index（分數由高到低）。"""
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = int(order[0])
+        keep.append(i)
+        if order.size == 1:
+            break
+        rest = order[1:]
+        order = rest[box_iou(boxes[i], boxes[rest]) <= iou_thres]
+    return keep
+
+
+def efficient_nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    conf_thres: float = 0.4,
+    iou_thres: float = 0.5,
+    max_det: int = 100,
+    class_agnostic: bool = True,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    EfficientNMS_TRT 的行為：每個 (框, 類別) 分數 > conf_thres 的組合都是候選，
+    class_agnostic 時跨類別抑制，否則逐類別；最後依分數取前 max_det 個。
+    boxes 為 xyxy [N, 4]，scores [N, nc]；回傳 (boxes [n, 4], scores [n], classes [n])。
+    """
+    bi, ci = np.nonzero(scores > conf_thres)
+    cand_scores = scores[bi, ci]
+    if class_agnostic:
+        keep = nms(boxes[bi], cand_scores, iou_thres)
+    else:
+        keep = []
+        for c in np.unique(ci):
+            sel = np.nonzero(ci == c)[0]
+            keep.extend(sel[nms(boxes[bi[sel]], cand_scores[sel], iou_thres)].tolist())
+    keep = np.asarray(keep, dtype=np.int64)
+    keep = keep[np.argsort(-cand_scores[keep], kind="stable")][:max_det]
+    return boxes[bi[keep]], cand_scores[keep], ci[keep]
+
+
+def decode(
+    pred: np.ndarray,
+    fmt: str = "yolov8",
+    conf_thres: float = 0.4,
+    iou_thres: float = 0.5,
+    max_det: int = 100,
+    class_agnostic: bool = True,
+    pre_nms_topk: int | None = None,
+    fp16_outputs: bool = False,
+) -> list[np.ndarray]:
+    """原始輸出 → [num, boxes, scores, classes]，形狀與 dtype 同 end2end engine（補零到 max_det）。"""
+    boxes, scores = split_predictions(pred, fmt)
+    idx = topk_candidates(scores, pre_nms_topk)
+    b, s, c = efficient_nms(cxcywh_to_xyxy(boxes[idx]), scores[idx], conf_thres, iou_thres, max_det, class_agnostic)
+    fdtype = np.float16 if fp16_outputs else np.float32
+    out_boxes = np.zeros((1, max_det, 4), fdtype)
+    out_scores = np.zeros((1, max_det), fdtype)
+    out_classes = np.zeros((1, max_det), np.int32)
+    n = len(b)
+    out_boxes[0, :n] = b
+    out_scores[0, :n] = s
+    out_classes[0, :n] = c
+    return [np.array([[n]], np.int32), out_boxes, out_scores, out_classes]
+
+
+def compare(ref: list[np.ndarray], out: list[np.ndarray], iou: float = 0.5) -> dict:
+    """
+    比較兩組 end2end 輸出：依分數貪婪配對（同類別、IoU >= iou），
+    回傳 {"ref", "out", "matched", "f1", "box_err", "score_err"}；誤差只看配對到的偵測。
+    """
+    def dets(o):
+        n = int(np.asarray(o[0]).reshape(-1)[0])
+        return (np.asarray(o[1], np.float64).reshape(-1, 4)[:n], np.asarray(o[2], np.float64).reshape(-1)[:n],
+                np.asarray(o[3]).reshape(-1)[:n].astype(np.int64))
+
+    rb, rs, rc = dets(ref)
+    ob, os_, oc = dets(out)
+    used = np.zeros(len(rb), dtype=bool)
+    matched, box_err, score_err = 0, 0.0, 0.0
+    for i in np.argsort(-os_, kind="stable"):
+        if not len(rb):
+            break
+        cand = np.where(~used & (rc == oc[i]), box_iou(ob[i], rb), 0.0)
+        j = int(np.argmax(cand))
+        if cand[j] >= iou:
+            used[j] = True
+            matched += 1
+            box_err = max(box_err, float(np.max(np.abs(ob[i] - rb[j]))))
+            score_err = max(score_err, abs(float(os_[i] - rs[j])))
+    total = len(rb) + len(ob)
+    return {
+        "ref": len(rb),
+        "out": len(ob),
+        "matched": matched,
+        "f1": 2 * matched / total if total else 1.0,
+        "box_err": box_err,
+        "score_err": score_err,
+    }
+
+
+if __name__ == "__main__":
+    from utils.autotune import load_inputs, onnx_input_shape
+    from utils.onnx_opt import run_model
+
+    parser = argparse.ArgumentParser(description="Decode raw YOLO outputs on the CPU and compare with an engine")
+    parser.add_argument("--onnx", required=True, help="raw ONNX model (no NMS)")
+    parser.add_argument("--v8", action="store_true", help="yolov8/9 output layout (default: yolov5)")
+    parser.add_argument("--images", default=None, help="input images (default: random)")
+    parser.add_argument("--num", type=int, default=8)
+    parser.add_argument("--engine", default=None, help="end2end engine built from the same ONNX to compare with")
+    parser.add_argument("--conf_thres", type=float, default=0.4)
+    parser.add_argument("--iou_thres", type=float, default=0.5)
+    parser.add_argument("--max_det", type=int, default=100)
+    parser.add_argument("--pre_nms_topk", type=int, default=None)
+    parser.add_argument("--no-class_agnostic", dest="class_agnostic", action="store_false")
+    args = parser.parse_args()
+
+    import onnx
+
+    model = onnx.load(args.onnx, load_external_data=False)
+    in_name = next(i.name for i in model.graph.input if i.name not in {t.name for t in model.graph.initializer})
+    inputs = load_inputs(args.images, onnx_input_shape(args.onnx), count=args.num)
+    engine = None
+    if args.engine:
+        from inference import BaseEngine
+
+        engine = BaseEngine(args.engine)
+    try:
+        for k, x in enumerate(inputs):
+            pred = run_model(args.onnx, {in_name: x})[0]
+            ref = decode(pred, "yolov8" if args.v8 else "yolov5", args.conf_thres, args.iou_thres, args.max_det,
+                         args.class_agnostic, args.pre_nms_topk)
+            if engine is None:
+                print(f"[{k}] {int(ref[0][0, 0])} detections")
+                continue
+            out = engine.infer(x)
+            out = [out[engine.roles[r]] for r in ("num", "boxes", "scores", "classes")]
+            r = compare(ref, out)
+            print(f"[{k}] ref {r['ref']} engine {r['out']} matched {r['matched']} f1 {r['f1']:.3f} "
+                  f"max box err {r['box_err']:.2f} px, max score err {r['score_err']:.4f}")
+    finally:
+        if engine is not None:
+            engine.close()
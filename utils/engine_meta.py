@@ -0,0 +1,226 @@
+# ./utils/engine_meta.py
+"""
+engine 旁邊的 metadata 檔（models/500e.trt -> models/500e.json），由 EngineBuilder 在建置時寫出：
+輸入 dtype / layout、前處理規格、輸出 schema、NMS 參數、類別名稱與建置選項，
+autotune / sensitivity 等工具再合併各自的區塊。runtime（inference.BaseEngine）載入時用它
+設定前處理與輸出對應，並與 engine 實際的 I/O 比對，不符就直接報錯。不存在或格式錯誤時一律當成空的。
+
+    update_meta("models/500e.trt", autotune={"options": {...}, "p50_ms": 1.8})
+    read_meta("models/500e.trt")["outputs"]
+"""
+from __future__ import annotations
+
+import ast
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from utils.config import deep_merge
+
+
+def meta_path(engine: str | Path) -> Path:
+    return Path(engine).with_suffix(".json")
+
+
+def read_meta(engine: str | Path) -> dict:
+    try:
+        with open(meta_path(engine), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def write_meta(engine: str | Path, data: dict):
+    """先寫暫存檔再 os.replace，讀取端不會看到寫到一半的檔案。"""
+    path = meta_path(engine)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def update_meta(engine: str | Path, **sections) -> dict:
+    """把 sections 遞迴合併進現有的 metadata 後寫回，回傳合併後的內容。"""
+    data = deep_merge(read_meta(engine), sections)
+    write_meta(engine, data)
+    return data
+
+
+def copy_meta(src: str | Path, dst: str | Path, move: bool = False):
+    """engine 被複製 / 改名時一起帶著 metadata；來源沒有 metadata 時刪掉目的地的舊檔。"""
+    src, dst = meta_path(src), meta_path(dst)
+    if src == dst:
+        return
+    if not src.is_file():
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if move:
+        os.replace(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+# -------- schema（EngineBuilder 寫、BaseEngine 讀） --------
+META_VERSION = 1
+END2END_ROLES = ("num", "boxes", "scores", "classes")
+
+
+def input_layout(shape) -> str:
+    """通道數（1 或 3）在第 1 維為 NCHW，在最後一維為 NHWC。"""
+    shape = list(shape)
+    if len(shape) >= 3 and shape[-1] in (1, 3) and shape[-3] not in (1, 3):
+        return "NHWC" if len(shape) == 4 else "HWC"
+    return "NCHW" if len(shape) == 4 else "CHW"
+
+
+def sized_shape(shape, layout: str, size, batch: int = 1) -> list[int]:
+    """把輸入形狀的 H、W 換成 size（int 或 (h, w)），其餘動態維度補上 batch / 3 通道。"""
+    h, w = (size, size) if isinstance(size, int) else size
+    shape = [int(d) for d in shape]
+    if layout.endswith("HWC"):
+        hwc = [h, w, shape[-1] if shape[-1] > 0 else 3]
+    else:
+        hwc = [shape[-3] if shape[-3] > 0 else 3, h, w]
+    return [batch if d < 0 else d for d in shape[:-3]] + hwc
+
+
+def parse_sizes(value) -> list[int] | None:
+    """--input_sizes：逗號分隔的輸入大小（例如 "320,480,640"），回傳去重後由小到大排序。"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v.strip()]
+    sizes = sorted({int(v) for v in value})
+    if any(s <= 0 or s % 32 for s in sizes):
+        raise ValueError(f"input sizes must be positive multiples of 32, got {sizes}")
+    return sizes
+
+
+def preprocess_spec(dtype: str, layout: str) -> dict:
+    """
+    runtime 要做的前處理。engine 的輸入是 uint8 時代表正規化（/255）已在網路內，
+    "fused" 列出 engine 自己會做的步驟，runtime 跳過它們。
+    """
+    fused = ["normalize"] if dtype == "uint8" else []
+    return {
+        "color": "RGB",
+        "layout": layout,
+        "dtype": dtype,
+        "divisor": None if fused else 255.0,
+        "fused": fused,
+    }
+
+
+def output_schema(outputs: list[dict], end2end: bool = False, v8: bool = False, v10: bool = False) -> list[dict]:
+    """
+    outputs 為 [{"name", "shape", "dtype"}]，加上 "role"：end2end / v10 是 num, boxes, scores, classes
+    （依名稱對應），其餘為 "predictions" 並記錄 "format"（yolov8：[bs, 4 + nc, N]，yolov5：[bs, N, 5 + nc]）。
+    """
+    schema = []
+    for o in outputs:
+        o = dict(o)
+        if (end2end or v10) and o["name"] in END2END_ROLES:
+            o["role"] = o["name"]
+        else:
+            o["role"] = "predictions"
+            o["format"] = "yolov8" if v8 else "yolov5"
+        schema.append(o)
+    return schema
+
+
+def num_classes(meta: dict) -> int | None:
+    names = meta.get("class_names")
+    if names:
+        return len(names)
+    for o in meta.get("outputs", []):
+        if o.get("role") == "predictions" and len(o.get("shape", [])) == 3:
+            if o.get("format") == "yolov8":
+                return int(o["shape"][1]) - 4
+            return int(o["shape"][2]) - 5
+    return None
+
+
+def onnx_class_names(onnx_path: str | Path) -> list[str] | None:
+    """ultralytics 匯出的 ONNX 在 metadata_props 的 "names" 存了 {0: 'enm', 1: 'down', ...}。"""
+    try:
+        import onnx
+
+        model = onnx.load(str(onnx_path), load_external_data=False)
+    except Exception:
+        return None
+    props = {p.key: p.value for p in model.metadata_props}
+    if "names" not in props:
+        return None
+    try:
+        names = ast.literal_eval(props["names"])
+    except (ValueError, SyntaxError):
+        return None
+    if isinstance(names, dict):
+        return [str(names[k]) for k in sorted(names)]
+    return [str(n) for n in names]
+
+
+def parse_class_names(value: str | None) -> list[str] | None:
+    """--class_names：逗號分隔的名稱，或每行一個名稱的文字檔。"""
+    if not value:
+        return None
+    if os.path.isfile(value):
+        with open(value, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [n.strip() for n in value.split(",") if n.strip()]
+
+
+def check_io(meta: dict, io: list[dict]) -> list[str]:
+    """
+    比對 metadata 與 engine 實際的 I/O（[{"name", "mode": "input"/"output", "shape", "dtype"}]），
+    回傳不符的項目；metadata 沒有 I/O 資訊（舊版或只有工具區塊）時回傳空 list。
+    """
+    problems = []
+    if not meta.get("input") and not meta.get("outputs"):
+        return problems
+    if meta.get("version", META_VERSION) > META_VERSION:
+        problems.append(f"metadata version {meta['version']} is newer than supported {META_VERSION}")
+    actual = {t["name"]: t for t in io}
+    expected = ([dict(meta["input"], mode="input")] if meta.get("input") else []) + [
+        dict(o, mode="output") for o in meta.get("outputs", [])
+    ]
+    for e in expected:
+        a = actual.get(e["name"])
+        if a is None:
+            problems.append(f"{e['mode']} '{e['name']}' missing from engine")
+            continue
+        for key in ("mode", "dtype"):
+            if str(a[key]) != str(e[key]):
+                problems.append(f"{e['name']}: {key} {a[key]} != {e[key]}")
+        if list(a["shape"]) != list(e["shape"]):
+            problems.append(f"{e['name']}: shape {list(a['shape'])} != {list(e['shape'])}")
+    extra = set(actual) - {e["name"] for e in expected}
+    if extra:
+        problems.append("engine has unexpected tensors: " + ", ".join(sorted(extra)))
+    roles = {o.get("role") for o in meta.get("outputs", [])}
+    if roles & set(END2END_ROLES) and set(END2END_ROLES) - roles:
+        problems.append("end2end outputs missing: " + ", ".join(sorted(set(END2END_ROLES) - roles)))
+    return problems
+
+
+def output_roles(meta: dict, names: list[str]) -> dict[str, int]:
+    """{role: engine 輸出的 index}；metadata 沒有輸出 schema 時依位置對應 end2end 的四個輸出。"""
+    roles = {o["name"]: o.get("role") for o in meta.get("outputs", [])}
+    if not roles:
+        return {r: i for i, r in enumerate(END2END_ROLES[: len(names)])} if len(names) == 4 else {"predictions": 0}
+    return {roles[n]: i for i, n in enumerate(names) if roles.get(n)}
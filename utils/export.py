@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import logging
 import argparse
 
@@ -8,6 +9,8 @@ import tensorrt as trt
 from cuda import cudart
 
 from utils import common
+from utils.calib_cache import CALIB_DIR, DEFAULT_PERCENTILE
+from utils.engine_meta import parse_class_names, parse_sizes
 from utils.image_batch import ImageBatcher
 
 os.environ["PATH"] += f";v12.4;v12.4\\bin;v12.4\\lib"
@@ -17,10 +20,13 @@ log = logging.getLogger("EngineBuilder")
 log.propagate = False
 log.setLevel(logging.INFO)
 
+MAX_TOPK = 3840  # ITopKLayer 的 k 上限
 
-class EngineCalibrator(trt.IInt8EntropyCalibrator2):
+
+class _CalibratorBase:
     """
-    Implements the INT8 Entropy Calibrator 2.
+    Batch feeding and cache handling shared by all the INT8 calibrators below, the TensorRT calibrator interface
+    comes from the second base class.
     """
 
     def __init__(self, cache_file):
@@ -49,7 +55,7 @@ class EngineCalibrator(trt.IInt8EntropyCalibrator2):
 
     def get_batch_size(self):
         """
-        Overrides from trt.IInt8EntropyCalibrator2.
+        Overrides from trt.IInt8Calibrator.
         Get the batch size to use for calibration.
         :return: Batch size.
         """
@@ -59,7 +65,7 @@ class EngineCalibrator(trt.IInt8EntropyCalibrator2):
 
     def get_batch(self, names):
         """
-        Overrides from trt.IInt8EntropyCalibrator2.
+        Overrides from trt.IInt8Calibrator.
         Get the next batch to use for calibration, as a list of device memory pointers.
         :param names: The names of the inputs, if useful to define the order of inputs.
         :return: A list of int-casted memory pointers.
@@ -83,7 +89,7 @@ class EngineCalibrator(trt.IInt8EntropyCalibrator2):
 
     def read_calibration_cache(self):
         """
-        Overrides from trt.IInt8EntropyCalibrator2.
+        Overrides from trt.IInt8Calibrator.
         Read the calibration cache file stored on disk, if it exists.
         :return: The contents of the cache file, if any.
         """
@@ -94,26 +100,101 @@ class EngineCalibrator(trt.IInt8EntropyCalibrator2):
 
     def write_calibration_cache(self, cache):
         """
-        Overrides from trt.IInt8EntropyCalibrator2.
+        Overrides from trt.IInt8Calibrator.
         Store the calibration cache to a file on disk.
         :param cache: The contents of the calibration cache to store.
         """
         if self.cache_file is None:
             return
+        os.makedirs(os.path.dirname(os.path.realpath(self.cache_file)), exist_ok=True)
         with open(self.cache_file, "wb") as f:
             log.info("Writing calibration cache data to: {}".format(self.cache_file))
             f.write(cache)
 
 
+class EngineCalibrator(_CalibratorBase, trt.IInt8EntropyCalibrator2):
+    """
+    Implements the INT8 Entropy Calibrator 2.
+    """
+
+
+class MinMaxCalibrator(_CalibratorBase, trt.IInt8MinMaxCalibrator):
+    """
+    Implements the INT8 MinMax Calibrator, the scale covers the full observed range of every tensor.
+    """
+
+
+class PercentileCalibrator(_CalibratorBase, trt.IInt8LegacyCalibrator):
+    """
+    Implements a percentile calibrator on top of the legacy calibrator: the scale of every tensor is clipped
+    at the given percentile of its observed absolute values, which ignores rare outliers.
+    """
+
+    def __init__(self, cache_file, percentile=99.99):
+        """
+        :param cache_file: The location of the cache file.
+        :param percentile: The percentile (0-100] of the activation histogram to clip at.
+        """
+        super().__init__(cache_file)
+        self.percentile = percentile
+
+    def get_quantile(self):
+        """
+        Overrides from trt.IInt8LegacyCalibrator.
+        """
+        return self.percentile / 100.0
+
+    def get_regression_cutoff(self):
+        """
+        Overrides from trt.IInt8LegacyCalibrator.
+        """
+        return 1.0
+
+    def read_histogram_cache(self, length):
+        """
+        Overrides from trt.IInt8LegacyCalibrator. The histograms are not cached, only the final scales are.
+        """
+        return None
+
+    def write_histogram_cache(self, data, length):
+        """
+        Overrides from trt.IInt8LegacyCalibrator.
+        """
+        return None
+
+
+CALIBRATORS = {
+    "entropy": EngineCalibrator,
+    "minmax": MinMaxCalibrator,
+    "percentile": PercentileCalibrator,
+}
+
+
+def create_calibrator(kind, cache_file, percentile=None):
+    """
+    :param kind: One of CALIBRATORS: 'entropy', 'minmax' or 'percentile'.
+    :param cache_file: The location of the cache file.
+    :param percentile: Only used by the percentile calibrator.
+    :return: The calibrator object.
+    """
+    if kind not in CALIBRATORS:
+        raise ValueError("Unknown calibrator {}, expected one of {}".format(kind, list(CALIBRATORS)))
+    if kind == "percentile":
+        return PercentileCalibrator(cache_file, DEFAULT_PERCENTILE if percentile is None else percentile)
+    return CALIBRATORS[kind](cache_file)
+
+
 class EngineBuilder:
     """
     Parses an ONNX graph and builds a TensorRT engine from it.
     """
 
-    def __init__(self, verbose=False, workspace=8):
+    def __init__(self, verbose=False, workspace=8, detailed_profile=False):
         """
         :param verbose: If enabled, a higher verbosity level will be set on the TensorRT logger.
         :param workspace: Max memory workspace to allow, in Gb.
+        :param detailed_profile: Keep detailed layer information (types, precisions, tactics) in the engine,
+        used by utils/inspect_engine.py for per-layer reports.
         """
         self.trt_logger = trt.Logger(trt.Logger.INFO)
         if verbose:
@@ -127,10 +208,34 @@ class EngineBuilder:
             trt.MemoryPoolType.WORKSPACE, workspace * (2**30)
         )
         # self.config.max_workspace_size = workspace * (2 ** 30)  # Deprecation
+        if detailed_profile:
+            self.config.profiling_verbosity = trt.ProfilingVerbosity.DETAILED
 
         self.batch_size = None
         self.network = None
         self.parser = None
+        self.onnx_path = None
+        self.onnx_source = None
+        self.optimized = False
+        self.digests = None
+        self.network_info = {}
+
+    def optimize_onnx(self, onnx_path):
+        """
+        Run the ONNX pre-optimization stage, reusing the cached result when the source file is unchanged.
+        Falls back to the original file if any pass fails, the parser will report real model errors.
+        :param onnx_path: The path to the ONNX graph to optimize.
+        :return: The path of the ONNX graph to parse.
+        """
+        from utils.onnx_opt import format_report, optimize_onnx
+
+        try:
+            path, report = optimize_onnx(onnx_path)
+        except Exception as e:
+            log.warning("ONNX optimization failed, parsing the original model: {}".format(e))
+            return onnx_path
+        print(format_report(report))
+        return str(path)
 
     def create_network(
         self, onnx_path, end2end, conf_thres, iou_thres, max_det, **kwargs
@@ -138,16 +243,54 @@ class EngineBuilder:
         """
         Parse the ONNX graph and create the corresponding TensorRT network definition.
         :param onnx_path: The path to the ONNX graph to load.
+        :param optimize: (kwarg, default True) Run the cached CPU optimization passes of utils/onnx_opt.py
+        (shape inference, constant folding, dead-node elimination, onnxsim) before parsing.
+        :param onnx_source: (kwarg, default None) The original ONNX model when onnx_path is already an optimized copy
+        of it (e.g. shared by the workers of utils/sweep.py), recorded in the metadata and used for the calibration
+        cache key and class names. None means onnx_path is the original model.
+        :param class_names: (kwarg, default None) The class names to record in the engine metadata, by default
+        they are read from the ONNX metadata ('names', as written by ultralytics).
+        :param pre_nms_topk: (kwarg, default None) For end2end, keep only the k boxes with the highest class score
+        before EfficientNMS (e.g. 1000 of the 8400 YOLOv8 candidates at 640), which cuts the NMS work.
+        :param fp16_outputs: (kwarg, default False) For end2end / v10, emit fp16 boxes and scores and int32 classes,
+        which halves the device to host copy. inference.BaseEngine converts them back to float32.
         """
         v8 = kwargs["v8"]
         v10 = kwargs["v10"]
         network_flags = 1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH)
         class_agnostic = not kwargs["no_class_agnostic"]
+        pre_nms_topk = kwargs.get("pre_nms_topk")
+        fp16_outputs = kwargs.get("fp16_outputs", False)
+        # 寫進 engine metadata 用，見 write_metadata
+        self.network_info = {
+            "end2end": bool(end2end),
+            "v8": bool(v8),
+            "v10": bool(v10),
+            "nms": None,
+            "class_names": kwargs.get("class_names"),
+            "input_sizes": None,
+        }
+        if end2end and not v10:
+            self.network_info["nms"] = {
+                "conf_thres": conf_thres,
+                "iou_thres": iou_thres,
+                "max_det": max_det,
+                "class_agnostic": class_agnostic,
+                "pre_nms_topk": pre_nms_topk,
+            }
 
         self.network = self.builder.create_network(network_flags)
         self.parser = trt.OnnxParser(self.network, self.trt_logger)
 
         onnx_path = os.path.realpath(onnx_path)
+        source = kwargs.get("onnx_source")
+        self.onnx_source = os.path.realpath(source) if source else onnx_path
+        self.optimized = self.onnx_source != onnx_path  # 傳入的已經是最佳化過的副本
+        if kwargs.get("optimize", True):
+            optimized = self.optimize_onnx(onnx_path)
+            self.optimized = self.optimized or optimized != onnx_path  # 失敗時回傳原檔
+            onnx_path = optimized
+        self.onnx_path = onnx_path
         with open(onnx_path, "rb") as f:
             if not self.parser.parse(f.read()):
                 print("Failed to load ONNX file: {}".format(onnx_path))
@@ -286,6 +429,8 @@ class EngineBuilder:
                     scores.get_output(0),
                     trt.ElementWiseOperation.PROD,
                 )
+            if pre_nms_topk:
+                boxes, scores = self.add_pre_nms_topk(boxes.get_output(0), scores.get_output(0), pre_nms_topk)
             """
             "plugin_version": "1",
             "background_class": -1,  # no background class
@@ -363,6 +508,56 @@ class EngineBuilder:
             for i in range(4):
                 self.network.mark_output(layer.get_output(i))
 
+        if fp16_outputs and (end2end or v10):
+            self.set_output_dtypes({"boxes": trt.float16, "scores": trt.float16, "classes": trt.int32})
+
+    def add_pre_nms_topk(self, boxes, scores, k):
+        """
+        Keep the k boxes whose best class score is highest, in front of EfficientNMS.
+        :param boxes: The [bs, N, 4] boxes tensor.
+        :param scores: The [bs, N, nc] class scores tensor.
+        :param k: The number of boxes to keep, at most MAX_TOPK.
+        :return: Two layers, whose first outputs are the [bs, k, 4] boxes and [bs, k, nc] scores.
+        """
+        num_boxes = boxes.shape[1]
+        if num_boxes > 0:
+            k = min(k, num_boxes)
+        if k > MAX_TOPK:
+            raise ValueError("pre_nms_topk {} is larger than the TopK limit {}".format(k, MAX_TOPK))
+        best = self.network.add_reduce(scores, trt.ReduceOperation.MAX, 1 << 2, False)  # [bs, N]
+        topk = self.network.add_topk(best.get_output(0), trt.TopKOperation.MAX, k, 1 << 1)
+        layers = []
+        for tensor in (boxes, scores):
+            gather = self.network.add_gather(tensor, topk.get_output(1), 1)
+            gather.num_elementwise_dims = 1  # batch 維度逐一對應：[bs, k] 的 index 取 [bs, N, c] -> [bs, k, c]
+            layers.append(gather)
+        print("Pre-NMS TopK: {} -> {} boxes".format(num_boxes, k))
+        return layers
+
+    def set_output_dtypes(self, dtypes):
+        """
+        Change the data type of network outputs. fp32 <-> fp16 is done by the output reformatting, other
+        conversions (e.g. the float YOLOv10 classes to int32) insert a cast layer.
+        :param dtypes: A {output name: trt.DataType} dict, names that are not outputs are ignored.
+        """
+        outputs = [self.network.get_output(i) for i in range(self.network.num_outputs)]
+        floats = (trt.float32, trt.float16)
+        for tensor in outputs:
+            dtype = dtypes.get(tensor.name)
+            if dtype is None or tensor.dtype == dtype:
+                continue
+            if tensor.dtype in floats and dtype in floats:
+                tensor.dtype = dtype
+                continue
+            name = tensor.name
+            self.network.unmark_output(tensor)
+            tensor.name = name + "_raw"
+            cast = self.network.add_identity(tensor)
+            cast.set_output_type(0, dtype)
+            cast.get_output(0).name = name
+            self.network.mark_output(cast.get_output(0))
+        print("Output dtypes: {}".format({n: str(d) for n, d in dtypes.items()}))
+
     def create_engine(
         self,
         engine_path,
@@ -371,24 +566,56 @@ class EngineBuilder:
         calib_cache=None,
         calib_num_images=5000,
         calib_batch_size=8,
+        timing_cache=None,
+        builder_opt_level=None,
+        tactic_sources=None,
+        sparsity=False,
+        calib_select="kcenter",
+        calibrator="entropy",
+        calib_cache_dir=CALIB_DIR,
+        calib_percentile=None,
+        layer_precisions=None,
+        refittable=False,
+        input_sizes=None,
     ):
         """
         Build the TensorRT engine and serialize it to disk.
         :param engine_path: The path where to serialize the engine to.
         :param precision: The datatype to use for the engine, either 'fp32', 'fp16' or 'int8'.
         :param calib_input: The path to a directory holding the calibration images.
-        :param calib_cache: The path where to write the calibration cache to, or if it already exists, load it from.
+        :param calib_cache: An explicit calibration cache file to write to, or if it already exists, load it from.
+        None (the default) keeps the cache in calib_cache_dir under a name keyed by the model, see resolve_calib_cache.
         :param calib_num_images: The maximum number of images to use for calibration.
         :param calib_batch_size: The batch size to use for the calibration process.
+        :param timing_cache: The path of a TensorRT timing cache file to reuse tactic timings from and update
+        after the build, or None to time every tactic again.
+        :param builder_opt_level: The builder optimization level (0-5), higher levels search more tactics and take
+        longer to build. None keeps the TensorRT default (3).
+        :param tactic_sources: The tactic sources to allow, as a list or a '+' separated string of
+        trt.TacticSource names (e.g. 'cublas+cudnn'), None or 'default' keeps the TensorRT default.
+        :param sparsity: Allow 2:4 structured sparsity kernels for layers whose weights are already sparse.
+        :param calib_select: How to pick calib_num_images out of a larger calibration folder, 'kcenter' / 'kmeans'
+        for a diverse subset (utils/calib_select.py) or None for the first files in name order.
+        :param calibrator: The INT8 calibrator, 'entropy' (IInt8EntropyCalibrator2), 'minmax' (IInt8MinMaxCalibrator)
+        or 'percentile' (IInt8LegacyCalibrator clipping at calib_percentile).
+        :param calib_cache_dir: The directory holding the keyed calibration caches.
+        :param calib_percentile: The percentile used by the 'percentile' calibrator, default 99.99.
+        :param layer_precisions: Per-layer precision overrides, a {layer name: 'fp32' / 'fp16'} dict or the path of
+        an overrides JSON written by utils/sensitivity.py, e.g. to keep the most quantization sensitive layers out
+        of INT8.
+        :param refittable: Build a refittable engine, whose weights can later be replaced from a retrained ONNX model
+        with the same topology by utils/refit.py instead of a full rebuild.
+        :param input_sizes: Square input sizes to build one optimization profile each for, e.g. [320, 480, 640],
+        see add_input_profiles. The ONNX input must have a dynamic H / W. None builds for the ONNX input shape.
         """
         engine_path = os.path.realpath(engine_path)
         engine_dir = os.path.dirname(engine_path)
         os.makedirs(engine_dir, exist_ok=True)
         print("Building {} Engine in {}".format(precision, engine_path))
         inputs = [self.network.get_input(i) for i in range(self.network.num_inputs)]
-
-        # TODO: Strict type is only needed If the per-layer precision overrides are used
-        # If a better method is found to deal with that issue, this flag can be removed.
+        calib_dims = None
+        if input_sizes:
+            calib_dims = self.add_input_profiles(input_sizes, calib_batch_size if precision == "int8" else None)
 
         if precision == "fp16":
             if not self.builder.platform_has_fast_fp16:
@@ -403,9 +630,16 @@ class EngineBuilder:
                     # Also enable fp16, as some layers may be even more efficient in fp16 than int8
                     self.config.set_flag(trt.BuilderFlag.FP16)
                 self.config.set_flag(trt.BuilderFlag.INT8)
-                self.config.int8_calibrator = EngineCalibrator(calib_cache)
-                if not os.path.exists(calib_cache):
-                    calib_shape = [calib_batch_size] + list(inputs[0].shape[1:])
+                calib_cache, reuse = self.resolve_calib_cache(
+                    inputs[0], calib_cache, calib_cache_dir, calibrator, calib_percentile, calib_dims
+                )
+                self.config.int8_calibrator = create_calibrator(calibrator, calib_cache, calib_percentile)
+                if not reuse:
+                    if not calib_input:
+                        raise ValueError(
+                            "No valid calibration cache at {}, --calib_input is required".format(calib_cache)
+                        )
+                    calib_shape = calib_dims or [calib_batch_size] + list(inputs[0].shape[1:])
                     calib_dtype = trt.nptype(inputs[0].dtype)
                     self.config.int8_calibrator.set_image_batcher(
                         ImageBatcher(
@@ -414,9 +648,20 @@ class EngineBuilder:
                             calib_dtype,
                             max_num_images=calib_num_images,
                             exact_batches=True,
+                            select=calib_select,
                         )
                     )
 
+        if layer_precisions:
+            self.set_layer_precisions(layer_precisions)
+        self.set_builder_options(builder_opt_level, tactic_sources, sparsity)
+        if refittable:
+            self.config.set_flag(trt.BuilderFlag.REFIT)
+        if timing_cache is not None:
+            self.set_timing_cache(timing_cache)
+        # 建置前先算好，寫 metadata 時出錯不會白白浪費建好的 engine
+        self.digests = self.onnx_digests()
+
         # with self.builder.build_engine(self.network, self.config) as engine, open(engine_path, "wb") as f:
         with (
             self.builder.build_serialized_network(self.network, self.config) as engine,
@@ -425,9 +670,285 @@ class EngineBuilder:
             print("Serializing engine to file: {:}".format(engine_path))
             f.write(engine)  # .serialize()
 
+        if timing_cache is not None:
+            self.save_timing_cache(timing_cache)
+        self.write_metadata(
+            engine_path,
+            {
+                "precision": precision,
+                "calibrator": calibrator if precision == "int8" else None,
+                "calib_select": calib_select if precision == "int8" else None,
+                "builder_opt_level": builder_opt_level,
+                "tactic_sources": tactic_sources,
+                "sparsity": sparsity,
+                "layer_precisions": str(layer_precisions)
+                if isinstance(layer_precisions, (str, os.PathLike))
+                else layer_precisions,
+                "refittable": bool(refittable),
+            },
+        )
+
+    def onnx_digests(self):
+        """
+        Hash the parsed ONNX graph for the engine metadata: the graph digest (utils/calib_cache.py) and the topology
+        digest that utils/refit.py checks. A digest that can't be computed is logged and recorded as None, which only
+        means the engine can't be refitted.
+        :return: A dict with the 'graph' and 'topology' digests.
+        """
+        from utils.calib_cache import graph_digest
+        from utils.refit import topology_digest
+
+        digests = {}
+        for key, fn in (("graph", graph_digest), ("topology", topology_digest)):
+            try:
+                digests[key] = fn(self.onnx_path)
+            except Exception as e:
+                log.warning("Could not compute the ONNX {} digest of {}: {}".format(key, self.onnx_path, e))
+                digests[key] = None
+        return digests
+
+    def write_metadata(self, engine_path, build):
+        """
+        Write the metadata file next to the engine (see utils/engine_meta.py), inference.BaseEngine configures the
+        preprocessing, output mapping and class names from it and checks it against the engine at load.
+        :param engine_path: The serialized engine path.
+        :param build: The build options to record.
+        """
+        from utils.engine_meta import (
+            META_VERSION,
+            input_layout,
+            meta_path,
+            onnx_class_names,
+            output_schema,
+            preprocess_spec,
+            write_meta,
+        )
+
+        def tensor(t):
+            return {"name": t.name, "shape": list(t.shape), "dtype": np.dtype(trt.nptype(t.dtype)).name}
+
+        inp = tensor(self.network.get_input(0))
+        inp["layout"] = input_layout(inp["shape"])
+        if self.network_info.get("input_sizes"):
+            inp["sizes"] = self.network_info["input_sizes"]  # profile i 對應 sizes[i]
+        outputs = [tensor(self.network.get_output(i)) for i in range(self.network.num_outputs)]
+        info = self.network_info
+        meta = {
+            "version": META_VERSION,
+            "input": inp,
+            "preprocess": preprocess_spec(inp["dtype"], inp["layout"]),
+            "outputs": output_schema(outputs, info.get("end2end"), info.get("v8"), info.get("v10")),
+            "nms": info.get("nms"),
+            "class_names": info.get("class_names") or onnx_class_names(self.onnx_source),
+            "build": {
+                **build,
+                "onnx": self.onnx_source,
+                **(self.digests or self.onnx_digests()),
+                "optimized": self.optimized,
+                "end2end": info.get("end2end"),
+                "v8": info.get("v8"),
+                "v10": info.get("v10"),
+                "tensorrt": trt.__version__,
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            },
+        }
+        write_meta(engine_path, meta)
+        log.info("Engine metadata written to: {}".format(meta_path(engine_path)))
+
+    def resolve_calib_cache(self, input, calib_cache, calib_cache_dir, calibrator, percentile=None, shape=None):
+        """
+        Pick the calibration cache file and decide whether it can be reused. The cache identity (ONNX graph hash,
+        input shape, network outputs, preprocessor and calibrator) is recorded in a .json next to the cache, a cache
+        whose identity doesn't match this build is never read. See utils/calib_cache.py.
+        :param input: The network input tensor.
+        :param calib_cache: An explicit cache file, or None to use the keyed file in calib_cache_dir.
+        :param calib_cache_dir: The directory holding the keyed calibration caches.
+        :param calibrator: The calibrator kind.
+        :param percentile: The percentile of the 'percentile' calibrator.
+        :param shape: The calibration input shape when the network input is dynamic, by default the input shape.
+        :return: A tuple (cache file, whether to reuse it instead of calibrating).
+        """
+        from utils.calib_cache import cache_path, calib_identity, resolve_cache, write_identity
+
+        outputs = [self.network.get_output(i).name for i in range(self.network.num_outputs)]
+        ident = calib_identity(
+            self.onnx_path, shape or input.shape, "fixed_shape_resizer", calibrator, percentile, outputs
+        )
+        keyed = cache_path(calib_cache_dir, self.onnx_source or self.onnx_path, ident)
+        # 明確指定的快取來源不符時不覆蓋，改寫到 key 對應的檔案
+        path, ok, checks = resolve_cache(calib_cache, keyed, ident)
+        for checked, reason in checks:
+            if reason == "unverified":
+                log.warning("Calibration cache {} has no identity record, using it as is".format(checked))
+            elif reason != "missing" and reason != "ok":
+                log.warning("Ignoring calibration cache {} ({})".format(checked, reason))
+        if ok:
+            log.info("Reusing calibration cache {}, calibration skipped".format(path))
+        else:
+            write_identity(path, ident)
+        return path, ok
+
+    def add_input_profiles(self, sizes, calib_batch_size=None):
+        """
+        Add one optimization profile per input size, with min = opt = max so every size gets tactics timed for
+        exactly its shape. Profile i serves sizes[i] (ascending), inference.BaseEngine switches between them at
+        runtime with set_input_size(), reusing the buffers allocated for the largest one.
+        The ONNX model must be exported with a dynamic H / W (e.g. ultralytics export dynamic=True).
+        :param sizes: The square input sizes, e.g. [320, 480, 640].
+        :param calib_batch_size: For INT8, also set a calibration profile at the largest size with this batch size.
+        :return: The calibration input shape, or None.
+        """
+        from utils.engine_meta import input_layout, parse_sizes, sized_shape
+
+        sizes = parse_sizes(sizes)
+        inp = self.network.get_input(0)
+        shape = list(inp.shape)
+        layout = input_layout(shape)
+        hw = shape[-3:-1] if layout.endswith("HWC") else shape[-2:]
+        if all(d > 0 for d in hw):
+            if sizes == [hw[0]] and hw[0] == hw[1]:
+                return None  # 靜態輸入本來就是這個大小
+            raise ValueError(
+                "Input '{}' has a static shape {}, export the ONNX model with a dynamic H / W "
+                "to build input sizes {}".format(inp.name, shape, sizes)
+            )
+        for size in sizes:
+            dims = sized_shape(shape, layout, size)
+            profile = self.builder.create_optimization_profile()
+            profile.set_shape(inp.name, dims, dims, dims)
+            self.config.add_optimization_profile(profile)
+            print("Optimization profile {}: {} {}".format(self.config.num_optimization_profiles - 1, inp.name, dims))
+        self.network_info["input_sizes"] = sizes
+
+        if calib_batch_size is None:
+            return None
+        # 校正用最大的輸入大小；batch 是靜態的就沿用，動態才用 calib_batch_size
+        dims = sized_shape(shape, layout, sizes[-1], calib_batch_size)
+        profile = self.builder.create_optimization_profile()
+        profile.set_shape(inp.name, dims, dims, dims)
+        self.config.set_calibration_profile(profile)
+        return dims
+
+    def describe_network(self):
+        """
+        :return: A list with the name, type and input / output tensor names of every network layer, in order.
+        """
+        layers = []
+        for i in range(self.network.num_layers):
+            layer = self.network.get_layer(i)
+            layers.append(
+                {
+                    "name": layer.name,
+                    "type": str(layer.type).split(".")[-1],
+                    "inputs": [
+                        layer.get_input(j).name for j in range(layer.num_inputs) if layer.get_input(j) is not None
+                    ],
+                    "outputs": [layer.get_output(j).name for j in range(layer.num_outputs)],
+                }
+            )
+        return layers
+
+    def mark_layer_outputs(self, names):
+        """
+        Mark the output tensors of the given layers as network outputs, so their activations can be read back
+        (used by utils/sensitivity.py). Note this keeps those layers from being fused with their consumers.
+        :param names: The layer names.
+        :return: The names of the newly marked tensors.
+        """
+        names = set(names)
+        existing = {self.network.get_output(i).name for i in range(self.network.num_outputs)}
+        marked = []
+        for i in range(self.network.num_layers):
+            layer = self.network.get_layer(i)
+            if layer.name not in names:
+                continue
+            for j in range(layer.num_outputs):
+                tensor = layer.get_output(j)
+                if tensor.name not in existing and tensor.dtype in (trt.float32, trt.float16):
+                    self.network.mark_output(tensor)
+                    marked.append(tensor.name)
+        return marked
+
+    def set_layer_precisions(self, overrides):
+        """
+        Pin layers to a precision, the rest of the network keeps the builder precision flags.
+        :param overrides: A {layer name: 'fp32' / 'fp16'} dict, or the path of an overrides JSON.
+        """
+        from utils.sensitivity import load_overrides
+
+        if not isinstance(overrides, dict):
+            overrides = load_overrides(overrides, self.onnx_source)
+        dtypes = {"fp32": trt.float32, "fp16": trt.float16}
+        found = 0
+        for i in range(self.network.num_layers):
+            layer = self.network.get_layer(i)
+            precision = overrides.get(layer.name)
+            if precision is None:
+                continue
+            layer.precision = dtypes[precision]
+            for j in range(layer.num_outputs):
+                if layer.get_output(j).dtype in (trt.float32, trt.float16):
+                    layer.set_output_type(j, dtypes[precision])
+            found += 1
+        if found < len(overrides):
+            log.warning(
+                "{} of {} layer precision overrides match no layer".format(len(overrides) - found, len(overrides))
+            )
+        # PREFER：無法滿足的層（例如沒有對應精度的 kernel）退回預設而不是建置失敗
+        self.config.set_flag(trt.BuilderFlag.PREFER_PRECISION_CONSTRAINTS)
+        log.info("Pinned {} layers: {}".format(found, dict(sorted(overrides.items()))))
+
+    def set_builder_options(self, builder_opt_level=None, tactic_sources=None, sparsity=False):
+        """
+        Apply the optional builder options explored by utils/autotune.py, see create_engine for the parameters.
+        """
+        if builder_opt_level is not None:
+            self.config.builder_optimization_level = int(builder_opt_level)
+        if isinstance(tactic_sources, str):
+            tactic_sources = None if tactic_sources == "default" else tactic_sources.split("+")
+        if tactic_sources is not None:
+            mask = 0
+            for name in tactic_sources:
+                mask |= 1 << int(getattr(trt.TacticSource, name.upper()))
+            self.config.set_tactic_sources(mask)
+        if sparsity:
+            self.config.set_flag(trt.BuilderFlag.SPARSE_WEIGHTS)
+
+    def set_timing_cache(self, path):
+        """
+        Load the timing cache file, if it exists, so already measured tactics are not timed again.
+        :param path: The timing cache file.
+        """
+        data = b""
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            log.info("Using timing cache: {}".format(path))
+        cache = self.config.create_timing_cache(data)
+        self.config.set_timing_cache(cache, ignore_mismatch=False)
+
+    def save_timing_cache(self, path):
+        """
+        Merge this build's timings into the timing cache file. The file is replaced atomically, several
+        builds (e.g. utils/sweep.py) can share one file; at worst one build's new entries are lost.
+        :param path: The timing cache file.
+        """
+        cache = self.config.get_timing_cache()
+        if cache is None:
+            return
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                cache.combine(self.config.create_timing_cache(f.read()), ignore_mismatch=True)
+        os.makedirs(os.path.dirname(os.path.realpath(path)), exist_ok=True)
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(memoryview(cache.serialize()))
+        os.replace(tmp, path)
+        log.info("Timing cache written to: {}".format(path))
+
 
 def main(args):
-    builder = EngineBuilder(args.verbose, args.workspace)
+    builder = EngineBuilder(args.verbose, args.workspace, args.detailed_profile)
     builder.create_network(
         args.onnx,
         args.end2end,
@@ -437,6 +958,10 @@ def main(args):
         v8=args.v8,
         v10=args.v10,
         no_class_agnostic=args.no_class_agnostic,
+        optimize=not args.no_optimize,
+        class_names=parse_class_names(args.class_names),
+        pre_nms_topk=args.pre_nms_topk,
+        fp16_outputs=args.fp16_outputs,
     )
     builder.create_engine(
         args.engine,
@@ -445,6 +970,17 @@ def main(args):
         args.calib_cache,
         args.calib_num_images,
         args.calib_batch_size,
+        args.timing_cache,
+        args.builder_opt_level,
+        args.tactic_sources,
+        args.sparsity,
+        None if args.calib_select == "none" else args.calib_select,
+        args.calibrator,
+        args.calib_cache_dir,
+        args.calib_percentile,
+        args.layer_precisions,
+        args.refittable,
+        parse_sizes(args.input_sizes),
     )
 
 
@@ -455,7 +991,7 @@ def onnx_to_trt(
     verbose: bool = False,
     workspace: int = 2,
     calib_input: str = None,
-    calib_cache: str = "./calibration.cache",
+    calib_cache: str = None,
     calib_num_images: int = 5000,
     calib_batch_size: int = 8,
     end2end: bool = False,
@@ -465,8 +1001,25 @@ def onnx_to_trt(
     v8: bool = False,
     v10: bool = False,
     no_class_agnostic: bool = False,
+    detailed_profile: bool = False,
+    optimize: bool = True,
+    timing_cache: str = None,
+    builder_opt_level: int = None,
+    tactic_sources=None,
+    sparsity: bool = False,
+    calib_select: str = "kcenter",
+    calibrator: str = "entropy",
+    calib_cache_dir: str = str(CALIB_DIR),
+    calib_percentile: float = None,
+    layer_precisions=None,
+    class_names=None,
+    refittable: bool = False,
+    pre_nms_topk: int = None,
+    fp16_outputs: bool = False,
+    input_sizes=None,
+    onnx_source: str = None,
 ):
-    b = EngineBuilder(verbose=verbose, workspace=workspace)
+    b = EngineBuilder(verbose=verbose, workspace=workspace, detailed_profile=detailed_profile)
     b.create_network(
         onnx_path,
         end2end,
@@ -476,6 +1029,11 @@ def onnx_to_trt(
         v8=v8,
         v10=v10,
         no_class_agnostic=no_class_agnostic,
+        optimize=optimize,
+        onnx_source=onnx_source,
+        class_names=class_names,
+        pre_nms_topk=pre_nms_topk,
+        fp16_outputs=fp16_outputs,
     )
     b.create_engine(
         engine_path,
@@ -484,6 +1042,17 @@ def onnx_to_trt(
         calib_cache,
         calib_num_images,
         calib_batch_size,
+        timing_cache,
+        builder_opt_level,
+        tactic_sources,
+        sparsity,
+        calib_select,
+        calibrator,
+        calib_cache_dir,
+        calib_percentile,
+        layer_precisions,
+        refittable,
+        input_sizes,
     )
 
 
@@ -513,8 +1082,27 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--calib_cache",
-        default="./calibration.cache",
-        help="The file path for INT8 calibration cache to use, default: ./calibration.cache",
+        default=None,
+        help="An explicit INT8 calibration cache file to use, default: a cache keyed by model, input shape, "
+        "preprocessor and calibrator in --calib_cache_dir",
+    )
+    parser.add_argument(
+        "--calib_cache_dir",
+        default=str(CALIB_DIR),
+        help="The directory holding keyed INT8 calibration caches, default: {}".format(CALIB_DIR),
+    )
+    parser.add_argument(
+        "--calibrator",
+        default="entropy",
+        choices=list(CALIBRATORS),
+        help="The INT8 calibrator: entropy (IInt8EntropyCalibrator2), minmax (IInt8MinMaxCalibrator) or "
+        "percentile (IInt8LegacyCalibrator clipping at --calib_percentile), default: entropy",
+    )
+    parser.add_argument(
+        "--calib_percentile",
+        default=DEFAULT_PERCENTILE,
+        type=float,
+        help="The percentile for --calibrator percentile, default: {}".format(DEFAULT_PERCENTILE),
     )
     parser.add_argument(
         "--calib_num_images",
@@ -570,6 +1158,86 @@ if __name__ == "__main__":
         action="store_true",
         help="Disable class-agnostic NMS (default: enabled)",
     )
+    parser.add_argument(
+        "--detailed_profile",
+        default=False,
+        action="store_true",
+        help="Keep detailed layer information for utils/inspect_engine.py, default: False",
+    )
+    parser.add_argument(
+        "--no_optimize",
+        default=False,
+        action="store_true",
+        help="Parse the ONNX file as is, skipping the cached optimization passes (utils/onnx_opt.py)",
+    )
+    parser.add_argument(
+        "--timing_cache",
+        default=None,
+        help="TensorRT timing cache file to reuse and update, default: None",
+    )
+    parser.add_argument(
+        "--builder_opt_level",
+        default=None,
+        type=int,
+        choices=range(6),
+        help="Builder optimization level 0-5, default: TensorRT default (3)",
+    )
+    parser.add_argument(
+        "--tactic_sources",
+        default=None,
+        help="'+' separated tactic sources to allow, e.g. 'cublas+cudnn', default: TensorRT default",
+    )
+    parser.add_argument(
+        "--sparsity",
+        default=False,
+        action="store_true",
+        help="Enable 2:4 structured sparsity kernels, default: False",
+    )
+    parser.add_argument(
+        "--calib_select",
+        default="kcenter",
+        choices=["none", "kcenter", "kmeans"],
+        help="How to pick --calib_num_images out of a larger folder: a diverse subset by image descriptors "
+        "(kcenter / kmeans, see utils/calib_select.py) or the first files by name (none), default: kcenter",
+    )
+    parser.add_argument(
+        "--layer_precisions",
+        default=None,
+        help="Per-layer precision overrides JSON written by utils/sensitivity.py, default: None",
+    )
+    parser.add_argument(
+        "--pre_nms_topk",
+        default=None,
+        type=int,
+        help="For --end2end, keep only the top-k boxes by class score before NMS (max {}), default: all".format(
+            MAX_TOPK
+        ),
+    )
+    parser.add_argument(
+        "--fp16_outputs",
+        default=False,
+        action="store_true",
+        help="For --end2end / --v10, emit fp16 boxes and scores and int32 classes, default: False",
+    )
+    parser.add_argument(
+        "--refittable",
+        default=False,
+        action="store_true",
+        help="Build a refittable engine, weights can then be updated with utils/refit.py, default: False",
+    )
+    parser.add_argument(
+        "--input_sizes",
+        default=None,
+        help="Comma separated square input sizes to build one optimization profile each for, e.g. 320,480,640, "
+        "the runtime switches between them without a rebuild. Needs an ONNX model with a dynamic H / W, "
+        "default: the ONNX input shape",
+    )
+    parser.add_argument(
+        "--class_names",
+        default=None,
+        help="Class names for the engine metadata, comma separated or a text file with one name per line, "
+        "default: the 'names' in the ONNX metadata",
+    )
     args = parser.parse_args()
     print(args)
     if not all([args.onnx, args.engine]):
@@ -577,8 +1245,9 @@ if __name__ == "__main__":
         log.error("These arguments are required: --onnx and --engine")
         sys.exit(1)
     if args.precision == "int8" and not (
-        args.calib_input or os.path.exists(args.calib_cache)
+        args.calib_input or args.calib_cache is None or os.path.exists(args.calib_cache)
     ):
+        # calib_cache 為 None 時要等解析完網路才知道 --calib_cache_dir 裡有沒有對應的快取
         parser.print_help()
         log.error(
             "When building in int8 precision, --calib_input or an existing --calib_cache file is required"
@@ -0,0 +1,441 @@
+# ./utils/frame_source.py
+"""
+擷取來源抽象層。
+
+每個來源的 grab() 都回傳 (frame, capture_ts, seq)：
+    frame:      (H, W, 4) uint8 BGRA，屬於來源自己的緩衝區，只保證到下一次 grab 前有效
+    capture_ts: time.perf_counter() 的擷取時間
+    seq:        單調遞增的幀序號（從 1 開始）
+若傳入 out，畫面會寫進呼叫端提供的緩衝區而不是回傳來源內部的 view。
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+Frame = Tuple[Optional[np.ndarray], float, int]
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameSource:
+    """擷取來源的共同介面。"""
+
+    name = "base"
+
+    def __init__(self, region: Tuple[int, int, int, int]):
+        self.region = tuple(int(v) for v in region)
+        left, top, right, bottom = self.region
+        self.width = right - left
+        self.height = bottom - top
+        self.shape = (self.height, self.width, 4)
+        self._seq = 0
+        self._capturing = False
+
+    @property
+    def is_capturing(self) -> bool:
+        return self._capturing
+
+    def start(self):
+        self._capturing = True
+
+    def stop(self):
+        self._capturing = False
+
+    def release(self):
+        self.stop()
+
+    def grab(self, out: np.ndarray | None = None) -> Frame:
+        raise NotImplementedError
+
+    def _stamp(self, frame: np.ndarray | None, out: np.ndarray | None) -> Frame:
+        ts = time.perf_counter()
+        if frame is None:
+            return None, ts, self._seq
+        if out is not None:
+            np.copyto(out, frame)
+            frame = out
+        self._seq += 1
+        return frame, ts, self._seq
+
+
+class DXCamSource(FrameSource):
+    """包裝已建立好的 dxcam.DXCamera（hook 由 Main._rework_dxc 處理）。"""
+
+    name = "dxcam"
+
+    def __init__(self, camera, region, target_fps: int = 240):
+        super().__init__(region)
+        self.camera = camera
+        self.target_fps = target_fps
+
+    @property
+    def is_capturing(self) -> bool:
+        return bool(self.camera is not None and self.camera.is_capturing)
+
+    def start(self):
+        self.camera.start(region=self.region, target_fps=self.target_fps)
+
+    def stop(self):
+        if self.camera is not None and self.camera.is_capturing:
+            self.camera.stop()
+
+    def release(self):
+        if self.camera is None:
+            return
+        self.stop()
+        self.camera.release()
+        self.camera.__del__()
+        self.camera = None
+
+    def grab(self, out=None) -> Frame:
+        # dxcam 回傳的是自己 ring buffer 內的 frame，不需再複製
+        return self._stamp(self.camera.get_latest_frame(), out)
+
+
+class MSSSource(FrameSource):
+    """mss 擷取；mss 物件綁定建立它的執行緒，所以在 start() 才建立。"""
+
+    name = "mss"
+
+    def __init__(self, region):
+        super().__init__(region)
+        self._sct = None
+
+    def start(self):
+        from mss import mss
+
+        if self._sct is None:
+            self._sct = mss()
+        super().start()
+
+    def stop(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+        super().stop()
+
+    def grab(self, out=None) -> Frame:
+        shot = self._sct.grab(self.region)
+        # 直接 view ScreenShot.raw（bytearray），不經過 np.asarray 的複製
+        frame = np.frombuffer(shot.raw, dtype=np.uint8).reshape(
+            shot.height, shot.width, 4
+        )
+        return self._stamp(frame, out)
+
+
+class ReplaySource(FrameSource):
+    """
+    從影片檔或圖片資料夾重播畫面，用於無螢幕環境下的測試與 benchmark。
+    解碼後的畫面會快取成 memory-mapped 檔案，之後的執行直接 mmap 不需重新解碼。
+    fps <= 0 表示不限速。
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        path: str,
+        region,
+        fps: float = 0,
+        loop: bool = True,
+        cache_dir: str | Path = "./cache/replay",
+    ):
+        super().__init__(region)
+        self.path = Path(path)
+        self.fps = float(fps or 0)
+        self.loop = loop
+        self.cache_dir = Path(cache_dir)
+        self.exhausted = False
+        self._frames: np.memmap | None = None
+        self._index = 0
+        self._next_ts = 0.0
+
+        if not self.path.exists():
+            raise FileNotFoundError(f"Replay source not found: {self.path}")
+
+    def __len__(self) -> int:
+        return 0 if self._frames is None else len(self._frames)
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def start(self):
+        if self._frames is None:
+            self._frames = self._open_cache()
+        self.rewind()
+        super().start()
+
+    def rewind(self):
+        self._index = 0
+        self._seq = 0
+        self.exhausted = False
+        self._next_ts = time.perf_counter()
+
+    def grab(self, out=None) -> Frame:
+        if self._index >= len(self._frames):
+            if not self.loop:
+                self.exhausted = True
+                return self._stamp(None, out)
+            self._index = 0
+
+        if self.fps > 0:
+            # 固定速率：依排程時間等待，落後時不補幀
+            now = time.perf_counter()
+            if now < self._next_ts:
+                time.sleep(self._next_ts - now)
+            self._next_ts = max(self._next_ts, now) + 1.0 / self.fps
+
+        frame = self._frames[self._index]
+        self._index += 1
+        return self._stamp(frame, out)
+
+    # -------- 快取 --------
+    def _cache_key(self) -> str:
+        st = self.path.stat()
+        if self.path.is_dir():
+            # 資料夾以內容清單 + 各檔 mtime 當 key
+            parts = [
+                f"{p.name}:{p.stat().st_mtime_ns}:{p.stat().st_size}"
+                for p in self._image_files()
+            ]
+        else:
+            parts = [f"{st.st_mtime_ns}:{st.st_size}"]
+        raw = "|".join([str(self.path.resolve()), *parts, f"{self.height}x{self.width}", "u8-bgra"])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _open_cache(self) -> np.memmap:
+        key = self._cache_key()
+        data_path = self.cache_dir / f"{key}.bin"
+        meta_path = self.cache_dir / f"{key}.json"
+
+        if not (data_path.exists() and meta_path.exists()):
+            self._build_cache(data_path, meta_path)
+
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        shape = (meta["count"], meta["height"], meta["width"], 4)
+        return np.memmap(data_path, dtype=np.uint8, mode="r", shape=shape)
+
+    def _build_cache(self, data_path: Path, meta_path: Path):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = data_path.with_suffix(".tmp")
+        count = 0
+        with open(tmp, "wb") as f:
+            for img in self._decode():
+                f.write(self._fit(img).tobytes())
+                count += 1
+        if count == 0:
+            os.remove(tmp)
+            raise ValueError(f"No frames decoded from {self.path}")
+        os.replace(tmp, data_path)
+        meta = {
+            "source": str(self.path.resolve()),
+            "count": count,
+            "height": self.height,
+            "width": self.width,
+        }
+        meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    def _image_files(self) -> list[Path]:
+        return sorted(
+            p for p in self.path.iterdir()
+            if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+        )
+
+    def _decode(self):
+        import cv2
+
+        if self.path.is_dir():
+            for p in self._image_files():
+                img = cv2.imread(str(p), cv2.IMREAD_UNCHANGED)
+                if img is not None:
+                    yield img
+            return
+
+        cap = cv2.VideoCapture(str(self.path))
+        try:
+            while True:
+                ok, img = cap.read()
+                if not ok:
+                    break
+                yield img
+        finally:
+            cap.release()
+
+    def _fit(self, img: np.ndarray) -> np.ndarray:
+        """轉成 uint8 BGRA 並取中央區域（與螢幕擷取中央 box 一致），太小則縮放。"""
+        import cv2
+
+        if img.dtype == np.uint16:
+            img = (img >> 8).astype(np.uint8)  # 16-bit PNG（IMREAD_UNCHANGED 保留原本的位元深度）
+        elif img.dtype != np.uint8:
+            raise ValueError(f"Unsupported image dtype for replay: {img.dtype}")
+
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+        elif img.shape[2] == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+
+        h, w = img.shape[:2]
+        if h >= self.height and w >= self.width:
+            top = (h - self.height) // 2
+            left = (w - self.width) // 2
+            img = img[top : top + self.height, left : left + self.width]
+        else:
+            img = cv2.resize(img, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(img)
+
+
+class CaptureThread(FrameSource):
+    """
+    把任一 FrameSource 放到獨立的 producer 執行緒上，讓擷取與推論重疊。
+
+    producer 寫進 slots 個預先配置的 buffer（至少 3 個：一個給消費端讀、一個是最新幀、
+    其餘給 producer 寫），消費端的 grab() 只拿「最新一幀」；
+    還沒被取走就被新畫面蓋掉的幀計入 dropped。
+    grab() 回傳的 buffer 在下一次 grab() 前不會被 producer 覆寫。
+    """
+
+    name = "thread"
+    idle_wait = 0.001  # s，來源暫時沒有畫面時的等待時間
+
+    def __init__(self, source: FrameSource, slots: int = 3, timeout: float = 1.0):
+        if slots < 3:
+            raise ValueError("CaptureThread needs at least 3 slots")
+        super().__init__(source.region)
+        self.source = source
+        self.timeout = timeout
+        self._buffers = [np.empty(source.shape, dtype=np.uint8) for _ in range(slots)]
+        self._cond = threading.Condition()
+        self._latest = -1  # 最新完成的 slot
+        self._reading = -1  # 消費端持有的 slot
+        self._fresh = False  # 最新幀是否尚未被取走
+        self._latest_ts = 0.0
+        self._latest_seq = 0
+        self._stop_evt = threading.Event()
+        self._started = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.error: Exception | None = None
+
+        self.produced = 0
+        self.consumed = 0
+        self.dropped = 0
+
+    @property
+    def is_capturing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(getattr(self.source, "exhausted", False)) and not self._fresh
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "produced": self.produced,
+                "consumed": self.consumed,
+                "dropped": self.dropped,
+            }
+
+    def start(self):
+        if self.is_capturing:
+            return
+        self._stop_evt.clear()
+        self._started.clear()
+        self.error = None
+        with self._cond:
+            self._latest = self._reading = -1
+            self._fresh = False
+            self.produced = self.consumed = self.dropped = 0
+        self._thread = threading.Thread(
+            target=self._run, name=f"Capture-{self.source.name}", daemon=True
+        )
+        self._thread.start()
+        # source.start() 在 producer 執行緒內執行（mss 需要），等它完成再回傳
+        self._started.wait(timeout=5.0)
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self._stop_evt.set()
+        with self._cond:
+            self._cond.notify_all()
+        t = self._thread
+        if t is not None and t is not threading.current_thread():
+            t.join(timeout=2.0)
+        self._thread = None
+
+    def release(self):
+        self.stop()
+        self.source.release()
+
+    def _run(self):
+        try:
+            self.source.start()
+        except Exception as e:
+            self.error = e
+            self._started.set()
+            return
+        self._started.set()
+
+        n = len(self._buffers)
+        try:
+            while not self._stop_evt.is_set():
+                with self._cond:
+                    # 消費端只會把 _reading 換成 _latest，所以這個 slot 在寫入期間是安全的
+                    slot = next(
+                        i for i in range(n) if i != self._latest and i != self._reading
+                    )
+                frame, ts, seq = self.source.grab(out=self._buffers[slot])
+                if frame is None:
+                    if getattr(self.source, "exhausted", False):
+                        break
+                    # 來源還沒有新畫面（mss 第一幀前、限速的 replay）：稍等再試，不要空轉佔滿一個核心
+                    self._stop_evt.wait(self.idle_wait)
+                    continue
+                with self._cond:
+                    if self._fresh:
+                        self.dropped += 1
+                    self._latest = slot
+                    self._latest_ts = ts
+                    self._latest_seq = seq
+                    self._fresh = True
+                    self.produced += 1
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.source.stop()
+            with self._cond:
+                self._cond.notify_all()
+
+    def grab(self, out=None) -> Frame:
+        with self._cond:
+            if not self._fresh:
+                self._cond.wait_for(
+                    lambda: self._fresh
+                    or self._stop_evt.is_set()
+                    or not self.is_capturing,
+                    timeout=self.timeout,
+                )
+            if not self._fresh:
+                if self.error is not None:
+                    raise self.error
+                return None, time.perf_counter(), self._latest_seq
+            self._reading = self._latest
+            self._fresh = False
+            self.consumed += 1
+            frame = self._buffers[self._reading]
+            ts, seq = self._latest_ts, self._latest_seq
+        if out is not None:
+            np.copyto(out, frame)
+            frame = out
+        return frame, ts, seq
@@ -35,6 +35,7 @@ class ImageBatcher:
         max_num_images=None,
         exact_batches=False,
         preprocessor="fixed_shape_resizer",
+        select=None,
     ):
         """
         :param input: The input directory to read images from.
@@ -45,6 +46,8 @@ class ImageBatcher:
         size. If false, it will pad the final batch with zeros to reach the batch size. If true, it will *remove* the
         last few images in excess of a batch size multiple, to guarantee batches are exact (useful for calibration).
         :param preprocessor: Set the preprocessor to use, depending on which network is being used.
+        :param select: How to choose max_num_images out of a larger folder: None takes the first ones in filename
+        order, 'kcenter' or 'kmeans' picks a diverse subset by image descriptors (see utils/calib_select.py).
         """
         # Find images in the given input path
         input = os.path.realpath(input)
@@ -94,6 +97,13 @@ class ImageBatcher:
         # Adapt the number of images as needed
         if max_num_images and 0 < max_num_images < len(self.images):
             self.num_images = max_num_images
+        if select and self.num_images < len(self.images):
+            from utils.calib_select import select_subset
+
+            # 依特徵挑出差異最大的子集；讀不到的圖會被略過，所以數量可能變少
+            self.images = select_subset(self.images, self.num_images, method=select)
+            self.num_images = len(self.images)
+            print("Selected {} calibration images by {}".format(self.num_images, select))
         if exact_batches:
             self.num_images = self.batch_size * (self.num_images // self.batch_size)
         if self.num_images < 1:
@@ -0,0 +1,149 @@
+# ./utils/inspect_engine.py
+"""
+engine 逐層耗時報告：以 IProfiler 跑 N 次推論，寫出錄製的 profile（JSON）並印出排序表格，
+可以再跟另一個 engine（或錄好的 JSON）比較，例如 fp16 vs int8、有無 EfficientNMS。
+
+    python -m utils.inspect_engine models/fp16.trt --json logs/fp16.json
+    python -m utils.inspect_engine models/int8.trt --diff logs/fp16.json
+    python -m utils.inspect_engine models/new.trt --onnx models/best.onnx --precision fp16 --end2end --v8
+
+引擎需以 --detailed_profile（utils/export.py）建置才有層類型與精度；
+否則只有層名稱，耗時一樣可以量測。統計與比較見 utils/profiling.py。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import tensorrt as trt
+
+from utils.profiling import aggregate, diff, format_diff, format_table, load_profile, save_profile
+
+
+class LayerProfiler(trt.IProfiler):
+    """收集每次執行各層的耗時；report_layer_time 在每次推論同步後由 TensorRT 依執行順序呼叫。"""
+
+    def __init__(self):
+        super().__init__()
+        self.layers: dict[str, list[float]] = {}
+
+    def report_layer_time(self, layer_name, ms):
+        self.layers.setdefault(layer_name, []).append(float(ms))
+
+
+def _precision(outputs) -> str:
+    # DETAILED 的格式字串像 "Half format NCHW" / "Int8 NC/32HW32" / "Float ..."
+    fmt = str((outputs or [{}])[0].get("Format/Datatype", ""))
+    for key, name in (("Int8", "int8"), ("Half", "fp16"), ("Float", "fp32"), ("Int32", "int32"), ("Bool", "bool")):
+        if key in fmt:
+            return name
+    return ""
+
+
+def layer_info(engine) -> dict[str, dict]:
+    """用 IEngineInspector 讀取各層類型與輸出精度；非 DETAILED 建置的 engine 只會有名稱。"""
+    inspector = engine.create_engine_inspector()
+    data = json.loads(inspector.get_engine_information(trt.LayerInformationFormat.JSON))
+    info: dict[str, dict] = {}
+    for layer in data.get("Layers", []):
+        if isinstance(layer, str):
+            info[layer] = {}
+            continue
+        info[layer.get("Name", "")] = {
+            "type": layer.get("LayerType", ""),
+            "precision": _precision(layer.get("Outputs")),
+            "tactic": layer.get("TacticName", ""),
+        }
+    return info
+
+
+def profile_engine(engine_path: str, iterations: int = 200, warmup: int = 20) -> dict:
+    """載入 engine，先跑 warmup 次不計時，再掛上 IProfiler 跑 iterations 次；回傳錄製的 profile。"""
+    from inference import BaseEngine
+
+    eng = BaseEngine(engine_path)
+    try:
+        spec = eng.inputs[0]
+        rng = np.random.default_rng(0)
+        inp = rng.random(spec["shape"], dtype=np.float32).astype(spec["dtype"])
+        for _ in range(warmup):
+            eng.infer(inp)
+
+        profiler = LayerProfiler()
+        eng.context.profiler = profiler
+        for _ in range(iterations):
+            eng.infer(inp)
+        eng.context.profiler = None
+
+        return {
+            "engine": os.path.realpath(engine_path),
+            "iterations": iterations,
+            "layers": profiler.layers,
+            "info": layer_info(eng.engine),
+        }
+    finally:
+        eng.close()
+
+
+def build_engine(opt):
+    """以 DETAILED profiling verbosity 從 ONNX 建置 engine（參數同 utils/export.py）。"""
+    from utils.export import onnx_to_trt
+
+    onnx_to_trt(
+        opt.onnx,
+        opt.engine,
+        precision=opt.precision,
+        workspace=opt.workspace,
+        calib_input=opt.calib_input,
+        calib_cache=opt.calib_cache,
+        end2end=opt.end2end,
+        v8=opt.v8,
+        v10=opt.v10,
+        detailed_profile=True,
+    )
+
+
+def _load(path: str, opt) -> dict:
+    if path.endswith(".json"):
+        return load_profile(path)
+    return profile_engine(path, opt.iters, opt.warmup)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-layer TensorRT engine profile")
+    parser.add_argument("engine", help="engine to profile (or a recorded profile .json)")
+    parser.add_argument("--diff", default=None, help="baseline engine or recorded .json to compare against")
+    parser.add_argument("--iters", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--json", default=None, help="write the recorded profile of ENGINE here")
+    parser.add_argument("--top", type=int, default=30)
+    build = parser.add_argument_group("build ENGINE from ONNX first")
+    build.add_argument("--onnx", default=None)
+    build.add_argument("-p", "--precision", default="fp16", choices=["fp32", "fp16", "int8"])
+    build.add_argument("-w", "--workspace", type=int, default=1)
+    build.add_argument("--calib_input", default=None)
+    build.add_argument("--calib_cache", default=None)
+    build.add_argument("--end2end", action="store_true")
+    build.add_argument("--v8", action="store_true")
+    build.add_argument("--v10", action="store_true")
+    opt = parser.parse_args()
+
+    if opt.onnx:
+        build_engine(opt)
+    elif not os.path.exists(opt.engine):
+        parser.exit(1, f"{opt.engine} not found\n")
+
+    profile = _load(opt.engine, opt)
+    if opt.json:
+        save_profile(profile, opt.json)
+        print(f"profile written to {opt.json}", file=sys.stderr)
+
+    report = aggregate(profile)
+    if opt.diff is None:
+        print(format_table(report, opt.top))
+    else:
+        # 基準放在 A，方便看「新 engine 比舊的快 / 慢多少」
+        print(format_diff(diff(aggregate(_load(opt.diff, opt)), report), opt.top))
@@ -0,0 +1,133 @@
+# ./utils/lifecycle.py
+"""
+Main 的生命週期狀態機。狀態轉換集中在這裡，等待一律用 Condition（不再輪詢旗標）。
+
+    INIT ──init_all──▶ READY ──start──▶ RUNNING ──stop──▶ DRAINING ──cleanup──▶ STOPPED
+    RUNNING ──例外──▶ FAILED；DRAINING ──stop 逾時──▶ FAILED
+    STOPPED / FAILED ──start──▶ RUNNING   （engine、緩衝區、擷取來源保留，不重新建立）
+    READY / STOPPED / FAILED ──cleanup(pause=False)──▶ INIT   （元件全部釋放，要再 init_all）
+
+    lc = Lifecycle()
+    lc.to(State.READY)
+    lc.to(State.RUNNING)                    # 開始計時 restart-to-first-frame
+    lc.mark_first_frame()                   # 第一幀處理完成，回傳耗時（ms）
+    lc.wait_for(State.STOPPED, timeout=5)   # 其他執行緒等待停止
+"""
+from __future__ import annotations
+
+import threading
+import time
+from enum import Enum
+from typing import Callable
+
+
+class State(str, Enum):
+    INIT = "init"
+    READY = "ready"
+    RUNNING = "running"
+    DRAINING = "draining"
+    STOPPED = "stopped"
+    FAILED = "failed"
+
+
+TRANSITIONS: dict[State, frozenset[State]] = {
+    State.INIT: frozenset({State.READY, State.FAILED}),
+    State.READY: frozenset({State.RUNNING, State.FAILED, State.INIT}),
+    State.RUNNING: frozenset({State.DRAINING, State.FAILED}),
+    State.DRAINING: frozenset({State.STOPPED, State.FAILED}),
+    State.STOPPED: frozenset({State.RUNNING, State.FAILED, State.INIT}),
+    State.FAILED: frozenset({State.RUNNING, State.INIT, State.READY}),
+}
+
+
+class TransitionError(RuntimeError):
+    pass
+
+
+class Lifecycle:
+    """
+    執行緒安全的狀態機。to() 檢查轉換是否合法並喚醒所有 wait_for()；
+    on_change(old, new) 在鎖外呼叫，可以安全地寫 log / 發 signal。
+    """
+
+    def __init__(self, on_change: Callable[[State, State], None] | None = None):
+        self._state = State.INIT
+        self._cond = threading.Condition()
+        self.on_change = on_change
+        self.error: BaseException | None = None
+        self.failed_from: State | None = None  # 進入 FAILED 前的狀態（INIT = 初始化失敗）
+        self.starts = 0
+        self._t_start: float | None = None
+        self.first_frame_ms: float | None = None  # 最近一次 start 到第一幀完成
+
+    @property
+    def state(self) -> State:
+        return self._state
+
+    @property
+    def running(self) -> bool:
+        return self._state is State.RUNNING
+
+    def can(self, new: State) -> bool:
+        return new in TRANSITIONS[self._state]
+
+    def to(self, new: State, error: BaseException | None = None) -> State:
+        """轉換到 new，回傳原本的狀態；不合法時丟出 TransitionError。"""
+        with self._cond:
+            old = self._state
+            if old is new:
+                return old
+            if new not in TRANSITIONS[old]:
+                raise TransitionError(f"{old.value} -> {new.value}")
+            self._state = new
+            if new is State.RUNNING:
+                self.starts += 1
+                self.error = None
+                self._t_start = time.perf_counter()
+                self.first_frame_ms = None
+            elif new is State.FAILED:
+                self.error = error
+                self.failed_from = old
+            self._cond.notify_all()
+        if self.on_change is not None:
+            self.on_change(old, new)
+        return old
+
+    def try_to(self, new: State, error: BaseException | None = None) -> bool:
+        """同 to()，但不合法時回傳 False（給可能跟其他執行緒競爭的路徑用）。"""
+        try:
+            self.to(new, error)
+        except TransitionError:
+            return False
+        return True
+
+    def wait_for(self, *states: State, timeout: float | None = None) -> bool:
+        """阻塞直到狀態是 states 之一；逾時回傳 False。"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._state in states, timeout=timeout)
+
+    def mark_first_frame(self) -> float | None:
+        """每幀都可以呼叫；只有 start 之後的第一次會記錄並回傳耗時（ms）。"""
+        t = self._t_start
+        if t is None:
+            return None
+        self._t_start = None
+        self.first_frame_ms = (time.perf_counter() - t) * 1e3
+        return self.first_frame_ms
+
+
+if __name__ == "__main__":
+    lc = Lifecycle(on_change=lambda a, b: print(f"{a.value} -> {b.value}"))
+    lc.to(State.READY)
+    lc.to(State.RUNNING)
+
+    def _worker():
+        time.sleep(0.05)
+        lc.mark_first_frame()
+        lc.wait_for(State.DRAINING)
+        lc.to(State.STOPPED)
+
+    threading.Thread(target=_worker).start()
+    time.sleep(0.1)
+    lc.to(State.DRAINING)
+    print("stopped:", lc.wait_for(State.STOPPED, timeout=1.0), f"first frame {lc.first_frame_ms:.1f} ms")
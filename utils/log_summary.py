@@ -0,0 +1,106 @@
+# ./utils/log_summary.py
+"""
+統計 FrameLogger 寫出的 JSON lines（見 utils/logger.py），依 session 列出每幀耗時分佈。
+
+    python -m utils.log_summary logs/frames.jsonl
+    python -m utils.log_summary logs/frames.jsonl* --aim-only --json
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+FIELDS = ("total_ms", "inf_ms", "cap_ms", "lat_ms")
+QUANTILES = (50, 90, 99)
+
+
+def iter_frames(paths: Iterable[str | Path]) -> Iterable[dict]:
+    """逐行讀取，只回傳帶 "frame" 欄位的紀錄；壞掉的行（例如寫到一半被中斷）直接略過。"""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(obj, dict) and isinstance(obj.get("frame"), dict):
+                    yield obj
+
+
+def summarize(records: Iterable[dict], aim_only: bool = False) -> dict[str, dict]:
+    """回傳 {session: {"frames", "duration_s", "fps", "skip_ratio", <field>: {p50, p90, p99, mean, max}}}。"""
+    sessions: dict[str, dict[str, list]] = defaultdict(lambda: defaultdict(list))
+    for obj in records:
+        fr = obj["frame"]
+        if aim_only and not fr.get("aim", True):
+            continue
+        s = sessions[obj.get("session", "?")]
+        s["ts"].append(obj.get("ts", 0.0))
+        s["skip"].append(bool(fr.get("skip", False)))
+        for k in FIELDS:
+            if k in fr:
+                s[k].append(fr[k])
+
+    out: dict[str, dict] = {}
+    for name, s in sessions.items():
+        ts = np.asarray(s["ts"], dtype=np.float64)
+        n = len(ts)
+        duration = float(ts.max() - ts.min()) if n > 1 else 0.0
+        row: dict = {
+            "frames": n,
+            "duration_s": round(duration, 3),
+            # 取樣（every > 1）時 fps 會偏低，看 total_ms 比較準
+            "fps": round((n - 1) / duration, 1) if duration > 0 else 0.0,
+            "skip_ratio": round(float(np.mean(s["skip"])), 4) if n else 0.0,
+        }
+        for k in FIELDS:
+            if not s[k]:
+                continue
+            v = np.asarray(s[k], dtype=np.float64)
+            q = np.percentile(v, QUANTILES)
+            row[k] = {f"p{p}": round(float(x), 3) for p, x in zip(QUANTILES, q)}
+            row[k]["mean"] = round(float(v.mean()), 3)
+            row[k]["max"] = round(float(v.max()), 3)
+        out[name] = row
+    return dict(sorted(out.items()))
+
+
+def format_table(summary: dict[str, dict], field: str = "total_ms") -> str:
+    head = f"{'session':<22} {'frames':>8} {'fps':>8} {'skip%':>6} " + " ".join(
+        f"{h:>8}" for h in ("p50", "p90", "p99", "max")
+    )
+    lines = [f"{field}:", head, "-" * len(head)]
+    for name, row in summary.items():
+        st = row.get(field)
+        cols = (
+            " ".join(f"{st[h]:8.3f}" for h in ("p50", "p90", "p99", "max"))
+            if st else " ".join(f"{'-':>8}" for _ in range(4))
+        )
+        lines.append(
+            f"{name:<22} {row['frames']:8d} {row['fps']:8.1f} {row['skip_ratio'] * 100:6.1f} {cols}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize per-frame timing logs")
+    parser.add_argument("logs", nargs="+", help="JSON lines files (globs are expanded)")
+    parser.add_argument("--field", default="total_ms", choices=FIELDS, help="column shown in the table")
+    parser.add_argument("--aim-only", action="store_true", help="ignore idle frames (aim off)")
+    parser.add_argument("--json", action="store_true", help="print the full summary as JSON")
+    args = parser.parse_args()
+
+    paths = sorted({p for pat in args.logs for p in (glob.glob(pat) or [pat])})
+    summary = summarize(iter_frames(paths), aim_only=args.aim_only)
+    if not summary:
+        parser.exit(1, "no frame records found\n")
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(format_table(summary, args.field))
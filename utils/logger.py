@@ -1,17 +1,24 @@
 from __future__ import annotations
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
+import time
+import traceback
 from logging import Handler
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler
 from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime
 import sys
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 # ANSI palette
 C: Dict[str, str] = {
     "red": "\033[91m", "green": "\033[92m", "blue": "\033[94m",
-    "yellow": "\033[93m", "cyan": "\033[96m", "magenta": "\033[95m",
+    "yellow": "\033[93m", "cyan": "\033[96m", "magenta": "\033[95m", "purple": "\033[95m",
     "black": "\033[30m", "white": "\033[97m", "gray": "\033[37m",
     "bg_red": "\033[41m", "bg_green": "\033[42m", "bg_blue": "\033[44m",
     "bg_yellow": "\033[43m", "bg_cyan": "\033[46m", "bg_magenta": "\033[45m",
@@ -32,6 +39,9 @@ class LoggerConfig:
     backup_count: int = 3
     use_color: Optional[bool] = None  # None=自動偵測 TTY
     datefmt: str = "%Y-%m-%d %H:%M:%S"
+    use_queue: bool = False  # True = 呼叫端只丟進 queue，格式化與 I/O 在 listener 執行緒
+    rate_limit: float = 0.0  # 秒；同一訊息在這段時間內只輸出一次，0 = 不限制
+    jsonl: bool = False  # 另外寫一份 JSON lines 到 {file_dir}/{file_name}.jsonl
 
     level_formats: Dict[int, str] = field(default_factory=lambda: {
         logging.DEBUG:    f"%(asctime)s [%(name)s] {C['cyan']}[DEBUG]{C['r']}    | %(message)s",
@@ -56,66 +66,339 @@ def _normalize_level(level: int | str) -> int:
 
 # -------- formatters --------
 class LevelFormatter(logging.Formatter):
-    """依 level 套用不同格式。"""
+    """依 level 套用不同格式（每個 level 的 Formatter 只建一次）。"""
     def __init__(self, fmt_map: Dict[int, str], datefmt: Optional[str] = None):
         super().__init__(datefmt=datefmt)
         self.fmt_map = fmt_map
         self.default = "%(levelname)s: %(message)s"
         self.datefmt = datefmt
+        self._formatters = {
+            lvl: logging.Formatter(fmt=fmt, datefmt=datefmt) for lvl, fmt in fmt_map.items()
+        }
+        self._default_formatter = logging.Formatter(fmt=self.default, datefmt=datefmt)
 
     def format(self, record: logging.LogRecord) -> str:
-        fmt = self.fmt_map.get(record.levelno, self.default)
-        return logging.Formatter(fmt=fmt, datefmt=self.datefmt).format(record)
+        return self._formatters.get(record.levelno, self._default_formatter).format(record)
 
-# -------- factory --------
-def get_logger(cfg: LoggerConfig) -> logging.Logger:
-    lvl = _normalize_level(cfg.level)
-    logger = logging.getLogger(cfg.name)
-    logger.setLevel(lvl)
-    logger.propagate = False  # 避免傳到 root 重複輸出
+# -------- filters --------
+class RateLimitFilter(logging.Filter):
+    """
+    同一 (level, 訊息) 在 interval 秒內只放行一次，被擋下的次數會附在下一次放行的訊息後面。
+    在呼叫端執行緒上只做一次 dict 查詢，被擋下的紀錄不會進 handler / queue。
+    """
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = float(interval)
+        self._seen: Dict[tuple, list] = {}  # key -> [last_emit, suppressed]
+        self._lock = threading.Lock()
 
-    if getattr(logger, "_configured", False):
-        return logger
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None:
+                if len(self._seen) > 1024:  # f-string 訊息可能無限多種，避免無限成長
+                    self._seen.clear()
+                self._seen[key] = [now, 0]
+                return True
+            if now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            suppressed = entry[1]
+            entry[0], entry[1] = now, 0
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+        return True
+
+# -------- structured (JSON lines) --------
+SESSION_ID = f"{datetime.now():%y%m%d-%H%M%S}-{os.getpid()}"  # 同一個行程內所有 logger 共用
+
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+def record_to_obj(record: logging.LogRecord) -> dict:
+    obj = {
+        "ts": round(record.created, 6),
+        "session": SESSION_ID,
+        "logger": record.name,
+        "level": record.levelname,
+        "msg": record.getMessage(),
+    }
+    if record.exc_info and not record.exc_text:
+        record.exc_text = logging.Formatter().formatException(record.exc_info)
+    if record.exc_text:
+        obj["exc"] = record.exc_text
+    # logger.info(..., extra={"frame": {...}}) 之類的額外欄位原樣帶出
+    for k, v in vars(record).items():
+        if k not in _RECORD_ATTRS and not k.startswith("_"):
+            obj[k] = v
+    return obj
+
+class JsonLinesFormatter(logging.Formatter):
+    """一筆紀錄一行 JSON，ANSI 顏色碼不會進檔案。"""
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record_to_obj(record), ensure_ascii=False, default=str)
+
+class JsonLinesHandler(RotatingFileHandler):
+    """
+    JSON lines 檔案。除了一般 LogRecord，也接受 write_obj(dict)（FrameLogger 用），
+    不必為每一幀建立 LogRecord。
+    """
+    def __init__(self, filename, maxBytes: int = 0, backupCount: int = 0):
+        super().__init__(filename, mode="a", maxBytes=maxBytes, backupCount=backupCount,
+                         encoding="utf-8", delay=True)
+        self.setFormatter(JsonLinesFormatter())
+
+    def write_obj(self, obj: dict, flush: bool = True):
+        line = json.dumps(obj, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() + len(line) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(line)
+            if flush:
+                self.stream.flush()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.write_obj(record_to_obj(record))
+        except Exception:
+            self.handleError(record)
 
-    handlers: list[Handler] = []
+# -------- shared handlers --------
+_SHARED: Dict[tuple, Handler] = {}
+_SHARED_LOCK = threading.Lock()
 
+def _shared_handler(key: tuple, factory: Callable[[], Handler]) -> Handler:
+    """同一個輸出目標（stdout、同一個檔案）整個行程只建一個 handler。"""
+    with _SHARED_LOCK:
+        h = _SHARED.get(key)
+        if h is None:
+            h = _SHARED[key] = factory()
+        return h
+
+def _console_handler(cfg: LoggerConfig) -> Handler:
     use_color = cfg.use_color if cfg.use_color is not None else sys.stdout.isatty()
-    if use_color:
-        ch = logging.StreamHandler(sys.stdout)
-        ch.setLevel(lvl)
-        ch.setFormatter(LevelFormatter(cfg.level_formats, datefmt=cfg.datefmt))
-        handlers.append(ch)
-    else:
+
+    def make() -> Handler:
         ch = logging.StreamHandler(sys.stdout)
-        ch.setLevel(lvl)
-        ch.setFormatter(logging.Formatter("%(asctime)s [%(name)s] [%(levelname)s] | %(message)s",
-                                          datefmt=cfg.datefmt))
-        handlers.append(ch)
+        if use_color:
+            ch.setFormatter(LevelFormatter(cfg.level_formats, datefmt=cfg.datefmt))
+        else:
+            ch.setFormatter(logging.Formatter(cfg.file_format, datefmt=cfg.datefmt))
+        return ch
 
-    if cfg.to_file:
-        cfg.file_dir.mkdir(parents=True, exist_ok=True)
+    return _shared_handler(("console", id(sys.stdout), use_color, cfg.datefmt), make)
+
+def _file_handler(cfg: LoggerConfig) -> Handler:
+    cfg.file_dir.mkdir(parents=True, exist_ok=True)
+    if cfg.static_file_name:
+        file_path = cfg.file_dir / f"{cfg.file_name}.log"
+    else:
         ts = datetime.now().strftime("%y-%m-%d-%H%M%S")
-        
-        if cfg.static_file_name:
-            file_path = cfg.file_dir / f"{cfg.file_name}.log"
-                
-        else:
-            file_path = cfg.file_dir / f"{ts}_{cfg.file_name}.log"
+        file_path = cfg.file_dir / f"{ts}_{cfg.file_name}.log"
 
+    def make() -> Handler:
         if cfg.rotate:
             fh: Handler = RotatingFileHandler(
-                file_path, mode='w',maxBytes=cfg.max_bytes, backupCount=cfg.backup_count, encoding="utf-8"
+                file_path, mode='w', maxBytes=cfg.max_bytes, backupCount=cfg.backup_count, encoding="utf-8"
             )
         else:
-            fh = logging.FileHandler(file_path, mode='w',encoding="utf-8")
-        fh.setLevel(lvl)
+            fh = logging.FileHandler(file_path, mode='w', encoding="utf-8")
         fh.setFormatter(logging.Formatter(cfg.file_format, datefmt=cfg.datefmt))
-        handlers.append(fh)
+        return fh
+
+    return _shared_handler(("file", str(file_path.resolve())), make)
+
+def _jsonl_handler(path: Path, max_bytes: int = 0, backup_count: int = 0) -> JsonLinesHandler:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return _shared_handler(
+        ("jsonl", str(path.resolve())),
+        lambda: JsonLinesHandler(path, maxBytes=max_bytes, backupCount=backup_count),
+    )
+
+# -------- async --------
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    只在呼叫端凍結訊息內容，不做格式化（QueueHandler.prepare 預設會在呼叫端 format）。
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # traceback 物件不跨執行緒保存，先轉成文字
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self.queue.put_nowait(record)
+
+class _Dispatcher:
+    """
+    整個行程共用一條背景執行緒：queue 模式的 LogRecord 依 logger 名稱分派到該 logger 的 handlers，
+    FrameLogger 的 (handler, dict) 直接寫進 JSON lines 檔。queue 清空時才 flush 檔案。
+    """
+    def __init__(self):
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._routes: Dict[str, list[Handler]] = {}
+        self._dirty: set = set()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def route(self, name: str, handlers: list[Handler]):
+        self._routes[name] = list(handlers)
+
+    def unroute(self, name: str):
+        self._routes.pop(name, None)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-dispatcher", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)  # 結束時把 queue 內剩下的紀錄寫完
+
+    def _run(self):
+        q = self.queue
+        while True:
+            item = q.get()
+            if item is None:
+                self._flush()
+                return
+            try:
+                if isinstance(item, logging.LogRecord):
+                    for h in self._routes.get(item.name, ()):
+                        if item.levelno >= h.level:
+                            h.handle(item)
+                elif isinstance(item, threading.Event):
+                    self._flush()
+                    item.set()
+                else:
+                    h, obj = item
+                    h.write_obj(obj, flush=False)
+                    self._dirty.add(h)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)  # 不能讓 dispatcher 執行緒死掉
+            if self._dirty and q.empty():
+                self._flush()
+
+    def _flush(self):
+        for h in self._dirty:
+            h.flush()
+        self._dirty.clear()
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """等目前 queue 內的紀錄都寫出去。"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        ev = threading.Event()
+        self.queue.put_nowait(ev)
+        return ev.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            t, self._thread = self._thread, None
+        if t is not None and t.is_alive():
+            self.queue.put_nowait(None)
+            t.join(timeout)
+
+_DISPATCHER = _Dispatcher()
+
+def drain_logs(timeout: float = 5.0) -> bool:
+    """queue 模式下等所有排隊中的紀錄寫完（bench / 關閉前用）。"""
+    return _DISPATCHER.drain(timeout)
+
+# -------- per-frame timing --------
+class FrameLogger:
+    """
+    每幀計時紀錄，寫進 JSON lines 檔（和 LoggerConfig.jsonl 同一種格式，多了 "frame" 欄位）。
+    log() 在呼叫端只做取樣判斷 + 一次 put_nowait，序列化與寫檔都在共用的背景執行緒。
+    """
+    def __init__(self, handler: JsonLinesHandler, name: str = "frames", every: int = 1):
+        self.handler = handler
+        self.name = name
+        self.every = max(1, int(every))
+        self._n = 0
+        self._put = _DISPATCHER.queue.put_nowait
+        _DISPATCHER.start()
+
+    def log(self, **fields):
+        self._n += 1
+        if self._n % self.every:
+            return
+        self._put((self.handler, {
+            "ts": round(time.time(), 6),
+            "session": SESSION_ID,
+            "logger": self.name,
+            "level": "FRAME",
+            "frame": fields,
+        }))
+
+def get_frame_logger(
+    path: str | Path = "./logs/frames.jsonl",
+    every: int = 1,
+    name: str = "frames",
+    max_bytes: int = 64 * 1024 * 1024,
+    backup_count: int = 3,
+) -> FrameLogger:
+    return FrameLogger(_jsonl_handler(Path(path), max_bytes, backup_count), name=name, every=every)
+
+# -------- factory --------
+def _output_key(cfg: LoggerConfig) -> tuple:
+    """決定 handlers / filter 的設定；等級不算在內（每次呼叫都直接套用）。"""
+    return (
+        cfg.to_file, str(cfg.file_dir), cfg.file_name, cfg.static_file_name, cfg.rotate, cfg.max_bytes,
+        cfg.backup_count, cfg.use_color, cfg.datefmt, cfg.use_queue, cfg.rate_limit, cfg.jsonl,
+    )
+
+def get_logger(cfg: LoggerConfig) -> logging.Logger:
+    """
+    每個名稱的 handlers 只在輸出設定改變時重建（同一個行程內重建 Main 時 log_async、
+    log_rate_limit、log_jsonl 才會生效）；stdout / 同一個檔案的 handler 由所有 logger 共用，
+    等級只由 logger 本身決定。
+    """
+    lvl = _normalize_level(cfg.level)
+    logger = logging.getLogger(cfg.name)
+    logger.setLevel(lvl)
+    logger.propagate = False  # 避免傳到 root 重複輸出
+
+    key = _output_key(cfg)
+    if getattr(logger, "_output_key", None) == key:
+        return logger
+
+    # 拿掉上一次加的 handler / filter（共用的 handler 不關閉，其他 logger 可能還在用）
+    for h in getattr(logger, "_own_handlers", ()):
+        logger.removeHandler(h)
+    if getattr(logger, "_rate_filter", None) is not None:
+        logger.removeFilter(logger._rate_filter)
+    _DISPATCHER.unroute(cfg.name)
+
+    handlers: list[Handler] = [_console_handler(cfg)]
+    if cfg.to_file:
+        handlers.append(_file_handler(cfg))
+    if cfg.jsonl:
+        handlers.append(_jsonl_handler(cfg.file_dir / f"{cfg.file_name}.jsonl", cfg.max_bytes, cfg.backup_count))
+
+    if cfg.use_queue:
+        _DISPATCHER.route(cfg.name, handlers)
+        _DISPATCHER.start()
+        handlers = [_NonBlockingQueueHandler(_DISPATCHER.queue)]
 
     for h in handlers:
         logger.addHandler(h)
 
-    logger._configured = True  # 標記避免重複加 handler
+    logger._rate_filter = None
+    if cfg.rate_limit > 0:
+        logger._rate_filter = RateLimitFilter(cfg.rate_limit)
+        logger.addFilter(logger._rate_filter)
+
+    logger._own_handlers = handlers
+    logger._output_key = key  # 設定相同時直接回傳，避免重複加 handler
     return logger
 
 if __name__ == "__main__":
@@ -126,10 +409,16 @@ if __name__ == "__main__":
         file_dir=Path("./logs"),
         file_name="demo",
         rotate=True,
+        jsonl=True,
     )
     log = get_logger(cfg)
     log.debug("debug")
     log.info("info ✅")
     log.warning("warning")
     log.error("error")
-    log.critical("critical")
\ No newline at end of file
+    log.critical("critical")
+
+    frames = get_frame_logger(Path("./logs/demo_frames.jsonl"))
+    for i in range(5):
+        frames.log(seq=i, cap_ms=0.4, inf_ms=3.1, total_ms=3.6, skip=False)
+    drain_logs()
\ No newline at end of file
@@ -0,0 +1,376 @@
+# ./utils/onnx_opt.py
+"""
+ONNX 前處理最佳化：在交給 trt.OnnxParser 之前先整理計算圖，只需要 CPU。
+
+    shape inference → 常數折疊 → 移除死節點 → onnxsim（有安裝時）→ shape inference
+
+結果以「來源檔雜湊 + 選項 + 版本」為 key 存在 ./cache/onnx，來源沒變就直接沿用。
+
+    path, report = optimize_onnx("models/best.onnx")
+    print(format_report(report))
+
+    python -m utils.onnx_opt models/best.onnx --check      # 另外比對最佳化前後的輸出
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from utils.cache import CACHE_DIR, digest_obj, file_digest
+
+OPT_CACHE_DIR = CACHE_DIR / "onnx"
+OPT_VERSION = 1  # 最佳化流程改變時 +1，讓舊快取失效
+MAX_FOLD_BYTES = 16 << 20  # 折疊後超過這個大小的常數不折疊，避免模型檔暴增
+KEEP = 8  # 快取只保留最近幾個模型
+
+# 每次執行結果不同，不能折疊
+_NONDETERMINISTIC = {
+    "RandomNormal",
+    "RandomNormalLike",
+    "RandomUniform",
+    "RandomUniformLike",
+    "Multinomial",
+    "Bernoulli",
+}
+
+
+def node_counts(model) -> dict[str, int]:
+    return dict(sorted(Counter(n.op_type for n in model.graph.node).items()))
+
+
+def _subgraph_inputs(node) -> set[str]:
+    """If / Loop / Scan 子圖用到的外層名稱（子圖內沒定義的輸入）。"""
+    import onnx
+
+    used: set[str] = set()
+    for attr in node.attribute:
+        graphs = []
+        if attr.type == onnx.AttributeProto.GRAPH:
+            graphs.append(attr.g)
+        elif attr.type == onnx.AttributeProto.GRAPHS:
+            graphs.extend(attr.graphs)
+        for g in graphs:
+            defined = {i.name for i in g.input} | {i.name for i in g.initializer}
+            for n in g.node:
+                defined.update(n.output)
+            for n in g.node:
+                used.update(i for i in n.input if i and i not in defined)
+                used.update(_subgraph_inputs(n) - defined)
+    return used
+
+
+def _static_shapes(graph) -> dict[str, list[int]]:
+    out = {}
+    for vi in [*graph.input, *graph.value_info, *graph.output]:
+        t = vi.type.tensor_type
+        if not t.HasField("shape"):
+            continue
+        dims = [d.dim_value if d.HasField("dim_value") else -1 for d in t.shape.dim]
+        if all(d >= 0 for d in dims):
+            out[vi.name] = dims
+    return out
+
+
+def fold_constants(model) -> int:
+    """
+    輸入全部是常數的節點直接在 CPU 上算出結果（onnx.reference），換成 initializer；
+    輸入形狀已知的 Shape 節點也一併折疊。回傳折疊的節點數。
+    """
+    from onnx import numpy_helper
+    from onnx.reference import ReferenceEvaluator
+
+    graph = model.graph
+    graph_inputs = {i.name for i in graph.input}
+    consts = {
+        init.name: numpy_helper.to_array(init)
+        for init in graph.initializer
+        if init.name not in graph_inputs  # 舊版匯出會把 initializer 也列為輸入，可被覆寫，不能當常數
+    }
+    shapes = _static_shapes(graph)
+    opsets = {o.domain: o.version for o in model.opset_import}
+
+    kept, folded, new_inits = [], 0, []
+    for node in graph.node:
+        values = None
+        if node.domain not in ("", "ai.onnx") or node.op_type in _NONDETERMINISTIC:
+            pass
+        elif node.op_type == "Shape" and node.input[0] in shapes and not node.attribute:
+            values = [np.asarray(shapes[node.input[0]], dtype=np.int64)]
+        elif all(i and i in consts for i in node.input) and not _subgraph_inputs(node):
+            try:
+                feeds = {i: consts[i] for i in node.input}
+                values = ReferenceEvaluator(node, opsets=opsets).run(None, feeds)
+            except Exception:
+                values = None  # reference 實作不支援的 op，留給 TensorRT
+        if values is None or sum(np.asarray(v).nbytes for v in values) > MAX_FOLD_BYTES:
+            kept.append(node)
+            continue
+        for name, v in zip(node.output, values):
+            if not name:
+                continue
+            v = np.asarray(v)
+            consts[name] = v
+            new_inits.append(numpy_helper.from_array(v, name))
+        folded += 1
+
+    if folded:
+        del graph.node[:]
+        graph.node.extend(kept)
+        graph.initializer.extend(new_inits)
+    return folded
+
+
+def eliminate_dead_nodes(model) -> int:
+    """移除不會影響圖輸出的節點，以及沒人用的 initializer / value_info。回傳移除的節點數。"""
+    graph = model.graph
+    live = {o.name for o in graph.output}
+    keep = []
+    for node in reversed(graph.node):
+        if any(o in live for o in node.output):
+            keep.append(node)
+            live.update(i for i in node.input if i)
+            live.update(_subgraph_inputs(node))
+    removed = len(graph.node) - len(keep)
+
+    inits = [i for i in graph.initializer if i.name in live]
+    infos = [v for v in graph.value_info if v.name in live]
+    if removed or len(inits) != len(graph.initializer):
+        del graph.node[:]
+        graph.node.extend(reversed(keep))
+        del graph.initializer[:]
+        graph.initializer.extend(inits)
+        del graph.value_info[:]
+        graph.value_info.extend(infos)
+    return removed
+
+
+def infer_shapes(model):
+    import onnx
+
+    return onnx.shape_inference.infer_shapes(model, check_type=False, strict_mode=False, data_prop=True)
+
+
+def _simplify(model):
+    """onnxsim 不在時回傳 None（它只是讓結果更好，不是必要的）。"""
+    try:
+        import onnxsim
+    except ImportError:
+        return None
+    simplified, ok = onnxsim.simplify(model)
+    return simplified if ok else None
+
+
+def _versions(simplify: bool) -> dict:
+    import onnx
+
+    v = {"onnx": onnx.__version__}
+    if simplify:
+        try:
+            import onnxsim
+
+            v["onnxsim"] = getattr(onnxsim, "__version__", "?")
+        except ImportError:
+            v["onnxsim"] = None
+    return v
+
+
+def run_passes(model, simplify: bool = True) -> tuple[object, list[dict]]:
+    """依序執行各個 pass，回傳 (最佳化後的模型, [{"pass", "nodes", ...}, ...])。"""
+    passes: list[dict] = []
+
+    def _record(name, **extra):
+        passes.append({"pass": name, "nodes": len(model.graph.node), **extra})
+
+    model = infer_shapes(model)
+    _record("shape_inference")
+    # 折疊後可能又有新的 Shape 可以折疊，跑到收斂為止（通常 1~2 輪）
+    for _ in range(8):
+        folded = fold_constants(model)
+        removed = eliminate_dead_nodes(model)
+        _record("fold_constants", folded=folded, removed=removed)
+        if not folded and not removed:
+            break
+        model = infer_shapes(model)
+    if simplify:
+        simplified = _simplify(model)
+        if simplified is not None:
+            model = simplified
+            _record("onnxsim")
+        else:
+            _record("onnxsim", skipped=True)
+    model = infer_shapes(model)
+    _record("shape_inference")
+    return model, passes
+
+
+def _prune_cache(cache_dir: Path, keep: int):
+    files = sorted(cache_dir.glob("*.onnx"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for p in files[keep:]:
+        for f in (p, p.with_suffix(".json")):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+
+def optimize_onnx(
+    src: str | Path,
+    cache_dir: str | Path = OPT_CACHE_DIR,
+    simplify: bool = True,
+    force: bool = False,
+) -> tuple[Path, dict]:
+    """
+    回傳 (最佳化後的 ONNX 路徑, 報告)。報告含前後各 op 的節點數與每個 pass 的結果；
+    快取命中時 report["cached"] 為 True，不會重新載入模型。
+    """
+    import json
+
+    import onnx
+
+    src = Path(src)
+    cache_dir = Path(cache_dir)
+    digest = file_digest(src)
+    key = digest_obj(
+        {"src": digest, "simplify": simplify, "version": OPT_VERSION, "libs": _versions(simplify)}
+    )[:16]
+    out = cache_dir / f"{src.stem}-{key}.onnx"
+    meta = out.with_suffix(".json")
+
+    if not force and out.exists() and meta.exists():
+        try:
+            report = json.loads(meta.read_text(encoding="utf-8"))
+            report["cached"] = True
+            os.utime(out)  # 讓常用的模型不會被 _prune_cache 清掉
+            return out, report
+        except ValueError:
+            pass
+
+    t0 = time.perf_counter()
+    model = onnx.load(str(src))
+    before = node_counts(model)
+    n_init = len(model.graph.initializer)
+    model, passes = run_passes(model, simplify=simplify)
+    onnx.checker.check_model(model)
+    after = node_counts(model)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        onnx.save(model, tmp)
+        os.replace(tmp, out)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    report = {
+        "source": str(src.resolve()),
+        "source_sha256": digest,
+        "output": str(out.resolve()),
+        "nodes_before": before,
+        "nodes_after": after,
+        "total_before": sum(before.values()),
+        "total_after": sum(after.values()),
+        "initializers_before": n_init,
+        "initializers_after": len(model.graph.initializer),
+        "passes": passes,
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    meta.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    _prune_cache(cache_dir, KEEP)
+    report["cached"] = False
+    return out, report
+
+
+def format_report(report: dict) -> str:
+    state = "cached" if report.get("cached") else f"{report['seconds']:.2f} s"
+    lines = [
+        f"{report['source']} -> {report['output']} ({state})",
+        f"nodes: {report['total_before']} -> {report['total_after']}, "
+        f"initializers: {report['initializers_before']} -> {report['initializers_after']}",
+        f"{'before':>8} {'after':>8}  op",
+    ]
+    b, a = report["nodes_before"], report["nodes_after"]
+    for op in sorted(b.keys() | a.keys(), key=lambda k: (-(b.get(k, 0) - a.get(k, 0)), k)):
+        mark = "" if b.get(op, 0) == a.get(op, 0) else "  *"
+        lines.append(f"{b.get(op, 0):8d} {a.get(op, 0):8d}  {op}{mark}")
+    lines.append("passes: " + ", ".join(
+        p["pass"] + ("(skipped)" if p.get("skipped") else f"({p['nodes']})") for p in report["passes"]
+    ))
+    return "\n".join(lines)
+
+
+def random_feeds(model, seed: int = 0) -> dict[str, np.ndarray]:
+    """依圖輸入的型別 / 形狀產生隨機資料；動態維度用 1。"""
+    from onnx import helper
+
+    rng = np.random.default_rng(seed)
+    inits = {i.name for i in model.graph.initializer}
+    feeds = {}
+    for vi in model.graph.input:
+        if vi.name in inits:
+            continue
+        t = vi.type.tensor_type
+        dtype = helper.tensor_dtype_to_np_dtype(t.elem_type)
+        shape = [d.dim_value if d.HasField("dim_value") and d.dim_value > 0 else 1 for d in t.shape.dim]
+        feeds[vi.name] = rng.random(shape).astype(dtype)
+    return feeds
+
+
+def run_model(path: str | Path, feeds: dict[str, np.ndarray]) -> list[np.ndarray]:
+    """CPU 上執行：有 onnxruntime 就用它，否則用 onnx.reference（慢，但不需要額外套件）。"""
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        import onnx
+        from onnx.reference import ReferenceEvaluator
+
+        return ReferenceEvaluator(onnx.load(str(path))).run(None, feeds)
+    sess = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    return sess.run(None, feeds)
+
+
+def check_outputs(src: str | Path, dst: str | Path, atol: float = 1e-4) -> list[float]:
+    """以同一組隨機輸入比對兩個模型，回傳各輸出的最大絕對誤差；超過 atol 丟出 AssertionError。"""
+    import onnx
+
+    feeds = random_feeds(onnx.load(str(src), load_external_data=False))
+    a, b = run_model(src, feeds), run_model(dst, feeds)
+    if len(a) != len(b):
+        raise AssertionError(f"output count differs: {len(a)} vs {len(b)}")
+    errs = []
+    for i, (x, y) in enumerate(zip(a, b)):
+        x, y = np.asarray(x), np.asarray(y)
+        if x.shape != y.shape:
+            raise AssertionError(f"output {i}: shape {x.shape} vs {y.shape}")
+        err = float(np.max(np.abs(x.astype(np.float64) - y.astype(np.float64)))) if x.size else 0.0
+        if err > atol:
+            raise AssertionError(f"output {i}: max abs error {err:g} > {atol:g}")
+        errs.append(err)
+    return errs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimize an ONNX model before TensorRT parsing (CPU only)")
+    parser.add_argument("onnx", help="input ONNX model")
+    parser.add_argument("--cache_dir", default=str(OPT_CACHE_DIR))
+    parser.add_argument("--no_simplify", action="store_true", help="skip onnxsim even if installed")
+    parser.add_argument("--force", action="store_true", help="ignore the cache")
+    parser.add_argument("--check", action="store_true", help="compare outputs before / after on random input")
+    parser.add_argument("--atol", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    path, report = optimize_onnx(args.onnx, args.cache_dir, simplify=not args.no_simplify, force=args.force)
+    print(format_report(report))
+    if args.check:
+        errs = check_outputs(args.onnx, path, atol=args.atol)
+        print("outputs match, max abs error: " + ", ".join(f"{e:.3g}" for e in errs))
@@ -0,0 +1,134 @@
+# ./utils/preview.py
+"""
+worker -> UI 的預覽通道。
+
+只有在 UI 端訂閱（頁面可見）時才發佈，依訂閱端要求的速率與尺寸把畫面縮小後
+放進單一 slot 的信箱；slot 尚未被取走時不再發佈，所以事件佇列裡最多只有一個通知，
+不會因為 UI 忙碌而累積整張畫面。
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class PreviewChannel(QObject):
+    ready = pyqtSignal()  # slot 由空變滿時發出一次
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._subscribed = False
+        self._interval = 1.0 / 20
+        self._req_fps = 20.0  # 訂閱端要求的速率
+        self._max_fps = 0.0  # worker 端上限（設定檔 preview_fps），0 = 不限制
+        self._max_size = (640, 640)  # (w, h)
+        self._next_ts = 0.0
+
+        # 雙緩衝：worker 寫其中一個，另一個可能正被 UI 讀取
+        self._buffers: list[np.ndarray | None] = [None, None]
+        self._write = 0
+        self._slot: tuple | None = None
+
+        # 發佈端 FPS（worker 每幀呼叫 offer 時更新）
+        self._fps_tau = 0.5
+        self._dt_ema: float | None = None
+        self._last_offer = 0.0
+        self.fps = 0.0
+
+        self.published = 0
+        self.busy = 0  # UI 尚未取走而略過的次數
+
+    # -------- UI 端 --------
+    def subscribe(self, max_fps: float = 20, max_size: tuple[int, int] = (640, 640)):
+        with self._lock:
+            self._req_fps = float(max_fps)
+            self._update_interval()
+            self._max_size = (max(1, int(max_size[0])), max(1, int(max_size[1])))
+            self._next_ts = 0.0
+            self._subscribed = True
+
+    def unsubscribe(self):
+        with self._lock:
+            self._subscribed = False
+            self._slot = None
+
+    def set_max_fps(self, max_fps: float):
+        """worker 端的發佈上限，可在執行中修改；0 = 依訂閱端要求。"""
+        with self._lock:
+            self._max_fps = max(0.0, float(max_fps))
+            self._update_interval()
+
+    def _update_interval(self):
+        fps = self._req_fps
+        if self._max_fps > 0:
+            fps = min(fps, self._max_fps)
+        self._interval = 1.0 / max(1e-3, fps)
+
+    @property
+    def subscribed(self) -> bool:
+        return self._subscribed
+
+    def take(self) -> tuple | None:
+        """取走最新的預覽：(img, boxes, scores, cls_inds, fps)，沒有則回傳 None。"""
+        with self._lock:
+            item, self._slot = self._slot, None
+        return item
+
+    # -------- worker 端 --------
+    def offer(self, img, boxes=None, scores=None, cls_inds=None):
+        """worker 每幀呼叫；不需要時只做一次時間比較就返回。"""
+        now = time.perf_counter()
+        if self._last_offer:
+            dt = now - self._last_offer
+            if dt > 0:
+                alpha = 1.0 - math.exp(-dt / self._fps_tau)
+                self._dt_ema = dt if self._dt_ema is None else (
+                    (1 - alpha) * self._dt_ema + alpha * dt
+                )
+                self.fps = 1.0 / self._dt_ema
+        self._last_offer = now
+
+        if not self._subscribed or now < self._next_ts:
+            return
+        if self._slot is not None:
+            self.busy += 1
+            return
+
+        small, scale = self._downscale(img)
+        if boxes is not None and len(boxes):
+            boxes = np.asarray(boxes, dtype=np.float32)[:, :4] * scale
+            scores = None if scores is None else np.array(scores, copy=True)
+            cls_inds = None if cls_inds is None else np.array(cls_inds, copy=True)
+
+        with self._lock:
+            if not self._subscribed:
+                return
+            self._next_ts = now + self._interval
+            self._slot = (small, boxes, scores, cls_inds, self.fps)
+            self._write ^= 1
+            self.published += 1
+        self.ready.emit()
+
+    def _downscale(self, img: np.ndarray) -> tuple[np.ndarray, float]:
+        h, w = img.shape[:2]
+        mw, mh = self._max_size
+        scale = min(1.0, mw / w, mh / h)
+        tw, th = max(1, int(w * scale)), max(1, int(h * scale))
+        shape = (th, tw) + img.shape[2:]
+
+        buf = self._buffers[self._write]
+        if buf is None or buf.shape != shape or buf.dtype != img.dtype:
+            buf = np.empty(shape, dtype=img.dtype)
+            self._buffers[self._write] = buf
+
+        if scale == 1.0:
+            np.copyto(buf, img)
+        else:
+            cv2.resize(img, (tw, th), dst=buf, interpolation=cv2.INTER_AREA)
+        return buf, scale
@@ -0,0 +1,194 @@
+# ./utils/profiling.py
+"""
+TensorRT 逐層耗時的統計與比較（純 Python / numpy，不需要 GPU）。
+
+錄下來的 profile（utils/inspect_engine.py 寫出的 JSON）格式：
+    {
+        "engine": "models/500e.trt",
+        "iterations": 200,
+        "layers": {"<layer name>": [每次執行的 ms, ...], ...},    # 依執行順序
+        "info": {"<layer name>": {"type": "...", "precision": "..."}, ...}   # 可省略
+    }
+
+    python -m utils.profiling fp16.json                 # 排序後的逐層表格
+    python -m utils.profiling fp16.json int8.json       # 兩個 engine 的差異
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+def load_profile(path: str | Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "layers" not in data:
+        raise ValueError(f"{path}: not a layer profile (missing 'layers')")
+    return data
+
+
+def save_profile(profile: dict, path: str | Path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+
+
+def aggregate(profile: dict) -> dict:
+    """
+    回傳 {"engine", "iterations", "total_ms", "layers": [...], "by_type": [...]}。
+    layers 每筆為 {name, type, precision, order, calls, mean_ms, median_ms, p90_ms, pct}，
+    依 median 由大到小排序；pct 是佔每次執行總時間（各層 median 加總）的比例。
+    """
+    info = profile.get("info") or {}
+    rows = []
+    for order, (name, times) in enumerate(profile["layers"].items()):
+        v = np.asarray(times, dtype=np.float64)
+        if v.size == 0:
+            continue
+        meta = info.get(name, {})
+        rows.append(
+            {
+                "name": name,
+                "type": meta.get("type", ""),
+                "precision": meta.get("precision", ""),
+                "order": order,
+                "calls": int(v.size),
+                "mean_ms": float(v.mean()),
+                "median_ms": float(np.median(v)),
+                "p90_ms": float(np.percentile(v, 90)),
+            }
+        )
+    total = sum(r["median_ms"] for r in rows)
+    for r in rows:
+        r["pct"] = r["median_ms"] / total * 100 if total > 0 else 0.0
+    rows.sort(key=lambda r: r["median_ms"], reverse=True)
+
+    by_type: dict[str, dict] = {}
+    for r in rows:
+        t = by_type.setdefault(r["type"] or "?", {"type": r["type"] or "?", "layers": 0, "median_ms": 0.0})
+        t["layers"] += 1
+        t["median_ms"] += r["median_ms"]
+    for t in by_type.values():
+        t["pct"] = t["median_ms"] / total * 100 if total > 0 else 0.0
+
+    return {
+        "engine": profile.get("engine", ""),
+        "iterations": profile.get("iterations", 0),
+        "total_ms": total,
+        "layers": rows,
+        "by_type": sorted(by_type.values(), key=lambda t: t["median_ms"], reverse=True),
+    }
+
+
+def diff(a: dict, b: dict) -> dict:
+    """
+    比較兩份 aggregate() 結果（a = 基準）。同名的層逐一比較，
+    只出現在一邊的層（融合方式不同時很常見）分別列出；另外依層類型加總比較。
+    各表依 |delta| 由大到小排序，相同時保持 a 的順序（a 沒有的接在後面），輸出順序固定。
+    """
+    la = {r["name"]: r for r in a["layers"]}
+    lb = {r["name"]: r for r in b["layers"]}
+    common = [
+        {
+            "name": n,
+            "a_ms": la[n]["median_ms"],
+            "b_ms": lb[n]["median_ms"],
+            "delta_ms": lb[n]["median_ms"] - la[n]["median_ms"],
+        }
+        for n in la
+        if n in lb
+    ]
+    common.sort(key=lambda r: abs(r["delta_ms"]), reverse=True)
+
+    ta = {t["type"]: t["median_ms"] for t in a["by_type"]}
+    tb = {t["type"]: t["median_ms"] for t in b["by_type"]}
+    by_type = [
+        {"type": k, "a_ms": ta.get(k, 0.0), "b_ms": tb.get(k, 0.0), "delta_ms": tb.get(k, 0.0) - ta.get(k, 0.0)}
+        for k in [*ta, *(k for k in tb if k not in ta)]
+    ]
+    by_type.sort(key=lambda r: abs(r["delta_ms"]), reverse=True)
+
+    return {
+        "a": a["engine"],
+        "b": b["engine"],
+        "a_total_ms": a["total_ms"],
+        "b_total_ms": b["total_ms"],
+        "common": common,
+        "only_a": [r for n, r in la.items() if n not in lb],  # layers 已依 median 排序
+        "only_b": [r for n, r in lb.items() if n not in la],
+        "by_type": by_type,
+    }
+
+
+def _short(name: str, width: int) -> str:
+    return name if len(name) <= width else name[: width - 3] + "..."
+
+
+def format_table(report: dict, top: int = 30, width: int = 60) -> str:
+    lines = [
+        f"{report['engine']}: {len(report['layers'])} layers, "
+        f"{report['total_ms']:.3f} ms / iteration (sum of medians, {report['iterations']} iterations)",
+        f"{'median ms':>10} {'p90 ms':>8} {'%':>6}  {'precision':<9} {'type':<18} layer",
+    ]
+    for r in report["layers"][:top]:
+        lines.append(
+            f"{r['median_ms']:10.4f} {r['p90_ms']:8.4f} {r['pct']:6.2f}  "
+            f"{r['precision']:<9} {r['type']:<18} {_short(r['name'], width)}"
+        )
+    if len(report["layers"]) > top:
+        rest = report["layers"][top:]
+        lines.append(
+            f"{sum(r['median_ms'] for r in rest):10.4f} {'':8} {sum(r['pct'] for r in rest):6.2f}  "
+            f"({len(rest)} more layers)"
+        )
+    lines.append(f"\n{'median ms':>10} {'%':>6} {'layers':>6}  type")
+    for t in report["by_type"]:
+        lines.append(f"{t['median_ms']:10.4f} {t['pct']:6.2f} {t['layers']:6d}  {t['type']}")
+    return "\n".join(lines)
+
+
+def format_diff(d: dict, top: int = 20, width: int = 60) -> str:
+    delta = d["b_total_ms"] - d["a_total_ms"]
+    lines = [
+        f"A: {d['a']}  {d['a_total_ms']:.3f} ms",
+        f"B: {d['b']}  {d['b_total_ms']:.3f} ms  ({delta:+.3f} ms, "
+        f"{(delta / d['a_total_ms'] * 100 if d['a_total_ms'] else 0.0):+.1f}%)",
+        f"\n{'A ms':>10} {'B ms':>10} {'delta':>10}  type",
+    ]
+    for r in d["by_type"]:
+        lines.append(f"{r['a_ms']:10.4f} {r['b_ms']:10.4f} {r['delta_ms']:+10.4f}  {r['type']}")
+
+    lines.append(f"\n{'A ms':>10} {'B ms':>10} {'delta':>10}  layer (in both, largest change first)")
+    for r in d["common"][:top]:
+        lines.append(f"{r['a_ms']:10.4f} {r['b_ms']:10.4f} {r['delta_ms']:+10.4f}  {_short(r['name'], width)}")
+    for key, label in (("only_a", "only in A"), ("only_b", "only in B")):
+        rows = d[key]
+        if not rows:
+            continue
+        lines.append(f"\n{'ms':>10}  {label} ({len(rows)} layers, {sum(r['median_ms'] for r in rows):.4f} ms)")
+        for r in rows[:top]:
+            lines.append(f"{r['median_ms']:10.4f}  {_short(r['name'], width)}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize / diff recorded TensorRT layer profiles")
+    parser.add_argument("profiles", nargs="+", help="one profile for a table, two for a diff")
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--json", action="store_true", help="print the aggregated result as JSON")
+    args = parser.parse_args()
+    if len(args.profiles) > 2:
+        parser.error("at most two profiles")
+
+    reports = [aggregate(load_profile(p)) for p in args.profiles]
+    out = reports[0] if len(reports) == 1 else diff(*reports)
+    if args.json:
+        print(json.dumps(out, indent=2))
+    elif len(reports) == 1:
+        print(format_table(out, args.top))
+    else:
+        print(format_diff(out, args.top))
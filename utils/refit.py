@@ -0,0 +1,235 @@
+# ./utils/refit.py
+"""
+不重建 engine，只換權重：以 --refittable（utils/export.py）建置的 engine，
+拿同一個架構重新訓練出的 ONNX，用 TensorRT Refitter 在幾秒內更新權重。
+
+refit 前會比對拓撲：新 ONNX（經過與建置時相同的 utils/onnx_opt.py 最佳化）的
+節點、連接、屬性與權重形狀的雜湊，必須等於 engine metadata 裡 build.topology 記錄的值；
+float 權重的數值不算在內（形狀參數之類的常數會算，見 topology_digest）。
+INT8 engine 的量化 scale 沿用原本的校正結果，權重變化大時請重新建置。
+
+    python utils/export.py -o models/best.onnx -e models/best.trt --end2end --v8 --refittable
+    python -m utils.refit models/best.trt models/best-ft.onnx                  # 原地更新
+    python -m utils.refit models/best.trt models/best-ft.onnx -o models/ft.trt
+    python -m utils.refit models/best.trt models/best-ft.onnx --check          # 只比對拓撲，不需要 TensorRT
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from utils.cache import digest_obj
+from utils.calib_cache import graph_digest
+from utils.engine_meta import copy_meta, read_meta, update_meta
+
+log = logging.getLogger("EngineBuilder")
+
+
+class RefitError(RuntimeError):
+    pass
+
+
+# 以 float 張量當形狀參數的輸入（Resize 的 roi / scales），數值由 TensorRT 寫死在 engine 裡
+_FLOAT_SHAPE_INPUTS = {"Resize": (1, 2), "Upsample": (1,)}
+
+
+def topology_digest(onnx_path: str | Path) -> str:
+    """
+    計算圖結構的雜湊：節點（op、domain、輸入輸出名稱、屬性）、輸入輸出型別、權重名稱 / 形狀 / dtype。
+    float 權重只取形狀與 dtype，重新訓練後的模型雜湊不變；非 float 的 initializer（Reshape 目標、
+    Slice 起點…）、Constant 節點的 tensor 與 Resize scales 連數值一起雜湊，這些會被寫死在 engine 裡，
+    refitter 換不掉。
+    """
+    import hashlib
+
+    import onnx
+    from onnx import AttributeProto, TensorProto, helper, numpy_helper
+
+    g = onnx.load(str(onnx_path)).graph
+    floats = {TensorProto.FLOAT, TensorProto.FLOAT16, TensorProto.BFLOAT16, TensorProto.DOUBLE}
+    shape_inputs = {
+        n.input[i]
+        for n in g.node
+        for i in _FLOAT_SHAPE_INPUTS.get(n.op_type, ())
+        if i < len(n.input) and n.input[i]
+    }
+
+    def tensor_sig(t, values: bool = False):
+        sig = [list(t.dims), int(t.data_type)]
+        if values or t.data_type not in floats:
+            sig.append(hashlib.sha256(numpy_helper.to_array(t).tobytes()).hexdigest())
+        return sig
+
+    def attr_sig(a):
+        if a.type == AttributeProto.TENSOR:
+            return tensor_sig(a.t, values=True)
+        if a.type == AttributeProto.TENSORS:
+            return [tensor_sig(t, values=True) for t in a.tensors]
+        if a.type in (AttributeProto.GRAPH, AttributeProto.GRAPHS):
+            return a.type  # 子圖（If / Loop）只記有無
+        value = helper.get_attribute_value(a)
+        if isinstance(value, list):
+            return [v.decode() if isinstance(v, bytes) else v for v in value]
+        return value.decode() if isinstance(value, bytes) else value
+
+    return digest_obj(
+        {
+            "version": 2,
+            "nodes": [
+                [n.op_type, n.domain, list(n.input), list(n.output), {a.name: attr_sig(a) for a in n.attribute}]
+                for n in g.node
+            ],
+            "initializers": {t.name: tensor_sig(t, t.name in shape_inputs) for t in g.initializer},
+            "inputs": [[v.name, str(v.type)] for v in g.input],
+            "outputs": [[v.name, str(v.type)] for v in g.output],
+        }
+    )
+
+
+def prepare_onnx(onnx_path: str | Path, optimized: bool) -> str:
+    """建置時有做 ONNX 最佳化，新模型也要走同樣的流程，權重名稱才會對得上。"""
+    if not optimized:
+        return str(onnx_path)
+    from utils.onnx_opt import optimize_onnx
+
+    path, _ = optimize_onnx(onnx_path)
+    return str(path)
+
+
+def check_topology(engine_path: str | Path, onnx_path: str | Path) -> tuple[str, dict]:
+    """回傳 (要拿來 refit 的 ONNX 路徑, engine metadata)；engine 不可 refit 或拓撲不同時丟 RefitError。"""
+    meta = read_meta(engine_path)
+    build = meta.get("build") or {}
+    if not build.get("refittable"):
+        raise RefitError(f"{engine_path} was not built with --refittable (or has no metadata), rebuild it")
+    if not build.get("topology"):
+        raise RefitError(f"{engine_path} metadata has no topology hash, rebuild it")
+    path = prepare_onnx(onnx_path, bool(build.get("optimized")))
+    topo = topology_digest(path)
+    if topo != build["topology"]:
+        raise RefitError(
+            f"{onnx_path} has a different graph topology than {engine_path} "
+            f"({topo[:12]} != {build['topology'][:12]}), a full rebuild is needed"
+        )
+    return path, meta
+
+
+def _set_weights_manually(refitter, onnx_path: str) -> list:
+    """
+    沒有 OnnxParserRefitter（TensorRT < 10）時，依名稱把 ONNX initializer 逐一交給 refitter。
+    回傳設定過的 array：trt.Weights 不持有記憶體，refit 完成前呼叫端要一直拿著。
+    """
+    import numpy as np
+    import onnx
+    import tensorrt as trt
+    from onnx import numpy_helper
+
+    wanted = set(refitter.get_all_weights())
+    keep = []
+    for init in onnx.load(onnx_path).graph.initializer:
+        if init.name not in wanted:
+            continue
+        arr = np.ascontiguousarray(numpy_helper.to_array(init))
+        keep.append(arr)
+        if not refitter.set_named_weights(init.name, trt.Weights(arr)):
+            raise RefitError(f"refitter rejected weights '{init.name}'")
+    return keep
+
+
+def refit_engine(
+    engine_path: str | Path,
+    onnx_path: str | Path,
+    output: str | Path | None = None,
+    check: bool = True,
+) -> dict:
+    """
+    以 onnx_path 的權重更新 engine，寫到 output（預設原地覆蓋，先寫暫存檔再替換）。
+    回傳 {"onnx", "seconds", "weights"}，也記錄在 metadata 的 build.refit。
+    """
+    import tensorrt as trt
+
+    t0 = time.perf_counter()
+    engine_path = Path(engine_path)
+    output = Path(output or engine_path)
+    if check:
+        path, meta = check_topology(engine_path, onnx_path)
+    else:
+        meta = read_meta(engine_path)
+        path = prepare_onnx(onnx_path, bool((meta.get("build") or {}).get("optimized")))
+    if (meta.get("build") or {}).get("precision") == "int8":
+        log.warning("INT8 engine: weights are refitted but the calibration scales are kept")
+
+    logger = trt.Logger(trt.Logger.WARNING)
+    trt.init_libnvinfer_plugins(logger, "")
+    runtime = trt.Runtime(logger)
+    with open(engine_path, "rb") as f:
+        engine = runtime.deserialize_cuda_engine(f.read())
+    if engine is None:
+        raise RefitError(f"failed to load {engine_path}")
+    if not engine.refittable:
+        raise RefitError(f"{engine_path} is not refittable, rebuild it with --refittable")
+
+    refitter = trt.Refitter(engine, logger)
+    if hasattr(trt, "OnnxParserRefitter"):
+        parser = trt.OnnxParserRefitter(refitter, logger)
+        if not parser.refit_from_file(path):
+            errors = [str(parser.get_error(i)) for i in range(parser.num_errors)]
+            raise RefitError("failed to read weights from {}: {}".format(path, "; ".join(errors)))
+        weights = len(refitter.get_all_weights())
+    else:
+        arrays = _set_weights_manually(refitter, path)
+        weights = len(arrays)
+    missing = refitter.get_missing_weights()
+    if missing:
+        raise RefitError("weights missing for refit: " + ", ".join(missing[:10]))
+    if not refitter.refit_cuda_engine():
+        raise RefitError("refit_cuda_engine failed")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=output.parent, prefix=output.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(memoryview(engine.serialize()))
+        os.replace(tmp, output)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    result = {
+        "onnx": str(Path(onnx_path).resolve()),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "weights": weights,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    if output != engine_path:
+        copy_meta(engine_path, output)
+    update_meta(output, build={"graph": graph_digest(path), "refit": result})
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update a refittable engine with the weights of a new ONNX model")
+    parser.add_argument("engine", help="engine built with utils/export.py --refittable")
+    parser.add_argument("onnx", help="retrained ONNX model with the same topology")
+    parser.add_argument("-o", "--output", default=None, help="write the refitted engine here (default: in place)")
+    parser.add_argument("--check", action="store_true", help="only compare the topology, do not refit")
+    parser.add_argument("--force", action="store_true", help="skip the topology check")
+    args = parser.parse_args()
+
+    try:
+        if args.check:
+            path, meta = check_topology(args.engine, args.onnx)
+            print(f"topology matches ({meta['build']['topology'][:12]}), {args.onnx} can be refitted into {args.engine}")
+        else:
+            res = refit_engine(args.engine, args.onnx, args.output, check=not args.force)
+            print(f"refitted {res['weights']} weights in {res['seconds']:.2f} s -> {args.output or args.engine}")
+    except RefitError as e:
+        print(f"error: {e}")
+        raise SystemExit(1)
@@ -0,0 +1,423 @@
+# ./utils/sensitivity.py
+"""
+INT8 逐層敏感度分析：找出量化後誤差最大的層，固定成 fp16（或 fp32），其餘維持 INT8。
+
+1. 建兩個「探測」engine（fp32 與 int8），把可量化層（conv / matmul / deconv）的輸出都標成網路輸出
+2. 在校正子集上同時跑兩者，每個張量算 int8 相對 fp32 的 NRMSE；
+   一層的「貢獻」= 自身輸出誤差 - 輸入端（最近的被量測祖先）誤差中的最大者，只算這層新增的部分
+3. 依貢獻排序，把前 k 層（k = 0, 1, 2, 4, 8 ...）固定精度後重建一般 engine，
+   最終輸出誤差（同 utils/autotune.py：1-F1 或相對誤差）<= tolerance 時停止
+4. 選中的 overrides 寫成 JSON，utils/export.py --layer_precisions 讀它即可重現同一個 engine
+
+探測 engine 因為中間輸出被標記，部分融合會被拆開，量到的是近似值；最後的選擇一律以一般 engine 的輸出為準。
+
+    python -m utils.sensitivity models/best.onnx -e models/best-mixed.trt --calib_input ./calib --images ./calib --end2end --v8
+    python -m utils.sensitivity models/best.onnx -e /tmp/mixed.trt --fake      # 不需要 GPU，走完整流程
+    python utils/export.py -o models/best.onnx -e models/best-mixed.trt -p int8 --layer_precisions models/best-mixed.precision.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+
+from utils.autotune import load_inputs, onnx_input_shape, output_error, run_engine
+from utils.engine_meta import copy_meta, update_meta
+
+log = logging.getLogger("EngineBuilder")
+
+SENSITIVITY_DIR = Path("./models/sensitivity")
+# INT8 量化主要落在這些層；其他層（激活、concat、resize...）跟著輸入的精度走
+PROBE_TYPES = ("CONVOLUTION", "DECONVOLUTION", "MATRIX_MULTIPLY", "FULLY_CONNECTED")
+PRECISIONS = ("fp16", "fp32")
+
+
+# -------- overrides 檔 --------
+def overrides_path(engine_path: str | Path) -> Path:
+    """models/best-mixed.trt -> models/best-mixed.precision.json"""
+    return Path(engine_path).with_suffix(".precision.json")
+
+
+def save_overrides(path: str | Path, layers: dict[str, str], **info):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({**info, "layers": layers}, f, ensure_ascii=False, indent=2)
+
+
+def load_overrides(path: str | Path, onnx_path: str | Path | None = None) -> dict[str, str]:
+    """
+    讀 overrides JSON 的 {layer 名稱: 精度}。
+    給了 onnx_path 時比對記錄的 graph 雜湊，不同只警告（層名稱通常還對得上，對不上的會被略過）。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    layers = data.get("layers", data)
+    bad = {k: v for k, v in layers.items() if v not in PRECISIONS}
+    if bad:
+        raise ValueError(f"unsupported precision in {path}: {bad}, expected one of {PRECISIONS}")
+    if onnx_path and data.get("graph"):
+        from utils.calib_cache import graph_digest
+
+        if graph_digest(onnx_path) != data["graph"]:
+            log.warning("Layer precision overrides {} were made for a different ONNX graph".format(path))
+    return dict(layers)
+
+
+# -------- 誤差（純 numpy，不需要 GPU） --------
+def accumulate_errors(pairs: Iterable[tuple[dict, dict]]) -> dict[str, float]:
+    """
+    pairs 是每個輸入的 (fp32 輸出, int8 輸出)，皆為 {張量名稱: array}。
+    回傳每個張量的 NRMSE = sqrt(sum((b - a)^2) / sum(a^2))，逐筆累加，不需要保留所有輸出。
+    """
+    se: dict[str, float] = {}
+    power: dict[str, float] = {}
+    for ref, out in pairs:
+        for name, a in ref.items():
+            if name not in out:
+                continue
+            a = np.asarray(a, dtype=np.float64)
+            b = np.asarray(out[name], dtype=np.float64)
+            if a.shape != b.shape:
+                continue
+            se[name] = se.get(name, 0.0) + float(np.sum((b - a) ** 2))
+            power[name] = power.get(name, 0.0) + float(np.sum(a * a))
+    return {n: float(np.sqrt(se[n] / power[n])) if power[n] > 0 else float(np.sqrt(se[n])) for n in se}
+
+
+def layer_scores(layers: list[dict], errors: dict[str, float], probed: Iterable[str]) -> list[dict]:
+    """
+    每個被量測層的 {"name", "type", "error", "input_error", "score"}，依 score 由大到小。
+    輸入誤差沿著未量測的層往上找最近的被量測張量；找不到（例如直接接網路輸入）視為 0。
+    """
+    producer = {t: layer for layer in layers for t in layer["outputs"]}
+    memo: dict[str, float] = {}
+
+    def tensor_error(name: str, seen: frozenset) -> float:
+        if name in errors:
+            return errors[name]
+        if name in memo:
+            return memo[name]
+        layer = producer.get(name)
+        if layer is None or layer["name"] in seen:
+            return 0.0
+        seen = seen | {layer["name"]}
+        memo[name] = max((tensor_error(t, seen) for t in layer["inputs"]), default=0.0)
+        return memo[name]
+
+    probed = set(probed)
+    scores = []
+    for layer in layers:
+        if layer["name"] not in probed:
+            continue
+        out_err = max((errors[t] for t in layer["outputs"] if t in errors), default=None)
+        if out_err is None:
+            continue
+        in_err = max((tensor_error(t, frozenset([layer["name"]])) for t in layer["inputs"]), default=0.0)
+        scores.append({
+            "name": layer["name"],
+            "type": layer["type"],
+            "error": out_err,
+            "input_error": in_err,
+            "score": out_err - in_err,
+        })
+    scores.sort(key=lambda s: -s["score"])
+    return scores
+
+
+def pin_counts(n: int, max_pinned: int | None = None) -> list[int]:
+    """要嘗試固定的層數：0, 1, 2, 4, 8 ... 直到 max_pinned（或 n）。"""
+    limit = n if max_pinned is None else min(n, max_pinned)
+    counts, k = [0], 1
+    while k < limit:
+        counts.append(k)
+        k *= 2
+    if limit > 0 and counts[-1] != limit:
+        counts.append(limit)
+    return counts
+
+
+# -------- 建置 / 執行（可替換成假的，見 fake_*） --------
+def build_probe(onnx_path: str, engine_path: str, params: dict) -> dict:
+    """建出標記了可量化層輸出的 engine，回傳 {"layers": 網路描述, "probed": 被量測的層名稱}。"""
+    from utils.export import EngineBuilder
+
+    params = dict(params)
+    b = EngineBuilder(verbose=params.pop("verbose", False), workspace=params.pop("workspace", 2))
+    b.create_network(
+        onnx_path,
+        params.pop("end2end", False),
+        params.pop("conf_thres", 0.4),
+        params.pop("iou_thres", 0.5),
+        params.pop("max_det", 100),
+        v8=params.pop("v8", False),
+        v10=params.pop("v10", False),
+        no_class_agnostic=params.pop("no_class_agnostic", False),
+    )
+    layers = b.describe_network()
+    probed = [layer["name"] for layer in layers if layer["type"] in PROBE_TYPES]
+    b.mark_layer_outputs(probed)
+    b.create_engine(engine_path, params.pop("precision"), **params)
+    return {"layers": layers, "probed": probed}
+
+
+def build_engine(onnx_path: str, engine_path: str, params: dict):
+    from utils.export import onnx_to_trt
+
+    onnx_to_trt(onnx_path, engine_path, **params)
+
+
+def run_pairs(ref_engine: str, engine: str, inputs: list[np.ndarray]) -> Iterable[tuple[dict, dict]]:
+    """兩個 engine 輪流跑同一個輸入，逐筆產生 ({名稱: fp32 輸出}, {名稱: int8 輸出})。"""
+    from inference import BaseEngine
+
+    ref, eng = BaseEngine(ref_engine), BaseEngine(engine)
+    try:
+        for x in inputs:
+            a = {o["name"]: h.copy() for o, h in zip(ref.outputs, ref.infer(x))}
+            b = {o["name"]: h.copy() for o, h in zip(eng.outputs, eng.infer(x))}
+            yield a, b
+    finally:
+        ref.close()
+        eng.close()
+
+
+# 假的網路：conv{i} -> act{i} 的鏈，少數幾層量化誤差特別大
+FAKE_LAYERS = 12
+FAKE_NOISE = {3: 0.02, 7: 0.05, 10: 0.015}
+FAKE_BASE_NOISE = 0.001
+
+
+def _fake_noise(i: int) -> float:
+    return FAKE_NOISE.get(i, FAKE_BASE_NOISE)
+
+
+def fake_probe(onnx_path: str, engine_path: str, params: dict) -> dict:
+    layers = []
+    prev = "images"
+    for i in range(FAKE_LAYERS):
+        layers.append({"name": f"conv{i}", "type": "CONVOLUTION", "inputs": [prev], "outputs": [f"c{i}"]})
+        layers.append({"name": f"act{i}", "type": "ACTIVATION", "inputs": [f"c{i}"], "outputs": [f"a{i}"]})
+        prev = f"a{i}"
+    with open(engine_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return {"layers": layers, "probed": [f"conv{i}" for i in range(FAKE_LAYERS)]}
+
+
+def fake_build(onnx_path: str, engine_path: str, params: dict):
+    with open(engine_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+
+def _fake_cum_noise(params: dict) -> list[float]:
+    if params.get("precision") != "int8":
+        return [0.0] * FAKE_LAYERS
+    pinned = params.get("layer_precisions") or {}
+    cum, total = [], 0.0
+    for i in range(FAKE_LAYERS):
+        total += 0.0 if f"conv{i}" in pinned else _fake_noise(i)
+        cum.append(total)
+    return cum
+
+
+def fake_pairs(ref_engine: str, engine: str, inputs: list[np.ndarray]) -> Iterable[tuple[dict, dict]]:
+    with open(engine, encoding="utf-8") as f:
+        cum = _fake_cum_noise(json.load(f))
+    for x in inputs:
+        a = {f"c{i}": x for i in range(FAKE_LAYERS)}
+        b = {f"c{i}": x * (1 + cum[i]) for i in range(FAKE_LAYERS)}
+        yield a, b
+
+
+def fake_run(engine_path: str, inputs: list[np.ndarray], iterations: int, warmup: int):
+    """int8 最快，每固定一層慢 0.05 ms；輸出誤差為未固定層的誤差總和。"""
+    with open(engine_path, encoding="utf-8") as f:
+        p = json.load(f)
+    cum = _fake_cum_noise(p)
+    ms = {"fp32": 4.0, "fp16": 2.0, "int8": 1.5}[p.get("precision", "fp16")]
+    ms += 0.05 * len(p.get("layer_precisions") or {})
+    return [[x * (1 + cum[-1])] for x in inputs], np.full(iterations, ms)
+
+
+# -------- 流程 --------
+def sensitivity(
+    onnx_path: str | Path,
+    engine_path: str | Path,
+    base: dict | None = None,
+    images: str | Path | None = None,
+    num_inputs: int = 32,
+    tolerance: float = 0.02,
+    pin: str = "fp16",
+    max_pinned: int | None = None,
+    iterations: int = 100,
+    warmup: int = 10,
+    work_dir: str | Path = SENSITIVITY_DIR,
+    probe_fn: Callable = build_probe,
+    build_fn: Callable = build_engine,
+    pairs_fn: Callable = run_pairs,
+    run_fn: Callable = run_engine,
+    progress: Callable[[str], None] | None = None,
+) -> dict:
+    """
+    回傳結果摘要（也寫進 engine metadata 的 "sensitivity" 區塊）：
+    {"scores", "candidates": [{"pinned", "p50_ms", "error", "passed"}], "chosen", "overrides"}。
+    沒有候選通過時不寫出 engine，chosen 為 None。
+    """
+    from utils.calib_cache import graph_digest
+
+    if pin not in PRECISIONS:
+        raise ValueError(f"pin must be one of {PRECISIONS}")
+    say = progress or (lambda msg: None)
+    base = dict(base or {})
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(onnx_path).stem
+    inputs = load_inputs(images, onnx_input_shape(onnx_path), count=num_inputs)
+
+    # 1. 探測 engine，逐層誤差
+    t0 = time.perf_counter()
+    ref_probe = str(work_dir / f"{stem}-probe-fp32.trt")
+    int8_probe = str(work_dir / f"{stem}-probe-int8.trt")
+    net = probe_fn(str(onnx_path), ref_probe, {**base, "precision": "fp32"})
+    probe_fn(str(onnx_path), int8_probe, {**base, "precision": "int8"})
+    errors = accumulate_errors(pairs_fn(ref_probe, int8_probe, inputs))
+    scores = layer_scores(net["layers"], errors, net["probed"])
+    say(f"probed {len(scores)} layers on {len(inputs)} inputs in {time.perf_counter() - t0:.1f} s")
+
+    # 2. fp32 參考輸出
+    ref_engine = str(work_dir / f"{stem}-fp32.trt")
+    build_fn(str(onnx_path), ref_engine, {**base, "precision": "fp32"})
+    ref_outputs, ref_t = run_fn(ref_engine, inputs, iterations, warmup)
+
+    # 3. 固定前 k 層，直到輸出誤差在門檻內
+    candidates, chosen = [], None
+    for k in pin_counts(len(scores), max_pinned):
+        overrides = {s["name"]: pin for s in scores[:k]}
+        path = str(work_dir / f"{stem}-int8-pin{k}.trt")
+        build_fn(str(onnx_path), path, {**base, "precision": "int8", "layer_precisions": overrides})
+        outputs, t = run_fn(path, inputs, iterations, warmup)
+        err = output_error(ref_outputs, outputs)
+        cand = {
+            "pinned": k,
+            "engine": path,
+            "p50_ms": float(np.median(t)),
+            **err,
+            "passed": err["error"] <= tolerance,
+            "overrides": overrides,
+        }
+        candidates.append(cand)
+        say(f"pin {k:>3} layers: p50 {cand['p50_ms']:.3f} ms, {err['metric']} {err['error']:.4f}"
+            + (" ok" if cand["passed"] else ""))
+        if cand["passed"]:
+            chosen = cand
+            break
+
+    summary = {
+        "onnx": str(Path(onnx_path).resolve()),
+        "pin": pin,
+        "tolerance": tolerance,
+        "reference_p50_ms": round(float(np.median(ref_t)), 4),
+        "inputs": str(images) if images else f"random x{len(inputs)}",
+        "scores": [{k: (round(v, 6) if isinstance(v, float) else v) for k, v in s.items()} for s in scores],
+        "candidates": [
+            {k: (round(v, 6) if isinstance(v, float) else v) for k, v in c.items() if k not in ("engine", "overrides")}
+            for c in candidates
+        ],
+        "chosen": None,
+        "overrides": None,
+    }
+    if chosen is None:
+        return summary
+
+    engine_path = Path(engine_path)
+    engine_path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(chosen["engine"], engine_path)
+    copy_meta(chosen["engine"], engine_path)
+    ov_path = overrides_path(engine_path)
+    save_overrides(
+        ov_path,
+        chosen["overrides"],
+        onnx=summary["onnx"],
+        graph=graph_digest(onnx_path),
+        error=chosen["error"],
+        metric=chosen["metric"],
+        tolerance=tolerance,
+        time=time.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+    summary["chosen"] = chosen["pinned"]
+    summary["overrides"] = str(ov_path)
+    update_meta(engine_path, sensitivity={**summary, "scores": summary["scores"][:20]})
+    return summary
+
+
+def format_scores(scores: list[dict], pinned: int | None = None, top: int = 20) -> str:
+    width = max([5] + [len(s["name"]) for s in scores[:top]])
+    head = f"{'':2}{'layer':<{width}}  {'type':<14} {'error':>9} {'input':>9} {'added':>9}"
+    lines = [head, "-" * len(head)]
+    for i, s in enumerate(scores[:top]):
+        mark = "* " if pinned is not None and i < pinned else "  "
+        lines.append(
+            f"{mark}{s['name']:<{width}}  {s['type']:<14} {s['error']:9.4f} {s['input_error']:9.4f} {s['score']:9.4f}"
+        )
+    if len(scores) > top:
+        lines.append(f"  ... {len(scores) - top} more")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pin the most INT8-sensitive layers to a higher precision")
+    parser.add_argument("onnx", help="input ONNX model")
+    parser.add_argument("-e", "--engine", required=True, help="where to write the mixed-precision engine")
+    parser.add_argument("--pin", default="fp16", choices=PRECISIONS, help="precision for the pinned layers")
+    parser.add_argument("--max_pinned", type=int, default=None, help="give up after pinning this many layers")
+    parser.add_argument("--images", default=None, help="representative input images (default: random)")
+    parser.add_argument("--num_inputs", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="max error vs fp32 (1-F1 or relative)")
+    parser.add_argument("--iters", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--work_dir", default=str(SENSITIVITY_DIR))
+    parser.add_argument("--fake", action="store_true", help="fake network / builder / runner (no GPU)")
+    base_args = parser.add_argument_group("fixed export options (see utils/export.py)")
+    base_args.add_argument("--end2end", action="store_true")
+    base_args.add_argument("--v8", action="store_true")
+    base_args.add_argument("--v10", action="store_true")
+    base_args.add_argument("--calib_input", default=None)
+    base_args.add_argument("--calib_cache", default=None)
+    base_args.add_argument("--calibrator", default="entropy", choices=("entropy", "minmax", "percentile"))
+    opt = parser.parse_args()
+
+    base = {"v8": opt.v8, "v10": opt.v10, "calib_input": opt.calib_input, "calib_cache": opt.calib_cache,
+            "calibrator": opt.calibrator}
+    if opt.end2end:
+        base["end2end"] = True
+    fakes = dict(probe_fn=fake_probe, build_fn=fake_build, pairs_fn=fake_pairs, run_fn=fake_run) if opt.fake else {}
+
+    summary = sensitivity(
+        opt.onnx,
+        opt.engine,
+        base=base,
+        images=opt.images,
+        num_inputs=opt.num_inputs,
+        tolerance=opt.tolerance,
+        pin=opt.pin,
+        max_pinned=opt.max_pinned,
+        iterations=opt.iters,
+        warmup=opt.warmup,
+        work_dir=opt.work_dir,
+        progress=lambda msg: print(msg, flush=True),
+        **fakes,
+    )
+    print()
+    print(format_scores(summary["scores"], summary["chosen"]))
+    print()
+    if summary["chosen"] is None:
+        print(f"no candidate within tolerance {opt.tolerance}, nothing written")
+        raise SystemExit(1)
+    print(f"pinned {summary['chosen']} layers to {opt.pin}: {opt.engine}")
+    print(f"overrides: {summary['overrides']} (utils/export.py --layer_precisions)")
@@ -0,0 +1,116 @@
+# ./utils/startup_profile.py
+"""
+解析 python -X importtime 的輸出，列出啟動時最花時間的 import。
+
+    python start.py --profile-startup            # 重新以 -X importtime 啟動並在結束時印出報告
+    python -m utils.startup_profile importtime.txt
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+PREFIX = "import time:"
+WINDOW_MARK = "startup: window shown"
+
+
+@dataclass(frozen=True, slots=True)
+class ImportEntry:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int  # 0 = 由程式碼直接 import，越大代表越深的相依
+
+
+def parse_importtime(lines: Iterable[str]) -> list[ImportEntry]:
+    """
+    每行格式：``import time:   self [us] | cumulative | imported package``，
+    套件名稱前的縮排（每層兩個空白）代表相依深度。
+    """
+    out: list[ImportEntry] = []
+    for line in lines:
+        if not line.startswith(PREFIX):
+            continue
+        parts = line[len(PREFIX):].split("|", 2)
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # 標題行
+        name = parts[2].rstrip("\n")[1:]  # 去掉 "|" 後固定的一個空白
+        stripped = name.lstrip(" ")
+        out.append(ImportEntry(stripped, self_us, cum_us, (len(name) - len(stripped)) // 2))
+    return out
+
+
+def top_level(entries: list[ImportEntry]) -> list[ImportEntry]:
+    """只留最外層（depth 最小）的 import，累計時間不會重複計算。"""
+    if not entries:
+        return []
+    d = min(e.depth for e in entries)
+    return [e for e in entries if e.depth == d]
+
+
+def format_report(entries: list[ImportEntry], top: int = 20) -> str:
+    roots = top_level(entries)
+    total = sum(e.cumulative_us for e in roots)
+    lines = [f"imports: {len(entries)} modules, {total / 1e3:.1f} ms total"]
+
+    lines.append(f"\n{'cumulative ms':>14} {'self ms':>9}  top-level import")
+    for e in sorted(roots, key=lambda e: e.cumulative_us, reverse=True)[:top]:
+        lines.append(f"{e.cumulative_us / 1e3:14.1f} {e.self_us / 1e3:9.1f}  {e.module}")
+
+    lines.append(f"\n{'self ms':>14} {'depth':>9}  slowest module bodies")
+    for e in sorted(entries, key=lambda e: e.self_us, reverse=True)[:top]:
+        lines.append(f"{e.self_us / 1e3:14.1f} {e.depth:9d}  {e.module}")
+    return "\n".join(lines)
+
+
+def run_profiled(argv: list[str], top: int = 20) -> int:
+    """
+    以 -X importtime 重新執行 argv（例如 ["start.py", "--log", "debug"]），
+    其他 stderr 輸出照常轉出，結束後印出 import 報告。
+    """
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-X", "importtime", *argv],
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        env={**os.environ, "STARTUP_PROFILE": str(time.time())},
+    )
+    collected: list[str] = []
+    for line in proc.stderr:
+        if line.startswith(PREFIX):
+            collected.append(line)
+        else:
+            sys.stderr.write(line)
+    code = proc.wait()
+
+    print(f"\n==== startup profile ({(time.perf_counter() - t0):.1f} s wall, exit {code}) ====")
+    print(format_report(parse_importtime(collected), top=top))
+    return code
+
+
+def mark_window_shown():
+    """在 window.show() 之後呼叫；由 --profile-startup 啟動時印出從啟動到視窗出現的時間。"""
+    started = os.environ.get("STARTUP_PROFILE")
+    if started:
+        print(f"{WINDOW_MARK} after {(time.time() - float(started)) * 1e3:.0f} ms", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize `python -X importtime` output")
+    parser.add_argument("file", help="captured stderr of a -X importtime run")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.file, encoding="utf-8", errors="replace") as f:
+        print(format_report(parse_importtime(f), top=args.top))
@@ -0,0 +1,321 @@
+# ./utils/sweep.py
+"""
+一次建置多種匯出參數組合的 engine，逐一 benchmark 後列出排名。
+
+    python -m utils.sweep models/best.onnx --grid precision=fp16,int8 max_det=100,300 \\
+        --end2end --v8 --calib_input ./calib --jobs 4 --gpu_jobs 1
+
+- 建置在 process pool 裡平行進行，同時使用 GPU 的數量由 --gpu_jobs 限制
+- engine 以「ONNX 雜湊 + 參數 + TensorRT 版本」命名，已經建過的直接沿用；
+  所有建置共用同一個 timing cache（tactic 量測結果）
+- benchmark 一次只跑一個（BaseEngine.benchmark），延遲數字才不會互相干擾
+- --fake 以假的 builder / benchmark 跑完整的排程與報表流程，不需要 GPU
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from utils.cache import JsonCache, digest_obj, file_digest
+from utils.engine_meta import copy_meta
+
+SWEEP_DIR = Path("./models/sweep")
+# 可以放進 grid 的 onnx_to_trt 參數
+GRID_KEYS = (
+    "precision",
+    "workspace",
+    "max_det",
+    "conf_thres",
+    "iou_thres",
+    "end2end",
+    "no_class_agnostic",
+    "pre_nms_topk",
+    "fp16_outputs",
+    "calib_num_images",
+    "calib_batch_size",
+    "calibrator",
+    "calib_percentile",
+    "builder_opt_level",
+    "tactic_sources",
+    "sparsity",
+)
+
+
+@dataclass
+class Variant:
+    params: dict
+    key: str
+    engine: str
+    status: str = "pending"  # built / cached / failed
+    build_s: float = 0.0
+    size_mb: float = 0.0
+    bench: dict = field(default_factory=dict)
+    error: str = ""
+
+
+def parse_value(text: str):
+    low = text.lower()
+    if low in ("true", "false"):
+        return low == "true"
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(items: list[str]) -> dict[str, list]:
+    """["precision=fp16,int8", "max_det=100"] -> {"precision": ["fp16", "int8"], "max_det": [100]}"""
+    grid: dict[str, list] = {}
+    for item in items:
+        key, sep, values = item.partition("=")
+        if not sep or not values:
+            raise ValueError(f"grid entry must look like key=v1,v2: {item!r}")
+        if key not in GRID_KEYS:
+            raise ValueError(f"unknown grid key {key!r}, expected one of {GRID_KEYS}")
+        grid[key] = [parse_value(v) for v in values.split(",")]
+    return grid
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict]:
+    keys = list(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+def _trt_version() -> str:
+    try:
+        import tensorrt as trt
+    except ImportError:
+        return "none"
+    return trt.__version__
+
+
+def plan(onnx_path: str | Path, grid: dict[str, list], base: dict, out_dir: str | Path, tag: str = "") -> list[Variant]:
+    """決定每個組合的 engine 路徑；參數相同（含 base）就得到同一個檔名，重跑時可以沿用。"""
+    onnx_path = Path(onnx_path)
+    digest = file_digest(onnx_path)
+    tag = tag or _trt_version()
+    out = []
+    for params in expand_grid(grid):
+        full = {**base, **params}
+        key = digest_obj({"onnx": digest, "params": full, "trt": tag})[:12]
+        name = "-".join([onnx_path.stem, str(full.get("precision", "fp16")), key]) + ".trt"
+        out.append(Variant(params=params, key=key, engine=str(Path(out_dir) / name)))
+    return out
+
+
+# -------- builder / benchmark（可替換成假的，見 fake_build / fake_bench） --------
+def build_engine(onnx_path: str, engine_path: str, params: dict, timing_cache: str | None):
+    from utils.export import onnx_to_trt
+
+    # ONNX 已在 run_sweep 裡先最佳化過一次，這裡不再重跑；params["onnx_source"] 是原始模型，寫進 metadata
+    onnx_to_trt(onnx_path, engine_path, optimize=False, timing_cache=timing_cache, **params)
+
+
+def bench_engine(engine_path: str, iterations: int, warmup: int) -> dict:
+    from inference import BaseEngine
+
+    eng = BaseEngine(engine_path)
+    try:
+        return eng.benchmark(iterations, warmup)
+    finally:
+        eng.close()
+
+
+def fake_build(onnx_path: str, engine_path: str, params: dict, timing_cache: str | None):
+    """不需要 GPU 的假 builder：依參數寫出大小不同的檔案，模擬建置時間。"""
+    scale = {"fp32": 4, "fp16": 2, "int8": 1}.get(params.get("precision", "fp16"), 2)
+    time.sleep(0.05 * scale)
+    if params.get("max_det") == -1:
+        raise RuntimeError("fake build failure")
+    with open(engine_path, "wb") as f:
+        f.write(b"\0" * (scale * 256 * 1024 + int(params.get("max_det", 100))))
+
+
+def fake_bench(engine_path: str, iterations: int, warmup: int) -> dict:
+    ms = os.path.getsize(engine_path) / (1 << 20) + 0.5
+    return {"iterations": iterations, "mean_ms": ms, "p50_ms": ms, "p90_ms": ms * 1.1, "p99_ms": ms * 1.3, "max_ms": ms * 1.5}
+
+
+def _build_job(
+    build_fn: Callable, gpu_slots, onnx_path: str, v: Variant, base: dict, timing_cache: str | None, build_kw: dict
+):
+    """
+    在 worker process 裡執行；先寫到暫存檔，成功才換成正式檔名，失敗不會留下半個 engine。
+    build_kw 只傳給 builder，不算進 engine 的 key / 紀錄。
+    """
+    tmp = v.engine + ".partial"
+    t0 = time.perf_counter()
+    try:
+        with gpu_slots:
+            t0 = time.perf_counter()  # 不把排隊等 GPU 的時間算進建置時間
+            build_fn(onnx_path, tmp, {**base, **v.params, **build_kw}, timing_cache)
+        os.replace(tmp, v.engine)
+        copy_meta(tmp, v.engine, move=True)
+        v.status = "built"
+    except BaseException as e:  # export 失敗時會 sys.exit
+        v.status = "failed"
+        v.error = f"{type(e).__name__}: {e}"
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    v.build_s = time.perf_counter() - t0
+    return v
+
+
+def run_sweep(
+    onnx_path: str | Path,
+    grid: dict[str, list],
+    base: dict | None = None,
+    out_dir: str | Path = SWEEP_DIR,
+    jobs: int = 2,
+    gpu_jobs: int = 1,
+    iterations: int = 200,
+    warmup: int = 20,
+    build_fn: Callable = build_engine,
+    bench_fn: Callable = bench_engine,
+    optimize: bool = True,
+    tag: str = "",
+    progress: Callable[[Variant], None] | None = None,
+) -> list[Variant]:
+    """
+    建置（平行，GPU 同時最多 gpu_jobs 個）→ benchmark（依序）。回傳 rank() 排序前的結果。
+    build_fn / bench_fn 需為模組層級函式（process pool 要能 pickle）。
+    """
+    import multiprocessing as mp
+
+    base = dict(base or {})
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    variants = plan(onnx_path, grid, base, out_dir, tag=tag)
+    history = JsonCache(out_dir / "sweep.json")
+
+    src = str(onnx_path)
+    todo = []
+    for v in variants:
+        if os.path.exists(v.engine):
+            v.status = "cached"
+            v.build_s = float((history.get(v.key) or {}).get("build_s", 0.0))
+            if progress:
+                progress(v)
+        else:
+            todo.append(v)
+
+    if todo:
+        build_kw = {}
+        if optimize and build_fn is build_engine:
+            from utils.onnx_opt import optimize_onnx
+
+            src = str(optimize_onnx(onnx_path)[0])  # 只做一次，所有 worker 共用
+            build_kw["onnx_source"] = str(onnx_path)  # metadata 記錄原始模型與 optimized=True
+        timing_cache = str(out_dir / "timing.cache")
+        with mp.Manager() as manager, ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+            gpu_slots = manager.Semaphore(max(1, gpu_jobs))
+            futures = [
+                pool.submit(_build_job, build_fn, gpu_slots, src, v, base, timing_cache, build_kw) for v in todo
+            ]
+            done = {}
+            for fut in as_completed(futures):
+                v = fut.result()
+                done[v.key] = v
+                if v.status == "built":
+                    history.put(v.key, {"params": {**base, **v.params}, "build_s": round(v.build_s, 3)}, keep=0)
+                if progress:
+                    progress(v)
+        variants = [done.get(v.key, v) for v in variants]
+
+    for v in variants:
+        if v.status == "failed":
+            continue
+        v.size_mb = os.path.getsize(v.engine) / (1 << 20)
+        try:
+            v.bench = bench_fn(v.engine, iterations, warmup)
+        except Exception as e:
+            v.status, v.error = "failed", f"benchmark {type(e).__name__}: {e}"
+    return variants
+
+
+def rank(variants: list[Variant], by: str = "p50_ms") -> list[Variant]:
+    """成功的依延遲（同分比檔案大小）排序，失敗的放最後。"""
+    ok = [v for v in variants if v.status != "failed"]
+    bad = [v for v in variants if v.status == "failed"]
+    ok.sort(key=lambda v: (v.bench.get(by, float("inf")), v.size_mb))
+    return ok + bad
+
+
+def format_table(variants: list[Variant]) -> str:
+    keys = sorted({k for v in variants for k in v.params})
+    head = f"{'#':>3} {'p50 ms':>8} {'p99 ms':>8} {'MB':>7} {'build s':>8} {'status':<7} " + " ".join(
+        f"{k:<10}" for k in keys
+    )
+    lines = [head, "-" * len(head)]
+    for i, v in enumerate(variants, 1):
+        params = " ".join(f"{str(v.params.get(k, '')):<10}" for k in keys)
+        if v.status == "failed":
+            lines.append(f"{'-':>3} {'-':>8} {'-':>8} {'-':>7} {v.build_s:8.1f} {v.status:<7} {params}  {v.error}")
+            continue
+        lines.append(
+            f"{i:3d} {v.bench.get('p50_ms', 0):8.3f} {v.bench.get('p99_ms', 0):8.3f} {v.size_mb:7.1f} "
+            f"{v.build_s:8.1f} {v.status:<7} {params}"
+        )
+    if variants and variants[0].status != "failed":
+        lines.append(f"\nbest: {variants[0].engine}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and benchmark a grid of export variants")
+    parser.add_argument("onnx", help="input ONNX model")
+    parser.add_argument("--grid", nargs="+", required=True, help="key=v1,v2 ... (keys: " + ", ".join(GRID_KEYS) + ")")
+    parser.add_argument("--out_dir", default=str(SWEEP_DIR))
+    parser.add_argument("--jobs", type=int, default=2, help="build processes")
+    parser.add_argument("--gpu_jobs", type=int, default=1, help="builds allowed on the GPU at the same time")
+    parser.add_argument("--iters", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--json", default=None, help="write the ranked results here")
+    parser.add_argument("--fake", action="store_true", help="fake builder / benchmark (no GPU)")
+    base_args = parser.add_argument_group("fixed export options (see utils/export.py)")
+    base_args.add_argument("--end2end", action="store_true")
+    base_args.add_argument("--v8", action="store_true")
+    base_args.add_argument("--v10", action="store_true")
+    base_args.add_argument("--calib_input", default=None)
+    base_args.add_argument("--calib_cache", default=None)
+    opt = parser.parse_args()
+
+    try:
+        grid = parse_grid(opt.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    base = {"v8": opt.v8, "v10": opt.v10, "calib_input": opt.calib_input, "calib_cache": opt.calib_cache}
+    if opt.end2end:
+        base["end2end"] = True
+
+    t0 = time.perf_counter()
+    results = run_sweep(
+        opt.onnx,
+        grid,
+        base,
+        out_dir=opt.out_dir,
+        jobs=opt.jobs,
+        gpu_jobs=opt.gpu_jobs,
+        iterations=opt.iters,
+        warmup=opt.warmup,
+        build_fn=fake_build if opt.fake else build_engine,
+        bench_fn=fake_bench if opt.fake else bench_engine,
+        tag="fake" if opt.fake else "",
+        progress=lambda v: print(f"[{v.status}] {Path(v.engine).name} {v.params} {v.error}".rstrip(), flush=True),
+    )
+    ranked = rank(results)
+    print(f"\n{len(results)} variants in {time.perf_counter() - t0:.1f} s")
+    print(format_table(ranked))
+    if opt.json:
+        Path(opt.json).write_text(json.dumps([asdict(v) for v in ranked], indent=2), encoding="utf-8")
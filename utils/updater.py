@@ -1,26 +1,109 @@
 import os
 import sys
 import json
+import time
+import queue
 import hashlib
 import tempfile
 import shutil
+import threading
 import os, tempfile, yaml
 from pathlib import Path
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 from .logger import get_logger, LoggerConfig
-
-import requests
+from .cache import file_digest
+from .config import deep_merge
 
 APP_VERSION = "1.0.0"
 OWNER = "carsupper665"
 REPO = "TensorRT-YOLO-assist"
 VERSION_URL = f"https://api.github.com/repos/{OWNER}/{REPO}/releases/latest"
 
+RAW_URL = f"https://raw.githubusercontent.com/{OWNER}/{REPO}/{{tag}}/"
+VERSION_ASSET = "version.json"
+MANIFEST_ASSET = "manifest.json"  # {"files": {"相對路徑": {"sha256", "size", "url"(可省略)}}, "base_url"(可省略)}
+DELTA_WORKERS = 4
+
+CHUNK_SIZE = 1 << 20  # 1 MB
+PROGRESS_INTERVAL = 0.25  # 秒，進度回報的最短間隔
+DOWNLOAD_RETRIES = 5
+
+
+class _ChunkSink:
+    """
+    背景執行緒寫檔 + 計算雜湊，主執行緒只負責從 socket 讀資料，兩邊可以重疊
+    （hashlib 處理大塊資料時會釋放 GIL）。
+    """
+    def __init__(self, f, h):
+        self._f = f
+        self._h = h
+        self._q: queue.Queue = queue.Queue(maxsize=8)  # 最多暫存 8 MB
+        self._err: BaseException | None = None
+        self._t = threading.Thread(target=self._run, name="download-sink", daemon=True)
+        self._t.start()
+
+    def _run(self):
+        while (chunk := self._q.get()) is not None:
+            if self._err is not None:
+                continue  # 已經出錯，把剩下的丟掉
+            try:
+                self._f.write(chunk)
+                self._h.update(chunk)
+            except BaseException as e:
+                self._err = e
+
+    def put(self, chunk: bytes):
+        if self._err is not None:
+            raise self._err
+        self._q.put(chunk)
+
+    def close(self):
+        self._q.put(None)
+        self._t.join()
+        if self._err is not None:
+            raise self._err
+
+def _safe_rel(rel: str) -> Path:
+    """manifest 裡的路徑只能是 install_dir 底下的相對路徑。"""
+    p = Path(rel)
+    if p.is_absolute() or p.drive or ".." in p.parts or not p.parts:
+        raise ValueError(f"unsafe path in manifest: {rel!r}")
+    return p
+
+
+def diff_manifest(remote: dict[str, dict], local: dict[str, str | None]) -> list[str]:
+    """回傳需要下載的檔案：本機不存在或 sha256 不同。local: {相對路徑: sha256 或 None}"""
+    return sorted(
+        rel for rel, e in remote.items() if local.get(rel) != str(e["sha256"]).lower()
+    )
+
+
+def _link_or_copy(src: Path, dst: Path) -> bool:
+    """能 hardlink 就 hardlink，回傳是否為 hardlink。"""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copy2(src, dst)  # 不同磁碟 / 檔案系統不支援
+        return False
+
+
 class Updater():
-    def __init__(self, install_dir: str | Path | None = None, on_update_func: callable = None, value: int = None):
+    def __init__(
+        self,
+        install_dir: str | Path | None = None,
+        on_update_func: callable = None,
+        value: int = None,
+        version_url: str = VERSION_URL,
+    ):
         self.app_ver = APP_VERSION
+        self.version_url = version_url
         self.install_dir = Path(install_dir or os.path.dirname(os.path.abspath(sys.argv[0])))
         self.on_update: callable | None = on_update_func if on_update_func is not None else self._on_update
         self.value = value if value is not None else 0
+        self._last_progress = 0.0
         log_cfg = LoggerConfig(
             name="Updater",
             level="info",
@@ -38,7 +121,9 @@ class Updater():
         return
 
     def get_latest(self) -> dict:
-        r = requests.get(url=VERSION_URL, timeout=30)
+        import requests  # 只有檢查更新時才載入
+
+        r = requests.get(url=self.version_url, timeout=30)
         r.raise_for_status()
         return r.json()
 
@@ -54,77 +139,315 @@ class Updater():
     def _is_newer(self, remote: str, local: str) -> bool:
         return self._parse_version(remote) > self._parse_version(local)
 
-    def _download_file(self, url: str, dst: Path) -> str:
-        """下載檔案並回傳 sha256"""
+    def _download_file(
+        self,
+        url: str,
+        dst: Path,
+        chunk_size: int = CHUNK_SIZE,
+        retries: int = DOWNLOAD_RETRIES,
+        progress: bool = True,
+    ) -> str:
+        """
+        下載檔案並回傳 sha256。
+        先寫到 <dst>.part，連線中斷時用 HTTP Range 從已下載的位置續傳（同一次或下次啟動都可以），
+        完成後才改名成 dst。伺服器不支援 Range 時從頭下載。
+        """
+        import requests
+
+        dst = Path(dst)
+        part = dst.with_name(dst.name + ".part")
+        if progress:
+            self.logger.info("Downloading File....")
+
         h = hashlib.sha256()
-        last_print = -1
-        downloaded = 0
-        self.logger.info("Downloading File....")
-        with requests.get(url, stream=True, timeout=60) as r:
-            r.raise_for_status()
-            with open(dst, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if not chunk:
-                        continue
-                    f.write(chunk)
+        offset = 0
+        if part.exists():
+            # 續傳：已下載的部分要先補進雜湊
+            with open(part, "rb") as f:
+                while chunk := f.read(chunk_size):
                     h.update(chunk)
-                    downloaded += len(chunk)
-                    # 每下載一段就簡單顯示一次（或改成每 N KB 顯示）
-                    mb = downloaded / (1024 * 1024)
-                    if mb != last_print:
-                        last_print = mb
-                        self.on_update(id="update", status=f"Downloading... {mb:.2f} MB", value=self.value)
-                        print(
-                            f"\rDownloading... {mb:.2f} MB",
-                            end="",
-                            flush=True,
-                        )
-                        
+                    offset += len(chunk)
+            self.logger.info(f"Resuming download at {offset / (1024 * 1024):.2f} MB")
+
+        attempt = 0
+        while True:
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with requests.get(url, stream=True, timeout=60, headers=headers) as r:
+                    if offset and r.status_code == 416:
+                        break  # 要求的範圍超過檔案大小：.part 已經是完整檔案
+                    r.raise_for_status()
+                    if offset and r.status_code != 206:
+                        # 伺服器忽略 Range，整個檔案重新下載
+                        self.logger.warning("Server does not support resume, restarting download")
+                        h = hashlib.sha256()
+                        offset = 0
+
+                    length = r.headers.get("Content-Length")
+                    total = None
+                    if length is not None and not r.headers.get("Content-Encoding"):
+                        total = offset + int(length)  # 壓縮傳輸時長度和解壓後對不上
+                    with open(part, "ab" if offset else "wb") as f:
+                        sink = _ChunkSink(f, h)
+                        try:
+                            for chunk in r.iter_content(chunk_size=chunk_size):
+                                if not chunk:
+                                    continue
+                                sink.put(chunk)
+                                offset += len(chunk)
+                                if progress:
+                                    self._report_progress(offset, total)
+                        finally:
+                            sink.close()
+                    if total is not None and offset < total:
+                        raise requests.ConnectionError(f"connection closed at {offset}/{total} bytes")
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                attempt += 1
+                if attempt > retries:
+                    raise
+                wait = min(2 ** attempt, 30)
+                self.logger.warning(f"Download interrupted ({e}), retry {attempt}/{retries} in {wait}s")
+                time.sleep(wait)
+
+        if progress:
+            self._report_progress(offset, offset, force=True)
+            print()
+        os.replace(part, dst)
         return h.hexdigest()
 
-    def backup(self, backup_dir: Path | None = None) -> Path:
-        """簡單把目前安裝目錄備份一份"""
+    def _report_progress(self, done: int, total: int | None, force: bool = False):
+        """依時間節流：每 PROGRESS_INTERVAL 秒最多回報一次。"""
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        mb = done / (1024 * 1024)
+        status = f"Downloading... {mb:.2f} MB"
+        if total:
+            status += f" / {total / (1024 * 1024):.2f} MB ({done * 100 // total}%)"
+        self.on_update(id="update", status=status, value=self.value)
+        print(f"\r{status}", end="", flush=True)
+
+    def backup(self, files: list[Path] | None = None, backup_dir: Path | None = None) -> Path:
+        """
+        備份安裝目錄。files（相對於 install_dir）有給時只備份這些會被覆蓋的檔案，
+        能用 hardlink 就用 hardlink（套用更新時是整個換掉檔案，不會改到原本的 inode）。
+        """
         backup_dir = backup_dir or (self.install_dir.parent / (self.install_dir.name + "_backup"))
         backup_dir = Path(backup_dir)
         if backup_dir.exists():
             shutil.rmtree(backup_dir)
-        shutil.copytree(self.install_dir, backup_dir)
+        if files is None:
+            shutil.copytree(self.install_dir, backup_dir)
+            return backup_dir
+
+        linked = copied = 0
+        for rel in files:
+            src = self.install_dir / rel
+            if not src.is_file():
+                continue  # 新檔案，沒有舊版可備份
+            if _link_or_copy(src, backup_dir / rel):
+                linked += 1
+            else:
+                copied += 1
+        self.logger.info(f"Backed up {linked + copied} files ({linked} hardlinked, {copied} copied)")
         return backup_dir
 
-    def _apply_update_zip(self, zip_path: Path):
+    @staticmethod
+    def _find_zip(search_dir: Path) -> Path:
+        for root, dirs, files in os.walk(search_dir):
+            for name in files:
+                if name.lower().endswith(".zip"):
+                    return Path(root) / name
+        raise FileNotFoundError(f"no .zip file found under {search_dir}")
+
+    def _extract_update(self, zip_path: Path) -> tuple[Path, Path]:
         """
-        最簡單版本：解壓 zip 覆蓋到 install_dir
+        解壓到 install_dir 底下的暫存資料夾（同一個檔案系統，套用時可以直接換檔）。
+        回傳 (暫存資料夾, 程式內容的根目錄)。
         """
         self.logger.info("unzip file....")
-        tmp_dir = Path(tempfile.mkdtemp(prefix="update_tmp_"))
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".update_tmp_", dir=self.install_dir))
+        try:
+            shutil.unpack_archive(str(zip_path), tmp_dir)
+            # zipball 固定多一層 <owner>-<repo>-<sha>/ 資料夾
+            return tmp_dir, next(tmp_dir.iterdir())
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def _list_files(root: Path) -> list[Path]:
+        return sorted(p.relative_to(root) for p in root.rglob("*") if p.is_file())
+
+    def _apply_files(
+        self,
+        root: Path,
+        files: list[Path],
+        backup_dir: Path,
+        removed: list[Path] = (),
+    ):
+        """
+        把 root 底下的 files 換進 install_dir、刪除 removed。
+        任何一步失敗就依 backup_dir（backup() 的結果）把已經動過的檔案還原，再把例外往外丟。
+        """
+        applied: list[tuple[Path, bool]] = []  # (相對路徑, 原本是否存在)
         try:
-            inner_zip: Path | None = None
-            for root, dirs, files in os.walk(zip_path):
-                for name in files:
-                    if name.lower().endswith(".zip"):
-                        inner_zip = Path(root) / name
-                        break
-                if inner_zip is not None:
-                    break
-
-            if inner_zip is None:
-                raise FileNotFoundError(f"no .zip file found under {zip_path}")
-            shutil.unpack_archive(str(inner_zip), tmp_dir)
-            # 假設 zip 裡面是「直接就是程式內容」，沒有多一層資料夾
-            zip_root = next(tmp_dir.iterdir())  # 你已經確定結構固定
-            for src_root, dirs, files in os.walk(zip_root):
-                rel = Path(src_root).relative_to(zip_root)
-
-                dst_dir = self.install_dir / rel
-                dst_dir.mkdir(parents=True, exist_ok=True)
-                for name in files:
-                    src = Path(src_root) / name
-                    dst = dst_dir / name
-                    print(f'Copy file: {src} to: {dst}')
-                    shutil.move(str(src), str(dst))
+            for rel in files:
+                dst = self.install_dir / rel
+                existed = dst.exists()
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(root / rel), str(dst))  # 同一檔案系統時是 os.replace，整個換掉檔案
+                applied.append((rel, existed))
+            for rel in removed:
+                dst = self.install_dir / rel
+                if dst.is_file():
+                    dst.unlink()
+                    applied.append((rel, True))
+        except BaseException:
+            self.logger.error(f"Apply failed after {len(applied)} files, rolling back")
+            self._rollback(applied, backup_dir)
+            raise
+        self.logger.info(f"Applied {len(files)} files, removed {len(removed)}")
+
+    def _rollback(self, applied: list[tuple[Path, bool]], backup_dir: Path):
+        for rel, existed in reversed(applied):
+            dst = self.install_dir / rel
+            try:
+                dst.unlink(missing_ok=True)
+                if existed:
+                    _link_or_copy(backup_dir / rel, dst)
+            except OSError as e:
+                self.logger.error(f"Rollback failed for {rel}: {e}")
+
+    def _apply_update_zip(self, zip_path: Path):
+        """
+        解壓 zip 覆蓋到 install_dir；只備份會被覆蓋的檔案。
+        zip_path 可以是 zip 檔本身或包含 zip 的資料夾。回傳備份資料夾。
+        """
+        zip_path = Path(zip_path)
+        if zip_path.is_dir():
+            zip_path = self._find_zip(zip_path)
+        tmp_dir, root = self._extract_update(zip_path)
+        try:
+            files = self._list_files(root)
+            bk_path = self.backup(files)
+            self.logger.info(f"Back up to: {bk_path}")
+            self._apply_files(root, files, bk_path)
+            return bk_path
         finally:
             shutil.rmtree(tmp_dir, ignore_errors=True)
 
+    # -------- delta update --------
+    @property
+    def _manifest_path(self) -> Path:
+        return self.install_dir / "cache" / "manifest.json"
+
+    def _load_local_manifest(self) -> dict[str, dict]:
+        try:
+            data = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+            return data.get("files", {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_local_manifest(self, files: dict[str, dict]):
+        """記錄已安裝檔案的 sha256 + size + mtime，下次比對時 mtime 沒變就不用重新雜湊。"""
+        out = {}
+        for rel, e in files.items():
+            p = self.install_dir / rel
+            if not p.is_file():
+                continue
+            st = p.stat()
+            out[rel] = {"sha256": str(e["sha256"]).lower(), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        self._manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": self.app_ver, "files": out}, indent=1), encoding="utf-8")
+        os.replace(tmp, self._manifest_path)
+
+    def _local_digests(self, remote: dict[str, dict], pool: ThreadPoolExecutor) -> dict[str, str | None]:
+        """本機檔案的 sha256；快取命中或大小就不同的檔案不用讀內容。"""
+        cached = self._load_local_manifest()
+
+        def one(rel: str) -> str | None:
+            p = self.install_dir / rel
+            try:
+                st = p.stat()
+            except OSError:
+                return None
+            c = cached.get(rel)
+            if c and c.get("size") == st.st_size and c.get("mtime_ns") == st.st_mtime_ns:
+                return c["sha256"]
+            if st.st_size != int(remote[rel]["size"]):
+                return None
+            return file_digest(p)
+
+        rels = list(remote)
+        return dict(zip(rels, pool.map(one, rels)))
+
+    def _delta_update(self, manifest_url: str, tag: str, tmpdir: Path) -> int:
+        """
+        依 manifest 只下載有變動的檔案（平行），驗證後一次套用；失敗會還原並丟出例外。
+        回傳更新的檔案數。
+        """
+        manifest_path = tmpdir / MANIFEST_ASSET
+        self._download_file(manifest_url, manifest_path, progress=False)
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        remote: dict[str, dict] = manifest["files"]
+        for rel in remote:
+            _safe_rel(rel)
+        base_url = manifest.get("base_url") or RAW_URL.format(tag=tag)
+
+        with ThreadPoolExecutor(max_workers=DELTA_WORKERS, thread_name_prefix="delta") as pool:
+            changed = diff_manifest(remote, self._local_digests(remote, pool))
+            # 上一版有、這一版沒有的檔案（只處理由 manifest 管理過的檔案，不碰使用者自己的檔案）
+            removed = sorted(
+                rel for rel in self._load_local_manifest() if rel not in remote and (self.install_dir / rel).is_file()
+            )
+            total = sum(int(remote[rel]["size"]) for rel in changed)
+            self.logger.info(
+                f"Delta update: {len(changed)}/{len(remote)} files changed "
+                f"({total / (1024 * 1024):.2f} MB), {len(removed)} removed"
+            )
+            if not changed and not removed:
+                self._save_local_manifest(remote)
+                return 0
+
+            staging = Path(tempfile.mkdtemp(prefix=".update_tmp_", dir=self.install_dir))
+            try:
+                done = [0]
+                lock = threading.Lock()
+
+                def fetch(rel: str):
+                    e = remote[rel]
+                    dst = staging / rel
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    url = e.get("url") or base_url + quote(Path(rel).as_posix())
+                    sha = self._download_file(url, dst, progress=False)
+                    if sha != str(e["sha256"]).lower() or dst.stat().st_size != int(e["size"]):
+                        raise ValueError(f"sha256/size mismatch for {rel}")
+                    with lock:
+                        done[0] += 1
+                        self.on_update(id="update", status=f"Downloading... {done[0]}/{len(changed)} files", value=self.value)
+
+                # list() 讓第一個失敗的下載直接丟出例外
+                list(pool.map(fetch, changed))
+
+                files = [Path(rel) for rel in changed]
+                gone = [Path(rel) for rel in removed]
+                bk_path = self.backup(files + gone)
+                self.logger.info(f"Back up to: {bk_path}")
+                self._apply_files(staging, files, bk_path, removed=gone)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        self._save_local_manifest(remote)
+        return len(changed)
+
+    @staticmethod
+    def _find_asset(assets: list[dict], name: str) -> dict | None:
+        return next((a for a in assets if a.get("name") == name), None)
+
     def _update_config(self,) -> dict | None:
         default = self.install_dir / "config" / "default.yaml"
         old = self.install_dir / "config" / "config.yaml"
@@ -132,20 +455,12 @@ class Updater():
         old_cfg = self._load_yaml(old)
         new_cfg = self._load_yaml(default)
 
-        new_keys = set(new_cfg.keys())
-        old_keys = set(old_cfg.keys())
-
-        if new_keys == old_keys:
+        # 遞迴補上新版 default.yaml 多出來的 key（包含巢狀），使用者的值優先
+        updated_data = deep_merge(new_cfg, old_cfg)
+        if updated_data == old_cfg:
             return None
-        
-        # TODO: key 內可能有 更多 key 需要比較
-        
-        updated_data = old_cfg
-        for nk, nv in new_cfg.items():
-            if nk not in old_keys:
-                updated_data[nk] = nv
         return updated_data
-    
+
     def _save_new(self, path: str, data: dict):
         try:
             os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
@@ -204,13 +519,16 @@ class Updater():
                 self.logger.warning("already latest version")
                 return False, None
 
-            # 先找到 version.json asset
-            ver_asset = assets[0]
+            # 先找到 version.json asset（舊的 release 沒有命名，放在第一個）
+            ver_asset = self._find_asset(assets, VERSION_ASSET) or (assets[0] if assets else None)
             if ver_asset is None:
                 self.logger.error("no version.json asset found")
                 return False, FileNotFoundError("No update info file")
 
             ver_url = ver_asset["browser_download_url"]  # 這裡用 browser_download_url 才是直接下載檔案
+            # 更新包放在固定位置，下載中斷後下次啟動可以續傳
+            dl_dir = self.install_dir / "cache" / "updates"
+            dl_dir.mkdir(parents=True, exist_ok=True)
             with tempfile.TemporaryDirectory() as tmpdir:
                 tmpdir = Path(tmpdir)
                 version_json_path = tmpdir / "version.json"
@@ -227,21 +545,32 @@ class Updater():
                     self.logger.warning("version.json says no newer version")
                     return False, None
 
+                # 有 manifest 時只下載變動的檔案，失敗（已還原）才退回整包更新
+                manifest_asset = self._find_asset(assets, MANIFEST_ASSET)
+                if manifest_asset is not None:
+                    try:
+                        n = self._delta_update(manifest_asset["browser_download_url"], tag_name, tmpdir)
+                        self.logger.info(f"Delta update applied ({n} files)")
+                        self.compear_cfg_and_update()
+                        self.logger.info("update success, please restart app")
+                        return True, None
+                    except Exception as e:
+                        self.logger.warning(f"Delta update failed ({e}), falling back to full package")
+
                 zipball_url = info["zipball_url" ] 
                 pkg_url = zipball_url
-                pkg_path = tmpdir / pkg_name
+                pkg_path = dl_dir / pkg_name
 
                 # 下載更新包
                 real_sha = self._download_file(pkg_url, pkg_path)
                 if expected_sha and real_sha.lower() != expected_sha:
                     self.logger.info(f"expected: {expected_sha}, \nbut got: {real_sha.lower()}")
                     self.logger.warning("sha256 mismatch, abort update")
+                    pkg_path.unlink(missing_ok=True)
                     return False, None
 
-                _bk_path = self.backup()
-                self.logger.info(f"Back up to: {_bk_path}")
-
-                self._apply_update_zip(tmpdir)
+                self._apply_update_zip(pkg_path)
+                pkg_path.unlink(missing_ok=True)
 
                 self.compear_cfg_and_update()
         except Exception as e:
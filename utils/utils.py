@@ -1,18 +1,22 @@
-import tensorrt as trt
-from cuda import cudart
 import numpy as np
-import cv2
-import matplotlib.pyplot as plt
+from functools import lru_cache
 
-from utils import common
+from utils.engine_meta import END2END_ROLES, check_io, meta_path, num_classes, output_roles, read_meta
 
 
 class BaseEngine(object):
     def __init__(self, engine_path):
+        # tensorrt / cuda 只在建立 engine 時才 import；cv2 也延後到用到的函式裡，import utils.utils 不載入任何重型套件
+        import tensorrt as trt
+        from cuda import cudart
+
+        from utils import common
+
         self.mean = None
         self.std = None
-        self.class_names = ["person", "bicycle", "car"]
-        self.n_classes = len(self.class_names)
+        self.meta = read_meta(engine_path)
+        self.class_names = self.meta.get("class_names") or ["person", "bicycle", "car"]
+        self.n_classes = num_classes(self.meta) or len(self.class_names)
         logger = trt.Logger(trt.Logger.WARNING)
         logger.min_severity = trt.Logger.Severity.ERROR
         runtime = trt.Runtime(logger)
@@ -50,10 +54,21 @@ class BaseEngine(object):
                 "size": size,
             }
             self.allocations.append(allocation)
+            binding["mode"] = "input" if is_input else "output"
             if self.engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT:
                 self.inputs.append(binding)
             else:
                 self.outputs.append(binding)
+        problems = check_io(
+            self.meta,
+            [{"name": b["name"], "mode": b["mode"], "shape": b["shape"], "dtype": b["dtype"].name}
+             for b in self.inputs + self.outputs],
+        )
+        if problems:
+            raise ValueError(
+                "{} does not match its metadata {}: {}".format(engine_path, meta_path(engine_path), "; ".join(problems))
+            )
+        self.roles = output_roles(self.meta, [o["name"] for o in self.outputs])
 
     def output_spec(self):
         """
@@ -73,6 +88,7 @@ class BaseEngine(object):
         :param scales: The image resize scales for each image in this batch. Default: No scale postprocessing applied.
         :return: A nested list for each image in the batch and each detection in the list.
         """
+        from utils import common
 
         # Prepare the output data.
         outputs = []
@@ -90,6 +106,8 @@ class BaseEngine(object):
         return outputs
 
     def detect_video(self, video_path, conf=0.5, end2end=False):
+        import cv2
+
         cap = cv2.VideoCapture(video_path)
         fourcc = cv2.VideoWriter_fourcc(*"XVID")
         fps = int(round(cap.get(cv2.CAP_PROP_FPS)))
@@ -117,7 +135,7 @@ class BaseEngine(object):
                 2,
             )
             if end2end:
-                num, final_boxes, final_scores, final_cls_inds = data
+                num, final_boxes, final_scores, final_cls_inds = (data[self.roles[r]] for r in END2END_ROLES)
                 final_boxes = np.reshape(final_boxes / ratio, (-1, 4))
                 dets = np.concatenate(
                     [
@@ -154,6 +172,8 @@ class BaseEngine(object):
         cv2.destroyAllWindows()
 
     def inference(self, img_path, conf=0.5, end2end=False):
+        import cv2
+
         origin_img = cv2.imread(img_path)
         # img, ratio = preproc(origin_img, self.imgsz, self.mean, self.std)
         img, ratio, dwdh = letterbox(origin_img, self.imgsz)
@@ -162,7 +182,7 @@ class BaseEngine(object):
         data = self.infer(img)
         if end2end:
             print("end2end")
-            num, final_boxes, final_scores, final_cls_inds = data
+            num, final_boxes, final_scores, final_cls_inds = (data[self.roles[r]] for r in END2END_ROLES)
             # final_boxes, final_scores, final_cls_inds  = data
             dwdh = np.asarray(dwdh * 2, dtype=np.float32)
             final_boxes -= dwdh
@@ -279,6 +299,8 @@ def multiclass_nms(boxes, scores, nms_thr, score_thr):
 
 
 def preproc(image, input_size, mean, std, swap=(2, 0, 1)):
+    import cv2
+
     if len(image.shape) == 3:
         padded_img = np.ones((input_size[0], input_size[1], 3)) * 114.0
     else:
@@ -306,6 +328,8 @@ def preproc(image, input_size, mean, std, swap=(2, 0, 1)):
 
 
 def letterbox(im, new_shape=(640, 640), color=(114, 114, 114), swap=(2, 0, 1)):
+    import cv2
+
     shape = im.shape[:2]  # current shape [height, width]
     if isinstance(new_shape, int):
         new_shape = (new_shape, new_shape)
@@ -334,6 +358,8 @@ def letterbox(im, new_shape=(640, 640), color=(114, 114, 114), swap=(2, 0, 1)):
 
 
 def rainbow_fill(size=50):  # simpler way to generate rainbow color
+    import matplotlib.pyplot as plt  # 只有畫框時才需要，不在 import 時載入
+
     cmap = plt.get_cmap("jet")
     color_list = []
 
@@ -346,10 +372,22 @@ def rainbow_fill(size=50):  # simpler way to generate rainbow color
     return np.array(color_list)
 
 
-_COLORS = rainbow_fill(80).astype(np.float32).reshape(-1, 3)
+@lru_cache(maxsize=1)
+def _colors() -> np.ndarray:
+    return rainbow_fill(80).astype(np.float32).reshape(-1, 3)
+
+
+def __getattr__(name):
+    # 舊程式碼用的 utils.utils._COLORS，第一次存取時才建立
+    if name == "_COLORS":
+        return _colors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def vis(img, boxes, scores, cls_ids, conf=0.5, class_names=None):
+    import cv2
+
+    _COLORS = _colors()
     for i in range(len(boxes)):
         box = boxes[i]
         cls_id = int(cls_ids[i])